@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多进程批量识别截图目录，结果逐条输出并写入JSONL/CSV文件，最后报告每个进程的吞吐量和启动耗时
+
+用法:
+    python batch_analyze.py [截图目录] [结果文件] [--processes N] [--chunk-size N] [--unordered] [--verbose]
+    截图目录默认为 png，结果文件（.jsonl 或 .csv）、进程数、每块截图数和是否按路径顺序输出默认读取
+    BATCH_ANALYSIS_CONFIG；--unordered 按完成顺序输出，--verbose 打印识别器的逐帧输出
+
+每个工作进程只加载一次识别器，截图按块交给进程池，每块用 StatusRecognizer.recognize_many 识别，
+结果在整块完成后立即写入文件，中途中断时已完成的结果仍然保留。
+"""
+
+import sys
+from cr.batch_analysis import BatchAnalyzer, ResultWriter, find_screenshots
+from config.config import BATCH_ANALYSIS_CONFIG
+
+
+def batch_analyze(screenshot_dir="png", output_path=None, processes=None, chunk_size=None, ordered=None,
+                  quiet=True):
+    """识别目录下的所有PNG截图，返回吞吐量统计"""
+    config = BATCH_ANALYSIS_CONFIG
+    analyzer = BatchAnalyzer(
+        processes=processes or config.get("processes"),
+        chunk_size=chunk_size or config.get("chunk_size", 16),
+        ordered=config.get("ordered", True) if ordered is None else ordered,
+        quiet=quiet
+    )
+    output_path = output_path or config.get("output_path")
+    paths = find_screenshots(screenshot_dir)
+    if not paths:
+        print(f"✗ 目录中没有截图: {screenshot_dir}")
+        return None
+    print(f"批量识别: {screenshot_dir}，共 {len(paths)} 张截图，{analyzer.processes} 个进程，"
+          f"每块 {analyzer.chunk_size} 张" + (f"，结果写入 {output_path}" if output_path else ""))
+
+    writer = ResultWriter(output_path) if output_path else None
+    try:
+        for row in analyzer.iter_results(paths):
+            if writer is not None:
+                writer.write(row)
+            print(f"  {row['path']}: {row['status'] or '未知'} ({row['similarity']:.4f})")
+    finally:
+        if writer is not None:
+            writer.close()
+
+    print()
+    analyzer.print_report()
+    if output_path:
+        print(f"✓ 结果已保存: {output_path}")
+    return analyzer.stats()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    options = {"quiet": "--verbose" not in args}
+    if "--unordered" in args:
+        options["ordered"] = False
+    positional = []
+    i = 0
+    while i < len(args):
+        if args[i] == "--processes":
+            options["processes"] = int(args[i + 1])
+            i += 1
+        elif args[i] == "--chunk-size":
+            options["chunk_size"] = int(args[i + 1])
+            i += 1
+        elif not args[i].startswith("--"):
+            positional.append(args[i])
+        i += 1
+    if positional:
+        options["screenshot_dir"] = positional[0]
+    if len(positional) > 1:
+        options["output_path"] = positional[1]
+    batch_analyze(**options)
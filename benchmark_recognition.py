@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+状态识别基准测试：在已标注的实际游戏截图上运行所有识别路径，输出JSON结果并与基线比较
+
+用法:
+    python benchmark_recognition.py [结果文件] [--baseline 基线文件] [--update-baseline]
+                                    [--repeat N] [--paths 路径1,路径2] [--no-memory]
+    结果文件默认为 benchmark_results.json，基线文件默认为 test/benchmark_baseline.json
+    识别路径: status_recognizer（按配置启用的完整流程）、template_matching、legacy，
+    以及留一法路径 probes、hash_index、classifier（每张截图用其余截图提出的像素探针、建立的哈希索引
+    或训练的分类器识别，只有它们的准确率用于判断这三个阶段是否可靠）
+
+记录每条路径的初始化耗时、各阶段（decode、probes、preprocess、hash、classifier、prefilter、coarse、button_scan、page_match）
+和总延迟的p50/p90/p99、各状态准确率以及tracemalloc峰值内存。基线存在时与之比较，
+有回归时以退出码1结束；--update-baseline 把本次结果写为新基线。
+"""
+
+import sys
+import json
+import argparse
+from cr.benchmark import BENCHMARK_PATHS, HELD_OUT_PATHS, run_benchmark, compare_results
+
+DEFAULT_OUTPUT = "benchmark_results.json"
+DEFAULT_BASELINE = "test/benchmark_baseline.json"
+
+
+def print_results(results):
+    """打印每条识别路径的摘要"""
+    for name, result in results["paths"].items():
+        total = result["latency_ms"]["total"]
+        memory = result["peak_memory_mb"]
+        print(f"\n{name}: 准确率 {result['accuracy']:.1%} ({result['frames']} 张)，初始化 {result['init_ms']:.1f}ms"
+              + (f"，峰值内存 {memory:.1f}MB" if memory is not None else "")
+              + (f"，留一法下直接给出结果 {result['decided']}/{result['frames']} 张" if "decided" in result else ""))
+        print(f"  {'阶段':<12}{'次数':>6}{'p50':>10}{'p90':>10}{'p99':>10}")
+        for stage, latency in result["latency_ms"].items():
+            print(f"  {stage:<12}{latency['frames']:>6}{latency['p50']:>10.2f}{latency['p90']:>10.2f}{latency['p99']:>10.2f}")
+        for state, state_result in result["per_state"].items():
+            print(f"  {state}: {state_result['correct']}/{state_result['frames']}")
+
+
+def benchmark_recognition(output_path=DEFAULT_OUTPUT, baseline_path=DEFAULT_BASELINE, update_baseline=False,
+                          repeat=1, paths=None, measure_memory=True):
+    """运行基准测试并与基线比较，返回是否没有回归"""
+    unknown = [name for name in paths or [] if name not in BENCHMARK_PATHS and name not in HELD_OUT_PATHS]
+    if unknown:
+        print(f"✗ 未知的识别路径: {unknown}，可选: {[*BENCHMARK_PATHS, *HELD_OUT_PATHS]}")
+        return False
+
+    results = run_benchmark(paths=paths, repeat=repeat, measure_memory=measure_memory)
+    print_results(results)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"\n✓ 结果已保存: {output_path}")
+
+    if update_baseline:
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"✓ 基线已更新: {baseline_path}")
+        return True
+
+    try:
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        print(f"⚠ 基线不存在: {baseline_path}，可使用 --update-baseline 生成")
+        return True
+    # 只比较本次运行的路径
+    baseline["paths"] = {name: result for name, result in baseline["paths"].items() if name in results["paths"]}
+    regressions = compare_results(results, baseline)
+    if regressions:
+        print(f"\n✗ 与基线相比有 {len(regressions)} 项回归:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return False
+    print(f"✓ 与基线相比没有回归: {baseline_path}")
+    return True
+
+
+def parse_args(argv=None):
+    """解析命令行参数，-h/--help 打印用法，未知参数报错退出"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("output_path", nargs="?", default=DEFAULT_OUTPUT, help=f"结果文件，默认 {DEFAULT_OUTPUT}")
+    parser.add_argument("--baseline", dest="baseline_path", default=DEFAULT_BASELINE,
+                        help=f"基线文件，默认 {DEFAULT_BASELINE}")
+    parser.add_argument("--update-baseline", action="store_true", help="把本次结果写为新基线")
+    parser.add_argument("--repeat", type=int, default=1, help="计时时每张截图识别的次数")
+    parser.add_argument("--paths", type=lambda value: value.split(","), default=None,
+                        help=f"逗号分隔的识别路径，可选: {','.join([*BENCHMARK_PATHS, *HELD_OUT_PATHS])}")
+    parser.add_argument("--no-memory", dest="measure_memory", action="store_false", help="不测量峰值内存")
+    return vars(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    sys.exit(0 if benchmark_recognition(**parse_args()) else 1)
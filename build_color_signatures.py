@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+从已标注的实际游戏截图建立每个状态的HSV颜色直方图签名，供StatusRecognizer在模板匹配前排除状态
+
+用法:
+    python build_color_signatures.py [截图目录] [签名文件]
+    截图目录默认为 png/实际游戏截图（子目录名即为状态），签名文件和交集下限默认读取
+    STATUS_RECOGNITION_CONFIG["color_prefilter"]
+
+保存前用留一法评估：每张截图与用其余截图建立的签名求交集，报告本状态的最低交集、
+其他状态的最高交集，以及按当前下限被错误排除的本状态次数和平均排除的状态数。
+"""
+
+import sys
+import time
+import numpy as np
+from cr.color_signature import ColorSignatures
+from cr.screen_classifier import labeled_images
+from cr.utils import ImageUtils
+from config.config import STATUS_RECOGNITION_CONFIG
+
+
+def evaluate_signatures(histograms, labels, min_intersection):
+    """留一法评估签名：返回本状态最低交集、其他状态最高交集、错误排除次数和平均排除数"""
+    labels = np.asarray(labels)
+    own = []
+    other = []
+    wrongly_eliminated = []
+    eliminated = 0
+    for i in range(len(labels)):
+        keep = np.arange(len(labels)) != i
+        signatures = ColorSignatures().fit(histograms[keep], labels[keep])
+        values = dict(zip(signatures.labels, np.minimum(signatures.signatures, histograms[i]).sum(axis=1).tolist()))
+        for label, value in values.items():
+            if label == labels[i]:
+                own.append(value)
+                if value < min_intersection:
+                    wrongly_eliminated.append(i)
+            else:
+                other.append(value)
+            eliminated += value < min_intersection
+    return {
+        "own_min": min(own) if own else 0.0,
+        "other_max": max(other) if other else 0.0,
+        "wrongly_eliminated": wrongly_eliminated,
+        "avg_eliminated": eliminated / len(labels) if len(labels) else 0.0
+    }
+
+
+def build_color_signatures(screenshot_dir="png/实际游戏截图", signatures_path=None):
+    """建立并保存颜色签名，输出留一法评估结果和单帧筛选耗时"""
+    config = STATUS_RECOGNITION_CONFIG.get("color_prefilter", {})
+    signatures_path = signatures_path or config.get("signatures_path", "png/status_color_signatures.npz")
+    min_intersection = config.get("min_intersection", 0.5)
+
+    images = labeled_images(screenshot_dir)
+    if not images:
+        print(f"✗ 目录中没有已标注的截图: {screenshot_dir}")
+        return None
+    labels = [label for label, _ in images]
+    print(f"建立颜色签名: {screenshot_dir}，共 {len(images)} 张截图")
+
+    # 直方图只计算一次，留一法评估和最终签名共用
+    signatures = ColorSignatures()
+    frames = [ImageUtils.load_image_array(path) for _, path in images]
+    histograms = np.stack([signatures.histogram(frame) for frame in frames])
+
+    evaluation = evaluate_signatures(histograms, labels, min_intersection)
+    print(f"\n留一法: 本状态最低交集 {evaluation['own_min']:.3f}，其他状态最高交集 {evaluation['other_max']:.3f}")
+    print(f"  交集下限 {min_intersection}: 平均每帧排除 {evaluation['avg_eliminated']:.2f} 个状态，"
+          f"错误排除本状态 {len(evaluation['wrongly_eliminated'])} 次")
+    for i in evaluation["wrongly_eliminated"]:
+        print(f"  ✗ {images[i][1]}")
+
+    signatures.fit(histograms, labels)
+    signatures.save(signatures_path)
+    print(f"\n✓ 签名已保存: {signatures_path} ({len(signatures)} 个状态: {signatures.labels})")
+
+    # 运行时帧已在内存中，测量单帧直方图和交集的耗时
+    start_time = time.perf_counter()
+    for frame in frames:
+        signatures.intersections(frame)
+    filter_us = (time.perf_counter() - start_time) / len(frames) * 1e6
+    print(f"  单帧筛选: {filter_us:.1f} 微秒")
+    evaluation["filter_us"] = filter_us
+    return evaluation
+
+
+if __name__ == "__main__":
+    build_color_signatures(*sys.argv[1:3])
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+为已标注的实际游戏截图建立感知哈希索引，供StatusRecognizer运行时快速查找
+
+用法:
+    python build_hash_index.py [截图目录] [索引文件] [dhash|phash]
+    截图目录默认为 png/实际游戏截图（子目录名即为状态），索引文件和哈希方法默认读取
+    STATUS_RECOGNITION_CONFIG["hash_index"]
+
+建立索引后用留一法评估：每张截图在去掉自身的索引中查找，报告命中率、命中结果的准确率和查找耗时。
+"""
+
+import sys
+import time
+import numpy as np
+from cr.hash_index import HashIndex
+from cr.utils import ImageUtils
+from config.config import STATUS_RECOGNITION_CONFIG
+
+
+def evaluate_index(index, max_distance):
+    """留一法评估索引：返回命中率、准确率和查找耗时（微秒）"""
+    hits = 0
+    correct = 0
+    search_times = []
+    for i in range(len(index)):
+        start_time = time.perf_counter()
+        match = index.lookup_hash(index.hashes[i], max_distance, exclude=i)
+        search_times.append((time.perf_counter() - start_time) * 1e6)
+        if match is not None:
+            hits += 1
+            correct += match[0] == index.labels[i]
+    total = len(index)
+    return {
+        "frames": total,
+        "hits": hits,
+        "hit_rate": hits / total if total else 0.0,
+        "hit_accuracy": correct / hits if hits else 0.0,
+        "search_us_p50": float(np.percentile(search_times, 50)) if search_times else 0.0,
+        "search_us_p99": float(np.percentile(search_times, 99)) if search_times else 0.0
+    }
+
+
+def build_hash_index(screenshot_dir="png/实际游戏截图", index_path=None, method=None):
+    """建立并保存哈希索引，输出建立耗时和留一法评估结果"""
+    config = STATUS_RECOGNITION_CONFIG.get("hash_index", {})
+    index_path = index_path or config.get("index_path", "png/status_hash_index.npz")
+    method = method or config.get("method", "phash")
+    max_distance = config.get("max_distance", 10)
+
+    print(f"建立哈希索引: {screenshot_dir} ({method})")
+    index = HashIndex.build(screenshot_dir, method)
+    if len(index) == 0:
+        print(f"✗ 目录中没有已标注的截图: {screenshot_dir}")
+        return None
+    index.save(index_path)
+
+    counts = {}
+    for label in index.labels:
+        counts[label] = counts.get(label, 0) + 1
+    print(f"✓ 索引已保存: {index_path}，共 {len(index)} 张截图: {counts}")
+    print(f"  建立耗时: {index.build_time:.3f} 秒（每张 {index.build_time / len(index) * 1000:.2f} 毫秒）")
+
+    # 运行时帧已在内存中，只测量哈希计算本身的耗时
+    gray = ImageUtils.load_gray_array(index.paths[0])
+    start_time = time.perf_counter()
+    for _ in range(100):
+        index.compute_hash(gray)
+    print(f"  单帧哈希耗时: {(time.perf_counter() - start_time) * 1e4:.1f} 微秒")
+
+    report = evaluate_index(index, max_distance)
+    print(f"\n留一法评估 (最大汉明距离 {max_distance}):")
+    print(f"  命中率: {report['hit_rate']:.1%} ({report['hits']}/{report['frames']})")
+    print(f"  命中准确率: {report['hit_accuracy']:.1%}")
+    print(f"  查找耗时: p50 {report['search_us_p50']:.1f} 微秒, p99 {report['search_us_p99']:.1f} 微秒")
+    return report
+
+
+if __name__ == "__main__":
+    build_hash_index(*sys.argv[1:4])
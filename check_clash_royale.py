@@ -1,22 +1,33 @@
 import time
 import os
 import subprocess
+import tempfile
+from cr.roi import get_roi_registry
+from cr.utils import ImageUtils
+from cr.window_geometry import get_geometry_service
 
 # 配置信息
 OCR_SCRIPT = "/Volumes/600g/app1/doubao获取/python/gemini_ocr.py"
 PYTHON_PATH = "/Users/aaa/python-sdk/python3.13.2/bin/python"
 
-# 创建截图目录
-if not os.path.exists('cr_check_png'):
-    os.makedirs('cr_check_png')
+# 截图目录：实时截图在首次写入时创建；分析已有图片时裁剪结果写入临时目录，不在仓库中留下文件
+CHECK_DIR = 'cr_check_png'
+OFFLINE_CHECK_DIR = os.path.join(tempfile.gettempdir(), 'cr_check_png')
+
+
+def check_filename(name, offline=False):
+    """生成带时间戳的检查截图路径，按需创建目录"""
+    directory = OFFLINE_CHECK_DIR if offline else CHECK_DIR
+    os.makedirs(directory, exist_ok=True)
+    timestamp = time.strftime("%Y%m%d_%H%M%S")
+    return os.path.join(directory, f'{name}_{timestamp}.png')
 
 # 1. 截取全屏或指定区域
 def check_clash_royale():
     print("\n=== 开始检查皇室战争界面 ===")
     
     # 截取全屏
-    timestamp = time.strftime("%Y%m%d_%H%M%S")
-    filename = f'cr_check_png/fullscreen_check_{timestamp}.png'
+    filename = check_filename('fullscreen_check')
     print(f"1. 正在截取全屏，保存为: {filename}")
     # 使用screencapture命令截取全屏
     subprocess.run(["screencapture", filename], check=True, capture_output=True, text=True)
@@ -56,8 +67,7 @@ def test_original_region():
     # 原始的WeApp区域配置
     weapp_region = (948, 31, 513, 955)
     
-    timestamp = time.strftime("%Y%m%d_%H%M%S")
-    filename = f'cr_check_png/original_region_{timestamp}.png'
+    filename = check_filename('original_region')
     print(f"1. 正在截取原始WeApp区域 {weapp_region}，保存为: {filename}")
     # 使用screencapture命令截取指定区域
     x, y, width, height = weapp_region
@@ -100,36 +110,26 @@ def extract_elixir(image_path=None):
     # 如果提供了图片路径，直接使用该图片；否则截图
     if image_path:
         print(f"1. 使用提供的图片：{image_path}")
-        # 使用PIL裁剪图片获取圣水区域
+        # 从截图中取出圣水区域
         try:
             from PIL import Image
             
-            # 打开图片
-            img = Image.open(image_path)
-            
-            # 圣水显示区域配置（x, y, width, height）
-            # 根据用户提供的信息：截图中(108, 625)坐标的地方有数字1-10
-            elixir_region = (108, 625, 108+335, 625+640)  # (left, top, right, bottom)
-            
-            # 裁剪圣水区域
-            elixir_img = img.crop(elixir_region)
+            # 圣水显示区域由ROI注册表统一定义（截图中(108, 625)坐标起有数字1-10），取原图视图后只编码该区域
+            img_np = ImageUtils.load_image_array(image_path)
+            elixir_img = Image.fromarray(get_roi_registry().view(img_np, "elixir"))
             
             # 保存裁剪后的图片
-            timestamp = time.strftime("%Y%m%d_%H%M%S")
-            filename = f'cr_check_png/elixir_region_{timestamp}.png'
+            filename = check_filename('elixir_region', offline=True)
             elixir_img.save(filename)
             print(f"2. 已裁剪圣水区域，保存为: {filename}")
         except Exception as e:
             print(f"❌ 裁剪图片失败：{e}")
             return None, image_path
     else:
-        # 圣水显示区域配置（x, y, width, height）
-        # 根据用户提供的信息：截图中(108, 625)坐标的地方有数字1-10，截图大小为335x640
-        # 这里假设用户指的是在全屏截图中，圣水区域的相对位置是(108, 625)，大小为335x640
-        elixir_region = (108, 625, 335, 640)
+        # 圣水显示区域按当前微信窗口位置换算为屏幕坐标 (x, y, width, height)
+        elixir_region = get_roi_registry().screen_region("elixir", get_geometry_service().get_region())
         
-        timestamp = time.strftime("%Y%m%d_%H%M%S")
-        filename = f'cr_check_png/elixir_region_{timestamp}.png'
+        filename = check_filename('elixir_region')
         print(f"1. 正在截取圣水区域 {elixir_region}，保存为: {filename}")
         
         # 使用screencapture命令截取指定区域
@@ -4,13 +4,19 @@
 检查皇室战争游戏当前状态的脚本
 """
 
+import sys
 import time
 import subprocess
 from cr import CRGameAutomation
+from cr.frame_writer import create_save_policy
 from config.config import BUTTON_CONFIG
 
-def check_game_status():
-    """检查游戏状态并推荐操作"""
+def check_game_status(record=False):
+    """检查游戏状态并推荐操作
+    
+    参数:
+        record: 是否录制会话（帧、识别状态和点击），录制结果可用replay_session.py回放
+    """
     # 记录开始时间
     start_time = time.time()
     print("开始检查游戏状态...")
@@ -19,10 +25,22 @@ def check_game_status():
     # 创建自动化实例
     auto = CRGameAutomation()
     
-    # 只执行一次检查
+    # 后台线程持续截图，识别和点击期间截图不再阻塞主循环
+    auto.start_capture_thread()
+    
+    # 只保留语料需要的截图：状态切换帧和低置信度帧，由后台线程异步写盘
+    if auto.frame_writer is not None:
+        auto.frame_writer.set_policy(create_save_policy(["transition", "low_confidence"]))
+    
+    if record:
+        auto.start_recording()
+    
     # 捕获屏幕并分析状态
-    while True:
-        status, screenshot_path = auto.capture_and_analyze(execute_action=True)
+    try:
+        while True:
+            status, screenshot_path = auto.capture_and_analyze(execute_action=True, save_screenshot=True)
+    finally:
+        auto.close()
     
     print(f"\n当前游戏状态: {status}")
     print(f"截图路径: {screenshot_path}")
@@ -34,4 +52,4 @@ def check_game_status():
     print(f"总流程耗时: {total_time:.2f} 秒")
 
 if __name__ == "__main__":
-    check_game_status()
+    check_game_status(record="--record" in sys.argv)
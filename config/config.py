@@ -5,7 +5,74 @@ SCREENSHOT_CONFIG = {
     "wechat_process_name": "WeChat",
     "weapp_relative_region": (0, 0, 335, 640),  # (相对x, 相对y, width, height)，相对于微信窗口左上角
     "screenshot_dir": "png",
-    "prefix": "weapp_auto"
+    "prefix": "weapp_auto",
+    # 截图后端：auto（macOS优先Quartz，其次screencapture，其他平台回放）、quartz、screencapture、replay
+    "capture_backend": "auto",
+    # 回放后端读取的图片文件或目录
+    "replay_source": "png/实际游戏截图",
+    # 实时截图是否写入磁盘，关闭后截图只在内存中流转；回放后端的截图来自已有文件，不受此项影响、默认不写盘
+    "save_screenshots": True,
+    # 回放后端下显式保存截图（auto_screenshot_clash_royale等）时写入的目录，None表示系统临时目录，避免写入png/
+    "replay_screenshot_dir": None,
+    # 后台截图线程的目标帧率
+    "capture_fps": 5.0,
+    # 后台截图环形缓冲区的槽位数量
+    "frame_buffer_size": 4,
+    # 等待后台截图线程产出新帧的超时时间（秒）
+    "frame_wait_timeout": 2.0,
+    # 窗口几何查询后端：auto（macOS使用applescript，其他平台使用static默认值）、applescript、static
+    "geometry_backend": "auto",
+    # 窗口位置缓存的最长有效时间（秒），窗口重新激活或校验失败时也会立即刷新；None表示不按时间过期
+    "geometry_max_age": 5.0,
+    # 窗口位置查询失败后使用默认值的时间（秒），之后再次尝试查询
+    "geometry_retry_interval": 5.0
+}
+
+# 常驻自动化进程配置：AppleScript和点击命令通过管道发给同一个进程执行
+AUTOMATION_WORKER_CONFIG = {
+    "enabled": True,  # 关闭后每条命令单独启动osascript/cliclick进程
+    "command": None,  # 启动工作进程的命令列表，None表示使用当前Python运行cr/automation_worker.py
+    "timeout": 10.0,  # 单条命令的响应超时时间（秒），超时后重启工作进程
+    "spawn_cost": 0.05  # 单独启动一次osascript/cliclick的估算耗时（秒），用于统计节省的耗时
+}
+
+# 截图异步保存配置
+FRAME_WRITER_CONFIG = {
+    "enabled": True,
+    # 保存策略：all（全部）、every_n（每N帧）、transition（状态变化时）、low_confidence（低置信度），
+    # 也可以写成列表，任一策略满足即保存
+    "policy": "all",
+    "every_n": 10,
+    "low_confidence_threshold": 0.6,
+    # 保存格式：png 或 npy（原始数组）
+    "format": "png",
+    "png_compress_level": 1,  # PNG压缩级别 0-9，越低写入越快
+    "workers": 2,  # 后台写入线程数量
+    "queue_size": 32  # 写入队列容量，队列满时丢弃新帧而不阻塞主循环
+}
+
+# 批量分析配置（CRGameAutomation.batch_analyze_screenshots、batch_analyze.py）
+BATCH_ANALYSIS_CONFIG = {
+    "processes": None,  # 工作进程数，None表示CPU核数；1表示在当前进程中识别
+    "chunk_size": 16,  # 每次交给工作进程的截图数
+    "ordered": True,  # 是否按文件路径顺序输出结果，False时按完成顺序输出
+    "output_path": None  # 逐条写入结果的文件（.jsonl 或 .csv），None表示不写文件
+}
+
+# 会话录制配置：录制实时循环的帧、识别状态和点击，用于离线回放
+SESSION_CONFIG = {
+    "session_dir": "sessions",  # 会话保存的根目录，每次录制新建一个带时间戳的子目录
+    "chunk_size": 32,  # 每个压缩分块包含的帧数
+    "compress_level": 1,  # 分块压缩级别 0-9，越低写入越快
+    "delta": True  # 保存相邻帧的差值，连续帧画面相近时体积小得多
+}
+
+# 感兴趣区域配置：相对坐标 (x1, y1, x2, y2)，取值0-1，相对于皇室战争截图的宽高
+ROI_CONFIG = {
+    "elixir": (0.1612, 0.4883, 0.6612, 0.9883),  # 圣水数字区域（670x1280截图中的(108, 625)起）
+    "card_strip": (0.0, 0.85, 1.0, 1.0),  # 底部15%的卡牌区域
+    "button_search": (0.0, 0.44, 1.0, 1.0),  # 按钮搜索区域（屏幕下半部分，上沿留出按钮半高的余量）
+    "game_area": (0.0, 0.0, 1.0, 0.85)  # 对战场地区域（卡牌区域以上）
 }
 
 # 状态识别配置
@@ -27,6 +94,132 @@ STATUS_RECOGNITION_CONFIG = {
             "template_path": "png/开宝箱/开宝箱界面.png",
             "threshold": 0.65
         }
+    },
+    # 多尺度按钮搜索：先在缩小的截图上按一组尺度粗搜索，再在最佳候选附近按原始分辨率精确匹配
+    "button_search": {
+        "enabled": True,  # 关闭后只按模板原始尺寸搜索
+        "scales": (0.65, 0.8, 1.0, 1.25, 1.55),  # 候选尺度（截图中按钮大小 / 模板大小），模板分别截自1026和670宽的截图
+        "coarse_factor": 4,  # 粗搜索的缩小倍数
+        "top_k": 3,  # 进入精确匹配的候选数量
+        "pixel_budget": 200000,  # 粗搜索最多计算的匹配位置数（所有尺度合计）
+        "min_template_side": 8  # 粗搜索时缩小后模板的最短边下限（像素）
+    },
+    # 按钮位置提示：记住每个按钮上一次匹配的位置和尺度，下一帧先在附近的小窗口内匹配，
+    # 窗口内的得分低于min_score时再搜索整个区域；依赖多尺度按钮搜索，批量识别（recognize_many）时不使用
+    "button_hints": {
+        "enabled": True,
+        "margin": 0.5,  # 窗口在按钮四周多留的宽度（按钮短边的倍数）
+        "min_score": 0.85  # 与按钮优先检测和候选检查的按钮阈值一致
+    },
+    # 像素探针：由discover_pixels.py --save-probes从已标注截图中提出，解码后最先检查，
+    # 恰好一个状态的探针命中比例达到min_fraction时直接返回，否则交给后续阶段
+    # 探针由基准测试的同一批截图提出，默认关闭；启用前先看 benchmark_recognition.py 中probes路径的留一法准确率
+    "probes": {
+        "enabled": False,
+        "probes_path": "png/status_probes.json",
+        "min_fraction": 1.0  # 一个状态需要命中的探针比例
+    },
+    # 感知哈希索引：由build_hash_index.py离线生成，命中时直接返回标注的状态，未命中时再做模板匹配
+    # 索引由基准测试的同一批截图建立，默认关闭；启用前先看 benchmark_recognition.py 中hash_index路径的留一法准确率
+    "hash_index": {
+        "enabled": False,
+        "index_path": "png/status_hash_index.npz",
+        "method": "phash",  # 建立索引的哈希方法：phash或dhash
+        "max_distance": 10  # 最大汉明距离（64位），同状态截图通常在10以内，不同状态在20以上
+    },
+    # 画面分类器：由train_screen_classifier.py离线训练，哈希索引未命中时先用分类器，置信度不够时再做模板匹配
+    # 训练截图与基准测试相同，默认关闭；启用前先看训练脚本报告的按会话留出准确率和基准测试classifier路径的留一法准确率
+    "classifier": {
+        "enabled": False,
+        "model_path": "png/status_classifier.npz",
+        "method": "linear",  # 训练的分类方法：linear（softmax线性模型）或knn
+        "min_confidence": 0.9  # 预测概率不低于该值时直接返回分类结果
+    },
+    # 模板仓库：所有模板只预处理一次（灰度、模糊、标准尺寸向量、掩码），快照按模板文件的修改时间失效，启动时内存映射
+    "template_store": {
+        "root_dir": "png",
+        "folders": ["战斗未开始", "战斗中", "战斗结束", "开宝箱", "其他"],
+        "snapshot_dir": "png/.template_store",  # None表示不写快照，每次启动都重新预处理
+        "blur_kernel": 3
+    },
+    # 页面ROI：每个状态只比较能区分状态的区域（相对坐标 (x1, y1, x2, y2)），不比较对战场地、背景等大面积像素，
+    # 页面相似度为区域内 1 - 平均绝对差/255，与整页相似度的取值范围不同，启用时使用这里的阈值
+    "page_rois": {
+        "enabled": True,
+        "regions": {
+            "战斗未开始": [(0.34, 0.76, 0.66, 0.86), (0.0, 0.94, 1.0, 0.96)],  # 对战按钮、底部导航栏
+            "战斗中": [(0.02, 0.85, 0.22, 0.93), (0.2, 0.965, 1.0, 0.99)],  # 表情按钮和下一张卡牌、圣水条
+            "战斗结束": [(0.36, 0.865, 0.64, 0.915), (0.1, 0.6, 0.9, 0.64)],  # 确定按钮、己方名称横幅
+            "开宝箱": [(0.4, 0.5, 0.65, 0.6), (0.25, 0.9, 0.75, 0.95)]  # 宝箱、底部问号
+        },
+        # 本状态截图的最低综合相似度与其他截图最高值的中点（png/实际游戏截图）
+        "thresholds": {
+            "战斗未开始": 0.79,  # 本状态最低 0.841，其他截图最高 0.737
+            "战斗中": 0.815,  # 本状态最低 0.832，其他截图最高 0.799
+            "战斗结束": 0.82,  # 本状态最低 0.880，其他截图最高 0.761
+            "开宝箱": 0.81  # 语料中没有开宝箱截图，其他截图最高 0.596
+        }
+    },
+    # 状态跟踪：按上一个确认状态的转移概率排列候选状态，足够确定时提前返回，省去其余模板的计算
+    "state_tracking": {
+        "enabled": True,
+        "margin": 0.025,  # 综合相似度需要超过该状态阈值的余量（战斗中: 0.815 + 0.025 = 0.84）
+        "button_threshold": 0.85,  # 按钮相似度下限，只看综合相似度无法区分战斗中和战斗结束
+        "prior_weight": 10.0,  # 先验转移权重相当于观察到的转移次数
+        "learn": True,  # 根据识别结果更新转移概率
+        # 先验转移权重：上一个状态 -> {下一帧状态: 权重}
+        "transitions": {
+            "战斗未开始": {"战斗未开始": 0.6, "战斗中": 0.4},
+            "战斗中": {"战斗中": 0.8, "战斗结束": 0.2},
+            "战斗结束": {"战斗结束": 0.5, "开宝箱": 0.25, "战斗未开始": 0.25},
+            "开宝箱": {"开宝箱": 0.5, "战斗未开始": 0.5}
+        }
+    },
+    # 颜色预筛选：由build_color_signatures.py从已标注截图建立每个状态的HSV直方图签名，
+    # 模板匹配前计算一次取样后的直方图，排除交集低于min_intersection的状态
+    "color_prefilter": {
+        "enabled": True,
+        "signatures_path": "png/status_color_signatures.npz",
+        "min_intersection": 0.5  # 实际游戏截图中本状态不低于0.88，其他状态不高于0.37
+    },
+    # 分级识别：先用模板库的标准尺寸缩略图（一次矩阵乘法）判断画面属于对战类还是菜单类，
+    # 只对该类的状态做按钮和页面匹配；两类的最高得分相差不到min_margin时不分级，检查所有状态
+    "hierarchy": {
+        "enabled": True,
+        "groups": {
+            "battle": ["战斗中", "战斗结束"],  # 画面大部分是对战场地
+            "menu": ["战斗未开始", "开宝箱"]  # 主界面和宝箱等菜单画面
+        },
+        "min_margin": 0.08  # 实际游戏截图中两类得分相差0.1以上，“其他”画面相差约0.05-0.1
+    },
+    # 各阶段的耗时预算（毫秒），超出时打印警告并计入StatusRecognizer.get_stage_stats的超预算次数
+    "stage_budgets_ms": {
+        "decode": 60,
+        "probes": 1,
+        "preprocess": 20,
+        "hash": 5,
+        "classifier": 2,
+        "prefilter": 1,
+        "coarse": 5,
+        "button_scan": 40,
+        "page_match": 20
+    },
+    # 批量识别（recognize_many）：解码线程数（None表示CPU核数）和每批的帧数，
+    # 同一批的截图同时在内存中，一次矩阵乘法算出与所有模板的得分
+    "batch_recognition": {
+        "workers": None,
+        "batch_size": 32
+    },
+    # 模板库的标准尺寸 (宽, 高)：所有状态模板缩放到该尺寸后堆叠成一个矩阵
+    "canonical_size": (64, 120),
+    # 缩放后的状态模板按截图尺寸缓存，保留最近使用的尺寸数量
+    "template_cache_size": 4,
+    # 画面变化检测：连续帧几乎相同时复用上一次的识别结果
+    "change_detection": {
+        "enabled": True,
+        "threshold": 0.005,  # 降采样签名的平均差异阈值（0-1）
+        "grid": (32, 32),  # 签名网格大小 (行数, 列数)
+        "max_skipped": 10  # 连续复用的最大次数，超过后强制重新识别
     }
 }
 
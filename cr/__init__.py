@@ -1,17 +1,28 @@
 # 皇室战争自动化工具包
 
-from cr.automation import CRGameAutomation
-from cr.screenshot import ScreenshotManager
-from cr.status_recognizer import StatusRecognizer
-from cr.button_marker import ButtonMarker
-from cr.action_executor import ActionExecutor
-from cr.yolo_detector import YoloDetector
+import importlib
 
-__all__ = [
-    'CRGameAutomation',
-    'ScreenshotManager',
-    'StatusRecognizer',
-    'ButtonMarker',
-    'ActionExecutor',
-    'YoloDetector'
-]
+# 导出的类 -> 所在模块；首次访问时才导入，只用到识别器的进程（如批量识别的工作进程）
+# 不会因为导入本包而加载自动化流程、YOLO和torch
+_EXPORTS = {
+    'CRGameAutomation': 'cr.automation',
+    'ScreenshotManager': 'cr.screenshot',
+    'StatusRecognizer': 'cr.status_recognizer',
+    'ButtonMarker': 'cr.button_marker',
+    'ActionExecutor': 'cr.action_executor',
+    'YoloDetector': 'cr.yolo_detector'
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -10,6 +10,16 @@ class ActionExecutor:
         self.button_positions = BUTTON_CONFIG
         # 初始化点击管理器
         self.click_manager = ClickManager()
+        # 点击目标，默认即点击管理器；会话回放时替换为只记录点击的对象
+        self.click_sink = self.click_manager
+        # 点击监听器，每次点击后以 (x, y, 是否成功, 当前状态行为) 调用，用于会话录制
+        self.click_listeners = []
+        # 状态行为中的等待函数，会话回放时按回放速度缩放
+        self.sleep = time.sleep
+        # 正在执行的状态行为
+        self.current_action = None
+        # 最近一次执行操作时对应的截图帧
+        self.last_frame = None
         # 定义状态到操作方法的映射
         self.action_map = {
             "战斗未开始": self.action_battle_not_started,
@@ -18,22 +28,45 @@ class ActionExecutor:
             "开宝箱": self.action_opening_chest
         }
     
-    def execute_action(self, status):
-        """根据状态执行相应的操作"""
+    def execute_action(self, status, frame=None):
+        """根据状态执行相应的操作
+        
+        参数:
+            status: 识别出的状态
+            frame: 识别所用的截图帧（可选）。帧携带截图区域时直接用它作为点击坐标系，
+                   省去点击前重新查询窗口位置
+        """
+        if frame is not None:
+            self.sync_frame(frame)
+        
         if status is None:
             print("无法识别状态，跳过执行行为")
             return False
         
         if status in self.action_map:
             print(f"\n执行状态行为: {status}")
-            return self.action_map[status]()
+            self.current_action = status
+            try:
+                return self.action_map[status]()
+            finally:
+                self.current_action = None
         else:
             print(f"未知状态: {status}，无对应行为")
             return False
     
+    def sync_frame(self, frame):
+        """记录最近一帧，并用帧的截图区域更新点击坐标系"""
+        self.last_frame = frame
+        region = getattr(frame, "region", None)
+        if region is not None:
+            self.click_manager.cr_window_region = tuple(region)
+    
     def click_with_cliclick(self, x, y):
-        """使用ClickManager执行点击操作"""
-        return self.click_manager.click(x, y)
+        """使用ClickManager执行点击操作，并通知点击监听器"""
+        success = self.click_sink.click(x, y)
+        for listener in self.click_listeners:
+            listener(x, y, success, self.current_action)
+        return success
     
     def _calculate_relative_position(self, button_pos):
         """将按钮的绝对坐标转换为相对于当前皇室战争窗口的坐标"""
@@ -120,7 +153,7 @@ class ActionExecutor:
                     # 每次点击后延迟1秒，最后一次点击后不需要延迟
                     if i < len(button_sequence):
                         print("  等待1秒...")
-                        time.sleep(1)
+                        self.sleep(1)
                 else:
                     print(f"  [警告] 按钮 {button_name} 不存在于配置中")
         
@@ -155,7 +188,7 @@ class ActionExecutor:
                 # 最后一次点击后不需要等待
                 if i < 4:
                     print("  等待2秒...")
-                    time.sleep(2)
+                    self.sleep(2)
             
             return True
         return False
\ No newline at end of file
@@ -3,9 +3,17 @@ from cr.status_recognizer import StatusRecognizer
 from cr.action_executor import ActionExecutor
 from cr.button_marker import ButtonMarker
 from cr.yolo_detector import YoloDetector
+from cr.frame_buffer import FrameRingBuffer, CaptureThread
+from cr.change_detector import FrameChangeDetector
+from cr.state_tracker import StateTracker
+from cr.frame_writer import FrameWriter, create_save_policy
+from cr.automation_worker import get_automation_client
+from cr.session import SessionRecorder
+from cr.batch_analysis import BatchAnalyzer, ResultWriter, find_screenshots
 from PIL import Image, ImageDraw
 import os
-from config.config import BUTTON_CONFIG
+import time
+from config.config import BUTTON_CONFIG, SCREENSHOT_CONFIG, STATUS_RECOGNITION_CONFIG, FRAME_WRITER_CONFIG, SESSION_CONFIG, BATCH_ANALYSIS_CONFIG
 
 class CRGameAutomation:
     """皇室战争游戏自动化工具，整合截图、状态识别和操作执行功能"""
@@ -25,41 +33,248 @@ class CRGameAutomation:
         
         # 按钮位置配置
         self.button_positions = BUTTON_CONFIG
+        
+        # 最近一次捕获的截图帧
+        self.last_frame = None
+        
+        # 后台截图线程和环形缓冲区，调用start_capture_thread后启用
+        self.capture_thread = None
+        self.frame_buffer = None
+        # 从缓冲区读帧时复用的图像数组
+        self._frame_out = None
+        
+        # 画面变化检测器，画面未变化时复用上一次的识别结果
+        change_config = STATUS_RECOGNITION_CONFIG.get("change_detection", {})
+        self.change_detector = None
+        if change_config.get("enabled", False):
+            self.change_detector = FrameChangeDetector(
+                threshold=change_config.get("threshold", 0.005),
+                grid=tuple(change_config.get("grid", (32, 32))),
+                max_skipped=change_config.get("max_skipped", 10)
+            )
+        # 上一次实际识别的结果 (status, similarity)
+        self._last_recognition = None
+        
+        # 状态跟踪器，按状态转移概率决定识别时先检查哪些状态
+        tracking_config = STATUS_RECOGNITION_CONFIG.get("state_tracking", {})
+        self.state_tracker = None
+        if tracking_config.get("enabled", False):
+            self.state_tracker = StateTracker(
+                statuses=list(STATUS_RECOGNITION_CONFIG["status_templates"].keys()),
+                transitions=tracking_config.get("transitions"),
+                prior_weight=tracking_config.get("prior_weight", 10.0),
+                learn=tracking_config.get("learn", True)
+            )
+        
+        # 截图异步写入器，按保存策略在后台线程中写盘
+        self.frame_writer = None
+        if FRAME_WRITER_CONFIG.get("enabled", False):
+            self.frame_writer = FrameWriter(
+                output_dir=self.screenshot_manager.screenshot_dir,
+                prefix=SCREENSHOT_CONFIG["prefix"],
+                fmt=FRAME_WRITER_CONFIG.get("format", "png"),
+                png_compress_level=FRAME_WRITER_CONFIG.get("png_compress_level", 1),
+                workers=FRAME_WRITER_CONFIG.get("workers", 2),
+                queue_size=FRAME_WRITER_CONFIG.get("queue_size", 32),
+                policy=create_save_policy(
+                    FRAME_WRITER_CONFIG.get("policy", "all"),
+                    every_n=FRAME_WRITER_CONFIG.get("every_n", 10),
+                    low_confidence_threshold=FRAME_WRITER_CONFIG.get("low_confidence_threshold", 0.6)
+                )
+            )
+        
+        # 会话录制器，调用start_recording后启用
+        self.session_recorder = None
+    
+    def start_recording(self, session_dir=None, chunk_size=None):
+        """开始录制会话：之后每次capture_and_analyze的帧、识别状态和点击都写入会话目录
+        
+        参数:
+            session_dir: 会话目录，默认在SESSION_CONFIG["session_dir"]下按时间创建
+            chunk_size: 每个压缩分块的帧数，默认读取配置
+        
+        返回:
+            session_dir: 实际使用的会话目录
+        """
+        self.stop_recording()
+        if session_dir is None:
+            session_dir = os.path.join(SESSION_CONFIG.get("session_dir", "sessions"),
+                                       time.strftime("session_%Y%m%d_%H%M%S"))
+        self.session_recorder = SessionRecorder(
+            session_dir,
+            chunk_size=chunk_size or SESSION_CONFIG.get("chunk_size", 32),
+            compress_level=SESSION_CONFIG.get("compress_level", 1),
+            delta=SESSION_CONFIG.get("delta", True)
+        )
+        self.action_executor.click_listeners.append(self.session_recorder.record_click)
+        print(f"✓ 开始录制会话: {session_dir}")
+        return session_dir
+    
+    def stop_recording(self):
+        """停止录制会话并写完剩余的帧"""
+        if self.session_recorder is None:
+            return
+        recorder, self.session_recorder = self.session_recorder, None
+        if recorder.record_click in self.action_executor.click_listeners:
+            self.action_executor.click_listeners.remove(recorder.record_click)
+        recorder.close()
+        print(f"✓ 会话录制已停止: {recorder.session_dir}，统计: {recorder.stats()}")
+    
+    def start_capture_thread(self, target_fps=None, buffer_size=None):
+        """启动后台截图线程，之后capture_and_analyze直接从环形缓冲区取帧
+        
+        参数:
+            target_fps: 目标截图帧率，默认读取配置中的capture_fps
+            buffer_size: 环形缓冲区槽位数量，默认读取配置中的frame_buffer_size
+        """
+        if self.capture_thread is not None and self.capture_thread.is_alive():
+            return self.capture_thread
+        
+        if target_fps is None:
+            target_fps = SCREENSHOT_CONFIG.get("capture_fps", 5.0)
+        if buffer_size is None:
+            buffer_size = SCREENSHOT_CONFIG.get("frame_buffer_size", 4)
+        
+        # 截图线程只截图不前置窗口，启动前先前置一次
+        if self.screenshot_manager.capture_backend.needs_window:
+            self.screenshot_manager.bring_clash_royale_to_front()
+        
+        self.frame_buffer = FrameRingBuffer(buffer_size)
+        self.capture_thread = CaptureThread(self.screenshot_manager, self.frame_buffer, target_fps)
+        self.capture_thread.start()
+        print(f"✓ 后台截图线程已启动 (目标帧率: {target_fps}, 缓冲区: {buffer_size})")
+        return self.capture_thread
+    
+    def stop_capture_thread(self):
+        """停止后台截图线程并输出统计信息"""
+        if self.capture_thread is None:
+            return
+        self.capture_thread.stop()
+        print(f"✓ 后台截图线程已停止: {self.capture_thread.stats()}，缓冲区: {self.frame_buffer.stats()}")
+        self.capture_thread = None
+    
+    def close(self):
+        """停止后台截图线程和会话录制，等待异步写入器写完剩余截图，并关闭常驻自动化进程"""
+        self.stop_capture_thread()
+        self.stop_recording()
+        if self.frame_writer is not None:
+            self.frame_writer.close()
+            print(f"✓ 截图写入器已关闭: {self.frame_writer.stats()}")
+            self.frame_writer = None
+        automation = get_automation_client()
+        if automation.is_running():
+            print(f"✓ 自动化进程已关闭: {automation.stats()}")
+            automation.close()
+    
+    def _capture_frame(self, prefix, skip_bring_to_front, save_screenshot):
+        """获取下一帧：后台线程运行时从环形缓冲区读取最新的新帧，否则同步截图"""
+        if self.capture_thread is None or not self.capture_thread.is_alive():
+            return self.screenshot_manager.capture_frame(prefix, skip_bring_to_front=skip_bring_to_front, save=save_screenshot)
+        
+        last_timestamp = self.last_frame.timestamp if self.last_frame is not None else 0.0
+        timeout = SCREENSHOT_CONFIG.get("frame_wait_timeout", 2.0)
+        frame = self.frame_buffer.next_after(last_timestamp, timeout=timeout, out=self._frame_out, newest=True)
+        if frame is None:
+            return None
+        # 下一轮复用同一块数组，循环中不再为每帧分配图像
+        self._frame_out = frame.image
+        
+        if save_screenshot:
+            self.screenshot_manager.save_frame(frame, prefix)
+        return frame
     
-    def capture_and_analyze(self, prefix="weapp_auto", execute_action=False, skip_bring_to_front=False):
+    def capture_and_analyze(self, prefix="weapp_auto", execute_action=False, skip_bring_to_front=False, save_screenshot=None):
         """截取屏幕并分析状态，可选择执行相应行为
         
         参数:
             prefix: 截图文件名前缀
             execute_action: 是否执行相应行为，默认不执行
             skip_bring_to_front: 是否跳过窗口前置操作，用于连续截图优化
+            save_screenshot: 是否保存截图，默认读取配置中的save_screenshots；启用异步写入器时
+                             由FRAME_WRITER_CONFIG的保存策略决定哪些帧落盘，写盘不阻塞主循环
+        
+        返回:
+            (status, screenshot_path): 识别状态和截图路径（未保存时路径为None，帧可从last_frame获取）
         """
         print("\n===== 开始捕获并分析屏幕 =====")
         
-        # 1. 截取屏幕 - 使用优化后的方法，支持跳过前置操作
-        screenshot_path = self.screenshot_manager.auto_screenshot_clash_royale(prefix, skip_bring_to_front=skip_bring_to_front)
-        if not screenshot_path:
+        if save_screenshot is None:
+            save_screenshot = self.screenshot_manager.save_screenshots
+        # 启用异步写入器时截图阶段不写盘，识别完成后再按策略提交
+        save_async = save_screenshot and self.frame_writer is not None
+        
+        # 1. 截取屏幕 - 得到内存中的帧，后台截图线程运行时直接从缓冲区读取
+        frame = self._capture_frame(prefix, skip_bring_to_front, save_screenshot and not save_async)
+        if frame is None:
             print("✗ 截图失败，无法继续分析")
             return None, None
+        self.last_frame = frame
+        
+        # 2. 分析状态 - 直接使用已解码的帧，画面未变化时复用上一次的结果
+        status, similarity = self._recognize_frame(frame)
         
-        # 2. 分析状态
-        status, similarity = self.status_recognizer.recognize_status(screenshot_path)
+        # 3. 按保存策略异步保存截图
+        if save_async:
+            self.frame_writer.submit(frame, status, similarity, prefix=prefix)
+        if self.session_recorder is not None:
+            self.session_recorder.record_frame(frame, status, similarity)
         
         if status:
             print(f"✓ 成功识别状态: {status} (相似度: {similarity:.4f})")
-            # 3. 执行相应行为（如果execute_action为True）
+            # 4. 执行相应行为（如果execute_action为True）
             if execute_action:
-                self.execute_smart_action(status, screenshot_path)
+                self.execute_smart_action(status, frame)
         else:
             print(f"✗ 无法识别状态 (最高相似度: {similarity:.4f})")
         
         print("===== 捕获分析完成 =====")
-        return status, screenshot_path
+        return status, frame.path
+    
+    def _recognize_frame(self, frame):
+        """识别帧状态，画面与上一次识别的帧几乎相同时跳过识别"""
+        if self.change_detector is not None:
+            if not self.change_detector.should_recognize(frame) and self._last_recognition is not None:
+                status, similarity = self._last_recognition
+                stats = self.change_detector.stats()
+                print(f"画面未变化 (差异: {self.change_detector.last_diff:.4f})，复用上一次识别结果: {status}"
+                      f" (已跳过 {stats['skipped']}/{stats['checked']} 次识别)")
+                return status, similarity
+        
+        if self.state_tracker is None:
+            status, similarity = self.status_recognizer.recognize_status(frame)
+        else:
+            recognizer = self.status_recognizer
+            status, similarity = recognizer.recognize_status(frame, candidates=self.state_tracker.candidates())
+            self.state_tracker.update(status, recognizer.last_evaluations, recognizer.total_evaluations,
+                                      recognizer.last_early_stop, recognizer.last_candidates_checked)
+            stats = self.state_tracker.stats()
+            print(f"状态跟踪: 模板计算 {recognizer.last_evaluations}/{recognizer.total_evaluations} 次，"
+                  f"本帧节省 {stats['last_saved']} 次，平均每帧节省 {stats['avg_saved_per_frame']:.2f} 次")
+        self._last_recognition = (status, similarity)
+        return status, similarity
+    
+    def get_recognition_stats(self):
+        """返回画面变化检测跳过识别的统计信息"""
+        if self.change_detector is None:
+            return None
+        return self.change_detector.stats()
+    
+    def get_state_tracking_stats(self):
+        """返回状态跟踪的统计信息：提前返回次数和节省的模板计算次数"""
+        if self.state_tracker is None:
+            return None
+        return self.state_tracker.stats()
     
-    def execute_smart_action(self, status, screenshot_path):
-        """根据状态执行智能行为"""
+    def execute_smart_action(self, status, screenshot=None):
+        """根据状态执行智能行为
+        
+        参数:
+            status: 识别出的状态
+            screenshot: 对应的截图帧或截图路径（可选）
+        """
         print(f"\n执行智能行为: {status}")
-        return self.action_executor.execute_action(status)
+        frame = screenshot if hasattr(screenshot, "image") else None
+        return self.action_executor.execute_action(status, frame)
     
     def analyze_existing_screenshot(self, screenshot_path):
         """分析已存在的截图"""
@@ -69,36 +284,60 @@ class CRGameAutomation:
         
         return self.status_recognizer.process_screenshot(screenshot_path)
     
-    def batch_analyze_screenshots(self, screenshot_dir="png"):
-        """批量分析指定目录下的截图"""
+    def batch_analyze_screenshots(self, screenshot_dir="png", output_path=None, processes=None,
+                                  chunk_size=None, ordered=None):
+        """批量分析指定目录下的截图，每条结果识别完成后立即打印并写入结果文件
+        
+        参数:
+            screenshot_dir: 截图目录（递归查找PNG文件）
+            output_path: 逐条写入结果的文件（.jsonl 或 .csv），默认读取 BATCH_ANALYSIS_CONFIG
+            processes: 工作进程数，1表示使用本实例的识别器在当前进程中识别
+            chunk_size: 每次交给工作进程的截图数
+            ordered: 是否按文件路径顺序输出结果
+        
+        返回:
+            results: (文件路径, 状态, 相似度) 列表
+        """
         print(f"\n===== 开始批量分析截图 =====")
         print(f"分析目录: {screenshot_dir}")
         
-        # 遍历目录下的所有PNG文件
-        results = []
-        for root, dirs, files in os.walk(screenshot_dir):
-            for file in files:
-                if file.endswith(".png"):
-                    file_path = os.path.join(root, file)
-                    status, similarity = self.status_recognizer.recognize_status(file_path)
-                    results.append((file_path, status, similarity))
+        config = BATCH_ANALYSIS_CONFIG
+        analyzer = BatchAnalyzer(
+            processes=processes or config.get("processes"),
+            chunk_size=chunk_size or config.get("chunk_size", 16),
+            ordered=config.get("ordered", True) if ordered is None else ordered,
+            recognizer=self.status_recognizer
+        )
+        output_path = output_path or config.get("output_path")
+        file_paths = find_screenshots(screenshot_dir)
+        print(f"共 {len(file_paths)} 个文件，{analyzer.processes} 个进程，每块 {analyzer.chunk_size} 张"
+              + (f"，结果写入 {output_path}" if output_path else ""))
         
         # 输出结果
-        print("\n批量分析结果:")
         print("-" * 70)
         print(f"{'文件路径':<50} {'状态':<15} {'相似度':<10}")
         print("-" * 70)
         
-        for file_path, status, similarity in results:
-            status_str = status if status else "未知"
-            # 分开格式化，避免复合格式问题
-            file_name = os.path.basename(file_path).ljust(50)
-            status_str = status_str.ljust(15)
-            similarity_str = f"{similarity:.4f}".ljust(10)
-            print(f"{file_name} {status_str} {similarity_str}")
+        results = []
+        writer = ResultWriter(output_path) if output_path else None
+        try:
+            for row in analyzer.iter_results(file_paths):
+                if writer is not None:
+                    writer.write(row)
+                results.append((row["path"], row["status"], row["similarity"]))
+                status_str = row["status"] if row["status"] else "未知"
+                # 分开格式化，避免复合格式问题
+                file_name = os.path.basename(row["path"]).ljust(50)
+                status_str = status_str.ljust(15)
+                similarity_str = f"{row['similarity']:.4f}".ljust(10)
+                print(f"{file_name} {status_str} {similarity_str}")
+        finally:
+            if writer is not None:
+                writer.close()
         
         print("-" * 70)
         print(f"总计分析: {len(results)} 个文件")
+        analyzer.print_report()
         print("===== 批量分析完成 =====")
         
         return results
@@ -154,7 +393,7 @@ class CRGameAutomation:
         """检测战斗画面中的元素
         
         参数:
-            screenshot_path: 战斗截图路径
+            screenshot_path: 战斗截图路径、RGB numpy数组或Frame对象
             
         返回:
             detected_elements: 检测到的战斗元素
@@ -169,7 +408,7 @@ class CRGameAutomation:
         """计算最佳下兵位置
         
         参数:
-            screenshot_path: 战斗截图路径
+            screenshot_path: 战斗截图路径、RGB numpy数组或Frame对象
             
         返回:
             best_position: 最佳下兵位置 (x, y)
@@ -184,10 +423,8 @@ class CRGameAutomation:
             return None
         
         # 获取图片形状
-        import cv2
-        image = cv2.imread(screenshot_path)
+        image = self.yolo_detector.load_bgr_image(screenshot_path)
         if image is None:
-            print(f"✗ 无法加载图片: {screenshot_path}")
             return None
         
         # 计算最佳下兵位置
@@ -200,7 +437,7 @@ class CRGameAutomation:
         """分析战斗截图并给出下兵建议
         
         参数:
-            screenshot_path: 战斗截图路径
+            screenshot_path: 战斗截图路径、RGB numpy数组或Frame对象
             output_path: 可视化结果输出路径
             
         返回:
@@ -230,18 +467,19 @@ class CRGameAutomation:
         print("\n===== 开始捕获战斗画面 =====")
         
         # 截取屏幕
-        screenshot_path = self.screenshot_manager.auto_screenshot_clash_royale(prefix)
-        if not screenshot_path:
+        frame = self.screenshot_manager.capture_frame(prefix)
+        if frame is None:
             print("✗ 截图失败，无法继续分析")
             return None
+        self.last_frame = frame
         
         # 识别状态
-        status, similarity = self.status_recognizer.recognize_status(screenshot_path)
+        status, similarity = self.status_recognizer.recognize_status(frame)
         
         if status == "战斗中":
             print(f"✓ 识别为战斗状态，开始分析下兵位置")
-            # 分析战斗截图
-            best_position = self.analyze_battle_screenshot(screenshot_path)
+            # 分析战斗截图，已保存时可视化结果写在截图旁边
+            best_position = self.analyze_battle_screenshot(frame.path or frame)
             return best_position
         else:
             print(f"✗ 当前不是战斗状态: {status}")
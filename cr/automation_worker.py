@@ -0,0 +1,439 @@
+"""常驻自动化进程：通过管道（JSON行）执行AppleScript和点击命令
+
+客户端 AutomationWorkerClient 负责启动、通信和异常重启；直接运行本文件即为工作进程。
+工作进程只依赖标准库，安装了pyobjc时AppleScript编译后常驻内存、点击直接发送Quartz事件，
+否则退回到调用osascript/cliclick命令。
+"""
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+# AppleScript布尔值描述符类型（四字符码'true'和'fals'）
+_TYPE_TRUE = 0x74727565
+_TYPE_FALSE = 0x66616C73
+
+
+class AutomationWorkerError(RuntimeError):
+    """自动化进程启动、通信或执行命令失败"""
+
+
+# ---------------------------------------------------------------------------
+# 工作进程
+# ---------------------------------------------------------------------------
+
+def _completed(returncode=0, stdout="", stderr=""):
+    return {"returncode": returncode, "stdout": stdout, "stderr": stderr}
+
+
+def _run_command(args):
+    result = subprocess.run(args, capture_output=True, text=True)
+    return _completed(result.returncode, result.stdout, result.stderr)
+
+
+class AppleScriptRunner:
+    """执行AppleScript，pyobjc可用时按脚本文本缓存编译结果"""
+
+    def __init__(self):
+        try:
+            from Foundation import NSAppleScript
+            self.NSAppleScript = NSAppleScript
+        except ImportError:
+            self.NSAppleScript = None
+        self._compiled = {}
+
+    @staticmethod
+    def _descriptor_to_text(descriptor):
+        """把AppleScript返回值转换为与osascript输出一致的文本"""
+        if descriptor is None:
+            return ""
+        text = descriptor.stringValue()
+        if text is not None:
+            return text
+        count = descriptor.numberOfItems()
+        if count > 0:
+            items = [AppleScriptRunner._descriptor_to_text(descriptor.descriptorAtIndex_(i)) for i in range(1, count + 1)]
+            return ", ".join(items)
+        if descriptor.descriptorType() == _TYPE_TRUE:
+            return "true"
+        if descriptor.descriptorType() == _TYPE_FALSE:
+            return "false"
+        return ""
+
+    def run(self, script):
+        if self.NSAppleScript is None:
+            result = _run_command(["osascript", "-e", script])
+            result["cached"] = False
+            return result
+
+        cached = script in self._compiled
+        if not cached:
+            compiled = self.NSAppleScript.alloc().initWithSource_(script)
+            ok, error = compiled.compileAndReturnError_(None)
+            if not ok:
+                result = _completed(1, stderr=str(error.get("NSAppleScriptErrorMessage", error)))
+                result["cached"] = False
+                return result
+            self._compiled[script] = compiled
+
+        descriptor, error = self._compiled[script].executeAndReturnError_(None)
+        if descriptor is None:
+            result = _completed(1, stderr=str(error.get("NSAppleScriptErrorMessage", error)))
+        else:
+            result = _completed(stdout=self._descriptor_to_text(descriptor) + "\n")
+        result["cached"] = cached
+        return result
+
+
+class ClickRunner:
+    """执行cliclick风格的命令，pyobjc可用时直接发送Quartz鼠标事件"""
+
+    def __init__(self):
+        try:
+            import Quartz
+            self.Quartz = Quartz
+        except ImportError:
+            self.Quartz = None
+
+    def _post_mouse(self, event_type, x, y, click_state=1):
+        Quartz = self.Quartz
+        event = Quartz.CGEventCreateMouseEvent(None, event_type, (x, y), Quartz.kCGMouseButtonLeft)
+        Quartz.CGEventSetIntegerValueField(event, Quartz.kCGMouseEventClickState, click_state)
+        Quartz.CGEventPost(Quartz.kCGHIDEventTap, event)
+
+    def _run_quartz(self, commands):
+        """执行c:x,y、dc:x,y、m:x,y命令，遇到其他命令返回False交给cliclick处理"""
+        parsed = []
+        for command in commands:
+            action, _, coords = command.partition(":")
+            if action not in ("c", "dc", "m"):
+                return False
+            x, y = (int(value) for value in coords.split(","))
+            parsed.append((action, x, y))
+
+        Quartz = self.Quartz
+        for action, x, y in parsed:
+            self._post_mouse(Quartz.kCGEventMouseMoved, x, y)
+            if action == "m":
+                continue
+            clicks = 2 if action == "dc" else 1
+            for click_state in range(1, clicks + 1):
+                self._post_mouse(Quartz.kCGEventLeftMouseDown, x, y, click_state)
+                self._post_mouse(Quartz.kCGEventLeftMouseUp, x, y, click_state)
+        return True
+
+    def run(self, args):
+        if self.Quartz is not None:
+            # -e 缓动参数只影响移动动画，直接发送事件时忽略
+            commands = list(args)
+            if commands[:1] == ["-e"]:
+                commands = commands[2:]
+            if self._run_quartz(commands):
+                return _completed()
+        return _run_command(["cliclick"] + list(args))
+
+
+def create_default_handlers():
+    """创建工作进程的命令处理函数，键为命令名称，值接收请求字典并返回结果字典"""
+    applescript = AppleScriptRunner()
+    clicker = ClickRunner()
+    return {
+        "ping": lambda request: {"pid": os.getpid()},
+        "osascript": lambda request: applescript.run(request["script"]),
+        "cliclick": lambda request: clicker.run(request["args"])
+    }
+
+
+def handle_request(request, handlers):
+    """执行一条请求并生成响应，处理函数抛出的异常作为错误返回"""
+    start_time = time.time()
+    response = {"id": request.get("id")}
+    handler = handlers.get(request.get("op"))
+    if handler is None:
+        response.update(ok=False, error=f"未知命令: {request.get('op')}")
+    else:
+        try:
+            response.update(ok=True, result=handler(request))
+        except Exception as e:
+            response.update(ok=False, error=f"{type(e).__name__}: {e}")
+    response["elapsed"] = time.time() - start_time
+    return response
+
+
+def serve(handlers=None, stdin=None, stdout=None):
+    """工作进程主循环：逐行读取JSON请求，逐行写回JSON响应，标准输入关闭时退出"""
+    handlers = handlers or create_default_handlers()
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    for line in stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            response = {"id": None, "ok": False, "error": f"无法解析请求: {e}", "elapsed": 0.0}
+        else:
+            response = handle_request(request, handlers)
+        stdout.write(json.dumps(response, ensure_ascii=False) + "\n")
+        stdout.flush()
+
+
+# ---------------------------------------------------------------------------
+# 客户端
+# ---------------------------------------------------------------------------
+
+class AutomationWorkerClient:
+    """自动化进程客户端，cr/中所有AppleScript和点击命令都通过它执行
+
+    工作进程在第一次请求时启动。进程退出后下一次请求会自动重启；
+    请求发送前进程已退出时重启后重新发送，执行中途退出则报错而不重复执行（避免重复点击）。
+    """
+
+    def __init__(self, command=None, enabled=True, timeout=10.0, spawn_cost=0.05):
+        """初始化客户端
+
+        参数:
+            command: 启动工作进程的命令列表，默认用当前解释器运行本文件
+            enabled: 为False时不启动工作进程，每条命令在当前进程中直接执行（每次启动osascript/cliclick）
+            timeout: 等待单条命令响应的超时时间（秒），超时后结束并重启工作进程
+            spawn_cost: 启动一次osascript/cliclick进程的估算耗时（秒），用于统计节省的耗时
+        """
+        self.command = command or [sys.executable, os.path.abspath(__file__)]
+        self.enabled = enabled
+        self.timeout = timeout
+        self.spawn_cost = spawn_cost
+        self._process = None
+        self._responses = None
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._local_handlers = None
+        # 统计信息
+        self.starts = 0
+        self.restarts = 0
+        self.requests = 0
+        self.failures = 0
+        self.cached_scripts = 0
+        self.startup_time = 0.0
+        self.roundtrip_time = 0.0
+        self.exec_time = 0.0
+        self.op_counts = {}
+
+    # 进程管理 -------------------------------------------------------------
+
+    def is_running(self):
+        """工作进程是否在运行"""
+        return self._process is not None and self._process.poll() is None
+
+    @staticmethod
+    def _read_responses(stdout, responses):
+        """后台读取工作进程输出，进程退出时放入None"""
+        for line in stdout:
+            responses.put(line)
+        responses.put(None)
+
+    def _start(self):
+        start_time = time.time()
+        try:
+            self._process = subprocess.Popen(self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                             text=True, encoding="utf-8", bufsize=1)
+        except OSError as e:
+            self._process = None
+            raise AutomationWorkerError(f"无法启动自动化进程: {e}")
+        self._responses = queue.Queue()
+        reader = threading.Thread(target=self._read_responses, args=(self._process.stdout, self._responses),
+                                  name="AutomationWorkerReader", daemon=True)
+        reader.start()
+        if self.starts > 0:
+            self.restarts += 1
+            print(f"⚠ 自动化进程已重启（第{self.restarts}次）")
+        self.starts += 1
+        self.startup_time += time.time() - start_time
+
+    def _stop(self):
+        process, self._process = self._process, None
+        if process is None:
+            return
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+        try:
+            process.wait(timeout=1.0)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+    def start(self):
+        """启动工作进程（已运行时不做任何事）"""
+        with self._lock:
+            if self.enabled and not self.is_running():
+                self._stop()
+                self._start()
+
+    def restart(self):
+        """结束并重新启动工作进程"""
+        with self._lock:
+            self._stop()
+            self._start()
+
+    def close(self):
+        """关闭工作进程"""
+        with self._lock:
+            self._stop()
+
+    # 请求 -----------------------------------------------------------------
+
+    def _send(self, request):
+        """发送请求，进程未运行或管道已断开时重启后重试一次"""
+        line = json.dumps(request, ensure_ascii=False) + "\n"
+        for attempt in range(2):
+            if not self.is_running():
+                self._stop()
+                self._start()
+            try:
+                self._process.stdin.write(line)
+                self._process.stdin.flush()
+                return
+            except (BrokenPipeError, OSError) as e:
+                if attempt == 1:
+                    raise AutomationWorkerError(f"无法向自动化进程发送命令: {e}")
+                self._stop()
+
+    def _receive(self, request_id):
+        deadline = time.time() + self.timeout
+        while True:
+            remaining = deadline - time.time()
+            try:
+                line = self._responses.get(timeout=max(0.0, remaining))
+            except queue.Empty:
+                self._stop()
+                raise AutomationWorkerError(f"自动化进程响应超时（{self.timeout}秒），已结束进程")
+            if line is None:
+                self._stop()
+                raise AutomationWorkerError("自动化进程在执行命令时退出")
+            response = json.loads(line)
+            # 丢弃之前超时请求的迟到响应
+            if response.get("id") == request_id:
+                return response
+
+    def request(self, op, **params):
+        """执行一条命令并返回结果字典
+
+        参数:
+            op: 命令名称，如osascript、cliclick、ping
+            **params: 命令参数
+
+        返回:
+            result: 工作进程返回的结果字典
+        """
+        with self._lock:
+            self._next_id += 1
+            request = dict(params, id=self._next_id, op=op)
+            start_time = time.time()
+            try:
+                if self.enabled:
+                    self._send(request)
+                    response = self._receive(request["id"])
+                else:
+                    if self._local_handlers is None:
+                        self._local_handlers = create_default_handlers()
+                    response = handle_request(request, self._local_handlers)
+            except AutomationWorkerError:
+                self.failures += 1
+                raise
+            self.requests += 1
+            self.op_counts[op] = self.op_counts.get(op, 0) + 1
+            self.roundtrip_time += time.time() - start_time
+            self.exec_time += response.get("elapsed", 0.0)
+
+        if not response.get("ok"):
+            self.failures += 1
+            raise AutomationWorkerError(response.get("error", "未知错误"))
+        result = response.get("result") or {}
+        if result.get("cached"):
+            self.cached_scripts += 1
+        return result
+
+    @staticmethod
+    def _to_completed_process(args, result, check):
+        completed = subprocess.CompletedProcess(args, result.get("returncode", 0),
+                                                result.get("stdout", ""), result.get("stderr", ""))
+        if check:
+            completed.check_returncode()
+        return completed
+
+    def run_osascript(self, script, check=False):
+        """执行AppleScript，返回与subprocess.run相同格式的CompletedProcess"""
+        result = self.request("osascript", script=script)
+        return self._to_completed_process(["osascript", "-e", script], result, check)
+
+    def run_cliclick(self, *args, check=True):
+        """执行cliclick命令，如 run_cliclick("c:100,200")"""
+        result = self.request("cliclick", args=[str(arg) for arg in args])
+        return self._to_completed_process(["cliclick"] + list(args), result, check)
+
+    def ping(self):
+        """检查工作进程是否正常响应，返回工作进程PID"""
+        return self.request("ping").get("pid")
+
+    def stats(self):
+        """返回请求统计信息，包括相对每条命令启动新进程估算节省的进程数和耗时"""
+        with self._lock:
+            requests = self.requests
+            average_roundtrip = self.roundtrip_time / requests if requests else 0.0
+            spawns_saved = requests - self.starts if self.enabled else 0
+            return {
+                "enabled": self.enabled,
+                "running": self.is_running(),
+                "requests": requests,
+                "op_counts": dict(self.op_counts),
+                "starts": self.starts,
+                "restarts": self.restarts,
+                "failures": self.failures,
+                "cached_scripts": self.cached_scripts,
+                "avg_roundtrip_time": average_roundtrip,
+                "avg_exec_time": self.exec_time / requests if requests else 0.0,
+                "ipc_overhead": (self.roundtrip_time - self.exec_time) / requests if requests else 0.0,
+                "startup_time": self.startup_time,
+                "spawns_saved": max(0, spawns_saved),
+                "latency_saved": max(0.0, spawns_saved * self.spawn_cost - self.startup_time)
+            }
+
+
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+
+def get_automation_client():
+    """获取进程内共享的自动化进程客户端，首次调用时根据配置创建"""
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is None:
+            from config.config import AUTOMATION_WORKER_CONFIG
+            _shared_client = AutomationWorkerClient(
+                command=AUTOMATION_WORKER_CONFIG.get("command"),
+                enabled=AUTOMATION_WORKER_CONFIG.get("enabled", True),
+                timeout=AUTOMATION_WORKER_CONFIG.get("timeout", 10.0),
+                spawn_cost=AUTOMATION_WORKER_CONFIG.get("spawn_cost", 0.05)
+            )
+        return _shared_client
+
+
+def set_automation_client(client):
+    """替换共享的自动化进程客户端，传入None时下次使用会按配置重新创建"""
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is not None and _shared_client is not client:
+            _shared_client.close()
+        _shared_client = client
+
+
+if __name__ == "__main__":
+    # 与客户端约定使用UTF-8传输，不受系统区域设置影响
+    sys.stdin.reconfigure(encoding="utf-8")
+    sys.stdout.reconfigure(encoding="utf-8")
+    serve()
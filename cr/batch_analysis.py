@@ -0,0 +1,254 @@
+import os
+import io
+import csv
+import json
+import time
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from cr.status_recognizer import StatusRecognizer
+
+# 支持的结果文件格式（按扩展名选择）
+RESULT_FORMATS = (".jsonl", ".csv")
+# 每条结果的字段，CSV按此顺序写表头
+RESULT_FIELDS = ("path", "status", "similarity", "decode_ms", "recognize_ms", "worker")
+
+# 工作进程中的识别器，每个进程在初始化时加载一次
+_worker_recognizer = None
+# 工作进程从提交进程池到加载完识别器的耗时（秒），随该进程的第一块结果返回一次
+_worker_startup = None
+
+
+def find_screenshots(screenshot_dir, extensions=(".png",)):
+    """递归列出目录下的截图，按路径排序，保证每次运行的顺序一致"""
+    paths = []
+    for root, dirs, files in os.walk(screenshot_dir):
+        for file in files:
+            if file.lower().endswith(extensions):
+                paths.append(os.path.join(root, file))
+    return sorted(paths)
+
+
+def _output(quiet):
+    """quiet时丢弃识别器的逐帧输出，否则照常打印"""
+    return contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext()
+
+
+def _init_worker(quiet, started=None):
+    """工作进程初始化：加载一次识别器
+
+    参数:
+        started: 主进程创建进程池时的time.time()，用于计算包括启动进程和导入模块在内的启动耗时
+    """
+    global _worker_recognizer, _worker_startup
+    with _output(quiet):
+        _worker_recognizer = StatusRecognizer()
+    if started is not None:
+        _worker_startup = time.time() - started
+
+
+def analyze_chunk(paths, recognizer=None, quiet=True):
+    """用recognize_many识别一块截图
+
+    参数:
+        paths: 截图路径列表
+        recognizer: 使用的识别器，None表示当前工作进程初始化时加载的识别器
+        quiet: 是否丢弃识别过程中的逐帧输出
+
+    返回:
+        (rows, seconds, startup): 每张截图一条结果字典，识别这块截图的耗时，以及工作进程的启动耗时
+            （只在该进程的第一块结果中返回，其余为None）
+    """
+    global _worker_startup
+    startup, _worker_startup = _worker_startup, None
+    recognizer = recognizer or _worker_recognizer
+    start_time = time.perf_counter()
+    # 进程池已经用满了所有核，进程内只用一个解码线程（仍与识别重叠）
+    with _output(quiet):
+        results = recognizer.recognize_many(paths, workers=1)
+    seconds = time.perf_counter() - start_time
+    worker = os.getpid()
+    rows = [{
+        "path": row["source"],
+        "status": row["status"],
+        "similarity": round(float(row["similarity"]), 6),
+        "decode_ms": round(float(row["decode_ms"]), 3),
+        "recognize_ms": round(float(row["recognize_ms"]), 3),
+        "worker": worker
+    } for row in results]
+    return rows, seconds, startup
+
+
+class ResultWriter:
+    """逐条写入识别结果，按扩展名选择JSONL或CSV，每条写入后立即刷新，中断时已完成的结果不会丢失"""
+
+    def __init__(self, path):
+        """初始化结果文件
+
+        参数:
+            path: 结果文件路径，扩展名为 .jsonl 或 .csv
+        """
+        self.path = path
+        self.format = os.path.splitext(path)[1].lower()
+        if self.format not in RESULT_FORMATS:
+            raise ValueError(f"不支持的结果格式: {path}，可选扩展名: {RESULT_FORMATS}")
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "w", encoding="utf-8", newline="")
+        self._csv = None
+        if self.format == ".csv":
+            self._csv = csv.DictWriter(self._file, fieldnames=RESULT_FIELDS)
+            self._csv.writeheader()
+        self.written = 0
+
+    def write(self, row):
+        """写入一条结果"""
+        if self._csv is not None:
+            self._csv.writerow({**row, "status": row["status"] or ""})
+        else:
+            self._file.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self.written += 1
+
+    def close(self):
+        """关闭结果文件"""
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+
+class BatchAnalyzer:
+    """多进程流式批量识别：截图按chunk_size分块交给进程池，每个工作进程只加载一次识别器
+
+    每块完成后立即逐条产出结果；ordered为True时先缓存提前完成的块，按输入顺序产出。
+    processes不大于1时在当前进程中用传入的识别器识别，不启动进程池。
+    """
+
+    def __init__(self, processes=None, chunk_size=16, ordered=True, recognizer=None, quiet=True):
+        """初始化批量识别
+
+        参数:
+            processes: 工作进程数，None表示CPU核数
+            chunk_size: 每块的截图数，块越大进程间通信越少，块越小结果产出越及时、负载越均衡
+            ordered: 是否按输入顺序产出结果
+            recognizer: 单进程模式使用的识别器，None时按需创建
+            quiet: 是否丢弃识别过程中的逐帧输出
+        """
+        self.processes = processes or os.cpu_count() or 1
+        self.chunk_size = max(1, int(chunk_size))
+        self.ordered = ordered
+        self.recognizer = recognizer
+        self.quiet = quiet
+        # 统计信息：进程号 -> {"images", "seconds", "startup"}，以及最近一次运行的总帧数和总耗时
+        self.worker_stats = {}
+        self.images = 0
+        self.wall_time = 0.0
+
+    def _record_chunk(self, rows, seconds, startup=None):
+        """累计每个工作进程识别的截图数和耗时，记录工作进程的启动耗时"""
+        worker = rows[0]["worker"] if rows else os.getpid()
+        stats = self.worker_stats.setdefault(worker, {"images": 0, "seconds": 0.0, "startup": None})
+        stats["images"] += len(rows)
+        stats["seconds"] += seconds
+        if startup is not None:
+            stats["startup"] = startup
+        self.images += len(rows)
+
+    def _iter_chunks(self, chunks):
+        """按完成顺序产出 (块序号, rows)"""
+        if self.processes <= 1:
+            if self.recognizer is None:
+                with _output(self.quiet):
+                    self.recognizer = StatusRecognizer()
+            for index, chunk in enumerate(chunks):
+                rows, seconds, _ = analyze_chunk(chunk, self.recognizer, self.quiet)
+                self._record_chunk(rows, seconds)
+                yield index, rows
+            return
+        with ProcessPoolExecutor(max_workers=self.processes, initializer=_init_worker,
+                                 initargs=(self.quiet, time.time())) as executor:
+            futures = {executor.submit(analyze_chunk, chunk, None, self.quiet): index
+                       for index, chunk in enumerate(chunks)}
+            for future in as_completed(futures):
+                rows, seconds, startup = future.result()
+                self._record_chunk(rows, seconds, startup)
+                yield futures[future], rows
+
+    def iter_results(self, paths):
+        """识别所有截图，逐条产出结果字典（字段见RESULT_FIELDS）
+
+        参数:
+            paths: 截图路径列表
+        """
+        paths = list(paths)
+        chunks = [paths[start:start + self.chunk_size] for start in range(0, len(paths), self.chunk_size)]
+        self.worker_stats = {}
+        self.images = 0
+        start_time = time.perf_counter()
+        pending = {}
+        next_index = 0
+        try:
+            for index, rows in self._iter_chunks(chunks):
+                if not self.ordered:
+                    yield from rows
+                    continue
+                # 提前完成的块先缓存，等前面的块都产出后再按顺序产出
+                pending[index] = rows
+                while next_index in pending:
+                    yield from pending.pop(next_index)
+                    next_index += 1
+        finally:
+            self.wall_time = time.perf_counter() - start_time
+
+    def analyze(self, paths, output_path=None):
+        """识别所有截图，可选地逐条写入结果文件
+
+        返回:
+            rows: 所有结果字典的列表，顺序与产出顺序一致
+        """
+        if output_path is None:
+            return list(self.iter_results(paths))
+        rows = []
+        with ResultWriter(output_path) as writer:
+            for row in self.iter_results(paths):
+                writer.write(row)
+                rows.append(row)
+        return rows
+
+    def stats(self):
+        """获取吞吐量统计：每个工作进程的截图数、识别耗时、每秒截图数和启动耗时，以及总体每秒截图数
+
+        启动耗时从创建进程池算到该进程加载完识别器，包括启动进程和导入模块；单进程模式为None。
+        """
+        workers = {
+            worker: {
+                "images": stats["images"],
+                "seconds": stats["seconds"],
+                "images_per_sec": stats["images"] / stats["seconds"] if stats["seconds"] > 0 else 0.0,
+                "startup_seconds": stats["startup"]
+            }
+            for worker, stats in self.worker_stats.items()
+        }
+        return {
+            "processes": self.processes,
+            "chunk_size": self.chunk_size,
+            "images": self.images,
+            "wall_time": self.wall_time,
+            "images_per_sec": self.images / self.wall_time if self.wall_time > 0 else 0.0,
+            "workers": workers
+        }
+
+    def print_report(self):
+        """打印吞吐量报告"""
+        stats = self.stats()
+        print(f"吞吐量: {stats['images']} 张截图，{stats['wall_time']:.2f}s，"
+              f"{stats['images_per_sec']:.1f} 张/秒 ({stats['processes']} 个进程，每块 {stats['chunk_size']} 张)")
+        for worker, worker_stats in sorted(stats["workers"].items()):
+            startup = worker_stats["startup_seconds"]
+            print(f"  进程 {worker}: {worker_stats['images']} 张，{worker_stats['seconds']:.2f}s，"
+                  f"{worker_stats['images_per_sec']:.1f} 张/秒"
+                  + (f"，启动 {startup:.2f}s" if startup is not None else ""))
@@ -0,0 +1,237 @@
+import io
+import time
+import platform
+import functools
+import contextlib
+import tracemalloc
+import numpy as np
+from config.config import STATUS_RECOGNITION_CONFIG
+from cr.hash_index import HashIndex
+from cr.pixel_discovery import DEFAULT_GRID_SIZE, NEGATIVE_LABELS, load_grids, propose_probes, state_scores
+from cr.pixel_probes import ProbeSet
+from cr.screen_classifier import ScreenClassifier, labeled_images
+
+# 识别器记录的阶段，按执行顺序排列
+BENCHMARK_STAGES = ("decode", "probes", "preprocess", "hash", "classifier", "prefilter", "coarse", "button_scan", "page_match")
+# 延迟统计的百分位
+BENCHMARK_PERCENTILES = (50, 90, 99)
+
+
+def _status_recognizer(use_probes=True, use_hash_index=True, use_classifier=True):
+    """创建cr.status_recognizer.StatusRecognizer，可关闭像素探针、哈希索引和分类器以只测模板匹配"""
+    from cr.status_recognizer import StatusRecognizer
+    recognizer = StatusRecognizer()
+    if not use_probes:
+        recognizer.probes = None
+    if not use_hash_index:
+        recognizer.hash_index = None
+    if not use_classifier:
+        recognizer.classifier = None
+    # “其他”等没有模板的状态识别结果为None
+    return recognizer, lambda label: label if label in recognizer.status_templates else None
+
+
+def _legacy_recognizer():
+    """创建根目录旧版status_recognizer.ScreenStatusRecognizer，它把“其他”作为一个状态返回"""
+    from status_recognizer import ScreenStatusRecognizer
+    recognizer = ScreenStatusRecognizer()
+    return recognizer, lambda label: label
+
+
+# 留一法路径每张截图都要重新生成阶段，截图的网格像素、哈希和特征只计算一次
+@functools.lru_cache(maxsize=None)
+def _image_centers(path):
+    return load_grids([(None, path)], DEFAULT_GRID_SIZE)[1][0]
+
+
+@functools.lru_cache(maxsize=None)
+def _image_hash(method, path):
+    return HashIndex(method).compute_hash(path)
+
+
+@functools.lru_cache(maxsize=None)
+def _image_features(method, path):
+    return ScreenClassifier(method).features(path)
+
+
+def _probes(images):
+    """用已标注截图提出像素探针，网格和每个状态的探针数与discover_pixels.py的默认值相同"""
+    centers = np.stack([_image_centers(path) for _, path in images])
+    labels = [label for label, _ in images]
+    states = [label for label in dict.fromkeys(labels) if label not in NEGATIVE_LABELS]
+    probes = {state: propose_probes(centers, labels, state, state_scores(centers, labels, state)) for state in states}
+    return ProbeSet(probes, list(DEFAULT_GRID_SIZE))
+
+
+def _hash_index(images):
+    """用已标注截图建立哈希索引，哈希方法读取配置"""
+    index = HashIndex(STATUS_RECOGNITION_CONFIG.get("hash_index", {}).get("method", "phash"))
+    index.hashes = np.array([_image_hash(index.method, path) for _, path in images], dtype=np.uint64)
+    index.labels = [label for label, _ in images]
+    index.paths = [path for _, path in images]
+    return index
+
+
+def _classifier(images):
+    """用已标注截图训练画面分类器，分类方法读取配置"""
+    method = STATUS_RECOGNITION_CONFIG.get("classifier", {}).get("method", "linear")
+    features = np.stack([_image_features(method, path) for _, path in images])
+    return ScreenClassifier(method).fit(features, [label for label, _ in images])
+
+
+# 识别路径名称 -> 创建 (识别器, 期望结果函数) 的函数
+BENCHMARK_PATHS = {
+    "status_recognizer": lambda: _status_recognizer(),
+    "template_matching": lambda: _status_recognizer(use_probes=False, use_hash_index=False, use_classifier=False),
+    "legacy": _legacy_recognizer
+}
+
+# 留一法路径：由已标注截图生成的阶段，名称 -> (识别器属性, last_timings中的阶段名, 用训练截图生成该阶段的函数)
+# 在模板匹配路径上运行，识别每张截图前用其余截图重新生成该阶段，准确率不受截图本身在训练集中的影响
+HELD_OUT_PATHS = {
+    "probes": ("probes", "probes", _probes),
+    "hash_index": ("hash_index", "hash", _hash_index),
+    "classifier": ("classifier", "classifier", _classifier)
+}
+
+
+def _percentiles(values):
+    """返回毫秒为单位的百分位和平均值"""
+    values_ms = np.asarray(values, dtype=np.float64) * 1000
+    summary = {f"p{percentile}": float(np.percentile(values_ms, percentile)) for percentile in BENCHMARK_PERCENTILES}
+    summary["mean"] = float(values_ms.mean())
+    summary["frames"] = len(values_ms)
+    return summary
+
+
+def run_path(name, images, repeat=1, measure_memory=True):
+    """在已标注的截图上运行一条识别路径
+
+    参数:
+        name: BENCHMARK_PATHS或HELD_OUT_PATHS中的路径名称
+        images: [(label, path), ...]
+        repeat: 计时时每张截图识别的次数
+        measure_memory: 是否再用tracemalloc单独运行一遍，记录峰值内存（计时那一遍不开启tracemalloc）
+
+    返回:
+        result: 包含初始化耗时、各阶段和总延迟的百分位、各状态准确率和峰值内存的字典；
+            留一法路径另有decided，即该阶段直接给出结果的帧数
+    """
+    held_out = HELD_OUT_PATHS.get(name)
+    factory = BENCHMARK_PATHS["template_matching" if held_out else name]
+    # 识别器输出大量日志，基准测试时不打印
+    with contextlib.redirect_stdout(io.StringIO()):
+        start_time = time.perf_counter()
+        recognizer, expected_status = factory()
+        init_time = time.perf_counter() - start_time
+
+        stage_times = {}
+        total_times = []
+        per_state = {}
+        decided = 0
+        for i, (label, path) in enumerate(images):
+            if held_out:
+                setattr(recognizer, held_out[0], held_out[2](images[:i] + images[i + 1:]))
+            for _ in range(repeat):
+                start_time = time.perf_counter()
+                status, _ = recognizer.recognize_status(path)
+                total_times.append(time.perf_counter() - start_time)
+                for stage, seconds in recognizer.last_timings.items():
+                    stage_times.setdefault(stage, []).append(seconds)
+            if held_out:
+                # 该阶段是最后执行的阶段，说明由它直接给出了结果
+                decided += int(recognizer.last_stages[-1:] == [held_out[1]])
+            state = per_state.setdefault(label, {"frames": 0, "correct": 0})
+            state["frames"] += 1
+            state["correct"] += int(status == expected_status(label))
+
+        peak_memory = None
+        if measure_memory:
+            tracemalloc.start()
+            try:
+                recognizer, _ = factory()
+                for i, (_, path) in enumerate(images):
+                    if held_out:
+                        setattr(recognizer, held_out[0], held_out[2](images[:i] + images[i + 1:]))
+                    recognizer.recognize_status(path)
+                peak_memory = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+    for state in per_state.values():
+        state["accuracy"] = state["correct"] / state["frames"]
+    frames = sum(state["frames"] for state in per_state.values())
+    correct = sum(state["correct"] for state in per_state.values())
+    latency = {stage: _percentiles(stage_times[stage]) for stage in BENCHMARK_STAGES if stage in stage_times}
+    latency["total"] = _percentiles(total_times) if total_times else {}
+    result = {
+        "frames": frames,
+        "accuracy": correct / frames if frames else 0.0,
+        "per_state": per_state,
+        "init_ms": init_time * 1000,
+        "latency_ms": latency,
+        "peak_memory_mb": peak_memory / (1024 * 1024) if peak_memory is not None else None
+    }
+    if held_out:
+        result["decided"] = decided
+    return result
+
+
+def run_benchmark(screenshot_dir="png/实际游戏截图", paths=None, repeat=1, measure_memory=True):
+    """在截图目录上运行多条识别路径
+
+    参数:
+        screenshot_dir: 已标注截图目录（子目录名即为状态）
+        paths: 路径名称列表，None表示BENCHMARK_PATHS和HELD_OUT_PATHS中的所有路径
+
+    返回:
+        results: {"environment": {...}, "paths": {路径名称: run_path的结果}}
+    """
+    images = labeled_images(screenshot_dir)
+    results = {
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "screenshot_dir": screenshot_dir,
+            "images": len(images),
+            "repeat": repeat
+        },
+        "paths": {}
+    }
+    for name in paths or [*BENCHMARK_PATHS, *HELD_OUT_PATHS]:
+        results["paths"][name] = run_path(name, images, repeat, measure_memory)
+    return results
+
+
+def compare_results(current, baseline, latency_tolerance=0.5, memory_tolerance=0.25, min_latency_ms=0.5):
+    """与基线比较，返回回归项的说明列表（空列表表示没有回归）
+
+    参数:
+        current, baseline: run_benchmark的结果
+        latency_tolerance: 延迟p50允许的相对增加
+        memory_tolerance: 峰值内存允许的相对增加
+        min_latency_ms: 基线p50低于该值的阶段不比较延迟（计时噪声大于差异）
+
+    各状态的准确率不允许下降；基线中有、当前结果中缺少的路径也视为回归。
+    """
+    regressions = []
+    for name, base in baseline.get("paths", {}).items():
+        result = current.get("paths", {}).get(name)
+        if result is None:
+            regressions.append(f"{name}: 缺少该识别路径的结果")
+            continue
+        for state, base_state in base.get("per_state", {}).items():
+            accuracy = result.get("per_state", {}).get(state, {}).get("accuracy", 0.0)
+            if accuracy < base_state["accuracy"]:
+                regressions.append(f"{name}: {state} 准确率 {base_state['accuracy']:.1%} -> {accuracy:.1%}")
+        for stage, base_latency in base.get("latency_ms", {}).items():
+            latency = result.get("latency_ms", {}).get(stage)
+            if not base_latency or latency is None or base_latency["p50"] < min_latency_ms:
+                continue
+            if latency["p50"] > base_latency["p50"] * (1 + latency_tolerance):
+                regressions.append(f"{name}: {stage} p50 {base_latency['p50']:.2f}ms -> {latency['p50']:.2f}ms")
+        base_memory, memory = base.get("peak_memory_mb"), result.get("peak_memory_mb")
+        if base_memory and memory and memory > base_memory * (1 + memory_tolerance):
+            regressions.append(f"{name}: 峰值内存 {base_memory:.1f}MB -> {memory:.1f}MB")
+    return regressions
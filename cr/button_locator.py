@@ -0,0 +1,240 @@
+import threading
+import numpy as np
+import cv2
+from cr.roi import get_roi_registry
+
+
+class MultiScaleButtonLocator:
+    """多尺度由粗到细的按钮定位器
+
+    按钮模板只在一种窗口尺寸下截取，窗口缩放后按钮大小会变化。定位分两步：
+    先把搜索区域缩小到 1/coarse_factor，在一组候选尺度下对整个区域做模板匹配；
+    再只在得分最高的几个候选附近按原始分辨率精确匹配。粗搜索的位置数超过pixel_budget时
+    自动加大缩小倍数，精确匹配的位置数只取决于top_k和余量，因此每次定位的计算量有上限，与窗口尺寸无关。
+    """
+
+    def __init__(self, scales=(0.65, 0.8, 1.0, 1.25, 1.55), coarse_factor=4, top_k=3,
+                 pixel_budget=200000, min_template_side=8):
+        """初始化按钮定位器
+
+        参数:
+            scales: 候选尺度（截图中按钮大小 / 模板大小）
+            coarse_factor: 粗搜索的缩小倍数
+            top_k: 进入精确匹配的候选数量
+            pixel_budget: 粗搜索最多计算的匹配位置数（所有尺度合计）
+            min_template_side: 粗搜索时缩小后模板的最短边下限（像素），模板太小时该尺度少缩小一些
+        """
+        self.scales = tuple(scales)
+        self.coarse_factor = max(1, int(coarse_factor))
+        self.top_k = max(1, int(top_k))
+        self.pixel_budget = pixel_budget
+        self.min_template_side = min_template_side
+        # 缩放后的模板缓存：(模板键, 尺度, 缩小倍数) -> 模板数组
+        self._templates = {}
+        self._lock = threading.Lock()
+        # 统计信息
+        self.searches = 0
+        self.coarse_positions = 0
+        self.refine_positions = 0
+        self.full_positions = 0
+        self.hint_positions = 0
+
+    @staticmethod
+    def _resize(image, scale):
+        """按比例缩放，缩小用INTER_AREA，放大用INTER_LINEAR"""
+        height, width = image.shape[:2]
+        size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+        interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+        return cv2.resize(image, size, interpolation=interpolation)
+
+    def _scaled_template(self, template, key, scale, factor):
+        """返回缩放到 scale / factor 的模板，指定key时缓存"""
+        if key is None:
+            return self._resize(template, scale / factor)
+        cache_key = (key, scale, factor)
+        with self._lock:
+            scaled = self._templates.get(cache_key)
+        if scaled is None:
+            scaled = self._resize(template, scale / factor)
+            with self._lock:
+                self._templates[cache_key] = scaled
+        return scaled
+
+    def _plan(self, search_shape, template_shape):
+        """确定各尺度的粗搜索缩小倍数，使粗搜索位置总数不超过预算
+
+        优先保证缩小后的模板不小于min_template_side；所有尺度都已达到该下限仍超出预算时，
+        预算优先，继续加大缩小倍数。
+
+        返回:
+            plan: [(尺度, 缩小倍数), ...]，跳过按钮比搜索区域还大的尺度
+        """
+        search_h, search_w = search_shape
+        template_h, template_w = template_shape
+        base_factor = self.coarse_factor
+        keep_min_side = True
+        while True:
+            plan = []
+            positions = 0
+            for scale in self.scales:
+                scaled_h, scaled_w = template_h * scale, template_w * scale
+                if scaled_h > search_h or scaled_w > search_w:
+                    continue
+                factor = base_factor
+                if keep_min_side:
+                    # 缩小后的模板不能小于下限，否则匹配失去区分度
+                    factor = max(1, min(base_factor, int(min(scaled_h, scaled_w) // self.min_template_side)))
+                positions += (search_h // factor - int(scaled_h / factor) + 1) * (search_w // factor - int(scaled_w / factor) + 1)
+                plan.append((scale, factor))
+            if positions <= self.pixel_budget or not plan:
+                return plan
+            if keep_min_side and all(factor < base_factor for _, factor in plan):
+                keep_min_side = False
+                continue
+            base_factor += 1
+
+    @staticmethod
+    def _match(image, template):
+        """归一化相关系数匹配，纯色区域的无定义结果按0处理"""
+        result = cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED)
+        return np.nan_to_num(result, nan=0.0, posinf=0.0, neginf=0.0)
+
+    def locate(self, screenshot, template, region="button_search", key=None):
+        """在截图中定位按钮
+
+        参数:
+            screenshot: 截图numpy数组（灰度或RGB，需与模板通道数一致）或PIL图像
+            template: 按钮模板
+            region: 搜索区域在ROI注册表中的名称，None表示整张截图
+            key: 模板缓存键（如状态名称），同一模板重复定位时避免重复缩放
+
+        返回:
+            (similarity, position, scale): 相似度（0-1）、按钮左上角在整张截图中的坐标 (x, y)
+                和估计的尺度；找不到时返回 (0.0, None, None)
+        """
+        screenshot_np = np.asarray(screenshot)
+        template_np = np.ascontiguousarray(np.asarray(template))
+
+        offset_x, offset_y = 0, 0
+        if region is not None:
+            registry = get_roi_registry()
+            offset_x, offset_y = registry.box(region, (screenshot_np.shape[1], screenshot_np.shape[0]))[:2]
+            screenshot_np = registry.view(screenshot_np, region)
+        search = np.ascontiguousarray(screenshot_np)
+        search_h, search_w = search.shape[:2]
+
+        plan = self._plan((search_h, search_w), template_np.shape[:2])
+        if not plan:
+            return 0.0, None, None
+
+        # 1. 粗搜索：每个缩小倍数只缩小一次搜索区域
+        coarse_images = {}
+        candidates = []
+        coarse_positions = 0
+        for scale, factor in plan:
+            if factor not in coarse_images:
+                coarse_images[factor] = search if factor == 1 else cv2.resize(
+                    search, (search_w // factor, search_h // factor), interpolation=cv2.INTER_AREA)
+            coarse = coarse_images[factor]
+            coarse_template = self._scaled_template(template_np, key, scale, factor)
+            if coarse_template.shape[0] > coarse.shape[0] or coarse_template.shape[1] > coarse.shape[1]:
+                continue
+            result = self._match(coarse, coarse_template)
+            coarse_positions += result.size
+            _, max_val, _, max_loc = cv2.minMaxLoc(result)
+            candidates.append((max_val, scale, factor, max_loc))
+
+        # 2. 精确匹配：只在得分最高的候选附近按原始分辨率匹配
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+        best = (0.0, None, None)
+        refine_positions = 0
+        for _, scale, factor, (coarse_x, coarse_y) in candidates[:self.top_k]:
+            full_template = self._scaled_template(template_np, key, scale, 1)
+            template_h, template_w = full_template.shape[:2]
+            # 粗搜索位置的误差不超过一个缩小倍数，两侧各留2倍余量
+            margin = 2 * factor
+            x0 = max(0, coarse_x * factor - margin)
+            y0 = max(0, coarse_y * factor - margin)
+            x1 = min(search_w, coarse_x * factor + template_w + margin)
+            y1 = min(search_h, coarse_y * factor + template_h + margin)
+            window = search[y0:y1, x0:x1]
+            if window.shape[0] < template_h or window.shape[1] < template_w:
+                continue
+            result = self._match(window, full_template)
+            refine_positions += result.size
+            _, max_val, _, max_loc = cv2.minMaxLoc(result)
+            if max_val > best[0]:
+                best = (max_val, (x0 + max_loc[0] + offset_x, y0 + max_loc[1] + offset_y), scale)
+
+        with self._lock:
+            self.searches += 1
+            self.coarse_positions += coarse_positions
+            self.refine_positions += refine_positions
+            # 同样的尺度在原始分辨率下穷举需要计算的位置数，用于对比
+            self.full_positions += sum(
+                (search_h - int(template_np.shape[0] * scale) + 1) * (search_w - int(template_np.shape[1] * scale) + 1)
+                for scale, _ in plan)
+
+        similarity, position, scale = best
+        return min(max(float(similarity), 0.0), 1.0), position, scale
+
+    def locate_near(self, screenshot, template, position, scale, margin, key=None):
+        """只在上一次匹配位置附近的小窗口内按已知尺度匹配按钮
+
+        参数:
+            screenshot: 截图numpy数组（灰度或RGB，需与模板通道数一致）或PIL图像
+            template: 按钮模板
+            position: 上一次匹配的按钮左上角在整张截图中的坐标 (x, y)
+            scale: 上一次匹配的尺度
+            margin: 窗口在按钮四周多留的像素
+            key: 模板缓存键，与locate共用缩放后的模板
+
+        返回:
+            (similarity, position): 窗口内的最佳相似度（0-1）和按钮左上角在整张截图中的坐标；
+                窗口放不下按钮时返回 (0.0, None)
+        """
+        screenshot_np = np.asarray(screenshot)
+        scaled = self._scaled_template(np.ascontiguousarray(np.asarray(template)), key, scale, 1)
+        template_h, template_w = scaled.shape[:2]
+        height, width = screenshot_np.shape[:2]
+        x, y = position
+        x0, y0 = max(0, x - margin), max(0, y - margin)
+        x1, y1 = min(width, x + template_w + margin), min(height, y + template_h + margin)
+        window = np.ascontiguousarray(screenshot_np[y0:y1, x0:x1])
+        if window.shape[0] < template_h or window.shape[1] < template_w:
+            return 0.0, None
+        result = self._match(window, scaled)
+        _, max_val, _, max_loc = cv2.minMaxLoc(result)
+        with self._lock:
+            self.hint_positions += result.size
+        return min(max(float(max_val), 0.0), 1.0), (x0 + max_loc[0], y0 + max_loc[1])
+
+    def stats(self):
+        """返回定位统计信息：平均每次计算的位置数，以及与原始分辨率穷举的比例"""
+        with self._lock:
+            evaluated = self.coarse_positions + self.refine_positions
+            return {
+                "searches": self.searches,
+                "coarse_positions": self.coarse_positions,
+                "refine_positions": self.refine_positions,
+                "avg_positions": evaluated / self.searches if self.searches else 0.0,
+                "full_search_ratio": evaluated / self.full_positions if self.full_positions else 0.0,
+                "hint_positions": self.hint_positions,
+                "cached_templates": len(self._templates)
+            }
+
+
+_shared_locator = None
+_shared_locator_lock = threading.Lock()
+
+
+def get_button_locator():
+    """获取进程内共享的按钮定位器，首次调用时按STATUS_RECOGNITION_CONFIG中的button_search配置创建"""
+    global _shared_locator
+    with _shared_locator_lock:
+        if _shared_locator is None:
+            from config.config import STATUS_RECOGNITION_CONFIG
+            options = dict(STATUS_RECOGNITION_CONFIG.get("button_search", {}))
+            options.pop("enabled", None)
+            _shared_locator = MultiScaleButtonLocator(**options)
+        return _shared_locator
@@ -0,0 +1,230 @@
+import os
+import sys
+import time
+import tempfile
+import subprocess
+import numpy as np
+from PIL import Image
+from cr.roi import get_roi_registry
+from cr.utils import ImageUtils
+
+# 回放后端支持的图片扩展名
+REPLAY_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+
+class Frame:
+    """单帧截图：解码后的RGB数组及其元数据"""
+
+    def __init__(self, image, timestamp=None, region=None, source=None, seq=0):
+        """初始化截图帧
+
+        参数:
+            image: (高, 宽, 3) 的uint8 RGB数组
+            timestamp: 截图时间戳（time.time()），默认取当前时间
+            region: 截图对应的屏幕绝对区域 (x, y, width, height)
+            source: 帧来源描述，如回放文件路径或后端名称
+            seq: 帧序号
+        """
+        self.image = image
+        self.timestamp = timestamp if timestamp is not None else time.time()
+        self.region = region
+        self.source = source
+        self.seq = seq
+        # 保存到磁盘后的路径，未保存时为None
+        self.path = None
+
+    @property
+    def size(self):
+        """帧尺寸 (width, height)，与PIL的size保持一致"""
+        return (self.image.shape[1], self.image.shape[0])
+
+    def to_pil(self):
+        """转换为PIL图像（共享像素数据时不做编解码）"""
+        return Image.fromarray(self.image)
+
+    def roi(self, name, registry=None):
+        """返回帧中指定感兴趣区域的numpy视图（不复制像素）
+
+        参数:
+            name: ROI注册表中的区域名称，如elixir、card_strip
+            registry: RoiRegistry实例，默认使用共享注册表
+        """
+        return (registry or get_roi_registry()).view(self.image, name)
+
+    def save(self, path):
+        """将帧编码保存到磁盘，返回保存路径"""
+        self.to_pil().save(path)
+        self.path = path
+        return path
+
+    def __repr__(self):
+        return f"Frame(seq={self.seq}, size={self.size}, region={self.region}, source={self.source})"
+
+
+class CaptureBackend:
+    """截图后端基类，子类实现grab方法返回Frame"""
+
+    name = "base"
+    # 是否需要先把微信窗口前置后才能截图
+    needs_window = True
+
+    def grab(self, region):
+        """截取指定屏幕区域 (x, y, width, height)，返回Frame"""
+        raise NotImplementedError
+
+    def close(self):
+        """释放后端资源"""
+        pass
+
+
+class ScreencaptureBackend(CaptureBackend):
+    """使用macOS screencapture命令截图
+
+    截图写入临时BMP文件（无压缩，编码开销远小于PNG），解码后立即删除，
+    调用方拿到的只有内存中的数组。
+    """
+
+    name = "screencapture"
+
+    def __init__(self, temp_dir=None):
+        self.temp_dir = temp_dir or tempfile.gettempdir()
+
+    def grab(self, region):
+        x, y, width, height = region
+        fd, temp_path = tempfile.mkstemp(suffix=".bmp", prefix="cr_capture_", dir=self.temp_dir)
+        os.close(fd)
+        try:
+            # -a禁用声音，-x不显示预览，-t指定格式，-R指定区域
+            screencapture_cmd = ["screencapture", "-a", "-x", "-t", "bmp", "-R", f"{x},{y},{width},{height}", temp_path]
+            subprocess.run(screencapture_cmd, check=True, capture_output=True, text=True)
+            if not os.path.exists(temp_path) or os.path.getsize(temp_path) == 0:
+                raise Exception(f"截图文件未生成: {temp_path}")
+            image_np = ImageUtils.load_image_array(temp_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return Frame(np.ascontiguousarray(image_np), region=region, source=self.name)
+
+
+class QuartzBackend(CaptureBackend):
+    """使用Quartz (pyobjc) 直接从窗口服务器读取像素，全程不落盘"""
+
+    name = "quartz"
+
+    def __init__(self):
+        import Quartz
+        self.Quartz = Quartz
+
+    @staticmethod
+    def is_available():
+        """检查当前环境是否安装了pyobjc的Quartz模块"""
+        try:
+            import Quartz  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def grab(self, region):
+        Quartz = self.Quartz
+        x, y, width, height = region
+        rect = Quartz.CGRectMake(x, y, width, height)
+        cg_image = Quartz.CGWindowListCreateImage(
+            rect,
+            Quartz.kCGWindowListOptionOnScreenOnly,
+            Quartz.kCGNullWindowID,
+            Quartz.kCGWindowImageDefault
+        )
+        if cg_image is None:
+            raise Exception(f"Quartz截图失败: {region}")
+
+        pixel_width = Quartz.CGImageGetWidth(cg_image)
+        pixel_height = Quartz.CGImageGetHeight(cg_image)
+        bytes_per_row = Quartz.CGImageGetBytesPerRow(cg_image)
+        data = Quartz.CGDataProviderCopyData(Quartz.CGImageGetDataProvider(cg_image))
+
+        # Quartz返回BGRA数据，每行可能有填充字节
+        bgra = np.frombuffer(data, dtype=np.uint8).reshape(pixel_height, bytes_per_row // 4, 4)
+        image_np = np.ascontiguousarray(bgra[:, :pixel_width, 2::-1])
+        return Frame(image_np, region=region, source=self.name)
+
+
+class ReplayBackend(CaptureBackend):
+    """从图片文件或目录回放截图，可在Linux上替代实时截图进行测试"""
+
+    name = "replay"
+    needs_window = False
+
+    def __init__(self, source="png/实际游戏截图", loop=True):
+        """初始化回放后端
+
+        参数:
+            source: 单个图片文件或图片目录（递归查找，按路径排序）
+            loop: 回放到末尾后是否从头开始
+        """
+        self.source = source
+        self.loop = loop
+        self.paths = self._collect_paths(source)
+        if not self.paths:
+            raise ValueError(f"回放目录中没有图片: {source}")
+        self.index = 0
+
+    @staticmethod
+    def _collect_paths(source):
+        """收集回放用的图片路径"""
+        if os.path.isfile(source):
+            return [source]
+        paths = []
+        for root, dirs, files in os.walk(source):
+            for file in files:
+                if file.lower().endswith(REPLAY_EXTENSIONS):
+                    paths.append(os.path.join(root, file))
+        paths.sort()
+        return paths
+
+    def grab(self, region=None):
+        if self.index >= len(self.paths):
+            if not self.loop:
+                raise EOFError("回放结束")
+            self.index = 0
+
+        path = self.paths[self.index]
+        self.index += 1
+        image_np = np.ascontiguousarray(ImageUtils.load_image_array(path))
+        return Frame(image_np, region=region, source=path)
+
+    def reset(self):
+        """回到第一帧"""
+        self.index = 0
+
+
+# 后端名称到类的映射
+CAPTURE_BACKENDS = {
+    "screencapture": ScreencaptureBackend,
+    "quartz": QuartzBackend,
+    "replay": ReplayBackend
+}
+
+
+def resolve_backend_name(name="auto"):
+    """将auto解析为当前平台可用的后端名称：macOS优先Quartz，其次screencapture，其他平台使用回放"""
+    if name != "auto":
+        return name
+    if sys.platform == "darwin":
+        return "quartz" if QuartzBackend.is_available() else "screencapture"
+    return "replay"
+
+
+def create_capture_backend(name="auto", **options):
+    """根据名称创建截图后端
+
+    参数:
+        name: 后端名称，可选auto、quartz、screencapture、replay
+        **options: 传递给后端构造函数的参数
+
+    返回:
+        backend: CaptureBackend实例
+    """
+    name = resolve_backend_name(name)
+    if name not in CAPTURE_BACKENDS:
+        raise ValueError(f"未知的截图后端: {name}，可选: {list(CAPTURE_BACKENDS.keys())}")
+    return CAPTURE_BACKENDS[name](**options)
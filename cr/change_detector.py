@@ -0,0 +1,95 @@
+import numpy as np
+from cr.utils import ImageUtils
+
+
+class FrameChangeDetector:
+    """画面变化检测器：比较降采样签名，判断当前帧是否需要重新识别状态
+
+    签名是整帧灰度的网格块均值。参考签名只在重新识别时更新，
+    因此缓慢累积的变化最终也会超过阈值并触发识别。
+    """
+
+    def __init__(self, threshold=0.005, grid=(32, 32), max_skipped=10):
+        """初始化变化检测器
+
+        参数:
+            threshold: 平均差异阈值（0-1），低于该值视为画面未变化
+            grid: 签名网格大小 (行数, 列数)
+            max_skipped: 连续复用识别结果的最大次数，超过后强制重新识别，0表示不限制
+        """
+        self.threshold = threshold
+        self.grid = grid
+        self.max_skipped = max_skipped
+        self._reference = None
+        self._consecutive_skipped = 0
+        # 统计信息
+        self.checked = 0
+        self.skipped = 0
+        self.last_diff = None
+
+    def compute_signature(self, image):
+        """计算帧的降采样灰度签名
+
+        参数:
+            image: RGB或灰度numpy数组、PIL图像、截图路径或Frame对象
+
+        返回:
+            signature: (行数, 列数) 的float32数组
+        """
+        image_np = ImageUtils.load_image_array(image)
+        rows, cols = self.grid
+        h, w = image_np.shape[:2]
+        # 先按步长抽样，每个网格块保留约4x4个采样点
+        step = max(1, min(h // (rows * 4), w // (cols * 4)))
+        sampled = image_np[::step, ::step].astype(np.float32)
+        if sampled.ndim == 3:
+            sampled = sampled.mean(axis=2)
+        sh, sw = sampled.shape
+        block_h, block_w = sh // rows, sw // cols
+        if block_h == 0 or block_w == 0:
+            raise ValueError(f"图像尺寸 {(w, h)} 小于签名网格 {self.grid}")
+        blocks = sampled[:block_h * rows, :block_w * cols].reshape(rows, block_h, cols, block_w)
+        return blocks.mean(axis=(1, 3))
+
+    def difference(self, signature):
+        """计算签名与参考签名的平均差异（0-1），无参考签名时返回None"""
+        if self._reference is None or self._reference.shape != signature.shape:
+            return None
+        return float(np.abs(signature - self._reference).mean() / 255.0)
+
+    def should_recognize(self, image):
+        """判断当前帧是否需要重新识别；需要时把该帧设为新的参考帧
+
+        返回:
+            bool: True表示画面有变化（或首次检测），需要重新识别
+        """
+        self.checked += 1
+        signature = self.compute_signature(image)
+        diff = self.difference(signature)
+        self.last_diff = diff
+
+        unchanged = diff is not None and diff < self.threshold
+        if unchanged and (self.max_skipped <= 0 or self._consecutive_skipped < self.max_skipped):
+            self._consecutive_skipped += 1
+            self.skipped += 1
+            return False
+
+        self._reference = signature
+        self._consecutive_skipped = 0
+        return True
+
+    def reset(self):
+        """清除参考帧，下一帧必定重新识别"""
+        self._reference = None
+        self._consecutive_skipped = 0
+
+    def stats(self):
+        """返回检测统计信息"""
+        recognized = self.checked - self.skipped
+        skip_rate = self.skipped / self.checked if self.checked else 0.0
+        return {
+            "checked": self.checked,
+            "skipped": self.skipped,
+            "recognized": recognized,
+            "skip_rate": skip_rate
+        }
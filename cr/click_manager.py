@@ -1,71 +1,68 @@
-import subprocess
 import time
-import os
 from config.config import SCREENSHOT_CONFIG
-from cr.utils import WeChatUtils
+from cr.automation_worker import get_automation_client
+from cr.window_geometry import AppleScriptGeometryBackend, get_geometry_service
+
+# 激活微信窗口的AppleScript，常驻自动化进程中只编译一次；同一次调用返回激活后的窗口位置和大小
+ACTIVATE_WECHAT_SCRIPT = '''tell application "WeChat"
+    activate
+    delay 0.1
+end tell
+tell application "System Events"
+    tell process "WeChat"
+        return (position of window 1) & (size of window 1)
+    end tell
+end tell'''
 
 class ClickManager:
     """点击管理器，封装点击操作并进行边界检查"""
     
-    def __init__(self):
+    def __init__(self, geometry=None, automation=None):
+        """初始化点击管理器
+        
+        参数:
+            geometry: WindowGeometryService实例，默认使用进程内共享的窗口几何服务
+            automation: AutomationWorkerClient实例，默认使用进程内共享的常驻自动化进程
+        """
         self.config = SCREENSHOT_CONFIG
         self.wechat_process_name = self.config["wechat_process_name"]
-        # 皇室战争窗口区域配置 - 延迟初始化，需要时才计算
-        self.cr_window_region = None
-        # 移除初始化时的打印信息
+        self.geometry = geometry or get_geometry_service()
+        self.automation = automation or get_automation_client()
+        # 外部指定的皇室战争窗口区域（例如截图帧携带的区域），为None时从窗口几何服务计算
+        self._cr_window_region = None
     
-    def _get_cr_window_region(self):
-        """获取皇室战争的窗口区域，格式为(x, y, width, height)"""
-        try:
-            # 激活微信窗口
-            WeChatUtils.bring_wechat_to_front()
-            time.sleep(0.1)
-            
-            # 获取微信窗口位置和大小
-            wx_window = WeChatUtils.get_wechat_window_position()
-            wx_x = wx_window["x"]
-            wx_y = wx_window["y"]
-            wx_width = wx_window["width"]
-            wx_height = wx_window["height"]
-            
-            # 从配置文件获取相对偏移量，忽略配置的宽度和高度
-            # 假设小程序占据微信窗口的主要内容区域
-            weapp_relative_region = self.config["weapp_relative_region"]
-            rel_x, rel_y, _, _ = weapp_relative_region
-            
-            # 动态计算皇室战争小程序的绝对区域
-            # 微信窗口左上角为基准点，加上小程序在微信窗口内的相对位置
-            # 使用微信窗口的实际宽度和高度作为小程序的宽度和高度
-            abs_x = wx_x + rel_x
-            abs_y = wx_y + rel_y
-            width = wx_width - rel_x  # 考虑相对偏移后的实际宽度
-            height = wx_height - rel_y  # 考虑相对偏移后的实际高度
-            
-            return (abs_x, abs_y, width, height)
-        except Exception as e:
-            print(f"获取微信窗口信息失败: {e}")
-            # 如果获取失败，使用默认值
-            wx_x, wx_y = (400, 100)  # 默认窗口位置
-            wx_width, wx_height = (800, 600)  # 默认窗口大小
-            weapp_relative_region = self.config["weapp_relative_region"]
-            rel_x, rel_y, _, _ = weapp_relative_region
-            # 使用默认窗口位置和实际大小
-            abs_x = wx_x + rel_x
-            abs_y = wx_y + rel_y
-            width = wx_width - rel_x
-            height = wx_height - rel_y
-            return (abs_x, abs_y, width, height)
+    @property
+    def cr_window_region(self):
+        """皇室战争窗口区域，格式为(x, y, width, height)"""
+        if self._cr_window_region is not None:
+            return self._cr_window_region
+        return self._get_cr_window_region()
+    
+    @cr_window_region.setter
+    def cr_window_region(self, region):
+        self._cr_window_region = tuple(region) if region is not None else None
+    
+    def _get_cr_window_region(self, force_refresh=False):
+        """根据共享的微信窗口位置计算皇室战争的窗口区域，格式为(x, y, width, height)
+        
+        从配置文件获取相对偏移量，忽略配置的宽度和高度，
+        使用微信窗口扣除偏移后的实际宽度和高度作为小程序的宽度和高度
+        """
+        return self.geometry.get_region(self.config["weapp_relative_region"], force_refresh)
     
     def update_cr_window_region(self):
-        """更新皇室战争窗口区域"""
-        self.cr_window_region = self._get_cr_window_region()
-        print(f"已更新皇室战争窗口区域: {self.cr_window_region}")
+        """重新查询微信窗口位置并更新皇室战争窗口区域"""
+        self._cr_window_region = None
+        region = self._get_cr_window_region(force_refresh=True)
+        print(f"已更新皇室战争窗口区域: {region}")
+    
+    def invalidate_window_region(self, reason=None):
+        """窗口位置可能已变化时调用，下次使用时重新查询"""
+        self._cr_window_region = None
+        self.geometry.report_sanity_failure(reason)
     
     def get_cr_window_position(self):
         """获取皇室战争窗口的位置和大小"""
-        # 确保窗口区域已初始化
-        if self.cr_window_region is None:
-            self.cr_window_region = self._get_cr_window_region()
         x, y, width, height = self.cr_window_region
         return {
             "x": x,
@@ -82,24 +79,8 @@ class ClickManager:
         return cr_pos["x"] <= x <= cr_pos["right"] and cr_pos["y"] <= y <= cr_pos["bottom"]
     
     def is_position_on_screen(self, x, y):
-        """判断指定坐标是否在屏幕范围内"""
-        # 使用系统命令获取屏幕大小
-        try:
-            # 使用 AppleScript 获取屏幕大小
-            applescript = '''tell application "Finder"
-    set screen_resolution to bounds of window of desktop
-    return screen_resolution
-end tell'''
-            result = subprocess.run(["osascript", "-e", applescript], check=True, capture_output=True, text=True)
-            # 解析结果，格式为 {0, 0, width, height}
-            bounds = result.stdout.strip().replace("{", "").replace("}", "").split(", ")
-            screen_width = int(bounds[2])
-            screen_height = int(bounds[3])
-        except Exception as e:
-            print(f"获取屏幕大小失败: {e}")
-            # 默认使用常见屏幕分辨率作为 fallback
-            screen_width, screen_height = 1920, 1080
-        return 0 <= x < screen_width and 0 <= y < screen_height
+        """判断指定坐标是否在屏幕范围内，屏幕尺寸来自共享缓存"""
+        return self.geometry.is_position_on_screen(x, y)
     
     def check_click_position(self, x, y):
         """检查点击位置是否合法
@@ -114,18 +95,7 @@ end tell'''
         """
         # 1. 检查是否在屏幕范围内
         if not self.is_position_on_screen(x, y):
-            # 重新获取屏幕大小用于错误信息
-            try:
-                applescript = '''tell application "Finder"
-    set screen_resolution to bounds of window of desktop
-    return screen_resolution
-end tell'''
-                result = subprocess.run(["osascript", "-e", applescript], check=True, capture_output=True, text=True)
-                bounds = result.stdout.strip().replace("{", "").replace("}", "").split(", ")
-                screen_width = int(bounds[2])
-                screen_height = int(bounds[3])
-            except Exception as e:
-                screen_width, screen_height = 1920, 1080
+            screen_width, screen_height = self.geometry.get_screen_size()
             return False, f"点击位置({x}, {y})超出屏幕边界({screen_width}, {screen_height})"
         
         # 2. 检查是否在皇室战争窗口内
@@ -135,6 +105,43 @@ end tell'''
         
         return True, ""
     
+    def _resolve_position(self, x, y):
+        """把请求坐标转换为绝对坐标并检查是否合法
+        
+        检查失败时说明缓存的窗口位置可能已过期，使缓存失效后重新计算一次
+        
+        Returns:
+            tuple: (绝对x坐标, 绝对y坐标, 是否合法, 错误信息)
+        """
+        abs_x, abs_y = self._convert_percentage_to_absolute(x, y)
+        is_valid, error_msg = self.check_click_position(abs_x, abs_y)
+        if not is_valid:
+            self.invalidate_window_region(f"点击位置校验失败: {error_msg}")
+            abs_x, abs_y = self._convert_percentage_to_absolute(x, y)
+            is_valid, error_msg = self.check_click_position(abs_x, abs_y)
+        if (abs_x, abs_y) != (x, y):
+            print(f"  转换为绝对坐标: ({abs_x}, {abs_y})")
+        return abs_x, abs_y, is_valid, error_msg
+    
+    def _activate_wechat(self, x, y):
+        """激活微信窗口，并用同一次调用返回的窗口位置更新几何缓存
+        
+        窗口位置不变时继续使用缓存；激活后窗口被移动或改变大小时按新的位置重新换算坐标，
+        返回结果无法解析时使缓存失效。
+        
+        Returns:
+            tuple: (绝对x坐标, 绝对y坐标, 是否合法, 错误信息)
+        """
+        result = self.automation.run_osascript(ACTIVATE_WECHAT_SCRIPT, check=True)
+        time.sleep(0.1)
+        try:
+            window_x, window_y, width, height = AppleScriptGeometryBackend._parse_numbers(result.stdout.strip())
+            self.geometry.update_window_bounds({"x": window_x, "y": window_y, "width": width, "height": height},
+                                               "activate")
+        except (AttributeError, ValueError):
+            self.geometry.invalidate(f"activate: 无法解析窗口位置 {getattr(result, 'stdout', None)!r}")
+        return self._resolve_position(x, y)
+    
     def _convert_percentage_to_absolute(self, x, y):
         """将百分比坐标转换为绝对坐标
         
@@ -148,9 +155,6 @@ end tell'''
         # 判断是否为百分比坐标（如果x或y在0-100范围内）
         if 0 <= x <= 100 and 0 <= y <= 100:
             print(f"  检测到百分比坐标: ({x}%, {y}%)")
-            # 确保皇室战争窗口区域已初始化
-            if self.cr_window_region is None:
-                self.cr_window_region = self._get_cr_window_region()
             # 获取皇室战争窗口区域
             cr_x, cr_y, cr_width, cr_height = self.cr_window_region
             # 转换为绝对坐标
@@ -174,30 +178,23 @@ end tell'''
         print(f"\n=== 执行点击操作 ===")
         print(f"请求点击位置: ({x}, {y})")
         
-        # 将百分比坐标转换为绝对坐标
-        abs_x, abs_y = self._convert_percentage_to_absolute(x, y)
-        if (abs_x, abs_y) != (x, y):
-            print(f"  转换为绝对坐标: ({abs_x}, {abs_y})")
-        
-        # 检查点击位置
-        is_valid, error_msg = self.check_click_position(abs_x, abs_y)
+        # 将百分比坐标转换为绝对坐标并检查点击位置
+        abs_x, abs_y, is_valid, error_msg = self._resolve_position(x, y)
         if not is_valid:
             print(f"✗ 点击失败: {error_msg}")
             return False
         
         try:
-            # 激活微信窗口
-            applescript = '''tell application "WeChat"
-    activate
-    delay 0.1
-end tell'''
-            subprocess.run(["osascript", "-e", applescript], check=True, capture_output=True, text=True)
-            time.sleep(0.1)
+            # 激活微信窗口，按激活后的窗口位置重新换算坐标
+            abs_x, abs_y, is_valid, error_msg = self._activate_wechat(x, y)
+            if not is_valid:
+                print(f"✗ 点击失败: {error_msg}")
+                return False
             
             # 只使用cliclick执行点击，不需要先移动鼠标
             print(f"  使用cliclick点击位置: ({abs_x}, {abs_y})")
             # 直接执行点击，cliclick的c:命令会自动定位到指定位置
-            subprocess.run(["cliclick", f"c:{abs_x},{abs_y}"], check=True, capture_output=True, text=True)
+            self.automation.run_cliclick(f"c:{abs_x},{abs_y}")
             
             print(f"✓ 点击成功: ({abs_x}, {abs_y})")
             return True
@@ -238,29 +235,22 @@ end tell'''
         print(f"\n=== 执行双击操作 ===")
         print(f"请求双击位置: ({x}, {y})")
         
-        # 将百分比坐标转换为绝对坐标
-        abs_x, abs_y = self._convert_percentage_to_absolute(x, y)
-        if (abs_x, abs_y) != (x, y):
-            print(f"  转换为绝对坐标: ({abs_x}, {abs_y})")
-        
-        # 检查点击位置
-        is_valid, error_msg = self.check_click_position(abs_x, abs_y)
+        # 将百分比坐标转换为绝对坐标并检查点击位置
+        abs_x, abs_y, is_valid, error_msg = self._resolve_position(x, y)
         if not is_valid:
             print(f"✗ 双击失败: {error_msg}")
             return False
         
         try:
-            # 激活微信窗口
-            applescript = '''tell application "WeChat"
-    activate
-    delay 0.1
-end tell'''
-            subprocess.run(["osascript", "-e", applescript], check=True, capture_output=True, text=True)
-            time.sleep(0.1)
+            # 激活微信窗口，按激活后的窗口位置重新换算坐标
+            abs_x, abs_y, is_valid, error_msg = self._activate_wechat(x, y)
+            if not is_valid:
+                print(f"✗ 双击失败: {error_msg}")
+                return False
             
             # 只使用cliclick执行双击
             print(f"  使用cliclick双击位置: ({abs_x}, {abs_y})")
-            subprocess.run(["cliclick", f"dc:{abs_x},{abs_y}"], check=True, capture_output=True, text=True)
+            self.automation.run_cliclick(f"dc:{abs_x},{abs_y}")
             
             print(f"✓ 双击成功: ({abs_x}, {abs_y})")
             return True
@@ -282,30 +272,23 @@ end tell'''
         print(f"\n=== 执行鼠标移动操作 ===")
         print(f"请求移动到位置: ({x}, {y})")
         
-        # 将百分比坐标转换为绝对坐标
-        abs_x, abs_y = self._convert_percentage_to_absolute(x, y)
-        if (abs_x, abs_y) != (x, y):
-            print(f"  转换为绝对坐标: ({abs_x}, {abs_y})")
-        
-        # 检查目标位置
-        is_valid, error_msg = self.check_click_position(abs_x, abs_y)
+        # 将百分比坐标转换为绝对坐标并检查目标位置
+        abs_x, abs_y, is_valid, error_msg = self._resolve_position(x, y)
         if not is_valid:
             print(f"✗ 鼠标移动失败: {error_msg}")
             return False
         
         try:
-            # 激活微信窗口
-            applescript = '''tell application "WeChat"
-    activate
-    delay 0.1
-end tell'''
-            subprocess.run(["osascript", "-e", applescript], check=True, capture_output=True, text=True)
-            time.sleep(0.1)
+            # 激活微信窗口，按激活后的窗口位置重新换算坐标
+            abs_x, abs_y, is_valid, error_msg = self._activate_wechat(x, y)
+            if not is_valid:
+                print(f"✗ 鼠标移动失败: {error_msg}")
+                return False
             
             # 使用cliclick移动鼠标，-e参数指定持续时间（毫秒）
             print(f"  移动鼠标到: ({abs_x}, {abs_y})")
             duration_ms = int(duration * 1000)  # 转换为毫秒
-            subprocess.run(["cliclick", f"-e", str(duration_ms), f"m:{abs_x},{abs_y}"], check=True, capture_output=True, text=True)
+            self.automation.run_cliclick("-e", str(duration_ms), f"m:{abs_x},{abs_y}")
             
             print(f"✓ 鼠标移动成功: ({abs_x}, {abs_y})")
             return True
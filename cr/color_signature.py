@@ -0,0 +1,140 @@
+import time
+import numpy as np
+import cv2
+from cr.screen_classifier import labeled_images
+from cr.utils import ImageUtils
+
+# HSV直方图每个通道的分箱数 (H, S, V)，色调分得更细：对战场地的绿色、塔的红蓝色和菜单的深蓝、金色主要靠色调区分
+DEFAULT_HSV_BINS = (8, 4, 4)
+# 计算直方图前按该步长对整帧取样（670x1280的截图约取80x42个像素）
+DEFAULT_SAMPLE_STEP = 16
+# OpenCV中H的取值范围是0-180，S、V是0-256
+HSV_RANGES = [0, 180, 0, 256, 0, 256]
+
+
+def hsv_histogram(frame, bins=DEFAULT_HSV_BINS, step=DEFAULT_SAMPLE_STEP):
+    """按步长取样后计算归一化的三维HSV直方图
+
+    参数:
+        frame: (高, 宽, 3或4) 的RGB(A) numpy数组
+        bins: 每个通道的分箱数 (H, S, V)
+        step: 取样步长
+
+    返回:
+        histogram: 长度为 H*S*V 分箱数、总和为1的float32数组
+    """
+    small = np.ascontiguousarray(frame[::step, ::step, :3])
+    hsv = cv2.cvtColor(small, cv2.COLOR_RGB2HSV)
+    histogram = cv2.calcHist([hsv], [0, 1, 2], None, list(bins), HSV_RANGES).ravel()
+    return histogram / max(float(histogram.sum()), 1.0)
+
+
+class ColorSignatures:
+    """每个状态的HSV颜色直方图签名，用于在模板匹配前排除颜色分布明显不同的状态
+
+    签名是该状态所有已标注截图直方图的平均值。一帧截图只计算一次直方图，
+    与每个签名求直方图交集（逐分箱取最小值再求和，取值0-1），低于下限的状态不再做模板匹配。
+    """
+
+    def __init__(self, bins=DEFAULT_HSV_BINS, step=DEFAULT_SAMPLE_STEP):
+        """初始化颜色签名
+
+        参数:
+            bins: 每个通道的分箱数 (H, S, V)
+            step: 取样步长
+        """
+        self.bins = tuple(int(value) for value in bins)
+        self.step = int(step)
+        self.labels = []
+        self.signatures = np.zeros((0, int(np.prod(self.bins))), dtype=np.float32)
+        # 统计信息
+        self.frames = 0
+        self.eliminated = 0
+        self.total_time = 0.0
+
+    def __len__(self):
+        return len(self.labels)
+
+    def histogram(self, frame):
+        """计算一帧截图的直方图"""
+        return hsv_histogram(frame, self.bins, self.step)
+
+    def fit(self, histograms, labels):
+        """每个状态的签名取其所有截图直方图的平均值
+
+        参数:
+            histograms: (截图数, 分箱数) 数组
+            labels: 每张截图的状态
+        """
+        histograms = np.asarray(histograms, dtype=np.float32)
+        labels = np.asarray(labels)
+        self.labels = list(dict.fromkeys(labels.tolist()))
+        self.signatures = np.stack([histograms[labels == label].mean(axis=0) for label in self.labels])
+        return self
+
+    @classmethod
+    def build(cls, root_dir, bins=DEFAULT_HSV_BINS, step=DEFAULT_SAMPLE_STEP):
+        """从 root_dir/<状态>/ 下的截图建立签名"""
+        signatures = cls(bins, step)
+        images = labeled_images(root_dir)
+        if images:
+            histograms = [signatures.histogram(ImageUtils.load_image_array(path)) for _, path in images]
+            signatures.fit(histograms, [label for label, _ in images])
+        return signatures
+
+    def intersections(self, frame):
+        """计算一帧截图与每个状态签名的直方图交集
+
+        返回:
+            intersections: 状态 -> 交集（0-1） 的字典；灰度帧返回空字典
+        """
+        if frame.ndim != 3 or len(self) == 0:
+            return {}
+        values = np.minimum(self.signatures, self.histogram(frame)).sum(axis=1)
+        return dict(zip(self.labels, values.tolist()))
+
+    def filter(self, frame, statuses, min_intersection):
+        """排除直方图交集低于min_intersection的状态
+
+        参数:
+            frame: RGB(A) numpy数组
+            statuses: 待筛选的状态列表
+            min_intersection: 交集下限
+
+        返回:
+            (kept, eliminated, intersections): 保留的状态、排除的状态和各状态的交集；
+            没有签名的状态（例如截图目录中没有该状态）总是保留
+        """
+        start_time = time.perf_counter()
+        intersections = self.intersections(frame)
+        eliminated = [status for status in statuses
+                      if status in intersections and intersections[status] < min_intersection]
+        kept = [status for status in statuses if status not in eliminated]
+        self.total_time += time.perf_counter() - start_time
+        self.frames += 1
+        self.eliminated += len(eliminated)
+        return kept, eliminated, intersections
+
+    def save(self, path):
+        """保存为npz文件"""
+        np.savez_compressed(path, labels=np.array(self.labels), signatures=self.signatures,
+                            bins=np.array(self.bins), step=self.step)
+
+    @classmethod
+    def load(cls, path):
+        """从save保存的npz文件加载"""
+        with np.load(path) as data:
+            signatures = cls(tuple(data["bins"].tolist()), int(data["step"]))
+            signatures.labels = data["labels"].tolist()
+            signatures.signatures = data["signatures"].astype(np.float32)
+        return signatures
+
+    def stats(self):
+        """获取预筛选统计信息"""
+        return {
+            "states": len(self),
+            "frames": self.frames,
+            "eliminated": self.eliminated,
+            "avg_eliminated": self.eliminated / self.frames if self.frames else 0.0,
+            "avg_filter_us": self.total_time / self.frames * 1e6 if self.frames else 0.0
+        }
@@ -0,0 +1,179 @@
+import threading
+import time
+import numpy as np
+from cr.capture import Frame
+
+
+class FrameRingBuffer:
+    """固定容量的截图环形缓冲区
+
+    所有槽位的图像数组在收到第一帧时一次性分配，之后循环复用；写满后覆盖最旧的帧
+    （drop-oldest）。读取时把槽位内容拷贝到调用方提供的数组中，生产者随后覆盖该槽位
+    也不会影响已读出的帧。
+
+    复用只发生在缓冲区内部和读取一侧：put收到的帧由截图后端新分配（解码BMP/PNG或转换Quartz像素），
+    写入时再拷贝到槽位，生产者每帧仍有一次分配。
+    """
+
+    def __init__(self, capacity=4):
+        """初始化环形缓冲区
+
+        参数:
+            capacity: 槽位数量
+        """
+        if capacity < 1:
+            raise ValueError("环形缓冲区容量至少为1")
+        self.capacity = capacity
+        # 槽位图像数组，形状为 (capacity, 高, 宽, 3)，收到第一帧时分配
+        self._images = None
+        # 槽位元数据：(seq, timestamp, region, source)
+        self._meta = [None] * capacity
+        # 下一次写入的位置（累计写入次数）
+        self._write_count = 0
+        # 已被读取过的最大帧序号
+        self._last_read_seq = 0
+        self._cond = threading.Condition()
+        # 统计信息
+        self.dropped = 0
+        self.reallocations = 0
+
+    def _ensure_storage(self, shape):
+        """确保槽位数组与帧尺寸一致，窗口尺寸变化时重新分配"""
+        if self._images is not None and self._images.shape[1:] == shape:
+            return
+        if self._images is not None:
+            self.reallocations += 1
+            print(f"⚠ 帧尺寸变化为 {shape}，重新分配环形缓冲区")
+        self._images = np.empty((self.capacity,) + shape, dtype=np.uint8)
+        self._meta = [None] * self.capacity
+
+    def put(self, frame):
+        """写入一帧，缓冲区已满时覆盖最旧的帧"""
+        with self._cond:
+            self._ensure_storage(frame.image.shape)
+            slot = self._write_count % self.capacity
+            old_meta = self._meta[slot]
+            # 被覆盖的帧从未被读取过，记为丢弃
+            if old_meta is not None and old_meta[0] > self._last_read_seq:
+                self.dropped += 1
+            np.copyto(self._images[slot], frame.image)
+            self._meta[slot] = (frame.seq, frame.timestamp, frame.region, frame.source)
+            self._write_count += 1
+            self._cond.notify_all()
+
+    def _read_slot(self, slot, out=None):
+        """把槽位内容拷贝到out（形状不符时新分配）并返回Frame"""
+        image = self._images[slot]
+        if out is None or out.shape != image.shape:
+            out = np.empty_like(image)
+        np.copyto(out, image)
+        seq, timestamp, region, source = self._meta[slot]
+        self._last_read_seq = max(self._last_read_seq, seq)
+        return Frame(out, timestamp=timestamp, region=region, source=source, seq=seq)
+
+    def _slots_newer_than(self, timestamp):
+        """按时间顺序返回时间戳晚于timestamp的槽位"""
+        slots = []
+        start = max(0, self._write_count - self.capacity)
+        for count in range(start, self._write_count):
+            slot = count % self.capacity
+            meta = self._meta[slot]
+            if meta is not None and meta[1] > timestamp:
+                slots.append(slot)
+        return slots
+
+    def latest(self, out=None):
+        """返回最新的一帧，缓冲区为空时返回None
+
+        参数:
+            out: 可复用的图像数组，形状匹配时帧数据直接拷贝进去，避免每次分配
+        """
+        with self._cond:
+            if self._write_count == 0:
+                return None
+            return self._read_slot((self._write_count - 1) % self.capacity, out)
+
+    def next_after(self, timestamp, timeout=None, out=None, newest=False):
+        """等待并返回时间戳晚于timestamp的帧
+
+        参数:
+            timestamp: 参考时间戳，通常是上一次处理的帧的时间戳
+            timeout: 最长等待时间（秒），None表示一直等待
+            out: 可复用的图像数组
+            newest: True时返回满足条件的最新一帧，False时返回其中最早的一帧
+
+        返回:
+            frame: Frame对象，超时返回None
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._slots_newer_than(timestamp), timeout):
+                return None
+            slots = self._slots_newer_than(timestamp)
+            return self._read_slot(slots[-1] if newest else slots[0], out)
+
+    def stats(self):
+        """返回缓冲区统计信息"""
+        with self._cond:
+            return {
+                "capacity": self.capacity,
+                "written": self._write_count,
+                "dropped": self.dropped,
+                "reallocations": self.reallocations
+            }
+
+
+class CaptureThread(threading.Thread):
+    """后台截图线程，以目标帧率持续把截图写入环形缓冲区
+
+    每次截图由capture_frame返回后端新分配的数组，再拷贝到环形缓冲区的槽位，即每帧一次分配加一次拷贝；
+    只有读取一侧（next_after/latest传入out）完全复用内存。
+    """
+
+    def __init__(self, screenshot_manager, frame_buffer, target_fps=5.0):
+        """初始化截图线程
+
+        参数:
+            screenshot_manager: ScreenshotManager实例，只在本线程中使用
+            frame_buffer: FrameRingBuffer实例
+            target_fps: 目标截图帧率
+        """
+        super().__init__(name="CaptureThread", daemon=True)
+        self.screenshot_manager = screenshot_manager
+        self.frame_buffer = frame_buffer
+        self.target_fps = target_fps
+        self._stop_event = threading.Event()
+        # 统计信息
+        self.captured = 0
+        self.failed = 0
+        self.total_capture_time = 0.0
+
+    def run(self):
+        interval = 1.0 / self.target_fps if self.target_fps > 0 else 0.0
+        while not self._stop_event.is_set():
+            start_time = time.time()
+            # 窗口前置在启动线程前完成，这里只截图不写盘
+            frame = self.screenshot_manager.capture_frame(skip_bring_to_front=True, save=False)
+            elapsed = time.time() - start_time
+            self.total_capture_time += elapsed
+            if frame is not None:
+                self.frame_buffer.put(frame)
+                self.captured += 1
+            else:
+                self.failed += 1
+            self._stop_event.wait(max(0.0, interval - elapsed))
+
+    def stop(self, timeout=2.0):
+        """停止截图线程并等待其退出"""
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+
+    def stats(self):
+        """返回截图线程统计信息"""
+        average = self.total_capture_time / self.captured if self.captured else 0.0
+        return {
+            "captured": self.captured,
+            "failed": self.failed,
+            "avg_capture_time": average,
+            "target_fps": self.target_fps
+        }
@@ -0,0 +1,257 @@
+import os
+import queue
+import threading
+import time
+import numpy as np
+from PIL import Image
+from cr.utils import SystemUtils
+
+# 支持的保存格式
+WRITER_FORMATS = ("png", "npy")
+
+
+class SavePolicy:
+    """截图保存策略基类，子类实现should_save判断是否保存当前帧"""
+
+    name = "base"
+
+    def should_save(self, frame, status=None, similarity=None):
+        raise NotImplementedError
+
+
+class SaveAllPolicy(SavePolicy):
+    """保存所有帧"""
+
+    name = "all"
+
+    def should_save(self, frame, status=None, similarity=None):
+        return True
+
+
+class EveryNthPolicy(SavePolicy):
+    """每N帧保存一帧"""
+
+    name = "every_n"
+
+    def __init__(self, every_n=10):
+        self.every_n = max(1, every_n)
+        self._count = 0
+
+    def should_save(self, frame, status=None, similarity=None):
+        self._count += 1
+        return (self._count - 1) % self.every_n == 0
+
+
+class StatusTransitionPolicy(SavePolicy):
+    """只在识别状态发生变化时保存"""
+
+    name = "transition"
+
+    def __init__(self):
+        self._last_status = object()
+
+    def should_save(self, frame, status=None, similarity=None):
+        changed = status != self._last_status
+        self._last_status = status
+        return changed
+
+
+class LowConfidencePolicy(SavePolicy):
+    """只保存无法识别或相似度低于阈值的帧，用于补充语料"""
+
+    name = "low_confidence"
+
+    def __init__(self, low_confidence_threshold=0.6):
+        self.threshold = low_confidence_threshold
+
+    def should_save(self, frame, status=None, similarity=None):
+        return status is None or similarity is None or similarity < self.threshold
+
+
+class AnyPolicy(SavePolicy):
+    """组合策略：任一子策略要求保存时即保存"""
+
+    name = "any"
+
+    def __init__(self, policies):
+        self.policies = policies
+
+    def should_save(self, frame, status=None, similarity=None):
+        # 每个子策略都要执行，保证计数类策略的状态正确推进
+        decisions = [policy.should_save(frame, status, similarity) for policy in self.policies]
+        return any(decisions)
+
+
+# 策略名称到类的映射
+SAVE_POLICIES = {
+    "all": SaveAllPolicy,
+    "every_n": EveryNthPolicy,
+    "transition": StatusTransitionPolicy,
+    "low_confidence": LowConfidencePolicy
+}
+
+
+def create_save_policy(name="all", **options):
+    """根据名称创建保存策略
+
+    参数:
+        name: 策略名称（all、every_n、transition、low_confidence），传入列表时组合为任一满足即保存
+        **options: 策略参数，如every_n、low_confidence_threshold，各策略只取自己需要的参数
+
+    返回:
+        policy: SavePolicy实例
+    """
+    if isinstance(name, (list, tuple)):
+        return AnyPolicy([create_save_policy(item, **options) for item in name])
+    if name not in SAVE_POLICIES:
+        raise ValueError(f"未知的保存策略: {name}，可选: {list(SAVE_POLICIES.keys())}")
+
+    policy_cls = SAVE_POLICIES[name]
+    if policy_cls is EveryNthPolicy:
+        return policy_cls(every_n=options.get("every_n", 10))
+    if policy_cls is LowConfidencePolicy:
+        return policy_cls(low_confidence_threshold=options.get("low_confidence_threshold", 0.6))
+    return policy_cls()
+
+
+class FrameWriter:
+    """截图异步写入器：主循环只负责入队，编码和磁盘写入由后台线程池完成"""
+
+    def __init__(self, output_dir="png", prefix="weapp_auto", fmt="png", png_compress_level=1,
+                 workers=2, queue_size=32, policy=None):
+        """初始化截图写入器
+
+        参数:
+            output_dir: 截图保存目录
+            prefix: 文件名前缀
+            fmt: 保存格式，png或npy（原始数组，写入最快）
+            png_compress_level: PNG压缩级别 0-9，越低写入越快、文件越大
+            workers: 后台写入线程数量
+            queue_size: 写入队列容量，队列满时丢弃新帧而不是阻塞主循环
+            policy: SavePolicy实例，默认保存所有帧
+        """
+        if fmt not in WRITER_FORMATS:
+            raise ValueError(f"未知的保存格式: {fmt}，可选: {WRITER_FORMATS}")
+        self.output_dir = output_dir
+        self.prefix = prefix
+        self.fmt = fmt
+        self.png_compress_level = png_compress_level
+        self.policy = policy or SaveAllPolicy()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._seq = 0
+        # 统计信息
+        self.submitted = 0
+        self.queued = 0
+        self.skipped = 0
+        self.dropped = 0
+        self.saved = 0
+        self.errors = 0
+        self.total_write_time = 0.0
+
+        SystemUtils.ensure_dir_exists(output_dir)
+        self._workers = []
+        for i in range(workers):
+            worker = threading.Thread(target=self._worker_loop, name=f"FrameWriter-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def set_policy(self, policy):
+        """替换保存策略"""
+        self.policy = policy
+
+    def _next_path(self, frame, prefix=None):
+        """生成带毫秒和序号的文件名，高频截图时不会互相覆盖"""
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+        filename = SystemUtils.get_frame_filename(prefix or self.prefix, frame.timestamp, seq, self.fmt)
+        return os.path.join(self.output_dir, filename)
+
+    def submit(self, frame, status=None, similarity=None, prefix=None):
+        """按保存策略提交一帧，立即返回
+
+        参数:
+            frame: Frame对象
+            status: 该帧的识别状态
+            similarity: 该帧的识别相似度
+            prefix: 文件名前缀，默认使用构造时的前缀
+
+        返回:
+            path: 计划写入的文件路径；策略不保存或队列已满时返回None
+        """
+        self.submitted += 1
+        if not self.policy.should_save(frame, status, similarity):
+            self.skipped += 1
+            return None
+
+        path = self._next_path(frame, prefix)
+        # 帧数组可能被截图线程复用，入队前拷贝一份
+        image = np.array(frame.image, copy=True)
+        try:
+            self._queue.put_nowait((path, image))
+        except queue.Full:
+            self.dropped += 1
+            print(f"⚠ 截图写入队列已满，丢弃帧: {frame.seq}")
+            return None
+        self.queued += 1
+        frame.path = path
+        return path
+
+    def _write(self, path, image):
+        """把数组编码写入磁盘"""
+        if self.fmt == "npy":
+            # np.save会自动补全.npy扩展名，这里直接写入文件对象保持路径不变
+            with open(path, "wb") as f:
+                np.save(f, image)
+        else:
+            Image.fromarray(image).save(path, compress_level=self.png_compress_level)
+
+    def _worker_loop(self):
+        """后台写入线程主循环"""
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                path, image = item
+                start_time = time.time()
+                self._write(path, image)
+                elapsed = time.time() - start_time
+                with self._lock:
+                    self.saved += 1
+                    self.total_write_time += elapsed
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                print(f"✗ 截图写入失败: {e}")
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        """等待队列中的截图全部写入磁盘"""
+        self._queue.join()
+
+    def close(self):
+        """写完队列中剩余的截图并停止后台线程"""
+        self.flush()
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+
+    def stats(self):
+        """返回写入统计信息"""
+        with self._lock:
+            average = self.total_write_time / self.saved if self.saved else 0.0
+            return {
+                "submitted": self.submitted,
+                "queued": self.queued,
+                "skipped": self.skipped,
+                "dropped": self.dropped,
+                "saved": self.saved,
+                "errors": self.errors,
+                "pending": self._queue.qsize(),
+                "avg_write_time": average
+            }
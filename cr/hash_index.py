@@ -0,0 +1,198 @@
+import os
+import time
+import numpy as np
+import cv2
+from cr.utils import ImageUtils
+
+# 建立索引时读取的图片扩展名
+INDEX_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+
+def dhash(image, hash_size=8):
+    """差异哈希：缩放到 (hash_size+1) x hash_size 后比较相邻像素的明暗，返回64位整数"""
+    gray = ImageUtils.load_gray_array(image)
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return _pack_bits(bits)
+
+
+def phash(image, hash_size=8, highfreq_factor=4):
+    """感知哈希：对缩小后的灰度图做DCT，低频系数与中位数比较，返回64位整数"""
+    gray = ImageUtils.load_gray_array(image)
+    size = hash_size * highfreq_factor
+    small = cv2.resize(gray, (size, size), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:hash_size, :hash_size].ravel()
+    # 中位数不包含直流分量，避免整体亮度影响
+    bits = low > np.median(low[1:])
+    return _pack_bits(bits)
+
+
+def _pack_bits(bits):
+    """把64个布尔值打包成一个uint64"""
+    return np.packbits(bits).view(">u8")[0].astype(np.uint64)
+
+
+# 哈希方法名称到函数的映射
+HASH_METHODS = {
+    "dhash": dhash,
+    "phash": phash
+}
+
+
+if hasattr(np, "bitwise_count"):
+    def _popcount(values):
+        return np.bitwise_count(values)
+else:
+    _POPCOUNT_TABLE = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+    def _popcount(values):
+        return _POPCOUNT_TABLE[values.view(np.uint8)].reshape(values.shape + (8,)).sum(axis=-1)
+
+
+class HashIndex:
+    """已标注截图的感知哈希索引
+
+    离线为 png/实际游戏截图/<状态>/ 下的每张截图计算64位哈希，运行时对当前帧计算同样的哈希，
+    与所有条目异或后统计不同的位数（汉明距离），一次数组运算完成查找。
+    """
+
+    def __init__(self, method="phash"):
+        """初始化哈希索引
+
+        参数:
+            method: 哈希方法，dhash或phash
+        """
+        if method not in HASH_METHODS:
+            raise ValueError(f"未知的哈希方法: {method}，可选: {list(HASH_METHODS.keys())}")
+        self.method = method
+        self.hash_function = HASH_METHODS[method]
+        self.hashes = np.zeros(0, dtype=np.uint64)
+        self.labels = []
+        self.paths = []
+        # 最近一次build的耗时（秒）
+        self.build_time = 0.0
+        # 统计信息
+        self.lookups = 0
+        self.hits = 0
+        self.hash_time = 0.0
+        self.search_time = 0.0
+
+    def __len__(self):
+        return len(self.labels)
+
+    def compute_hash(self, image):
+        """计算图片的64位哈希"""
+        return self.hash_function(image)
+
+    def add(self, label, image, path=None):
+        """添加一个已标注的截图
+
+        参数:
+            label: 截图所属的状态
+            image: 截图路径、PIL图像或numpy数组
+            path: 截图路径，默认使用image（当image是路径时）
+        """
+        self.hashes = np.append(self.hashes, np.uint64(self.compute_hash(image)))
+        self.labels.append(label)
+        self.paths.append(path if path is not None else (image if isinstance(image, str) else ""))
+
+    @classmethod
+    def build(cls, root_dir, method="phash"):
+        """为 root_dir/<状态>/ 下的所有截图建立索引，子目录名即为状态标签
+
+        返回:
+            index: HashIndex实例，build_time为建立索引的耗时
+        """
+        index = cls(method)
+        start_time = time.time()
+        hashes = []
+        for label in sorted(os.listdir(root_dir)):
+            label_dir = os.path.join(root_dir, label)
+            if not os.path.isdir(label_dir):
+                continue
+            for filename in sorted(os.listdir(label_dir)):
+                if filename.lower().endswith(INDEX_EXTENSIONS):
+                    path = os.path.join(label_dir, filename)
+                    hashes.append(index.compute_hash(path))
+                    index.labels.append(label)
+                    index.paths.append(path)
+        index.hashes = np.array(hashes, dtype=np.uint64)
+        index.build_time = time.time() - start_time
+        return index
+
+    def save(self, path):
+        """保存索引为npz文件"""
+        np.savez(path, hashes=self.hashes, labels=np.array(self.labels, dtype=str),
+                 paths=np.array(self.paths, dtype=str), method=np.array(self.method))
+
+    @classmethod
+    def load(cls, path):
+        """从npz文件加载索引"""
+        with np.load(path, allow_pickle=False) as data:
+            index = cls(str(data["method"]))
+            index.hashes = data["hashes"].astype(np.uint64)
+            index.labels = data["labels"].tolist()
+            index.paths = data["paths"].tolist()
+        return index
+
+    def distances(self, image_hash):
+        """计算一个哈希与索引中所有条目的汉明距离"""
+        return _popcount(self.hashes ^ np.uint64(image_hash))
+
+    def lookup_hash(self, image_hash, max_distance=10, exclude=None):
+        """按哈希查找最接近的条目
+
+        参数:
+            image_hash: compute_hash得到的哈希
+            max_distance: 最大汉明距离，超过视为未命中
+            exclude: 查找时忽略的条目下标（用于留一法评估）
+
+        返回:
+            (label, distance, path) 或 None；距离范围内的条目标签不一致时视为未命中
+        """
+        if not self.labels:
+            return None
+        distances = self.distances(image_hash)
+        if exclude is not None:
+            distances = distances.astype(np.int16)
+            distances[exclude] = 64 + 1
+        nearest = int(np.argmin(distances))
+        distance = int(distances[nearest])
+        if distance > max_distance:
+            return None
+        label = self.labels[nearest]
+        # 距离范围内同时有不同状态的截图时无法确定，交给模板匹配
+        within = np.flatnonzero(distances <= max_distance)
+        if any(self.labels[index] != label for index in within):
+            return None
+        return label, distance, self.paths[nearest]
+
+    def lookup(self, image, max_distance=10):
+        """计算图片哈希并查找，记录耗时和命中率
+
+        返回:
+            (label, distance, path) 或 None
+        """
+        start_time = time.perf_counter()
+        image_hash = self.compute_hash(image)
+        hashed_time = time.perf_counter()
+        match = self.lookup_hash(image_hash, max_distance)
+        self.hash_time += hashed_time - start_time
+        self.search_time += time.perf_counter() - hashed_time
+        self.lookups += 1
+        if match is not None:
+            self.hits += 1
+        return match
+
+    def stats(self):
+        """返回查找统计信息，耗时单位为微秒"""
+        return {
+            "method": self.method,
+            "entries": len(self.labels),
+            "build_time": self.build_time,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+            "avg_hash_us": self.hash_time / self.lookups * 1e6 if self.lookups else 0.0,
+            "avg_search_us": self.search_time / self.lookups * 1e6 if self.lookups else 0.0
+        }
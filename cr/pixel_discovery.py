@@ -0,0 +1,240 @@
+import numpy as np
+import cv2
+from cr.pixel_probes import probe_coordinates
+from cr.screen_classifier import labeled_images
+from cr.utils import ImageUtils
+
+# 分析网格尺寸 (宽, 高)，与截图宽高比（约0.52）一致；每个网格单元是原图一小块区域的平均颜色
+DEFAULT_GRID_SIZE = (32, 60)
+# 只作为反例参与分析、不为其生成区域和探针的状态（没有对应的模板）
+NEGATIVE_LABELS = ("其他",)
+# 方差下限（RGB取值0-255），防止样本很少、颜色几乎不变的单元得分无限大
+VARIANCE_FLOOR = 25.0
+
+
+def cell_centers(grid_size):
+    """网格单元中心的相对坐标，保留4位小数，与探针文件中保存的坐标一致
+
+    返回:
+        (xs, ys): 长度分别为网格宽、高的数组
+    """
+    width, height = grid_size
+    return np.round((np.arange(width) + 0.5) / width, 4), np.round((np.arange(height) + 0.5) / height, 4)
+
+
+def load_grids(images, grid_size=DEFAULT_GRID_SIZE):
+    """把已标注的截图缩小到分析网格，并取出每个单元中心的原始像素
+
+    参数:
+        images: [(label, path), ...]，通常来自labeled_images
+        grid_size: 网格尺寸 (宽, 高)
+
+    返回:
+        grids: (帧数, 高, 宽, 3) 的float32 RGB数组，每个元素是一个单元的平均颜色，用于提出区域
+        centers: 同样形状的数组，每个元素是单元中心的单个像素，与运行时探针读取的像素相同
+        labels: 长度为帧数的状态列表
+    """
+    xs, ys = cell_centers(grid_size)
+    grids = []
+    centers = []
+    for _, path in images:
+        frame = ImageUtils.load_image_array(path)
+        if frame.ndim == 2:
+            frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2RGB)
+        frame = frame[..., :3]
+        grids.append(cv2.resize(frame, grid_size, interpolation=cv2.INTER_AREA))
+        columns, rows = probe_coordinates(xs, ys, (frame.shape[1], frame.shape[0]))
+        centers.append(frame[rows[:, None], columns[None, :]])
+    return np.stack(grids).astype(np.float32), np.stack(centers).astype(np.float32), [label for label, _ in images]
+
+
+def variance_ratio(grids, labels):
+    """所有状态之间的方差与状态内方差之比（单因素方差分析的F值，三个通道求和）
+
+    返回:
+        ratio: (高, 宽) 数组，越大表示该单元越能区分各状态
+    """
+    labels = np.asarray(labels)
+    mean = grids.mean(axis=0)
+    between = np.zeros(grids.shape[1:], dtype=np.float32)
+    within = np.zeros(grids.shape[1:], dtype=np.float32)
+    for label in np.unique(labels):
+        group = grids[labels == label]
+        group_mean = group.mean(axis=0)
+        between += len(group) * (group_mean - mean) ** 2
+        within += ((group - group_mean) ** 2).sum(axis=0)
+    states = len(np.unique(labels))
+    between /= max(states - 1, 1)
+    within = within / max(len(labels) - states, 1) + VARIANCE_FLOOR
+    return (between / within).sum(axis=-1)
+
+
+def state_scores(grids, labels, state):
+    """一个状态对其余所有帧的区分度（Fisher判别比，三个通道求和）
+
+    返回:
+        scores: (高, 宽) 数组，(状态均值 - 其余均值)^2 / (状态方差 + 其余方差)
+    """
+    own = np.asarray(labels) == state
+    positive, negative = grids[own], grids[~own]
+    gap = (positive.mean(axis=0) - negative.mean(axis=0)) ** 2
+    spread = positive.var(axis=0) + negative.var(axis=0) + VARIANCE_FLOOR
+    return (gap / spread).sum(axis=-1)
+
+
+def propose_regions(scores, count=3, quantile=0.97):
+    """把得分最高的网格单元合并成矩形区域
+
+    参数:
+        scores: state_scores返回的得分图
+        count: 最多返回的区域数量
+        quantile: 得分不低于该分位数的单元参与合并
+
+    返回:
+        regions: [{"box": 相对坐标 (x1, y1, x2, y2), "score": 区域内平均得分, "cells": 单元数}, ...]，
+                 按 平均得分 * sqrt(单元数) 从高到低排列，兼顾区分度和对单个像素噪声的稳健性
+    """
+    height, width = scores.shape
+    selected = (scores >= np.quantile(scores, quantile)).astype(np.uint8)
+    components, component_map, stats, _ = cv2.connectedComponentsWithStats(selected, connectivity=8)
+    regions = []
+    for component in range(1, components):
+        x, y, w, h, cells = stats[component]
+        mean_score = float(scores[component_map == component].mean())
+        regions.append({
+            "box": tuple(round(float(value), 4) for value in (x / width, y / height, (x + w) / width, (y + h) / height)),
+            "score": mean_score,
+            "cells": int(cells)
+        })
+    regions.sort(key=lambda region: region["score"] * np.sqrt(region["cells"]), reverse=True)
+    return regions[:count]
+
+
+def propose_probes(centers, labels, state, scores, count=8, min_spacing=3, tolerance_sigma=3.0, min_tolerance=12.0):
+    """选出得分最高、彼此相隔至少min_spacing个单元的像素探针
+
+    参数:
+        centers, labels: load_grids的结果
+        state: 状态
+        scores: 该状态在centers上的得分图
+        count: 探针数量
+        min_spacing: 两个探针之间的最小网格距离（切比雪夫距离），避免都落在同一个按钮上
+        tolerance_sigma: 容差为该状态帧在该单元的颜色标准差的倍数
+        min_tolerance: 容差下限
+
+    返回:
+        probes: [{"x": 相对x, "y": 相对y, "rgb": 期望颜色, "tolerance": 每个通道允许的偏差, "score": 得分}, ...]
+    """
+    height, width = scores.shape
+    xs, ys = cell_centers((width, height))
+    own = centers[np.asarray(labels) == state]
+    mean, std = own.mean(axis=0), own.std(axis=0)
+    probes = []
+    taken = []
+    for index in np.argsort(scores, axis=None)[::-1]:
+        y, x = divmod(int(index), width)
+        if any(max(abs(x - tx), abs(y - ty)) < min_spacing for tx, ty in taken):
+            continue
+        taken.append((x, y))
+        probes.append({
+            "x": float(xs[x]),
+            "y": float(ys[y]),
+            "rgb": [int(round(value)) for value in mean[y, x]],
+            "tolerance": int(np.ceil(max(min_tolerance, tolerance_sigma * float(std[y, x].max())))),
+            "score": float(scores[y, x])
+        })
+        if len(probes) >= count:
+            break
+    return probes
+
+
+def probe_matches(centers, probes):
+    """判断每帧是否所有探针的颜色都在容差范围内
+
+    参数:
+        centers: load_grids返回的单元中心像素
+        probes: propose_probes的结果
+
+    返回:
+        matches: 长度为帧数的bool数组
+    """
+    height, width = centers.shape[1:3]
+    matches = np.ones(len(centers), dtype=bool)
+    for probe in probes:
+        x = min(int(probe["x"] * width), width - 1)
+        y = min(int(probe["y"] * height), height - 1)
+        diff = np.abs(centers[:, y, x] - np.asarray(probe["rgb"], dtype=np.float32))
+        matches &= (diff <= probe["tolerance"]).all(axis=-1)
+    return matches
+
+
+def evaluate_probes(centers, labels, states, count=8):
+    """留一法评估探针：每帧用其余帧提出的探针判断，恰好一个状态的探针全部命中才算给出结果
+
+    返回:
+        {"frames", "decided", "correct", "decision_rate", "accuracy"}，accuracy为给出结果的帧中正确的比例
+    """
+    labels = np.asarray(labels)
+    decided = 0
+    correct = 0
+    for i in range(len(labels)):
+        keep = np.arange(len(labels)) != i
+        train_centers, train_labels = centers[keep], list(labels[keep])
+        matched = []
+        for state in states:
+            if state not in train_labels:
+                continue
+            state_probes = propose_probes(train_centers, train_labels, state,
+                                          state_scores(train_centers, train_labels, state), count)
+            if probe_matches(centers[i:i + 1], state_probes)[0]:
+                matched.append(state)
+        if len(matched) == 1:
+            decided += 1
+            correct += matched[0] == labels[i]
+    return {
+        "frames": len(labels),
+        "decided": decided,
+        "correct": int(correct),
+        "decision_rate": decided / len(labels) if len(labels) else 0.0,
+        "accuracy": correct / decided if decided else 0.0
+    }
+
+
+def discover(screenshot_dir="png/实际游戏截图", states=None, grid_size=DEFAULT_GRID_SIZE, regions=3, probes=8):
+    """分析已标注截图，为每个状态给出排好序的区分区域和像素探针
+
+    参数:
+        screenshot_dir: 已标注截图目录（子目录名即为状态）
+        states: 要分析的状态，None表示除NEGATIVE_LABELS以外的所有状态
+        grid_size: 分析网格尺寸 (宽, 高)
+        regions: 每个状态的区域数量
+        probes: 每个状态的探针数量
+
+    返回:
+        result: {"grid_size", "frames", "regions": {状态: [...]}, "probes": {状态: [...]},
+                 "coverage": {状态: 区域占整帧的比例}, "separation": {状态: 探针在本状态/其他帧上的命中率},
+                 "shared_regions": 按所有状态的方差比排序、同时区分各状态的区域,
+                 "leave_one_out": evaluate_probes的结果}
+    """
+    grids, centers, labels = load_grids(labeled_images(screenshot_dir), grid_size)
+    if states is None:
+        states = [label for label in dict.fromkeys(labels) if label not in NEGATIVE_LABELS]
+    own_labels = np.asarray(labels)
+    result = {"grid_size": list(grid_size), "frames": len(labels), "regions": {}, "probes": {},
+              "coverage": {}, "separation": {},
+              "shared_regions": propose_regions(variance_ratio(grids, labels), regions)}
+    for state in states:
+        state_regions = propose_regions(state_scores(grids, labels, state), regions)
+        state_probes = propose_probes(centers, labels, state, state_scores(centers, labels, state), probes)
+        matches = probe_matches(centers, state_probes)
+        own = own_labels == state
+        result["regions"][state] = state_regions
+        result["probes"][state] = state_probes
+        result["coverage"][state] = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in
+                                        (region["box"] for region in state_regions))
+        result["separation"][state] = {
+            "own_hit_rate": float(matches[own].mean()) if own.any() else 0.0,
+            "other_hit_rate": float(matches[~own].mean()) if (~own).any() else 0.0
+        }
+    result["leave_one_out"] = evaluate_probes(centers, labels, states, probes)
+    return result
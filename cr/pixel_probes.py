@@ -0,0 +1,122 @@
+import json
+import time
+import threading
+import numpy as np
+
+
+def probe_coordinates(xs, ys, size):
+    """把相对坐标换算成像素坐标，发现探针（pixel_discovery）和运行时检查使用同一换算
+
+    参数:
+        xs, ys: 相对坐标数组（0-1）
+        size: 截图尺寸 (宽, 高)
+
+    返回:
+        (列下标数组, 行下标数组)
+    """
+    width, height = size
+    columns = np.minimum((np.asarray(xs) * width).astype(np.intp), width - 1)
+    rows = np.minimum((np.asarray(ys) * height).astype(np.intp), height - 1)
+    return columns, rows
+
+
+class ProbeSet:
+    """像素探针：每个状态由若干 (相对x, 相对y, 期望RGB, 容差) 描述
+
+    所有状态的探针拼接成一组数组，一帧截图只做一次花式索引取出所有探针像素，
+    与期望颜色逐通道比较后按状态统计命中比例，整个过程只需几微秒。
+    恰好一个状态的探针全部命中时才给出结果，其余帧交给后续的识别阶段。
+    """
+
+    def __init__(self, probes=None, grid_size=None):
+        """初始化探针集合
+
+        参数:
+            probes: 状态 -> [{"x", "y", "rgb", "tolerance"}, ...] 的字典
+            grid_size: 发现探针时使用的分析网格尺寸，只作记录
+        """
+        self.probes = {state: list(state_probes) for state, state_probes in (probes or {}).items() if state_probes}
+        self.grid_size = grid_size
+        self.states = list(self.probes)
+        rows = [(index, probe) for index, state in enumerate(self.states) for probe in self.probes[state]]
+        self._xs = np.array([probe["x"] for _, probe in rows], dtype=np.float64)
+        self._ys = np.array([probe["y"] for _, probe in rows], dtype=np.float64)
+        self._expected = np.array([probe["rgb"] for _, probe in rows], dtype=np.int16).reshape(-1, 3)
+        self._tolerance = np.array([probe["tolerance"] for _, probe in rows], dtype=np.int16)[:, None]
+        self._state_index = np.array([index for index, _ in rows], dtype=np.intp)
+        self._counts = np.bincount(self._state_index, minlength=len(self.states))
+        # 截图尺寸 -> (列下标, 行下标)，窗口尺寸不变时只换算一次
+        self._resolved = {}
+        self._lock = threading.Lock()
+        # 统计信息
+        self.checks = 0
+        self.decisions = 0
+        self.total_time = 0.0
+
+    def __len__(self):
+        return len(self._state_index)
+
+    def _coordinates(self, size):
+        """获取指定截图尺寸下所有探针的像素坐标"""
+        with self._lock:
+            coordinates = self._resolved.get(size)
+            if coordinates is None:
+                coordinates = probe_coordinates(self._xs, self._ys, size)
+                self._resolved[size] = coordinates
+            return coordinates
+
+    def match(self, frame):
+        """计算每个状态的探针命中比例
+
+        参数:
+            frame: (高, 宽, 3或4) 的RGB(A) numpy数组
+
+        返回:
+            fractions: 状态 -> 命中比例 的字典；灰度帧或没有探针时返回空字典
+        """
+        if frame.ndim != 3 or len(self) == 0:
+            return {}
+        columns, rows = self._coordinates((frame.shape[1], frame.shape[0]))
+        pixels = frame[rows, columns, :3].astype(np.int16)
+        hits = (np.abs(pixels - self._expected) <= self._tolerance).all(axis=1)
+        matched = np.bincount(self._state_index, weights=hits, minlength=len(self.states))
+        return dict(zip(self.states, (matched / self._counts).tolist()))
+
+    def decide(self, frame, min_fraction=1.0):
+        """只有一个状态的命中比例达到min_fraction时返回该状态
+
+        返回:
+            (状态, 命中比例)；无法确定时状态为None，命中比例为所有状态中的最高值
+        """
+        start_time = time.perf_counter()
+        fractions = self.match(frame)
+        matched = [state for state, fraction in fractions.items() if fraction >= min_fraction]
+        self.total_time += time.perf_counter() - start_time
+        self.checks += 1
+        if len(matched) == 1:
+            self.decisions += 1
+            return matched[0], fractions[matched[0]]
+        return None, max(fractions.values(), default=0.0)
+
+    def save(self, path):
+        """保存为JSON文件"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"grid_size": self.grid_size, "probes": self.probes}, f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        """从save保存的JSON文件加载"""
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data.get("probes", {}), data.get("grid_size"))
+
+    def stats(self):
+        """获取探针统计信息"""
+        return {
+            "states": len(self.states),
+            "probes": len(self),
+            "checks": self.checks,
+            "decisions": self.decisions,
+            "decision_rate": self.decisions / self.checks if self.checks else 0.0,
+            "avg_check_us": self.total_time / self.checks * 1e6 if self.checks else 0.0
+        }
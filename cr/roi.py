@@ -0,0 +1,112 @@
+import threading
+
+
+class RoiRegistry:
+    """感兴趣区域（ROI）注册表
+
+    区域用相对坐标 (x1, y1, x2, y2)（0-1，相对于截图宽高）声明，按截图尺寸换算成像素坐标后缓存，
+    窗口尺寸不变时只换算一次。view返回当前帧对应区域的numpy视图（不复制像素），
+    各分析模块只读取自己需要的像素。
+    """
+
+    def __init__(self, regions=None):
+        """初始化ROI注册表
+
+        参数:
+            regions: 区域名称到相对坐标 (x1, y1, x2, y2) 的字典
+        """
+        self.regions = {}
+        self._resolved = {}
+        self._lock = threading.Lock()
+        # 统计信息：像素坐标换算次数
+        self.resolutions = 0
+        for name, box in (regions or {}).items():
+            self.register(name, box)
+
+    def register(self, name, box):
+        """注册或替换一个区域
+
+        参数:
+            name: 区域名称
+            box: 相对坐标 (x1, y1, x2, y2)，取值0-1，且x1 < x2、y1 < y2
+        """
+        x1, y1, x2, y2 = (float(value) for value in box)
+        if not (0.0 <= x1 < x2 <= 1.0 and 0.0 <= y1 < y2 <= 1.0):
+            raise ValueError(f"ROI区域坐标无效: {name} -> {box}")
+        with self._lock:
+            self.regions[name] = (x1, y1, x2, y2)
+            self._resolved.clear()
+
+    def resolve(self, size):
+        """把所有区域换算成指定截图尺寸下的像素坐标
+
+        参数:
+            size: 截图尺寸 (宽, 高)
+
+        返回:
+            boxes: 区域名称到像素坐标 (x1, y1, x2, y2) 的字典
+        """
+        size = (int(size[0]), int(size[1]))
+        with self._lock:
+            boxes = self._resolved.get(size)
+            if boxes is None:
+                width, height = size
+                boxes = {}
+                for name, (x1, y1, x2, y2) in self.regions.items():
+                    left, top = int(round(x1 * width)), int(round(y1 * height))
+                    # 至少保留1个像素
+                    right = max(left + 1, int(round(x2 * width)))
+                    bottom = max(top + 1, int(round(y2 * height)))
+                    boxes[name] = (left, top, min(right, width), min(bottom, height))
+                self._resolved[size] = boxes
+                self.resolutions += 1
+            return boxes
+
+    def box(self, name, size):
+        """返回区域在指定截图尺寸下的像素坐标 (x1, y1, x2, y2)"""
+        boxes = self.resolve(size)
+        if name not in boxes:
+            raise KeyError(f"未注册的ROI区域: {name}，可选: {list(boxes.keys())}")
+        return boxes[name]
+
+    def view(self, image, name):
+        """返回图像中指定区域的numpy视图，不复制像素
+
+        参数:
+            image: (高, 宽) 或 (高, 宽, 通道) 的numpy数组
+            name: 区域名称
+
+        返回:
+            view: 与image共享内存的子数组
+        """
+        height, width = image.shape[:2]
+        x1, y1, x2, y2 = self.box(name, (width, height))
+        return image[y1:y2, x1:x2]
+
+    def screen_region(self, name, window_region):
+        """把区域换算成屏幕坐标，用于直接截取屏幕上的该区域
+
+        参数:
+            name: 区域名称
+            window_region: 截图窗口在屏幕上的区域 (x, y, 宽, 高)
+
+        返回:
+            region: 屏幕坐标 (x, y, 宽, 高)
+        """
+        window_x, window_y, width, height = window_region
+        x1, y1, x2, y2 = self.box(name, (width, height))
+        return (window_x + x1, window_y + y1, x2 - x1, y2 - y1)
+
+
+_shared_registry = None
+_shared_registry_lock = threading.Lock()
+
+
+def get_roi_registry():
+    """获取进程内共享的ROI注册表，首次调用时按配置中的ROI_CONFIG创建"""
+    global _shared_registry
+    with _shared_registry_lock:
+        if _shared_registry is None:
+            from config.config import ROI_CONFIG
+            _shared_registry = RoiRegistry(ROI_CONFIG)
+        return _shared_registry
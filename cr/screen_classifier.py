@@ -0,0 +1,234 @@
+import os
+import time
+import numpy as np
+import cv2
+from cr.hash_index import INDEX_EXTENSIONS
+from cr.utils import ImageUtils
+
+# 灰度特征的缩略图尺寸 (宽, 高)，与截图宽高比（约0.52）一致
+DEFAULT_FEATURE_SIZE = (16, 30)
+# 颜色直方图每个通道的分箱数，共 bins^3 维
+DEFAULT_COLOR_BINS = 4
+
+# 分类方法：linear为softmax线性模型，knn为k近邻
+CLASSIFIER_METHODS = ("linear", "knn")
+
+
+def labeled_images(root_dir):
+    """列出 root_dir/<状态>/ 下的所有截图，子目录名即为状态标签
+
+    返回:
+        [(label, path), ...]，按状态和文件名排序
+    """
+    images = []
+    for label in sorted(os.listdir(root_dir)):
+        label_dir = os.path.join(root_dir, label)
+        if not os.path.isdir(label_dir):
+            continue
+        for filename in sorted(os.listdir(label_dir)):
+            if filename.lower().endswith(INDEX_EXTENSIONS):
+                images.append((label, os.path.join(label_dir, filename)))
+    return images
+
+
+class ScreenClassifier:
+    """基于缩略图的轻量画面分类器，只依赖NumPy和OpenCV
+
+    特征为缩略灰度图（标准化后）加RGB颜色直方图。先按步长对整帧取样再缩小，
+    特征提取不需要处理每个像素；推理只是一次矩阵乘法（linear）或一次距离计算（knn）。
+    训练结果（标准化参数、权重或样本特征）保存在一个npz文件中。
+    """
+
+    def __init__(self, method="linear", feature_size=DEFAULT_FEATURE_SIZE, color_bins=DEFAULT_COLOR_BINS, k=3,
+                 outlier_factor=2.0):
+        """初始化分类器
+
+        参数:
+            method: 分类方法，linear或knn
+            feature_size: 灰度缩略图尺寸 (宽, 高)
+            color_bins: 颜色直方图每个通道的分箱数
+            k: knn的近邻数量
+            outlier_factor: 与预测类别中心的距离超过训练样本最大距离的该倍数时视为未见过的画面
+        """
+        if method not in CLASSIFIER_METHODS:
+            raise ValueError(f"未知的分类方法: {method}，可选: {list(CLASSIFIER_METHODS)}")
+        self.method = method
+        self.feature_size = (int(feature_size[0]), int(feature_size[1]))
+        self.color_bins = int(color_bins)
+        self.k = int(k)
+        self.outlier_factor = outlier_factor
+        self.labels = []
+        # 特征标准化参数
+        self.mean = None
+        self.std = None
+        # 各类别的特征中心和训练样本到所属中心的最大距离，用于拒绝训练集中没有的画面
+        self.centroids = None
+        self.radius = 0.0
+        # linear: (特征维数, 类别数) 权重和偏置；knn: 标准化后的样本特征和类别下标
+        self.weights = None
+        self.bias = None
+        self.samples = None
+        self.targets = None
+        # 统计信息
+        self.predictions = 0
+        self.outliers = 0
+        self.feature_time = 0.0
+        self.inference_time = 0.0
+
+    def features(self, image):
+        """提取一帧截图的特征向量
+
+        参数:
+            image: 截图路径、PIL图像、RGB或灰度numpy数组、Frame对象
+
+        返回:
+            feature: 缩略灰度图和归一化颜色直方图拼接成的float32向量
+        """
+        image_np = ImageUtils.load_image_array(image)
+        if image_np.ndim == 2:
+            image_np = np.repeat(image_np[:, :, None], 3, axis=2)
+        width, height = self.feature_size
+        # 先按步长取样到约两倍缩略图尺寸，再用INTER_AREA缩小，避免对整帧做区域平均
+        step_y = max(1, image_np.shape[0] // (2 * height))
+        step_x = max(1, image_np.shape[1] // (2 * width))
+        sampled = np.ascontiguousarray(image_np[::step_y, ::step_x])
+        small = cv2.resize(sampled, (width, height), interpolation=cv2.INTER_AREA).astype(np.float32)
+        gray = (small[:, :, 0] * 0.299 + small[:, :, 1] * 0.587 + small[:, :, 2] * 0.114).ravel() / 255.0
+
+        quantized = (sampled.reshape(-1, 3) // (256 // self.color_bins)).astype(np.intp)
+        codes = (quantized[:, 0] * self.color_bins + quantized[:, 1]) * self.color_bins + quantized[:, 2]
+        histogram = np.bincount(codes, minlength=self.color_bins ** 3).astype(np.float32)
+        histogram /= histogram.sum()
+        return np.concatenate([gray, histogram]).astype(np.float32)
+
+    def fit(self, features, labels, epochs=500, learning_rate=0.5, l2=1e-2):
+        """用已标注的特征训练分类器
+
+        参数:
+            features: (样本数, 特征维数) 数组，来自features()
+            labels: 每个样本的状态标签
+            epochs, learning_rate, l2: linear模型全批量梯度下降的轮数、学习率和L2正则系数
+
+        返回:
+            self
+        """
+        features = np.asarray(features, dtype=np.float32)
+        self.labels = sorted(set(labels))
+        targets = np.array([self.labels.index(label) for label in labels], dtype=np.intp)
+        self.mean = features.mean(axis=0)
+        # 训练集中几乎不变的特征（如从未出现的颜色）不放大，避免新画面的微小差异主导结果
+        self.std = np.maximum(features.std(axis=0), 1e-2)
+        standardized = (features - self.mean) / self.std
+        self.centroids = np.stack([standardized[targets == index].mean(axis=0) for index in range(len(self.labels))])
+        self.radius = float(np.linalg.norm(standardized - self.centroids[targets], axis=1).max())
+
+        if self.method == "knn":
+            self.samples = np.ascontiguousarray(standardized)
+            self.targets = targets
+            return self
+
+        # softmax回归，样本很少，全批量梯度下降即可收敛
+        samples, classes = standardized.shape[0], len(self.labels)
+        one_hot = np.eye(classes, dtype=np.float32)[targets]
+        self.weights = np.zeros((standardized.shape[1], classes), dtype=np.float32)
+        self.bias = np.zeros(classes, dtype=np.float32)
+        for _ in range(epochs):
+            probabilities = self._softmax(standardized @ self.weights + self.bias)
+            gradient = (probabilities - one_hot) / samples
+            self.weights -= learning_rate * (standardized.T @ gradient + l2 * self.weights)
+            self.bias -= learning_rate * gradient.sum(axis=0)
+        return self
+
+    @staticmethod
+    def _softmax(logits):
+        logits = logits - logits.max(axis=-1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=-1, keepdims=True)
+
+    def predict_proba(self, feature):
+        """返回特征向量属于各类别的概率，顺序与self.labels一致
+
+        knn的概率为k个近邻中各类别所占的比例
+        """
+        standardized = (feature - self.mean) / self.std
+        if self.method == "linear":
+            return self._softmax(standardized @ self.weights + self.bias)
+        distances = np.einsum("ij,ij->i", self.samples - standardized, self.samples - standardized)
+        k = min(self.k, len(distances))
+        nearest = np.argpartition(distances, k - 1)[:k]
+        return np.bincount(self.targets[nearest], minlength=len(self.labels)) / k
+
+    def is_outlier(self, feature, index):
+        """判断特征是否远离第index个类别的训练样本（例如训练集中没有的状态）"""
+        distance = np.linalg.norm((feature - self.mean) / self.std - self.centroids[index])
+        return distance > self.outlier_factor * self.radius
+
+    def predict(self, image):
+        """预测一帧截图的状态，记录特征提取和推理耗时
+
+        返回:
+            (label, confidence): 概率最高的状态和它的概率；画面远离训练样本时返回 (None, 0.0)
+        """
+        start_time = time.perf_counter()
+        feature = self.features(image)
+        extracted_time = time.perf_counter()
+        probabilities = self.predict_proba(feature)
+        best = int(np.argmax(probabilities))
+        outlier = self.is_outlier(feature, best)
+        self.feature_time += extracted_time - start_time
+        self.inference_time += time.perf_counter() - extracted_time
+        self.predictions += 1
+        if outlier:
+            self.outliers += 1
+            return None, 0.0
+        return self.labels[best], float(probabilities[best])
+
+    def save(self, path):
+        """把模型保存为一个npz文件"""
+        arrays = {
+            "method": np.array(self.method),
+            "feature_size": np.array(self.feature_size),
+            "color_bins": np.array(self.color_bins),
+            "k": np.array(self.k),
+            "outlier_factor": np.array(self.outlier_factor),
+            "labels": np.array(self.labels, dtype=str),
+            "mean": self.mean,
+            "std": self.std,
+            "centroids": self.centroids,
+            "radius": np.array(self.radius)
+        }
+        if self.method == "linear":
+            arrays.update(weights=self.weights, bias=self.bias)
+        else:
+            arrays.update(samples=self.samples, targets=self.targets)
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """从npz文件加载模型"""
+        with np.load(path, allow_pickle=False) as data:
+            classifier = cls(str(data["method"]), tuple(data["feature_size"].tolist()),
+                             int(data["color_bins"]), int(data["k"]), float(data["outlier_factor"]))
+            classifier.labels = data["labels"].tolist()
+            classifier.mean = data["mean"]
+            classifier.std = data["std"]
+            classifier.centroids = data["centroids"]
+            classifier.radius = float(data["radius"])
+            if classifier.method == "linear":
+                classifier.weights = data["weights"]
+                classifier.bias = data["bias"]
+            else:
+                classifier.samples = data["samples"]
+                classifier.targets = data["targets"]
+        return classifier
+
+    def stats(self):
+        """返回预测统计信息，耗时单位为微秒"""
+        return {
+            "method": self.method,
+            "labels": list(self.labels),
+            "predictions": self.predictions,
+            "outliers": self.outliers,
+            "avg_feature_us": self.feature_time / self.predictions * 1e6 if self.predictions else 0.0,
+            "avg_inference_us": self.inference_time / self.predictions * 1e6 if self.predictions else 0.0
+        }
@@ -1,9 +1,12 @@
 import subprocess
+import tempfile
 import time
 import os
 from config.config import SCREENSHOT_CONFIG, DOUBAO_OCR_CONFIG
 from cr.click_manager import ClickManager
+from cr.capture import create_capture_backend, resolve_backend_name
 from cr.utils import WeChatUtils, SystemUtils
+from cr.window_geometry import get_geometry_service
 
 # OCR配置
 OCR_SCRIPT = DOUBAO_OCR_CONFIG.get("ocr_script_path", "/Volumes/600g/app1/doubao获取/python/doubao_ocr.py")
@@ -19,101 +22,59 @@ CLASH_ROYALE_CONFIG = {
 class ScreenshotManager:
     """截图管理器，专注于自动截取WeApp界面"""
     
-    def __init__(self):
+    def __init__(self, capture_backend=None, geometry=None):
+        """初始化截图管理器
+        
+        参数:
+            capture_backend: 截图后端实例，默认根据配置中的capture_backend创建
+            geometry: WindowGeometryService实例，默认使用进程内共享的窗口几何服务
+        """
         self.config = SCREENSHOT_CONFIG
         self.screenshot_dir = self.config["screenshot_dir"]
         self.wechat_process_name = self.config["wechat_process_name"]
         self.weapp_relative_region = self.config["weapp_relative_region"]
+        # 窗口位置和屏幕尺寸由共享的窗口几何服务缓存，点击管理器使用同一份缓存
+        self.geometry = geometry or get_geometry_service()
         # 初始化点击管理器
-        self.click_manager = ClickManager()
-        # 添加缓存机制 - 先初始化缓存属性
-        self._wx_window_cache = None
-        self._screen_size_cache = None
-        self._last_calculated_time = 0
-        self._cache_timeout = 5.0  # 缓存超时时间，单位：秒
+        self.click_manager = ClickManager(geometry=self.geometry)
         self._debug = self.config.get("debug", False)
+        # 截图后端
+        if capture_backend is None:
+            capture_backend = self._create_capture_backend()
+        self.capture_backend = capture_backend
+        # 回放的帧本来就是磁盘上的文件，默认不再保存；显式保存时写入临时目录，不在png/下留下重复的截图
+        self.save_screenshots = self.config.get("save_screenshots", True)
+        if capture_backend.name == "replay":
+            self.save_screenshots = False
+            self.screenshot_dir = (self.config.get("replay_screenshot_dir")
+                                   or os.path.join(tempfile.gettempdir(), "cr_replay_screenshots"))
+            SystemUtils.ensure_dir_exists(self.screenshot_dir)
+        # 截图帧序号
+        self._frame_seq = 0
         # 初始化时计算一次绝对区域 - 后调用计算方法
         self.weapp_region = self._calculate_absolute_weapp_region()
     
+    def _create_capture_backend(self):
+        """根据配置创建截图后端"""
+        backend_name = resolve_backend_name(self.config.get("capture_backend", "auto"))
+        options = {}
+        if backend_name == "replay":
+            options["source"] = self.config.get("replay_source", "png/实际游戏截图")
+        backend = create_capture_backend(backend_name, **options)
+        if self._debug:
+            print(f"✓ 使用截图后端: {backend.name}")
+        return backend
+    
     def _get_screen_size(self):
-        """获取屏幕尺寸，带缓存机制"""
-        if self._screen_size_cache is not None:
-            return self._screen_size_cache
-            
-        try:
-            applescript = '''tell application "Finder"
-    set screen_resolution to bounds of window of desktop
-    return screen_resolution
-end tell'''
-            result = subprocess.run(["osascript", "-e", applescript], check=True, capture_output=True, text=True)
-            # 解析结果，格式为 {0, 0, width, height}
-            bounds = result.stdout.strip().replace("{", "").replace("}", "").split(", ")
-            screen_width = int(bounds[2])
-            screen_height = int(bounds[3])
-            self._screen_size_cache = (screen_width, screen_height)
-            return self._screen_size_cache
-        except Exception as e:
-            if self._debug:
-                print(f"获取屏幕大小失败: {e}")
-            # 默认使用常见屏幕分辨率作为 fallback
-            self._screen_size_cache = (1920, 1080)
-            return self._screen_size_cache
+        """获取屏幕尺寸，来自共享的窗口几何缓存"""
+        return self.geometry.get_screen_size()
     
     def _calculate_absolute_weapp_region(self, force_recalculate=False):
-        """根据系统返回的微信窗口位置计算weapp绝对区域，带缓存机制"""
-        # 检查缓存是否有效
-        current_time = time.time()
-        if not force_recalculate and self._wx_window_cache is not None:
-            cached_time, cached_region = self._wx_window_cache
-            if current_time - cached_time < self._cache_timeout:
-                if self._debug:
-                    print(f"✓ 使用缓存的皇室战争区域: {cached_region}")
-                return cached_region
-        
-        try:
-            # 获取微信窗口位置和大小，不强制前置窗口
-            wx_window = WeChatUtils.get_wechat_window_position()
-            wx_x = wx_window["x"]
-            wx_y = wx_window["y"]
-            wx_width = wx_window["width"]
-            wx_height = wx_window["height"]
-            
-            # 动态计算小程序相对区域（假设小程序占据微信窗口的主要内容区域）
-            # 这里使用微信窗口的实际大小来计算小程序区域
-            rel_x = 0  # 相对于微信窗口左边界的偏移
-            rel_y = 0  # 相对于微信窗口上边界的偏移
-            width = wx_width  # 使用微信窗口的实际宽度
-            height = wx_height  # 使用微信窗口的实际高度
-            
-            # 计算绝对区域
-            abs_x = wx_x + rel_x
-            abs_y = wx_y + rel_y
-            region = (abs_x, abs_y, width, height)
-            
-            # 缓存结果
-            self._wx_window_cache = (current_time, region)
-            if self._debug:
-                print(f"✓ 已从系统获取微信窗口位置 ({wx_x}, {wx_y}) 和大小 ({wx_width}, {wx_height})，计算出皇室战争区域: {region}")
-            return region
-        except Exception as e:
-            if self._debug:
-                print(f"⚠ 获取微信窗口位置失败: {e}")
-            # 使用默认值作为 fallback
-            wx_x, wx_y = (400, 100)  # 默认窗口位置
-            wx_width, wx_height = (800, 600)  # 默认窗口大小
-            
-            # 动态计算小程序区域
-            rel_x = 0
-            rel_y = 0
-            width = wx_width
-            height = wx_height
-            
-            default_x = wx_x + rel_x
-            default_y = wx_y + rel_y
-            region = (default_x, default_y, width, height)
-            if self._debug:
-                print(f"  使用默认值计算皇室战争区域: {region}")
-            return region
+        """根据微信窗口位置计算weapp绝对区域（小程序占据整个微信窗口），窗口位置来自共享缓存"""
+        region = self.geometry.get_region(force_refresh=force_recalculate)
+        if self._debug:
+            print(f"✓ 皇室战争区域: {region}")
+        return region
     
     def set_screenshot_dir(self, dir_path):
         """设置截图保存目录"""
@@ -136,6 +97,8 @@ end tell'''
             if WeChatUtils.bring_wechat_to_front():
                 if self._debug:
                     print("✓ 成功将微信窗口置顶")
+                # 激活后窗口可能被移动或改变大小，缓存的位置不再可信
+                self.geometry.invalidate("activate")
                 # 重新计算weapp_region，确保截图区域正确
                 self.weapp_region = self._calculate_absolute_weapp_region(force_recalculate=force)
                 if self._debug:
@@ -234,71 +197,84 @@ end tell'''
         """自动截取WeApp界面（兼容原有方法）"""
         return self.auto_screenshot_clash_royale(prefix)
     
-    def auto_screenshot_clash_royale(self, prefix="cr", skip_bring_to_front=False):
-        """专门用于截取皇室战争界面的方法"""
+    def capture_frame(self, prefix="cr", skip_bring_to_front=False, save=None):
+        """截取皇室战争界面并返回内存中的Frame
+        
+        参数:
+            prefix: 保存截图时的文件名前缀
+            skip_bring_to_front: 是否跳过窗口前置操作，用于连续截图优化
+            save: 是否同时把截图写入磁盘，默认读取配置中的save_screenshots（回放后端默认不保存）
+            
+        返回:
+            frame: Frame对象（image为RGB数组，保存后path为文件路径），失败返回None
+        """
+        if save is None:
+            save = self.save_screenshots
         if self._debug:
-            print("\n=== 开始自动截取皇室战争界面 ===")
+            print("\n=== 开始截取皇室战争界面 ===")
         
         try:
-            # 1. 专门唤出皇室战争页面（可选跳过）
-            if not skip_bring_to_front:
+            needs_window = self.capture_backend.needs_window
+            if needs_window and not skip_bring_to_front:
+                # 1. 专门唤出皇室战争页面
                 if not self.bring_clash_royale_to_front():
                     if self._debug:
                         print("⚠ 无法唤出皇室战争页面，继续尝试截图...")
-            
-            # 2. 等待界面稳定 - 减少等待时间
-            time.sleep(0.2)
-            
-            # 3. 仅在必要时更新weapp_region
-            if not skip_bring_to_front:
+                
+                # 2. 等待界面稳定 - 减少等待时间
+                time.sleep(0.2)
+
+            if needs_window:
+                # 3. 从共享缓存更新weapp_region，缓存失效后才会重新查询窗口位置
                 self.weapp_region = self._calculate_absolute_weapp_region()
                 if self._debug:
                     print(f"更新后的皇室战争区域: {self.weapp_region}")
-            
-            # 4. 截取WeApp区域（皇室战争区域）
+
+            # 4. 截取WeApp区域（皇室战争区域），结果保留在内存中
             if self._debug:
-                print(f"正在截取皇室战争区域: {self.weapp_region}")
-            
-            # 5. 保存截图
-            filename = os.path.join(self.screenshot_dir, self.get_timestamp_filename(prefix))
-            
-            # 使用screencapture命令截图，添加-a参数禁用声音，-x参数不显示截图预览
-            x, y, width, height = self.weapp_region
-            # 构建screencapture命令，-R参数指定区域：x,y,width,height
-            screencapture_cmd = ["screencapture", "-a", "-x", "-R", f"{x},{y},{width},{height}", filename]
-            subprocess.run(screencapture_cmd, check=True, capture_output=True, text=True)
-            
-            # 6. 检查截图是否成功生成
-            if not os.path.exists(filename):
-                raise Exception(f"截图文件未生成: {filename}")
-            
-            # 7. 快速验证截图尺寸是否符合预期
-            try:
-                from PIL import Image
-                with Image.open(filename) as img:
-                    screenshot_size = img.size
-                    # 检查截图尺寸是否合理
-                    if screenshot_size[0] < 100 or screenshot_size[1] < 100:
-                        raise Exception(f"截图尺寸异常: {screenshot_size}")
-                    if self._debug:
-                        print(f"  截图尺寸: {screenshot_size}")
-            except Exception as e:
-                if self._debug:
-                    print(f"  获取截图尺寸失败: {e}")
+                print(f"正在截取皇室战争区域: {self.weapp_region} (后端: {self.capture_backend.name})")
+            frame = self.capture_backend.grab(self.weapp_region)
+            self._frame_seq += 1
+            frame.seq = self._frame_seq
             
+            # 5. 快速验证截图尺寸是否符合预期
+            screenshot_size = frame.size
+            if screenshot_size[0] < 100 or screenshot_size[1] < 100:
+                # 截图尺寸异常说明缓存的窗口位置可能已过期
+                if needs_window:
+                    self.geometry.report_sanity_failure(f"截图尺寸异常: {screenshot_size}")
+                raise Exception(f"截图尺寸异常: {screenshot_size}")
             if self._debug:
-                file_size = os.path.getsize(filename)
-                print(f"✅ 成功截取皇室战争界面，保存为: {filename}")
-                print(f"  文件大小: {file_size} 字节")
+                print(f"  截图尺寸: {screenshot_size}")
             
-            return filename
+            # 6. 按需保存截图
+            if save:
+                self.save_frame(frame, prefix)
+            
+            return frame
         except Exception as e:
             if self._debug:
-                print(f"✗ 自动截取皇室战争界面失败: {e}")
+                print(f"✗ 截取皇室战争界面失败: {e}")
                 import traceback
                 traceback.print_exc()
             return None
     
+    def save_frame(self, frame, prefix="cr"):
+        """把内存中的帧保存到截图目录，返回文件路径（文件名带毫秒和帧序号）"""
+        filename = os.path.join(self.screenshot_dir, SystemUtils.get_frame_filename(prefix, frame.timestamp, frame.seq))
+        frame.save(filename)
+        if self._debug:
+            print(f"✅ 成功截取皇室战争界面，保存为: {filename}")
+            print(f"  文件大小: {os.path.getsize(filename)} 字节")
+        return filename
+    
+    def auto_screenshot_clash_royale(self, prefix="cr", skip_bring_to_front=False):
+        """专门用于截取皇室战争界面的方法，截图保存到磁盘并返回文件路径"""
+        frame = self.capture_frame(prefix, skip_bring_to_front=skip_bring_to_front, save=True)
+        if frame is None:
+            return None
+        return frame.path
+    
     def screenshot_fullscreen(self, prefix="fullscreen"):
         """截取全屏"""
         try:
@@ -0,0 +1,367 @@
+"""会话录制与回放
+
+录制：把实时循环中的每一帧（图像、截图时间戳、截图区域）、识别状态和ActionExecutor发出的每次点击
+写入一个目录，每chunk_size帧压缩成一个npz分块，后台线程写盘，进程中断时已写完的分块仍可读取。
+
+回放：按原始时间间隔（1倍速、N倍速或最快速度）把录制的帧送回CRGameAutomation，
+点击发送到FakeClickSink而不是真实屏幕，可在Linux上复现线上问题和测试识别吞吐。
+"""
+import json
+import os
+import queue
+import threading
+import time
+import zipfile
+import numpy as np
+from cr.capture import CaptureBackend, Frame
+
+# 会话目录格式版本
+SESSION_FORMAT_VERSION = 1
+# 会话信息文件名
+SESSION_INFO_FILE = "session.json"
+
+
+def _chunk_filename(index):
+    return f"chunk_{index:06d}.npz"
+
+
+class SessionRecorder:
+    """会话录制器：帧和事件按分块压缩写入会话目录"""
+
+    def __init__(self, session_dir, chunk_size=32, compress_level=1, delta=True, queue_size=4):
+        """初始化会话录制器
+
+        参数:
+            session_dir: 会话目录，不存在时自动创建
+            chunk_size: 每个分块包含的最大帧数；截图尺寸变化时提前结束当前分块
+            compress_level: 分块的zlib压缩级别 0-9，越低写入越快
+            delta: 是否保存相邻帧的差值，连续帧画面相近时压缩后体积小得多
+            queue_size: 等待写盘的分块数量上限，写盘跟不上时录制会等待而不是丢帧
+                （等待时不持有锁，record_click和stats不受影响）
+        """
+        self.session_dir = session_dir
+        self.chunk_size = max(1, chunk_size)
+        self.compress_level = compress_level
+        self.delta = delta
+        os.makedirs(session_dir, exist_ok=True)
+
+        self._images = []
+        self._frames = []
+        self._clicks = []
+        self._chunk_index = 0
+        self._last_seq = None
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._worker = threading.Thread(target=self._worker_loop, name="SessionRecorder", daemon=True)
+        self._worker.start()
+        self.closed = False
+        # 统计信息
+        self.frames_recorded = 0
+        self.clicks_recorded = 0
+        self.chunks_written = 0
+        self.bytes_written = 0
+        self.errors = 0
+        self.started_at = time.time()
+
+    def record_frame(self, frame, status=None, similarity=None):
+        """录制一帧及其识别结果
+
+        参数:
+            frame: Frame对象
+            status: 识别状态
+            similarity: 识别相似度
+        """
+        chunks = []
+        with self._lock:
+            if self._images and self._images[0].shape != frame.image.shape:
+                chunks.append(self._take_chunk())
+            # 帧数组可能被截图线程复用，录制时拷贝一份
+            self._images.append(np.array(frame.image, copy=True))
+            self._frames.append({
+                "seq": frame.seq,
+                "timestamp": frame.timestamp,
+                "region": list(frame.region) if frame.region is not None else None,
+                "source": frame.source if isinstance(frame.source, str) else None,
+                "status": status,
+                "similarity": float(similarity) if similarity is not None else None
+            })
+            self._last_seq = frame.seq
+            self.frames_recorded += 1
+            if len(self._images) >= self.chunk_size:
+                chunks.append(self._take_chunk())
+        for chunk in chunks:
+            self._submit_chunk(chunk)
+
+    def record_click(self, x, y, success, action=None, timestamp=None):
+        """录制一次点击，可直接注册为ActionExecutor的点击监听器
+
+        参数:
+            x: 请求的点击x坐标（百分比坐标或绝对坐标）
+            y: 请求的点击y坐标
+            success: 点击是否成功
+            action: 发出点击的状态行为
+            timestamp: 点击时间，默认取当前时间
+        """
+        with self._lock:
+            self._clicks.append({
+                "timestamp": timestamp if timestamp is not None else time.time(),
+                "frame_seq": self._last_seq,
+                "x": x,
+                "y": y,
+                "success": bool(success),
+                "action": action
+            })
+            self.clicks_recorded += 1
+
+    def _take_chunk(self):
+        """取出当前分块并换上空的缓冲（调用方持有锁）
+
+        返回:
+            (path, images, meta)，没有待写的帧和点击时返回None
+        """
+        if not self._images and not self._clicks:
+            return None
+        chunk = (os.path.join(self.session_dir, _chunk_filename(self._chunk_index)), self._images,
+                 {"frames": self._frames, "clicks": self._clicks})
+        self._chunk_index += 1
+        self._images, self._frames, self._clicks = [], [], []
+        return chunk
+
+    def _submit_chunk(self, chunk):
+        """把_take_chunk取出的分块交给后台线程写盘（调用方不能持有锁）
+
+        队列满时在这里等待；后台线程写完每块后要获取锁更新统计，持有锁等待会互相阻塞。
+        """
+        if chunk is None:
+            return
+        path, images, meta = chunk
+        images = np.stack(images) if images else np.zeros((0, 0, 0, 3), dtype=np.uint8)
+        self._queue.put((path, images, meta))
+
+    def _write_chunk(self, path, images, meta):
+        """写入一个npz分块：images为 (帧数, 高, 宽, 3) 数组，meta为JSON字符串"""
+        meta["encoding"] = "delta" if self.delta else "raw"
+        if self.delta and len(images) > 1:
+            # 第一帧原样保存，之后每帧保存与前一帧的差值（uint8按模256回绕，读取时累加还原）
+            images[1:] = images[1:] - images[:-1].copy()
+        temp_path = path + ".tmp"
+        with zipfile.ZipFile(temp_path, "w", zipfile.ZIP_DEFLATED, compresslevel=self.compress_level) as zf:
+            with zf.open("images.npy", "w", force_zip64=True) as f:
+                np.lib.format.write_array(f, images)
+            with zf.open("meta.npy", "w") as f:
+                np.lib.format.write_array(f, np.array(json.dumps(meta, ensure_ascii=False)))
+        # 写完后再改名，读取方不会看到写了一半的分块
+        os.replace(temp_path, path)
+        return os.path.getsize(path)
+
+    def _worker_loop(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                size = self._write_chunk(*item)
+                with self._lock:
+                    self.chunks_written += 1
+                    self.bytes_written += size
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                print(f"✗ 会话分块写入失败: {e}")
+            finally:
+                self._queue.task_done()
+
+    def close(self):
+        """写完剩余的帧并生成会话信息文件"""
+        if self.closed:
+            return
+        with self._lock:
+            chunk = self._take_chunk()
+        self._submit_chunk(chunk)
+        self._queue.put(None)
+        self._worker.join()
+        self.closed = True
+        info = {
+            "version": SESSION_FORMAT_VERSION,
+            "started_at": self.started_at,
+            "ended_at": time.time(),
+            "chunks": [_chunk_filename(i) for i in range(self._chunk_index)],
+            "frames": self.frames_recorded,
+            "clicks": self.clicks_recorded
+        }
+        with open(os.path.join(self.session_dir, SESSION_INFO_FILE), "w", encoding="utf-8") as f:
+            json.dump(info, f, ensure_ascii=False, indent=2)
+
+    def stats(self):
+        """返回录制统计信息"""
+        with self._lock:
+            return {
+                "frames": self.frames_recorded,
+                "clicks": self.clicks_recorded,
+                "chunks_written": self.chunks_written,
+                "bytes_written": self.bytes_written,
+                "bytes_per_frame": self.bytes_written / self.frames_recorded if self.frames_recorded else 0.0,
+                "pending_chunks": self._queue.qsize(),
+                "errors": self.errors
+            }
+
+
+class SessionReader:
+    """读取会话目录，逐块解压，不会一次性把整个会话载入内存"""
+
+    def __init__(self, session_dir):
+        self.session_dir = session_dir
+        info_path = os.path.join(session_dir, SESSION_INFO_FILE)
+        if os.path.exists(info_path):
+            with open(info_path, encoding="utf-8") as f:
+                self.info = json.load(f)
+            self.chunks = self.info["chunks"]
+        else:
+            # 录制被中断时没有会话信息文件，读取已经写完的分块
+            self.info = None
+            self.chunks = sorted(name for name in os.listdir(session_dir)
+                                 if name.startswith("chunk_") and name.endswith(".npz"))
+        if not self.chunks:
+            raise ValueError(f"会话目录中没有录制数据: {session_dir}")
+
+    def read_chunk(self, index):
+        """读取一个分块，返回 (images数组, meta字典)"""
+        with np.load(os.path.join(self.session_dir, self.chunks[index])) as data:
+            images, meta = data["images"], json.loads(str(data["meta"]))
+        if meta.get("encoding") == "delta" and len(images) > 1:
+            images = np.cumsum(images, axis=0, dtype=np.uint8)
+        return images, meta
+
+    def iter_frames(self):
+        """按录制顺序生成 (Frame, 帧信息字典)"""
+        for index in range(len(self.chunks)):
+            images, meta = self.read_chunk(index)
+            for image, info in zip(images, meta["frames"]):
+                region = tuple(info["region"]) if info["region"] is not None else None
+                frame = Frame(image, timestamp=info["timestamp"], region=region,
+                              source=info.get("source"), seq=info["seq"])
+                yield frame, info
+
+    def clicks(self):
+        """返回录制的全部点击"""
+        clicks = []
+        for index in range(len(self.chunks)):
+            clicks.extend(self.read_chunk(index)[1]["clicks"])
+        return clicks
+
+
+class SessionReplayBackend(CaptureBackend):
+    """把录制的会话作为截图后端，按原始时间间隔除以speed回放
+
+    speed为None或0时不等待，按最快速度回放。帧保留录制时的时间戳和截图区域。
+    """
+
+    name = "session"
+    needs_window = False
+
+    def __init__(self, session_dir, speed=1.0):
+        self.reader = SessionReader(session_dir)
+        self.speed = speed
+        self._frames = self.reader.iter_frames()
+        self._first_timestamp = None
+        self._start_time = None
+        # 最近一帧的录制信息（包含录制时的识别状态）
+        self.last_info = None
+        self.frames_served = 0
+        self.finished = False
+
+    def grab(self, region=None):
+        try:
+            frame, info = next(self._frames)
+        except StopIteration:
+            self.finished = True
+            raise EOFError("会话回放结束")
+
+        if self._first_timestamp is None:
+            self._first_timestamp = frame.timestamp
+            self._start_time = time.time()
+        elif self.speed:
+            # 按录制时的时间间隔等待
+            target = self._start_time + (frame.timestamp - self._first_timestamp) / self.speed
+            delay = target - time.time()
+            if delay > 0:
+                time.sleep(delay)
+        self.last_info = info
+        self.frames_served += 1
+        return frame
+
+
+class FakeClickSink:
+    """替代ClickManager接收点击，只记录不操作屏幕"""
+
+    def __init__(self):
+        self.clicks = []
+
+    def click(self, x, y):
+        self.clicks.append((x, y))
+        return True
+
+
+class SessionReplayer:
+    """把录制的会话送回CRGameAutomation，统计吞吐并对比录制时和回放时的识别状态"""
+
+    def __init__(self, session_dir, automation, speed=1.0, execute_action=True):
+        """初始化会话回放器
+
+        参数:
+            session_dir: 会话目录
+            automation: CRGameAutomation实例，回放期间会替换它的截图后端和点击目标
+            speed: 回放速度倍数，1为原速，None或0为最快速度
+            execute_action: 是否根据识别结果执行状态行为（点击发送到FakeClickSink）
+        """
+        self.session_dir = session_dir
+        self.automation = automation
+        self.speed = speed
+        self.execute_action = execute_action
+        self.click_sink = FakeClickSink()
+
+    def _scaled_sleep(self, seconds):
+        """状态行为中的等待按回放速度缩放，最快速度时不等待"""
+        if self.speed:
+            time.sleep(seconds / self.speed)
+
+    def run(self):
+        """执行回放
+
+        返回:
+            report: 回放报告，包含帧数、耗时、帧率、状态不一致的帧和点击数量
+        """
+        automation = self.automation
+        backend = SessionReplayBackend(self.session_dir, self.speed)
+        executor = automation.action_executor
+        saved = (automation.screenshot_manager.capture_backend, executor.click_sink, executor.sleep)
+        automation.screenshot_manager.capture_backend = backend
+        executor.click_sink = self.click_sink
+        executor.sleep = self._scaled_sleep
+
+        mismatches = []
+        start_time = time.time()
+        try:
+            while True:
+                served = backend.frames_served
+                status, _ = automation.capture_and_analyze(execute_action=self.execute_action, save_screenshot=False)
+                # 截图管理器会吞掉回放结束的EOFError，通过后端状态判断
+                if backend.finished or backend.frames_served == served:
+                    break
+                recorded_status = backend.last_info["status"]
+                if status != recorded_status:
+                    mismatches.append({"seq": backend.last_info["seq"], "recorded": recorded_status, "replayed": status})
+        finally:
+            automation.screenshot_manager.capture_backend, executor.click_sink, executor.sleep = saved
+        elapsed = time.time() - start_time
+        frames = backend.frames_served
+
+        return {
+            "frames": frames,
+            "elapsed": elapsed,
+            "fps": frames / elapsed if elapsed > 0 else 0.0,
+            "speed": self.speed or "max",
+            "status_mismatches": mismatches,
+            "recorded_clicks": len(backend.reader.clicks()),
+            "replayed_clicks": len(self.click_sink.clicks)
+        }
@@ -0,0 +1,103 @@
+import threading
+from config.config import STATUS_RECOGNITION_CONFIG
+
+
+class StateTracker:
+    """游戏状态跟踪器：记录上一个确认的状态和状态转移概率，给出下一帧最可能的状态顺序
+
+    转移概率由配置中的先验权重和运行中观察到的转移次数共同决定（先验作为伪计数），
+    识别器按该顺序检查状态，足够确定时提前返回，省去其余模板的计算。
+    """
+
+    def __init__(self, statuses, transitions=None, prior_weight=10.0, learn=True):
+        """初始化状态跟踪器
+
+        参数:
+            statuses: 所有可识别的状态
+            transitions: 先验转移权重 {上一个状态: {下一个状态: 权重}}，默认读取配置中的state_tracking.transitions
+            prior_weight: 先验相当于观察到的转移次数，越大越不容易被实际观察改变
+            learn: 是否根据识别结果更新转移次数
+        """
+        self.statuses = list(statuses)
+        self.prior_weight = prior_weight
+        self.learn = learn
+        self._lock = threading.Lock()
+        # 转移计数：上一个状态 -> {下一个状态: 计数}，先验按权重归一化后换算成伪计数
+        self._counts = {}
+        if transitions is None:
+            transitions = STATUS_RECOGNITION_CONFIG["state_tracking"]["transitions"]
+        for previous, targets in transitions.items():
+            total = sum(targets.values())
+            if total > 0:
+                self._counts[previous] = {status: prior_weight * weight / total for status, weight in targets.items()}
+        # 上一个确认的状态（识别失败的帧不改变该状态）
+        self.last_status = None
+        # 统计信息
+        self.frames = 0
+        self.early_stops = 0
+        self.evaluations = 0
+        self.saved_evaluations = 0
+        self.last_saved = 0
+
+    def transition_probabilities(self, status=None):
+        """返回从指定状态（默认上一个确认的状态）转移到各状态的概率"""
+        status = self.last_status if status is None else status
+        with self._lock:
+            counts = self._counts.get(status, {})
+            total = sum(counts.values())
+            if total <= 0:
+                return {}
+            return {target: count / total for target, count in counts.items()}
+
+    def candidates(self):
+        """按转移概率从高到低返回候选状态；没有确认状态时返回None，由识别器完整识别
+
+        没有出现在转移表中的状态排在最后，保持statuses中的顺序。
+        """
+        if self.last_status is None:
+            return None
+        probabilities = self.transition_probabilities()
+        return sorted(self.statuses, key=lambda status: (-probabilities.get(status, 0.0), self.statuses.index(status)))
+
+    def update(self, status, evaluations, total_evaluations, early_stop=False, candidates_checked=False):
+        """记录一帧的识别结果
+
+        参数:
+            status: 识别结果，None表示未识别出状态
+            evaluations: 本帧实际计算的模板次数
+            total_evaluations: 完整识别一帧需要计算的模板次数
+            early_stop: 本帧是否按候选顺序提前返回
+            candidates_checked: 本帧是否按候选顺序检查了状态；像素探针、哈希索引或分类器直接给出结果的帧
+                不计算模板，但不是候选顺序节省的，不计入节省次数
+        """
+        with self._lock:
+            self.frames += 1
+            self.evaluations += evaluations
+            self.last_saved = total_evaluations - evaluations if early_stop or candidates_checked else 0
+            self.saved_evaluations += self.last_saved
+            if early_stop:
+                self.early_stops += 1
+            if status is None:
+                return
+            if self.learn and self.last_status is not None:
+                targets = self._counts.setdefault(self.last_status, {})
+                targets[status] = targets.get(status, 0.0) + 1
+            self.last_status = status
+
+    def reset(self):
+        """忘记上一个确认的状态，下一帧完整识别"""
+        self.last_status = None
+
+    def stats(self):
+        """返回跟踪统计信息，包括平均每帧节省的模板计算次数"""
+        with self._lock:
+            return {
+                "frames": self.frames,
+                "last_status": self.last_status,
+                "early_stops": self.early_stops,
+                "early_stop_rate": self.early_stops / self.frames if self.frames else 0.0,
+                "evaluations": self.evaluations,
+                "saved_evaluations": self.saved_evaluations,
+                "avg_saved_per_frame": self.saved_evaluations / self.frames if self.frames else 0.0,
+                "last_saved": self.last_saved
+            }
@@ -1,8 +1,37 @@
 from PIL import Image
 import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from config.config import STATUS_RECOGNITION_CONFIG
+from cr.button_locator import get_button_locator
+from cr.color_signature import ColorSignatures
+from cr.hash_index import HashIndex
+from cr.pixel_probes import ProbeSet
+from cr.roi import RoiRegistry
+from cr.screen_classifier import ScreenClassifier
+from cr.template_bank import TemplateBank, DEFAULT_CANONICAL_SIZE
+from cr.template_store import get_template_store
 from cr.utils import ImageUtils
 
+# 综合相似度中页面相似度的权重，其余为按钮相似度的权重；未列出的状态使用DEFAULT_PAGE_WEIGHT
+STATUS_PAGE_WEIGHTS = {
+    "战斗中": 0.8,  # 战斗中状态：提高页面权重，降低按钮权重，减少误判
+    "战斗结束": 0.9,  # 战斗结束状态：提高页面权重，降低按钮权重
+    "战斗未开始": 0.9  # 战斗未开始状态：提高页面权重，降低按钮权重
+}
+DEFAULT_PAGE_WEIGHT = 0.4
+
+# 各状态综合相似度（整页比较）的识别阈值：取 png/实际游戏截图 中本状态截图的最低综合相似度
+# 与其他截图的最高值的中点
+STATUS_THRESHOLDS = {
+    "战斗结束": 0.81,  # 本状态最低 0.857，其他截图最高 0.754
+    "战斗中": 0.78,   # 本状态最低 0.820，其他截图最高 0.731
+    "战斗未开始": 0.79,  # 本状态最低 0.820，其他截图最高 0.767
+    "开宝箱": 0.75  # 语料中没有开宝箱截图，其他截图最高 0.609
+}
+
 class StatusRecognizer:
     """屏幕状态识别器，用于判断当前截图属于什么状态"""
     
@@ -11,19 +40,171 @@ class StatusRecognizer:
         self.status_templates = self.config["status_templates"]
         # 按钮模板映射：状态 -> 按钮模板
         self.button_templates = {}
+        # 按截图尺寸缓存缩放后的状态模板数组：(宽, 高) -> (状态列表, (状态数, 高, 宽) 数组)，LRU淘汰
+        self.template_cache = OrderedDict()
+        self.template_cache_size = self.config.get("template_cache_size", 4)
+        self.template_cache_hits = 0
+        self.template_cache_misses = 0
+        # 预处理后的模板仓库（启动时内存映射快照）
+        self.template_store = get_template_store()
+        # 页面ROI：每个状态只比较配置中声明的区域，按截图尺寸缓存区域内的像素下标和模板像素值
+        self.page_rois = {}
+        self.page_roi_registry = None
+        self.roi_template_cache = OrderedDict()
+        self.status_thresholds = dict(STATUS_THRESHOLDS)
+        roi_config = self.config.get("page_rois", {})
+        if roi_config.get("enabled", False):
+            regions = {}
+            for status, boxes in roi_config.get("regions", {}).items():
+                self.page_rois[status] = [f"{status}/{index}" for index in range(len(boxes))]
+                regions.update(zip(self.page_rois[status], boxes))
+            self.page_roi_registry = RoiRegistry(regions)
+            # ROI相似度与整页相似度的取值范围不同，使用ROI对应的阈值
+            self.status_thresholds.update(roi_config.get("thresholds", {}))
+        # 所有状态模板按标准低分辨率堆叠的模板库，一次矩阵乘法得到完整的得分向量
+        self.template_bank = TemplateBank(self.config.get("canonical_size", DEFAULT_CANONICAL_SIZE))
+        # 分级识别：类别 -> 状态列表；最近一次识别粗分类选出的类别，None表示检查了所有状态
+        hierarchy_config = self.config.get("hierarchy", {})
+        self.coarse_groups = hierarchy_config.get("groups", {}) if hierarchy_config.get("enabled", False) else {}
+        self.coarse_min_margin = hierarchy_config.get("min_margin", 0.08)
+        self.last_branch = None
+        # 各阶段的耗时预算（毫秒）和累计统计：阶段 -> {"runs", "total_ms", "overruns"}，以及各类别的帧数
+        self.stage_budgets = self.config.get("stage_budgets_ms", {})
+        self.stage_stats = {}
+        self.branch_counts = {}
+        # 最近一次识别实际执行的阶段，按执行顺序排列
+        self.last_stages = []
+        # 多尺度按钮搜索
+        self.multiscale_button_search = self.config.get("button_search", {}).get("enabled", False)
+        self.button_locator = get_button_locator() if self.multiscale_button_search else None
+        # 最近一次识别中各状态按钮的匹配结果：状态 -> (相似度, 左上角坐标, 尺度)
+        self.button_matches = {}
+        # 按钮位置提示：状态 -> (截图尺寸, 左上角坐标, 尺度)，记录上一次得分足够高的匹配，
+        # 按钮从画面中消失后删除
+        hint_config = self.config.get("button_hints", {})
+        self.button_hints_enabled = hint_config.get("enabled", False)
+        self.button_hint_margin = hint_config.get("margin", 0.5)
+        self.button_hint_min_score = hint_config.get("min_score", 0.85)
+        self.button_hints = {}
+        self.button_hint_hits = 0
+        self.button_hint_misses = 0
+        # 最近一次识别计算的模板次数（按钮模板和页面模板各算一次），是否按候选顺序检查了状态，以及是否提前返回
+        self.last_evaluations = 0
+        self.last_candidates_checked = False
+        self.last_early_stop = False
+        # 最近一次识别各阶段的耗时（秒）：decode、probes、preprocess、hash、classifier、prefilter、coarse、
+        # button_scan、page_match，
+        # 只包含实际执行的阶段
+        self.last_timings = {}
+        # 像素探针，最近一次识别由探针给出的结果 (状态, 命中比例)
+        self.probes = None
+        self.probe_min_fraction = self.config.get("probes", {}).get("min_fraction", 1.0)
+        self.last_probe_match = None
+        self.load_probes()
+        # 感知哈希索引，最近一次识别是否由索引命中
+        self.hash_index = None
+        self.hash_max_distance = self.config.get("hash_index", {}).get("max_distance", 10)
+        self.last_hash_match = None
+        self.load_hash_index()
+        # 画面分类器，最近一次识别的分类结果 (状态, 置信度)
+        self.classifier = None
+        self.classifier_min_confidence = self.config.get("classifier", {}).get("min_confidence", 0.9)
+        self.last_classification = None
+        self.load_classifier()
+        # 颜色预筛选签名，最近一次识别的筛选结果 {"kept", "eliminated", "intersections"}
+        self.color_signatures = None
+        self.color_min_intersection = self.config.get("color_prefilter", {}).get("min_intersection", 0.5)
+        self.last_prefilter = None
+        self.load_color_signatures()
+        # 批量识别：解码线程数、每批帧数，最近一次批量识别结果中scores列对应的状态和各步骤的总耗时（秒）
+        batch_config = self.config.get("batch_recognition", {})
+        self.batch_workers = batch_config.get("workers")
+        self.batch_size = batch_config.get("batch_size", 32)
+        self.last_batch_labels = []
+        self.last_batch_timings = {}
         # 加载所有状态模板
         self.load_templates()
         # 加载所有状态对应的按钮模板
         self.load_all_button_templates()
     
+    def load_probes(self):
+        """加载discover_pixels.py --save-probes生成的像素探针，探针文件不存在时跳过该阶段"""
+        probe_config = self.config.get("probes", {})
+        if not probe_config.get("enabled", False):
+            return
+        probes_path = probe_config.get("probes_path")
+        if not probes_path or not os.path.exists(probes_path):
+            print(f"⚠ 像素探针不存在: {probes_path}，可运行 python discover_pixels.py --save-probes 生成")
+            return
+        try:
+            self.probes = ProbeSet.load(probes_path)
+            print(f"✓ 成功加载像素探针: {probes_path} ({len(self.probes)} 个探针，状态: {self.probes.states})")
+        except Exception as e:
+            print(f"✗ 加载像素探针失败: {probes_path}")
+            print(f"  错误信息: {e}")
+    
+    def load_hash_index(self):
+        """加载build_hash_index.py生成的感知哈希索引，索引文件不存在时只使用模板匹配"""
+        hash_config = self.config.get("hash_index", {})
+        if not hash_config.get("enabled", False):
+            return
+        index_path = hash_config.get("index_path")
+        if not index_path or not os.path.exists(index_path):
+            print(f"⚠ 哈希索引不存在: {index_path}，可运行 python build_hash_index.py 生成")
+            return
+        try:
+            self.hash_index = HashIndex.load(index_path)
+            print(f"✓ 成功加载哈希索引: {index_path} ({self.hash_index.method}, {len(self.hash_index)} 张截图)")
+        except Exception as e:
+            print(f"✗ 加载哈希索引失败: {index_path}")
+            print(f"  错误信息: {e}")
+    
+    def load_classifier(self):
+        """加载train_screen_classifier.py训练的画面分类器，模型文件不存在时只使用模板匹配"""
+        classifier_config = self.config.get("classifier", {})
+        if not classifier_config.get("enabled", False):
+            return
+        model_path = classifier_config.get("model_path")
+        if not model_path or not os.path.exists(model_path):
+            print(f"⚠ 画面分类器不存在: {model_path}，可运行 python train_screen_classifier.py 生成")
+            return
+        try:
+            self.classifier = ScreenClassifier.load(model_path)
+            print(f"✓ 成功加载画面分类器: {model_path} ({self.classifier.method}, 状态: {self.classifier.labels})")
+        except Exception as e:
+            print(f"✗ 加载画面分类器失败: {model_path}")
+            print(f"  错误信息: {e}")
+    
+    def load_color_signatures(self):
+        """加载build_color_signatures.py生成的颜色签名，签名文件不存在时不做预筛选"""
+        prefilter_config = self.config.get("color_prefilter", {})
+        if not prefilter_config.get("enabled", False):
+            return
+        signatures_path = prefilter_config.get("signatures_path")
+        if not signatures_path or not os.path.exists(signatures_path):
+            print(f"⚠ 颜色签名不存在: {signatures_path}，可运行 python build_color_signatures.py 生成")
+            return
+        try:
+            self.color_signatures = ColorSignatures.load(signatures_path)
+            print(f"✓ 成功加载颜色签名: {signatures_path} (状态: {self.color_signatures.labels})")
+        except Exception as e:
+            print(f"✗ 加载颜色签名失败: {signatures_path}")
+            print(f"  错误信息: {e}")
+    
     def load_templates(self):
         """加载所有状态模板图片"""
         print("加载状态模板...")
         for status, config in self.status_templates.items():
             try:
-                template_img = Image.open(config["template_path"])
-                # 转换为灰度图，减少颜色干扰，提高识别率
-                template_img = template_img.convert("L")
+                template_path = config["template_path"]
+                if template_path in self.template_store and self.template_store.canonical_size == self.template_bank.canonical_size:
+                    # 模板仓库中已有预处理好的灰度数组和标准向量，不再解码PNG
+                    template_img = Image.fromarray(self.template_store.gray(template_path))
+                    self.template_bank.add_vector(status, self.template_store.vector(template_path), template_path)
+                else:
+                    # 转换为灰度图，减少颜色干扰，提高识别率
+                    template_img = Image.open(template_path).convert("L")
+                    self.template_bank.add(status, template_img, template_path)
                 self.status_templates[status]["template_img"] = template_img
                 # 保存模板原始尺寸
                 self.status_templates[status]["template_size"] = template_img.size
@@ -47,46 +228,560 @@ class StatusRecognizer:
         
         for status, button_path in status_to_button_path.items():
             try:
-                button_template = Image.open(button_path)
-                button_template = button_template.convert("L")
+                button_template = self.template_store.gray(button_path)
+                if button_template is None:
+                    button_template = np.asarray(Image.open(button_path).convert("L"))
                 self.button_templates[status] = button_template
                 print(f"✓ 成功加载按钮模板: {status} -> {button_path}")
-                print(f"  按钮模板尺寸: {button_template.size}")
+                print(f"  按钮模板尺寸: {button_template.shape[::-1]}")
             except Exception as e:
                 print(f"✗ 加载按钮模板失败: {status} -> {button_path}")
                 print(f"  错误信息: {e}")
                 self.button_templates[status] = None
     
+    def get_resized_templates(self, size):
+        """获取缩放到指定截图尺寸的状态模板，同一尺寸只缩放一次
+        
+        参数:
+            size: 截图尺寸 (宽, 高)
+        
+        返回:
+            (statuses, templates): 状态列表和对应的 (状态数, 高, 宽) uint8模板数组
+        """
+        size = (int(size[0]), int(size[1]))
+        if size in self.template_cache:
+            self.template_cache_hits += 1
+            self.template_cache.move_to_end(size)
+            return self.template_cache[size]
+        
+        self.template_cache_misses += 1
+        statuses = [status for status, config in self.status_templates.items() if "template_img" in config]
+        arrays = [np.asarray(self.status_templates[status]["template_img"].resize(size)) for status in statuses]
+        templates = np.stack(arrays) if arrays else np.zeros((0, size[1], size[0]), dtype=np.uint8)
+        templates.setflags(write=False)
+        self.template_cache[size] = (statuses, templates)
+        # 窗口尺寸变化后淘汰最久未使用的尺寸
+        while len(self.template_cache) > self.template_cache_size:
+            evicted, _ = self.template_cache.popitem(last=False)
+            print(f"  淘汰尺寸 {evicted} 的模板缓存")
+        return statuses, templates
+    
+    def compute_page_similarities(self, screenshot_gray, statuses=None):
+        """一次数组运算计算截图与所有状态模板的页面相似度
+        
+        参数:
+            screenshot_gray: (高, 宽) 的uint8灰度数组
+            statuses: 只计算这些状态，None表示所有状态
+        
+        返回:
+            similarities: 状态到页面相似度（0-1）的字典
+        """
+        start_time = time.perf_counter()
+        height, width = screenshot_gray.shape
+        all_statuses, templates = self.get_resized_templates((width, height))
+        if statuses is None:
+            statuses = all_statuses
+        else:
+            statuses = [status for status in statuses if status in all_statuses]
+            templates = templates[[all_statuses.index(status) for status in statuses]]
+        self.last_evaluations += len(statuses)
+        # 与ImageUtils.simple_template_matching的评分一致：1 - 平均绝对差/255，先转为int16避免uint8相减回绕
+        diff = np.abs(screenshot_gray[np.newaxis].astype(np.int16) - templates)
+        totals = diff.reshape(len(statuses), -1).sum(axis=1, dtype=np.uint64)
+        similarities = 1.0 - totals / (height * width * 255.0)
+        self._add_timing("page_match", time.perf_counter() - start_time)
+        return dict(zip(statuses, similarities.tolist()))
+    
+    def get_roi_templates(self, size):
+        """获取指定截图尺寸下各状态ROI内的像素下标和模板像素值，同一尺寸只计算一次
+        
+        返回:
+            entries: 状态 -> (一维像素下标, 对应的模板像素值) 的字典，只包含声明了ROI的状态
+        """
+        size = (int(size[0]), int(size[1]))
+        if size in self.roi_template_cache:
+            self.roi_template_cache.move_to_end(size)
+            return self.roi_template_cache[size]
+        
+        statuses, templates = self.get_resized_templates(size)
+        width, height = size
+        boxes = self.page_roi_registry.resolve(size)
+        entries = {}
+        for index, status in enumerate(statuses):
+            if not self.page_rois.get(status):
+                continue
+            mask = np.zeros((height, width), dtype=bool)
+            for name in self.page_rois[status]:
+                x1, y1, x2, y2 = boxes[name]
+                mask[y1:y2, x1:x2] = True
+            indices = np.flatnonzero(mask)
+            values = templates[index].ravel()[indices].astype(np.int16)
+            indices.setflags(write=False)
+            values.setflags(write=False)
+            entries[status] = (indices, values)
+        self.roi_template_cache[size] = entries
+        while len(self.roi_template_cache) > self.template_cache_size:
+            self.roi_template_cache.popitem(last=False)
+        return entries
+    
+    def compute_roi_similarities(self, screenshot_gray, statuses=None):
+        """只比较各状态ROI内的像素，计算量与ROI面积成正比，与整帧面积无关
+        
+        参数:
+            screenshot_gray: (高, 宽) 的uint8灰度数组
+            statuses: 只计算这些状态，None表示所有声明了ROI的状态
+        
+        返回:
+            similarities: 状态到ROI相似度（1 - 平均绝对差/255）的字典
+        """
+        start_time = time.perf_counter()
+        height, width = screenshot_gray.shape
+        entries = self.get_roi_templates((width, height))
+        statuses = list(entries) if statuses is None else [status for status in statuses if status in entries]
+        self.last_evaluations += len(statuses)
+        pixels = screenshot_gray.ravel()
+        similarities = {}
+        for status in statuses:
+            indices, values = entries[status]
+            diff = np.abs(pixels[indices].astype(np.int16) - values)
+            similarities[status] = 1.0 - float(diff.sum()) / (len(indices) * 255.0)
+        self._add_timing("page_match", time.perf_counter() - start_time)
+        return similarities
+    
+    def page_similarities(self, screenshot_gray, statuses=None):
+        """计算页面相似度：声明了ROI的状态只比较ROI，其余状态比较整页"""
+        if self.page_roi_registry is None:
+            return self.compute_page_similarities(screenshot_gray, statuses)
+        if statuses is None:
+            statuses = [status for status, config in self.status_templates.items() if "template_img" in config]
+        similarities = self.compute_roi_similarities(screenshot_gray, statuses)
+        remaining = [status for status in statuses if status not in similarities]
+        if remaining:
+            similarities.update(self.compute_page_similarities(screenshot_gray, remaining))
+        return similarities
+    
+    def prefilter_statuses(self, screenshot_np):
+        """颜色预筛选：排除HSV直方图与签名的交集低于下限的状态
+        
+        返回:
+            statuses: 保留的状态列表；未加载签名或灰度帧时返回None，表示不筛选
+        """
+        if self.color_signatures is None or screenshot_np.ndim != 3:
+            return None
+        start_time = time.perf_counter()
+        statuses = [status for status, config in self.status_templates.items() if "template_img" in config]
+        kept, eliminated, intersections = self.color_signatures.filter(screenshot_np, statuses,
+                                                                       self.color_min_intersection)
+        elapsed = time.perf_counter() - start_time
+        self._add_timing("prefilter", elapsed)
+        self.last_prefilter = {"kept": kept, "eliminated": eliminated, "intersections": intersections}
+        print(f"颜色预筛选: 排除 {eliminated}，保留 {kept} ({elapsed * 1e6:.0f}微秒)")
+        return kept
+    
+    def coarse_statuses(self, screenshot_gray, bank_scores=None):
+        """粗分类：用模板库的标准尺寸缩略图判断画面属于哪一类，只返回该类的状态
+        
+        每类的得分是该类所有页面模板的最高相关系数，缩略图和矩阵乘法的耗时约1-2毫秒。
+        
+        参数:
+            screenshot_gray: (高, 宽) 的uint8灰度数组
+            bank_scores: 已经算好的模板库得分向量（批量识别时整批一次计算），None表示现在计算
+        
+        返回:
+            statuses: 得分最高的类别包含的状态列表；未启用、只有一类或两类得分相差不到min_margin时返回None，
+                      表示检查所有状态
+        """
+        self.last_branch = None
+        if len(self.coarse_groups) < 2 or len(self.template_bank) == 0:
+            return None
+        start_time = time.perf_counter()
+        if bank_scores is None:
+            bank_scores = self.template_bank.score(screenshot_gray)
+        scores = self.template_bank.label_scores(bank_scores)
+        group_scores = sorted(
+            ((max((scores[status] for status in statuses if status in scores), default=-1.0), group)
+             for group, statuses in self.coarse_groups.items()),
+            reverse=True
+        )
+        self._add_timing("coarse", time.perf_counter() - start_time)
+        (best_score, best_group), (second_score, _) = group_scores[0], group_scores[1]
+        if best_score - second_score < self.coarse_min_margin:
+            print(f"粗分类不确定: {best_group} ({best_score:.3f}) / 次高 {second_score:.3f}，检查所有状态")
+            return None
+        self.last_branch = best_group
+        print(f"粗分类: {best_group} ({best_score:.3f}，次高 {second_score:.3f})，只检查 {self.coarse_groups[best_group]}")
+        return list(self.coarse_groups[best_group])
+    
+    def score_templates(self, screenshot):
+        """一次矩阵乘法计算截图与模板库中所有模板的归一化相关系数
+        
+        参数:
+            screenshot: 截图路径、PIL图像、RGB或灰度numpy数组、Frame对象
+        
+        返回:
+            (labels, scores): 每个模板所属的状态列表和对应的得分向量（-1到1）
+        """
+        return self.template_bank.labels, self.template_bank.score(screenshot)
+    
+    @staticmethod
+    def fuse_similarity(status, page_similarity, button_similarity):
+        """综合页面相似度和按钮相似度，不同状态使用不同的权重"""
+        page_weight = STATUS_PAGE_WEIGHTS.get(status, DEFAULT_PAGE_WEIGHT)
+        return (page_similarity * page_weight) + (button_similarity * (1 - page_weight))
+    
+    @property
+    def total_evaluations(self):
+        """完整识别一帧需要计算的模板次数：所有按钮模板和页面模板"""
+        buttons = sum(1 for template in self.button_templates.values() if template is not None)
+        pages = sum(1 for config in self.status_templates.values() if "template_img" in config)
+        return buttons + pages
+    
+    def _check_candidates(self, screenshot_gray, candidates, button_similarities):
+        """按候选顺序逐个检查状态，某个状态足够确定时提前返回
+        
+        状态被接受需要同时满足：按钮相似度不低于button_threshold，且综合相似度超过该状态阈值加margin。
+        只看按钮不够，例如战斗结束画面中表情按钮的相似度也有0.9左右。
+        
+        返回:
+            (status, similarity) 或 None（没有候选足够确定，需要完整识别）
+        """
+        tracking_config = self.config.get("state_tracking", {})
+        margin = tracking_config.get("margin", 0.03)
+        button_threshold = tracking_config.get("button_threshold", 0.85)
+        
+        self.last_candidates_checked = True
+        print(f"\n=== 按候选顺序检测: {candidates} ===")
+        for status in candidates:
+            if self.button_templates.get(status) is None:
+                continue
+            button_similarity = self.check_status_button(screenshot_gray, status)
+            button_similarities[status] = button_similarity
+            if button_similarity < button_threshold:
+                continue
+            page_similarity = self.page_similarities(screenshot_gray, [status]).get(status)
+            if page_similarity is None:
+                continue
+            similarity = self.fuse_similarity(status, page_similarity, button_similarity)
+            if similarity >= self.status_thresholds[status] + margin:
+                print(f"\n✓ 候选状态足够确定，提前返回: {status} (综合相似度: {similarity:.4f}，"
+                      f"模板计算 {self.last_evaluations}/{self.total_evaluations} 次)")
+                self.last_early_stop = True
+                return status, similarity
+        return None
+    
+    def get_cache_stats(self):
+        """返回模板缓存统计信息"""
+        stats = {
+            "sizes": list(self.template_cache.keys()),
+            "hits": self.template_cache_hits,
+            "misses": self.template_cache_misses
+        }
+        if self.roi_template_cache:
+            # 最近使用的尺寸下，页面比较实际读取的像素占整帧的比例（所有状态平均）
+            (width, height), entries = next(reversed(self.roi_template_cache.items()))
+            pixels = sum(len(indices) for indices, _ in entries.values())
+            stats["roi_fraction"] = pixels / (len(entries) * width * height) if entries else 0.0
+        return stats
+    
+    def get_button_hint_stats(self):
+        """返回按钮位置提示的命中次数、未命中次数（转为搜索整个区域）和命中率，以及各按钮当前的提示位置"""
+        checks = self.button_hint_hits + self.button_hint_misses
+        return {
+            "hits": self.button_hint_hits,
+            "misses": self.button_hint_misses,
+            "hit_rate": self.button_hint_hits / checks if checks else 0.0,
+            "hints": {status: position for status, (_, position, _) in self.button_hints.items()}
+        }
+    
+    def get_stage_stats(self):
+        """返回各阶段的执行次数、平均耗时、预算和超预算次数，以及粗分类选出各类别的帧数（all表示不确定）"""
+        stages = {}
+        for stage, stats in self.stage_stats.items():
+            stages[stage] = {
+                "runs": stats["runs"],
+                "avg_ms": stats["total_ms"] / stats["runs"],
+                "budget_ms": self.stage_budgets.get(stage),
+                "overruns": stats["overruns"]
+            }
+        return {"stages": stages, "branches": dict(self.branch_counts)}
+    
+    def _record_stages(self):
+        """记录最近一次识别实际执行的阶段，累计耗时并检查是否超出预算"""
+        self.last_stages = list(self.last_timings)
+        if "coarse" in self.last_timings:
+            # 粗分类不确定、检查了所有状态的帧记为all
+            branch = self.last_branch or "all"
+            self.branch_counts[branch] = self.branch_counts.get(branch, 0) + 1
+        for stage, seconds in self.last_timings.items():
+            elapsed_ms = seconds * 1000
+            stats = self.stage_stats.setdefault(stage, {"runs": 0, "total_ms": 0.0, "overruns": 0})
+            stats["runs"] += 1
+            stats["total_ms"] += elapsed_ms
+            budget = self.stage_budgets.get(stage)
+            if budget is not None and elapsed_ms > budget:
+                stats["overruns"] += 1
+                print(f"⚠ 阶段 {stage} 耗时 {elapsed_ms:.1f}ms，超出预算 {budget}ms")
+    
     def check_status_button(self, screenshot_gray, status):
         """检查截图中是否存在指定状态的按钮"""
-        if status not in self.button_templates or not self.button_templates[status]:
+        if self.button_templates.get(status) is None:
             print(f"  {status}按钮模板未加载，跳过检查")
             return 0.0
         
         # 使用专门的按钮模板匹配算法检查对应状态的按钮
         button_template = self.button_templates[status]
-        button_similarity = ImageUtils.button_template_matching(screenshot_gray, button_template)
-        print(f"  {status}按钮相似度: {button_similarity:.4f}")
+        self.last_evaluations += 1
+        start_time = time.perf_counter()
+        size = (screenshot_gray.shape[1], screenshot_gray.shape[0])
+        # 位置提示依赖多尺度定位器，关闭button_search时只按模板原始尺寸搜索整个区域
+        hints_enabled = self.button_hints_enabled and self.button_locator is not None
+        hint = self.button_hints.get(status) if hints_enabled else None
+        if hint is not None and hint[0] == size:
+            # 先在上一次匹配位置附近的小窗口内匹配，得分足够高时不再搜索整个区域
+            _, position, scale = hint
+            margin = int(self.button_hint_margin * min(button_template.shape[:2]) * scale)
+            button_similarity, position = self.button_locator.locate_near(
+                screenshot_gray, button_template, position, scale, margin, key=status)
+            if button_similarity >= self.button_hint_min_score:
+                self.button_hint_hits += 1
+                self.button_matches[status] = (button_similarity, position, scale)
+                self.button_hints[status] = (size, position, scale)
+                print(f"  {status}按钮相似度: {button_similarity:.4f} (位置提示命中: {position}, 尺度: {scale})")
+                self._add_timing("button_scan", time.perf_counter() - start_time)
+                return button_similarity
+            self.button_hint_misses += 1
+        if self.button_locator is not None:
+            # 窗口缩放后按钮大小会变化，按多个尺度搜索
+            button_similarity, position, scale = self.button_locator.locate(screenshot_gray, button_template, key=status)
+            self.button_matches[status] = (button_similarity, position, scale)
+            print(f"  {status}按钮相似度: {button_similarity:.4f} (位置: {position}, 尺度: {scale})")
+        else:
+            button_similarity, position = ImageUtils.locate_button(screenshot_gray, button_template)
+            self.button_matches[status] = (button_similarity, position, 1.0 if position else None)
+            print(f"  {status}按钮相似度: {button_similarity:.4f}")
+        if hints_enabled:
+            if button_similarity >= self.button_hint_min_score:
+                _, position, scale = self.button_matches[status]
+                self.button_hints[status] = (size, position, scale)
+            else:
+                # 整个区域都没有找到按钮（例如画面已切换），下一帧不再先查旧位置
+                self.button_hints.pop(status, None)
+        self._add_timing("button_scan", time.perf_counter() - start_time)
         return button_similarity
     
-    def recognize_status(self, screenshot_path):
-        """识别当前截图的状态"""
+    def _add_timing(self, stage, seconds):
+        """累加最近一次识别中某个阶段的耗时"""
+        self.last_timings[stage] = self.last_timings.get(stage, 0.0) + seconds
+    
+    def recognize_status(self, screenshot, candidates=None):
+        """识别当前截图的状态
+        
+        参数:
+            screenshot: 截图路径、PIL图像、RGB numpy数组或Frame对象，
+                        传入内存中的帧时不会再经过PNG解码
+            candidates: 按可能性从高到低排列的候选状态（通常来自StateTracker），先逐个检查，
+                        足够确定时提前返回；都不确定时再完整识别，已计算的按钮相似度不会重复计算。
+                        None表示直接完整识别
+        """
+        self._reset_last_results()
+        result = self._recognize_status(screenshot, candidates)
+        self._record_stages()
+        return result
+    
+    def _reset_last_results(self):
+        """清空最近一次识别的记录"""
+        self.last_evaluations = 0
+        self.last_candidates_checked = False
+        self.last_early_stop = False
+        self.last_probe_match = None
+        self.last_hash_match = None
+        self.last_classification = None
+        self.last_prefilter = None
+        self.last_branch = None
+        self.last_timings = {}
+    
+    def _prepare_frame(self, source):
+        """批量识别的解码任务（在线程池中执行）：解码为RGB数组，转换为灰度并计算模板库的标准向量
+        
+        返回:
+            (screenshot_np, screenshot_gray, vector, seconds)：解码失败时前三项为None
+        """
+        start_time = time.perf_counter()
         try:
-            # 打开并预处理截图
-            screenshot = Image.open(screenshot_path)
-            screenshot_gray = ImageUtils.preprocess_image(screenshot)
+            screenshot_np = ImageUtils.load_image_array(source)
+            screenshot_gray = ImageUtils.load_gray_array(screenshot_np)
+            vector = self.template_bank.vectorize(screenshot_gray)
+        except Exception as e:
+            print(f"✗ 解码截图失败: {source}")
+            print(f"  错误信息: {e}")
+            screenshot_np = screenshot_gray = vector = None
+        return screenshot_np, screenshot_gray, vector, time.perf_counter() - start_time
+    
+    def recognize_many(self, screenshots, workers=None, batch_size=None):
+        """批量识别多帧截图
+        
+        解码、灰度转换和标准尺寸缩略图在线程池中并行完成（PIL解码和numpy、OpenCV运算不持有GIL），
+        每批截图的缩略图堆叠成一个 (帧数, 宽*高) 矩阵，一次矩阵乘法算出与所有模板的得分，
+        之后每帧按recognize_status的阶段识别，粗分类直接使用这批得分；下一批的解码与本批的识别同时进行。
+        每帧的识别结果与关闭按钮位置提示后逐帧调用recognize_status相同，不受输入顺序和分批方式影响。
+        
+        参数:
+            screenshots: 截图路径、PIL图像、RGB numpy数组或Frame对象的列表
+            workers: 解码线程数，默认读取 STATUS_RECOGNITION_CONFIG["batch_recognition"]，None表示CPU核数
+            batch_size: 每批的帧数，同一批的截图同时在内存中
+        
+        返回:
+            results: 长度为帧数的结构化numpy数组，字段为 source（输入）、status（状态或None）、
+                     similarity、scores（各状态的模板库最高得分，顺序见last_batch_labels）、
+                     decode_ms（解码和预处理）、recognize_ms（识别各阶段）
+        """
+        screenshots = list(screenshots)
+        workers = workers or self.batch_workers or os.cpu_count() or 1
+        batch_size = max(1, batch_size or self.batch_size)
+        labels = list(dict.fromkeys(self.template_bank.labels))
+        self.last_batch_labels = labels
+        results = np.zeros(len(screenshots), dtype=[
+            ("source", object), ("status", object), ("similarity", np.float32),
+            ("scores", np.float32, (len(labels),)), ("decode_ms", np.float32), ("recognize_ms", np.float32)
+        ])
+        results["status"] = None
+        results["scores"] = np.nan
+        timings = {"decode": 0.0, "score": 0.0, "recognize": 0.0}
+        total_start = time.perf_counter()
+        
+        # 离线批量中的截图不一定是连续的帧，按钮位置提示会让一帧的结果取决于同一进程之前识别过哪些帧
+        # （随分块大小、进程数和输入顺序变化），批量识别时清空并关闭提示，结束后恢复
+        hints_enabled = self.button_hints_enabled
+        self.button_hints_enabled = False
+        self.button_hints = {}
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                pending = [executor.submit(self._prepare_frame, source) for source in screenshots[:batch_size]]
+                for start in range(0, len(screenshots), batch_size):
+                    wait_start = time.perf_counter()
+                    prepared = [future.result() for future in pending]
+                    timings["decode"] += time.perf_counter() - wait_start
+                    # 先提交下一批的解码，与本批的识别重叠
+                    pending = [executor.submit(self._prepare_frame, source)
+                               for source in screenshots[start + batch_size:start + 2 * batch_size]]
+                
+                    start_time = time.perf_counter()
+                    decoded = [index for index, (_, _, vector, _) in enumerate(prepared) if vector is not None]
+                    bank_scores = None
+                    if decoded and len(self.template_bank):
+                        bank_scores = self.template_bank.score_vectors(np.stack([prepared[index][2] for index in decoded]))
+                        _, label_scores = self.template_bank.label_scores_many(bank_scores)
+                        results["scores"][[start + index for index in decoded]] = label_scores
+                    timings["score"] += time.perf_counter() - start_time
+                
+                    for index, (screenshot_np, screenshot_gray, _, seconds) in enumerate(prepared):
+                        row = results[start + index]
+                        row["source"] = screenshots[start + index]
+                        row["decode_ms"] = seconds * 1000
+                        if screenshot_np is None:
+                            continue
+                        start_time = time.perf_counter()
+                        self._reset_last_results()
+                        frame_scores = bank_scores[decoded.index(index)] if bank_scores is not None else None
+                        status, similarity = self._recognize_status(screenshot_np, None, screenshot_gray, frame_scores)
+                        self._record_stages()
+                        elapsed = time.perf_counter() - start_time
+                        timings["recognize"] += elapsed
+                        row["status"] = status
+                        row["similarity"] = similarity
+                        row["recognize_ms"] = elapsed * 1000
+        finally:
+            self.button_hints_enabled = hints_enabled
+        
+        timings["total"] = time.perf_counter() - total_start
+        self.last_batch_timings = timings
+        frames = len(screenshots)
+        print(f"\n批量识别: {frames} 帧 ({workers} 个解码线程，每批 {batch_size} 帧)，总耗时 {timings['total']:.2f}s，"
+              f"{frames / timings['total'] if timings['total'] > 0 else 0.0:.1f} 帧/秒")
+        print(f"  等待解码 {timings['decode'] * 1000:.1f}ms，模板库评分 {timings['score'] * 1000:.1f}ms，"
+              f"识别 {timings['recognize'] * 1000:.1f}ms")
+        return results
+    
+    def _recognize_status(self, screenshot, candidates, screenshot_gray=None, bank_scores=None):
+        """按阶段识别截图状态，各阶段的耗时记录在last_timings中
+        
+        批量识别时传入已经转换好的灰度数组和模板库得分向量，不再重复计算
+        """
+        try:
+            # 加载截图，只解码一次，探针和分类器使用彩色数组，模板匹配使用灰度数组
+            start_time = time.perf_counter()
+            screenshot_np = ImageUtils.load_image_array(screenshot)
+            self._add_timing("decode", time.perf_counter() - start_time)
+            
+            # 最先检查像素探针，只读取几十个像素，恰好一个状态全部命中时直接返回
+            if self.probes is not None:
+                start_time = time.perf_counter()
+                label, fraction = self.probes.decide(screenshot_np, self.probe_min_fraction)
+                self._add_timing("probes", time.perf_counter() - start_time)
+                if label is not None:
+                    self.last_probe_match = (label, fraction)
+                    print(f"\n✓ 像素探针命中: {label} (命中比例: {fraction:.2f})")
+                    return (label if label in self.status_templates else None), fraction
+            
+            start_time = time.perf_counter()
+            if screenshot_gray is None:
+                screenshot_gray = ImageUtils.load_gray_array(screenshot_np)
+            self._add_timing("preprocess", time.perf_counter() - start_time)
+            
+            # 先查感知哈希索引，命中时不再做模板匹配；标注为“其他”等非识别状态时返回None
+            if self.hash_index is not None:
+                start_time = time.perf_counter()
+                match = self.hash_index.lookup(screenshot_gray, self.hash_max_distance)
+                self._add_timing("hash", time.perf_counter() - start_time)
+                if match is not None:
+                    label, distance, path = match
+                    self.last_hash_match = match
+                    similarity = 1 - distance / 64
+                    print(f"\n✓ 哈希索引命中: {label} (汉明距离: {distance}，最接近: {path})")
+                    return (label if label in self.status_templates else None), similarity
+            
+            # 再用画面分类器，置信度足够时直接返回；未见过的画面或置信度不够时继续模板匹配
+            if self.classifier is not None:
+                start_time = time.perf_counter()
+                label, confidence = self.classifier.predict(screenshot_np)
+                self._add_timing("classifier", time.perf_counter() - start_time)
+                self.last_classification = (label, confidence)
+                if label is not None and confidence >= self.classifier_min_confidence:
+                    print(f"\n✓ 画面分类器: {label} (置信度: {confidence:.3f})")
+                    return (label if label in self.status_templates else None), confidence
             
             best_status = None
             best_similarity = 0
             
+            button_similarities = {}
+            
+            # 颜色预筛选排除颜色分布明显不同的状态，粗分类后只对所属类别的状态做按钮和页面匹配，
+            # 例如对战画面不计算主界面和宝箱模板
+            statuses = self.prefilter_statuses(screenshot_np)
+            if statuses is None or statuses:
+                branch = self.coarse_statuses(screenshot_gray, bank_scores)
+                if branch is not None:
+                    statuses = branch if statuses is None else [status for status in statuses if status in branch]
+            if statuses is not None and not statuses:
+                print("\n✗ 颜色预筛选和粗分类排除了所有状态")
+                return None, 0
+            if statuses is not None and candidates:
+                candidates = [status for status in candidates if status in statuses]
+            
+            # 0. 按候选顺序检查最可能的状态
+            if candidates:
+                result = self._check_candidates(screenshot_gray, candidates, button_similarities)
+                if result is not None:
+                    return result
+            
             # 1. 首先检查所有状态的按钮，记录按钮相似度
             print("\n=== 开始按钮优先检测 ===")
             
-            button_similarities = {}
-            
             for status in self.button_templates:
-                button_similarity = self.check_status_button(screenshot_gray, status)
-                button_similarities[status] = button_similarity
+                if statuses is not None and status not in statuses:
+                    continue
+                if status not in button_similarities:
+                    button_similarities[status] = self.check_status_button(screenshot_gray, status)
             
             # 找出按钮相似度最高的状态
             max_button_similarity = 0
@@ -112,31 +807,14 @@ class StatusRecognizer:
             # 5. 进行完整的状态识别，结合页面相似度和按钮相似度
             print("\n=== 进行完整状态识别 ===")
             
-            for status, config in self.status_templates.items():
-                if "template_img" not in config:
-                    continue
-                
-                template = config["template_img"]
-                
-                # 使用简单模板匹配算法获取页面相似度
-                page_similarity = ImageUtils.simple_template_matching(screenshot_gray, template)
+            # 使用缓存的缩放模板算出所有状态的页面相似度，声明了ROI的状态只比较ROI
+            page_similarities = self.page_similarities(screenshot_gray, statuses)
+            
+            for status, page_similarity in page_similarities.items():
                 
                 # 综合考虑页面相似度和按钮相似度，根据状态调整权重
-                button_similarity = button_similarities[status]
-                
-                # 为不同状态设置不同的权重分配
-                if status == "战斗中":
-                    # 战斗中状态：提高页面权重，降低按钮权重，减少误判
-                    similarity = (page_similarity * 0.8) + (button_similarity * 0.2)
-                elif status == "战斗结束":
-                    # 战斗结束状态：提高页面权重，降低按钮权重
-                    similarity = (page_similarity * 0.9) + (button_similarity * 0.1)
-                elif status == "战斗未开始":
-                    # 战斗未开始状态：提高页面权重，降低按钮权重
-                    similarity = (page_similarity * 0.9) + (button_similarity * 0.1)
-                else:
-                    # 其他状态：保持原有权重
-                    similarity = (page_similarity * 0.4) + (button_similarity * 0.6)
+                button_similarity = button_similarities.get(status, 0.0)
+                similarity = self.fuse_similarity(status, page_similarity, button_similarity)
                 
                 print(f"状态比较: {status} -> 页面相似度: {page_similarity:.4f}, 按钮相似度: {button_similarity:.4f}, 综合相似度: {similarity:.4f}")
                 
@@ -145,17 +823,9 @@ class StatusRecognizer:
                     best_similarity = similarity
                     best_status = status
             
-            # 6. 使用配置文件中定义的阈值或默认阈值
+            # 6. 使用各状态的阈值
             if best_status:
-                # 为不同状态设置不同的阈值
-                status_thresholds = {
-                    "战斗结束": 0.53,  # 降低战斗结束状态的阈值，提高识别率
-                    "战斗中": 0.54,   # 降低战斗中状态的阈值，提高识别率
-                    "战斗未开始": 0.54,  # 降低战斗未开始状态的阈值，提高识别率
-                    "开宝箱": 0.65
-                }
-                
-                threshold = status_thresholds[best_status]
+                threshold = self.status_thresholds[best_status]
                 print(f"使用状态 '{best_status}' 的阈值: {threshold}")
                 
                 if best_similarity >= threshold:
@@ -172,13 +842,17 @@ class StatusRecognizer:
             traceback.print_exc()
             return None, 0
     
-    def process_screenshot(self, screenshot_path):
-        """处理截图：识别状态"""
-        print(f"\n处理截图: {screenshot_path}")
+    def process_screenshot(self, screenshot):
+        """处理截图：识别状态
+        
+        参数:
+            screenshot: 截图路径、PIL图像、RGB numpy数组或Frame对象
+        """
+        print(f"\n处理截图: {screenshot}")
         print("=" * 50)
         
         # 识别状态
-        status, similarity = self.recognize_status(screenshot_path)
+        status, similarity = self.recognize_status(screenshot)
         
         if status:
             print(f"✓ 识别结果: {status} (相似度: {similarity:.4f})")
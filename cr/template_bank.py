@@ -0,0 +1,166 @@
+import numpy as np
+import cv2
+from cr.utils import ImageUtils
+
+# 模板统一缩放到的标准尺寸 (宽, 高)，与皇室战争截图的宽高比（约0.52）一致
+DEFAULT_CANONICAL_SIZE = (64, 120)
+
+
+class TemplateBank:
+    """状态模板库：所有模板缩放到同一标准低分辨率，堆叠成一个连续矩阵
+
+    每个模板转换为灰度、缩放到canonical_size、减去均值并归一化后作为矩阵的一行，
+    一帧截图按同样方式处理后与矩阵相乘一次，就得到它与所有模板的归一化相关系数。
+    增加模板只是给矩阵加一行，不会增加Python层的循环。
+    """
+
+    def __init__(self, canonical_size=DEFAULT_CANONICAL_SIZE):
+        """初始化模板库
+
+        参数:
+            canonical_size: 标准尺寸 (宽, 高)
+        """
+        self.canonical_size = (int(canonical_size[0]), int(canonical_size[1]))
+        # 每个模板的标签（状态）和名称（通常是文件路径）
+        self.labels = []
+        self.names = []
+        self._rows = []
+        self._matrix = None
+        self._label_starts = None
+        self._label_order = None
+
+    def __len__(self):
+        return len(self._rows)
+
+    def vectorize(self, image):
+        """把一张图片转换为标准尺寸的零均值单位向量
+
+        参数:
+            image: 截图路径、PIL图像、RGB或灰度numpy数组、Frame对象
+
+        返回:
+            vector: 长度为 宽*高 的float32数组；纯色图片返回全0向量
+        """
+        gray = ImageUtils.load_gray_array(image)
+        small = cv2.resize(gray, self.canonical_size, interpolation=cv2.INTER_AREA)
+        vector = small.astype(np.float32).ravel()
+        vector -= vector.mean()
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector
+
+    def fits(self, size, tolerance=0.15):
+        """判断一张图片是否适合作为整页模板：宽高比与标准尺寸接近，且不小于标准尺寸
+
+        参数:
+            size: 图片尺寸 (宽, 高)
+            tolerance: 宽高比允许的相对偏差
+
+        返回:
+            bool: 按钮等局部截图返回False，应使用滑动模板匹配
+        """
+        width, height = size
+        canonical_w, canonical_h = self.canonical_size
+        if width < canonical_w or height < canonical_h:
+            return False
+        canonical_ratio = canonical_w / canonical_h
+        return abs(width / height - canonical_ratio) <= tolerance * canonical_ratio
+
+    def add(self, label, image, name=None):
+        """添加一个模板
+
+        参数:
+            label: 模板所属的状态
+            image: 模板图片（路径、PIL图像或numpy数组）
+            name: 模板名称，默认使用路径
+        """
+        if name is None:
+            name = image if isinstance(image, str) else f"{label}_{len(self.names)}"
+        self.add_vector(label, self.vectorize(image), name)
+
+    def add_vector(self, label, vector, name):
+        """添加一个已经按vectorize处理过的模板向量（例如来自TemplateStore的快照）"""
+        self._rows.append(vector)
+        self.labels.append(label)
+        self.names.append(name)
+        self._matrix = None
+
+    @property
+    def matrix(self):
+        """(模板数, 宽*高) 的连续float32模板矩阵，同一状态的模板相邻排列"""
+        if self._matrix is None:
+            self._build()
+        return self._matrix
+
+    def _build(self):
+        """按状态分组排序后堆叠模板，记录每个状态的起始行，用于按状态取最大值"""
+        if not self._rows:
+            self._matrix = np.zeros((0, self.canonical_size[0] * self.canonical_size[1]), dtype=np.float32)
+            self._label_order, self._label_starts = [], np.zeros(0, dtype=np.intp)
+            return
+        # 状态按首次添加的顺序排列，同一状态内保持添加顺序
+        label_order = list(dict.fromkeys(self.labels))
+        order = sorted(range(len(self._rows)), key=lambda index: label_order.index(self.labels[index]))
+        self._rows = [self._rows[index] for index in order]
+        self.labels = [self.labels[index] for index in order]
+        self.names = [self.names[index] for index in order]
+        self._matrix = np.ascontiguousarray(np.stack(self._rows))
+        self._matrix.setflags(write=False)
+        self._label_order = label_order
+        self._label_starts = np.array([self.labels.index(label) for label in self._label_order], dtype=np.intp)
+
+    def score(self, image):
+        """计算一帧截图与所有模板的归一化相关系数
+
+        参数:
+            image: 截图路径、PIL图像、RGB或灰度numpy数组、Frame对象
+
+        返回:
+            scores: 长度为模板数的float32数组，顺序与self.labels、self.names一致
+        """
+        return self.matrix @ self.vectorize(image)
+
+    def score_many(self, images):
+        """一次矩阵乘法计算多帧截图与所有模板的相关系数
+
+        返回:
+            scores: (帧数, 模板数) 的float32数组
+        """
+        return self.score_vectors(np.stack([self.vectorize(image) for image in images]))
+
+    def score_vectors(self, vectors):
+        """对已经按vectorize处理过的 (帧数, 宽*高) 向量矩阵计算与所有模板的相关系数，
+        向量可以在其他线程中预先计算
+
+        返回:
+            scores: (帧数, 模板数) 的float32数组
+        """
+        return np.asarray(vectors, dtype=np.float32) @ self.matrix.T
+
+    def label_scores(self, scores):
+        """把一帧的模板得分按状态取最大值
+
+        参数:
+            scores: score返回的一维数组
+
+        返回:
+            状态 -> 最高得分 的字典
+        """
+        labels, maxima = self.label_scores_many(np.asarray(scores)[np.newaxis])
+        return dict(zip(labels, maxima[0].tolist()))
+
+    def label_scores_many(self, scores):
+        """把多帧的模板得分按状态取最大值
+
+        参数:
+            scores: score_many返回的 (帧数, 模板数) 数组
+
+        返回:
+            (状态列表, (帧数, 状态数) 数组)
+        """
+        if self._matrix is None:
+            self._build()
+        if not self._label_order:
+            return [], np.zeros((len(scores), 0), dtype=np.float32)
+        return list(self._label_order), np.maximum.reduceat(scores, self._label_starts, axis=1)
@@ -0,0 +1,262 @@
+import os
+import json
+import time
+import threading
+import numpy as np
+import cv2
+from PIL import Image
+from cr.hash_index import INDEX_EXTENSIONS
+from cr.template_bank import TemplateBank, DEFAULT_CANONICAL_SIZE
+from cr.utils import ImageUtils
+
+# 快照格式版本，预处理方式变化时加1使旧快照失效
+SNAPSHOT_VERSION = 1
+
+
+class TemplateStore:
+    """预处理后的模板仓库，带内存映射的磁盘快照
+
+    启动时对 root_dir/<文件夹>/ 下的所有模板只做一次预处理：灰度化、高斯模糊、
+    缩放到标准尺寸的零均值单位向量（与TemplateBank一致），以及由alpha通道得到的掩码。
+    结果写入snapshot_dir下的快照（像素拼接成一个.npy，标准向量一个.npy，索引一个json），
+    之后启动时只要模板文件的修改时间和大小没有变化，就直接内存映射快照，不再解码PNG。
+    返回的数组都是只读视图。
+    """
+
+    def __init__(self, root_dir="png", folders=None, snapshot_dir=None,
+                 canonical_size=DEFAULT_CANONICAL_SIZE, blur_kernel=3):
+        """初始化模板仓库并加载快照（快照失效时重新预处理）
+
+        参数:
+            root_dir: 模板根目录
+            folders: 读取的子文件夹（通常是各状态名称），None表示root_dir下的所有子文件夹
+            snapshot_dir: 快照目录，None表示不写快照，每次启动都重新预处理
+            canonical_size: 标准向量的尺寸 (宽, 高)
+            blur_kernel: 高斯模糊的核大小
+        """
+        self.root_dir = root_dir
+        self.folders = folders
+        self.snapshot_dir = snapshot_dir
+        self.canonical_size = (int(canonical_size[0]), int(canonical_size[1]))
+        self.blur_kernel = int(blur_kernel)
+        self.names = []
+        self.labels = []
+        self.shapes = []
+        self._offsets = []
+        self._index = {}
+        self._pixels = np.zeros(0, dtype=np.uint8)
+        self._vectors = np.zeros((0, self.canonical_size[0] * self.canonical_size[1]), dtype=np.float32)
+        # 最近一次加载是否重新预处理，以及加载耗时（秒）
+        self.rebuilt = False
+        self.load_time = 0.0
+        self.load()
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, path):
+        return os.path.normpath(path) in self._index
+
+    def sources(self):
+        """列出所有模板文件
+
+        返回:
+            [(label, path), ...]，label为所在子文件夹名称
+        """
+        sources = []
+        if not os.path.isdir(self.root_dir):
+            return sources
+        folders = self.folders if self.folders is not None else sorted(
+            name for name in os.listdir(self.root_dir) if os.path.isdir(os.path.join(self.root_dir, name)))
+        for label in folders:
+            folder = os.path.join(self.root_dir, label)
+            if not os.path.isdir(folder):
+                continue
+            for filename in sorted(os.listdir(folder)):
+                if filename.lower().endswith(INDEX_EXTENSIONS):
+                    sources.append((label, os.path.normpath(os.path.join(folder, filename))))
+        return sources
+
+    def signature(self, sources):
+        """模板文件的修改时间、大小和预处理参数，任何一项变化都会使快照失效"""
+        files = []
+        for label, path in sources:
+            stat = os.stat(path)
+            files.append([label, path, stat.st_mtime_ns, stat.st_size])
+        return {
+            "version": SNAPSHOT_VERSION,
+            "canonical_size": list(self.canonical_size),
+            "blur_kernel": self.blur_kernel,
+            "files": files
+        }
+
+    def load(self):
+        """加载快照，快照不存在或已失效时重新预处理并写入快照"""
+        start_time = time.time()
+        sources = self.sources()
+        signature = self.signature(sources)
+        self.rebuilt = not self._load_snapshot(signature)
+        if self.rebuilt:
+            self._build(sources)
+            if self.snapshot_dir:
+                self._save_snapshot(signature)
+        self.load_time = time.time() - start_time
+
+    def _snapshot_paths(self):
+        return (os.path.join(self.snapshot_dir, "index.json"),
+                os.path.join(self.snapshot_dir, "pixels.npy"),
+                os.path.join(self.snapshot_dir, "vectors.npy"))
+
+    def _load_snapshot(self, signature):
+        """签名一致时内存映射快照，返回是否成功"""
+        if not self.snapshot_dir:
+            return False
+        index_path, pixels_path, vectors_path = self._snapshot_paths()
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            if index.get("signature") != signature:
+                return False
+            pixels = np.load(pixels_path, mmap_mode="r")
+            vectors = np.load(vectors_path, mmap_mode="r")
+        except (OSError, ValueError):
+            return False
+        self._set_entries(index["entries"], pixels, vectors)
+        return True
+
+    def _save_snapshot(self, signature):
+        """写入快照：先写数组，最后写索引，索引写完之前旧快照不会被当作有效"""
+        index_path, pixels_path, vectors_path = self._snapshot_paths()
+        entries = [{"name": name, "label": label, "shape": list(shape), "offsets": list(offsets)}
+                   for name, label, shape, offsets in zip(self.names, self.labels, self.shapes, self._offsets)]
+        try:
+            os.makedirs(self.snapshot_dir, exist_ok=True)
+            if os.path.exists(index_path):
+                os.remove(index_path)
+            for path, array in ((pixels_path, self._pixels), (vectors_path, self._vectors)):
+                temp_path = path + ".tmp.npy"
+                np.save(temp_path, array)
+                os.replace(temp_path, path)
+            with open(index_path, "w", encoding="utf-8") as f:
+                json.dump({"signature": signature, "entries": entries}, f, ensure_ascii=False)
+        except OSError as e:
+            print(f"⚠ 写入模板快照失败: {self.snapshot_dir}，错误信息: {e}")
+            return
+        # 重新映射刚写入的快照，与下次启动的状态一致，预处理时的内存可以释放
+        self._set_entries(entries, np.load(pixels_path, mmap_mode="r"), np.load(vectors_path, mmap_mode="r"))
+
+    def _build(self, sources):
+        """解码并预处理所有模板，像素按 灰度、模糊、掩码 的顺序拼接成一个一维数组"""
+        vectorizer = TemplateBank(self.canonical_size)
+        blocks = []
+        vectors = []
+        entries = []
+        position = 0
+        for label, path in sources:
+            try:
+                image_np = self._load_image(path)
+            except Exception as e:
+                print(f"✗ 预处理模板失败: {path}")
+                print(f"  错误信息: {e}")
+                continue
+            alpha = image_np[:, :, 3] if image_np.ndim == 3 and image_np.shape[2] == 4 else None
+            gray = ImageUtils.load_gray_array(image_np)
+            blurred = cv2.GaussianBlur(gray, (self.blur_kernel, self.blur_kernel), 0)
+            # 完全不透明的模板不需要掩码
+            mask = (alpha > 0).astype(np.uint8) if alpha is not None and alpha.min() == 0 else None
+
+            offsets = [position, position + gray.size, -1]
+            blocks.extend([gray.ravel(), blurred.ravel()])
+            position += 2 * gray.size
+            if mask is not None:
+                offsets[2] = position
+                blocks.append(mask.ravel())
+                position += mask.size
+            vectors.append(vectorizer.vectorize(gray))
+            entries.append({"name": path, "label": label, "shape": list(gray.shape), "offsets": offsets})
+
+        pixels = np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.uint8)
+        vectors = np.stack(vectors) if vectors else np.zeros((0, self._vectors.shape[1]), dtype=np.float32)
+        pixels.setflags(write=False)
+        vectors.setflags(write=False)
+        self._set_entries(entries, pixels, vectors)
+
+    @staticmethod
+    def _load_image(path):
+        """解码模板并保留alpha通道，用于生成掩码"""
+        with Image.open(path) as img:
+            return np.asarray(img.convert("RGBA") if "A" in img.getbands() else img.convert("RGB"))
+
+    def _set_entries(self, entries, pixels, vectors):
+        self.names = [entry["name"] for entry in entries]
+        self.labels = [entry["label"] for entry in entries]
+        self.shapes = [tuple(entry["shape"]) for entry in entries]
+        self._offsets = [tuple(entry["offsets"]) for entry in entries]
+        self._index = {name: index for index, name in enumerate(self.names)}
+        self._pixels = pixels
+        self._vectors = vectors
+
+    def _block(self, path, which):
+        index = self._index.get(os.path.normpath(path))
+        if index is None:
+            return None
+        offset = self._offsets[index][which]
+        if offset < 0:
+            return None
+        height, width = self.shapes[index]
+        return self._pixels[offset:offset + height * width].reshape(height, width)
+
+    def entries(self, folder=None):
+        """返回模板路径列表，指定folder时只返回该文件夹下的模板"""
+        if folder is None:
+            return list(self.names)
+        folder = os.path.normpath(folder)
+        return [name for name in self.names if os.path.dirname(name) == folder]
+
+    def gray(self, path):
+        """模板的 (高, 宽) 只读灰度数组（与PIL convert("L")一致），不存在时返回None"""
+        return self._block(path, 0)
+
+    def blurred(self, path):
+        """模板高斯模糊后的只读灰度数组，不存在时返回None"""
+        return self._block(path, 1)
+
+    def mask(self, path):
+        """模板的只读掩码（1为有效像素），模板完全不透明或不存在时返回None"""
+        return self._block(path, 2)
+
+    def size(self, path):
+        """模板尺寸 (宽, 高)"""
+        height, width = self.shapes[self._index[os.path.normpath(path)]]
+        return width, height
+
+    def vector(self, path):
+        """模板缩放到canonical_size的零均值单位向量（与TemplateBank.vectorize一致）"""
+        index = self._index.get(os.path.normpath(path))
+        return None if index is None else self._vectors[index]
+
+    def stats(self):
+        """返回仓库统计信息"""
+        return {
+            "templates": len(self.names),
+            "rebuilt": self.rebuilt,
+            "load_time": self.load_time,
+            "pixel_bytes": int(self._pixels.nbytes),
+            "memory_mapped": isinstance(self._pixels, np.memmap)
+        }
+
+
+_shared_store = None
+_shared_store_lock = threading.Lock()
+
+
+def get_template_store():
+    """获取进程内共享的模板仓库，首次调用时按STATUS_RECOGNITION_CONFIG中的template_store配置创建"""
+    global _shared_store
+    with _shared_store_lock:
+        if _shared_store is None:
+            from config.config import STATUS_RECOGNITION_CONFIG
+            options = dict(STATUS_RECOGNITION_CONFIG.get("template_store", {}))
+            options.setdefault("canonical_size", STATUS_RECOGNITION_CONFIG.get("canonical_size", DEFAULT_CANONICAL_SIZE))
+            _shared_store = TemplateStore(**options)
+        return _shared_store
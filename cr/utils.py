@@ -1,12 +1,65 @@
 from PIL import Image
 import numpy as np
+import cv2
 import subprocess
 import time
 import os
+from cr.automation_worker import get_automation_client
+from cr.button_locator import get_button_locator
+from cr.roi import get_roi_registry
+from cr.window_geometry import get_geometry_service
 
 class ImageUtils:
     """图像处理工具类"""
-    
+
+    @staticmethod
+    def load_image_array(source):
+        """将截图来源统一转换为RGB numpy数组
+
+        参数:
+            source: 截图路径、PIL图像、numpy数组或Frame对象（带image属性）
+
+        返回:
+            image_np: (高, 宽, 3) 的uint8 RGB数组；灰度输入返回 (高, 宽) 数组
+        """
+        # Frame对象直接取出已解码的数组，避免再次解码
+        if hasattr(source, "image") and isinstance(source.image, np.ndarray):
+            source = source.image
+
+        if isinstance(source, np.ndarray):
+            image_np = source
+        elif isinstance(source, Image.Image):
+            image_np = np.asarray(source.convert("L") if source.mode in ("L", "1", "I", "F") else source.convert("RGB"))
+        else:
+            with Image.open(source) as img:
+                image_np = np.asarray(img.convert("RGB"))
+
+        # 去掉alpha通道
+        if image_np.ndim == 3 and image_np.shape[2] == 4:
+            image_np = image_np[:, :, :3]
+        return image_np
+
+    @staticmethod
+    def load_gray_array(source):
+        """将截图来源转换为 (高, 宽) 的uint8灰度数组，不经过PIL图像
+
+        使用与PIL convert("L")相同的ITU-R 601-2整数公式，结果与PIL逐像素一致
+        """
+        image_np = ImageUtils.load_image_array(source)
+        if image_np.ndim == 2:
+            return image_np
+        rgb = image_np.astype(np.uint32)
+        gray = (rgb[:, :, 0] * 19595 + rgb[:, :, 1] * 38470 + rgb[:, :, 2] * 7471 + 0x8000) >> 16
+        return gray.astype(np.uint8)
+
+    @staticmethod
+    def load_gray_image(source):
+        """将截图来源转换为灰度PIL图像，数组输入不经过PNG编解码"""
+        if isinstance(source, Image.Image):
+            return ImageUtils.preprocess_image(source)
+        image_np = ImageUtils.load_image_array(source)
+        return ImageUtils.preprocess_image(Image.fromarray(image_np))
+
     @staticmethod
     def preprocess_image(img):
         """图片预处理：转换为灰度图并进行简单降噪"""
@@ -53,8 +106,8 @@ class ImageUtils:
         resized_template = template_img.resize((screenshot_w, screenshot_h))
         resized_template_np = np.array(resized_template)
         
-        # 计算图片差异
-        diff = np.abs(screenshot_np - resized_template_np)
+        # 计算图片差异（转为int16，避免uint8相减回绕）
+        diff = np.abs(screenshot_np.astype(np.int16) - resized_template_np.astype(np.int16))
         # 计算差异比例
         diff_ratio = np.sum(diff) / (diff.size * 255)
         # 转换为相似度
@@ -63,98 +116,76 @@ class ImageUtils:
         return similarity
     
     @staticmethod
-    def button_template_matching(screenshot, button_template):
-        """专门用于按钮识别的模板匹配算法"""
-        # 将图片转换为numpy数组
-        screenshot_np = np.array(screenshot)
-        button_np = np.array(button_template)
+    def locate_button(screenshot, button_template, region="button_search"):
+        """在截图中定位按钮，一次计算所有位置的归一化相关系数（OpenCV模板匹配）
         
-        screenshot_h, screenshot_w = screenshot_np.shape
-        button_h, button_w = button_np.shape
+        参数:
+            screenshot: 截图（PIL图像或numpy数组，灰度或RGB，需与按钮模板通道数一致）
+            button_template: 按钮模板
+            region: 搜索区域在ROI注册表中的名称，默认只搜索屏幕下半部分（对战按钮通常在底部），None表示整张截图
         
-        # 如果按钮尺寸大于截图尺寸，调整按钮尺寸
-        if button_h > screenshot_h or button_w > screenshot_w:
-            return 0.0
+        返回:
+            (similarity, position): 最佳匹配的相似度（0-1）和按钮左上角在整张截图中的坐标 (x, y)；
+                按钮大于搜索区域时返回 (0.0, None)
+        """
+        screenshot_np = np.asarray(screenshot)
+        button_np = np.asarray(button_template)
         
-        best_similarity = 0.0
+        # 只在可能出现按钮的区域搜索，减少计算量；视图不复制像素
+        offset_x, offset_y = 0, 0
+        if region is not None:
+            registry = get_roi_registry()
+            offset_x, offset_y = registry.box(region, (screenshot_np.shape[1], screenshot_np.shape[0]))[:2]
+            screenshot_np = registry.view(screenshot_np, region)
         
-        # 在截图中滑动按钮模板，寻找最佳匹配
-        # 只在可能出现按钮的区域搜索，减少计算量
-        search_region_h = screenshot_h - button_h + 1
-        search_region_w = screenshot_w - button_w + 1
+        screenshot_h, screenshot_w = screenshot_np.shape[:2]
+        button_h, button_w = button_np.shape[:2]
         
-        # 只搜索屏幕下半部分，因为对战按钮通常在底部
-        start_y = int(search_region_h * 0.5)
-        end_y = search_region_h
+        # 如果按钮尺寸大于搜索区域尺寸，无法匹配
+        if button_h > screenshot_h or button_w > screenshot_w:
+            return 0.0, None
         
-        for y in range(start_y, end_y, 5):  # 步长为5，减少计算量
-            for x in range(0, search_region_w, 5):  # 步长为5，减少计算量
-                # 截取当前窗口
-                window = screenshot_np[y:y+button_h, x:x+button_w]
-                
-                # 计算差异
-                diff = np.abs(window - button_np)
-                diff_ratio = np.sum(diff) / (diff.size * 255)
-                similarity = 1 - diff_ratio
-                
-                # 更新最佳相似度
-                if similarity > best_similarity:
-                    best_similarity = similarity
+        # OpenCV按浮点累加，不会出现uint8相减回绕；逐像素步长计算所有位置
+        result = cv2.matchTemplate(np.ascontiguousarray(screenshot_np), np.ascontiguousarray(button_np), cv2.TM_CCOEFF_NORMED)
+        # 纯色窗口或模板的相关系数无定义，按不匹配处理
+        result = np.nan_to_num(result, nan=0.0, posinf=0.0, neginf=0.0)
+        _, max_val, _, max_loc = cv2.minMaxLoc(result)
         
-        return best_similarity
+        # 负相关视为不匹配，相似度限制在0-1之间
+        similarity = min(max(float(max_val), 0.0), 1.0)
+        return similarity, (max_loc[0] + offset_x, max_loc[1] + offset_y)
     
     @staticmethod
-    def find_button_position(interface_img, button_img):
-        """使用模板匹配找到按钮在界面中的位置"""
-        # 将图片转换为numpy数组
-        interface_np = np.array(interface_img)
-        button_np = np.array(button_img)
-        
-        # 获取界面和按钮的尺寸
-        if len(interface_np.shape) == 3:
-            interface_h, interface_w, _ = interface_np.shape
-        else:
-            interface_h, interface_w = interface_np.shape
-        
-        if len(button_np.shape) == 3:
-            button_h, button_w, _ = button_np.shape
-        else:
-            button_h, button_w = button_np.shape
+    def button_template_matching(screenshot, button_template, region="button_search"):
+        """专门用于按钮识别的模板匹配算法，返回最佳匹配的相似度（0-1）
         
-        # 计算需要遍历的区域
-        h_search = interface_h - button_h
-        w_search = interface_w - button_w
-        
-        best_match = (0, 0)
-        min_diff = float('inf')
+        参数:
+            screenshot: 灰度截图（PIL图像或numpy数组）
+            button_template: 灰度按钮模板
+            region: 搜索区域在ROI注册表中的名称，None表示整张截图
+        """
+        return ImageUtils.locate_button(screenshot, button_template, region)[0]
+    
+    @staticmethod
+    def find_button_position(interface_img, button_img):
+        """使用多尺度模板匹配找到按钮在界面中的位置，返回按钮左上角坐标 (x, y)
         
-        # 遍历界面，寻找与按钮最匹配的区域
-        for y in range(0, h_search, 5):  # 步长为5，加快搜索速度
-            for x in range(0, w_search, 5):
-                # 截取当前区域
-                if len(interface_np.shape) == 3:
-                    region = interface_np[y:y+button_h, x:x+button_w, :]
-                    # 计算与按钮的差异
-                    diff = np.sum(np.abs(region - button_np))
-                else:
-                    region = interface_np[y:y+button_h, x:x+button_w]
-                    # 计算与按钮的差异
-                    diff = np.sum(np.abs(region - button_np))
-                # 更新最佳匹配
-                if diff < min_diff:
-                    min_diff = diff
-                    best_match = (x, y)
+        按钮模板可能截自不同尺寸的窗口，按共享按钮定位器配置的尺度搜索整张界面图
+        """
+        # 去掉alpha通道，保证界面和按钮通道数一致
+        interface_np = ImageUtils.load_image_array(interface_img)
+        button_np = ImageUtils.load_image_array(button_img)
         
-        return best_match
+        _, position, _ = get_button_locator().locate(interface_np, button_np, region=None)
+        return position if position is not None else (0, 0)
 
 class SystemUtils:
     """系统工具类"""
     
     @staticmethod
     def run_osascript(script):
-        """运行AppleScript脚本"""
-        result = subprocess.run(["osascript", "-e", script], capture_output=True, text=True)
-        return result
+        """通过常驻自动化进程运行AppleScript脚本，返回CompletedProcess"""
+        return get_automation_client().run_osascript(script)
     
     @staticmethod
     def get_timestamp_filename(prefix="auto"):
@@ -162,6 +193,22 @@ class SystemUtils:
         timestamp = time.strftime("%Y%m%d_%H%M%S")
         return f"{prefix}_{timestamp}.png"
     
+    @staticmethod
+    def get_frame_filename(prefix="auto", timestamp=None, seq=0, ext="png"):
+        """生成带毫秒和序号的文件名，1秒内多次截图也不会重名
+        
+        参数:
+            prefix: 文件名前缀
+            timestamp: 截图时间戳（time.time()），默认取当前时间
+            seq: 帧序号
+            ext: 文件扩展名
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        milliseconds = int((timestamp % 1) * 1000)
+        time_str = time.strftime("%Y%m%d_%H%M%S", time.localtime(timestamp))
+        return f"{prefix}_{time_str}_{milliseconds:03d}_{seq:06d}.{ext}"
+    
     @staticmethod
     def ensure_dir_exists(dir_path):
         """确保目录存在"""
@@ -210,55 +257,13 @@ class WeChatUtils:
         return SystemUtils.bring_window_to_front("WeChat")
     
     @staticmethod
-    def get_wechat_window_position():
-        """获取微信窗口的位置和大小"""
-        try:
-            # 激活微信窗口，确保能获取到正确的窗口信息
-            activate_script = '''tell application "WeChat"
-    activate
-    delay 0.1
-end tell'''
-            subprocess.run(["osascript", "-e", activate_script], check=True, capture_output=True, text=True)
-            time.sleep(0.1)
-            
-            # 使用System Events获取微信窗口的实际位置
-            position_script = '''tell application "System Events"
-    tell process "WeChat"
-        get position of window 1
-    end tell
-end tell'''
-            position_result = subprocess.run(["osascript", "-e", position_script], check=True, capture_output=True, text=True)
-            
-            # 解析位置结果，格式为 {x, y}
-            position = position_result.stdout.strip().replace("{", "").replace("}", "").split(", ")
-            wx_x = int(position[0])
-            wx_y = int(position[1])
-            
-            # 从系统获取微信窗口的大小
-            size_script = '''tell application "System Events"
-    tell process "WeChat"
-        get size of window 1
-    end tell
-end tell'''
-            size_result = subprocess.run(["osascript", "-e", size_script], check=True, capture_output=True, text=True)
-            
-            # 解析大小结果，格式为 {width, height}
-            size = size_result.stdout.strip().replace("{", "").replace("}", "").split(", ")
-            wx_width = int(size[0])
-            wx_height = int(size[1])
-            
-            return {
-                "x": wx_x,
-                "y": wx_y,
-                "width": wx_width,
-                "height": wx_height
-            }
-        except Exception as e:
-            print(f"获取微信窗口位置失败: {e}")
-            # 返回默认值
-            return {
-                "x": 400,
-                "y": 100,
-                "width": 800,
-                "height": 600
-            }
\ No newline at end of file
+    def get_wechat_window_position(force_refresh=False):
+        """获取微信窗口的位置和大小，结果来自共享的窗口几何缓存
+
+        参数:
+            force_refresh: 是否忽略缓存重新查询
+
+        返回:
+            包含x、y、width、height的字典，查询失败时为默认值
+        """
+        return get_geometry_service().get_window_bounds(force_refresh)
\ No newline at end of file
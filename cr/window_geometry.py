@@ -0,0 +1,352 @@
+import sys
+import threading
+import time
+from cr.automation_worker import get_automation_client
+
+# 查询失败时使用的默认窗口位置和大小
+DEFAULT_WINDOW_BOUNDS = {"x": 400, "y": 100, "width": 800, "height": 600}
+# 查询失败时使用的默认屏幕分辨率
+DEFAULT_SCREEN_SIZE = (1920, 1080)
+# 窗口位置缓存的默认最长有效时间（秒），与旧实现的缓存时间一致
+DEFAULT_MAX_AGE = 5.0
+# 旧实现每次获取窗口位置需要启动的osascript进程数（激活、位置、大小）
+LEGACY_WINDOW_SUBPROCESSES = 3
+# 旧实现每次获取窗口位置附带的等待时间（秒）
+LEGACY_WINDOW_SLEEP = 0.1
+
+
+class GeometryBackend:
+    """窗口几何查询后端基类，子类实现窗口位置和屏幕尺寸的实际查询"""
+
+    name = "base"
+
+    def __init__(self):
+        # 实际启动的子进程数，以及通过常驻自动化进程完成、不启动子进程的查询数
+        self.subprocess_count = 0
+        self.worker_roundtrips = 0
+
+    def query_window_bounds(self, process_name):
+        """查询窗口位置和大小，返回包含x、y、width、height的字典"""
+        raise NotImplementedError
+
+    def query_screen_size(self):
+        """查询屏幕尺寸，返回 (宽, 高)"""
+        raise NotImplementedError
+
+
+class AppleScriptGeometryBackend(GeometryBackend):
+    """通过常驻自动化进程执行AppleScript查询窗口几何信息，位置和大小合并为一次调用"""
+
+    name = "applescript"
+
+    def __init__(self, automation=None):
+        super().__init__()
+        self.automation = automation
+
+    def _run(self, script):
+        automation = self.automation or get_automation_client()
+        # 常驻自动化进程只是一次管道往返；客户端禁用时每条命令在当前进程中启动一个osascript
+        if automation.enabled:
+            self.worker_roundtrips += 1
+        else:
+            self.subprocess_count += 1
+        return automation.run_osascript(script, check=True).stdout.strip()
+
+    @staticmethod
+    def _parse_numbers(output):
+        """解析AppleScript返回的数字列表，格式如 {1, 2, 3, 4} 或 1, 2, 3, 4"""
+        return [int(value) for value in output.replace("{", "").replace("}", "").split(",")]
+
+    def query_window_bounds(self, process_name):
+        script = f'''tell application "System Events"
+    tell process "{process_name}"
+        set window_position to position of window 1
+        set window_size to size of window 1
+    end tell
+end tell
+return (window_position & window_size)'''
+        x, y, width, height = self._parse_numbers(self._run(script))
+        return {"x": x, "y": y, "width": width, "height": height}
+
+    def query_screen_size(self):
+        script = '''tell application "Finder"
+    set screen_resolution to bounds of window of desktop
+    return screen_resolution
+end tell'''
+        # 结果格式为 {0, 0, width, height}
+        bounds = self._parse_numbers(self._run(script))
+        return bounds[2], bounds[3]
+
+
+class StaticGeometryBackend(GeometryBackend):
+    """返回固定几何信息的后端，用于非macOS平台和测试
+
+    可以通过修改window_bounds、screen_size模拟窗口移动，latency模拟每次查询的耗时。
+    """
+
+    name = "static"
+
+    def __init__(self, window_bounds=None, screen_size=None, latency=0.0):
+        super().__init__()
+        self.window_bounds = dict(window_bounds or DEFAULT_WINDOW_BOUNDS)
+        self.screen_size = tuple(screen_size or DEFAULT_SCREEN_SIZE)
+        self.latency = latency
+
+    def _simulate_query(self):
+        self.subprocess_count += 1
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+    def query_window_bounds(self, process_name):
+        self._simulate_query()
+        return dict(self.window_bounds)
+
+    def query_screen_size(self):
+        self._simulate_query()
+        return self.screen_size
+
+
+# 后端名称到类的映射
+GEOMETRY_BACKENDS = {
+    "applescript": AppleScriptGeometryBackend,
+    "static": StaticGeometryBackend
+}
+
+
+def create_geometry_backend(name="auto", **options):
+    """根据名称创建窗口几何查询后端
+
+    参数:
+        name: 后端名称（applescript、static），auto表示macOS使用applescript，其他平台使用static
+        **options: 传给后端构造函数的参数
+
+    返回:
+        backend: GeometryBackend实例
+    """
+    if name == "auto":
+        name = "applescript" if sys.platform == "darwin" else "static"
+    if name not in GEOMETRY_BACKENDS:
+        raise ValueError(f"未知的窗口几何后端: {name}，可选: {list(GEOMETRY_BACKENDS.keys())}")
+    return GEOMETRY_BACKENDS[name](**options)
+
+
+class WindowGeometryService:
+    """共享的窗口几何服务：缓存微信窗口位置和屏幕尺寸，供截图和点击模块共用
+
+    缓存超过max_age秒、显式失效（invalidate）或调用方报告校验失败（report_sanity_failure）时刷新；
+    调用方已经拿到窗口位置时（例如激活微信的同一次AppleScript调用）用update_window_bounds更新，位置不变时缓存继续使用。
+    查询失败时返回默认值，并在retry_interval秒后重试。
+    """
+
+    def __init__(self, backend=None, process_name="WeChat", max_age=DEFAULT_MAX_AGE, retry_interval=5.0):
+        """初始化窗口几何服务
+
+        参数:
+            backend: GeometryBackend实例，默认根据平台自动选择
+            process_name: 微信进程名称
+            max_age: 缓存最长有效时间（秒），None表示只在显式失效时刷新
+            retry_interval: 查询失败后使用默认值的时间（秒），之后再次尝试查询
+        """
+        self.backend = backend or create_geometry_backend()
+        self.process_name = process_name
+        self.max_age = max_age
+        self.retry_interval = retry_interval
+        self._lock = threading.Lock()
+        # 缓存项格式为 (查询时间, 值, 是否为失败后的默认值)
+        self._window_entry = None
+        self._screen_entry = None
+        # 统计信息
+        self.window_queries = 0
+        self.window_hits = 0
+        self.screen_queries = 0
+        self.screen_hits = 0
+        self.query_failures = 0
+        self.invalidations = 0
+        self.sanity_failures = 0
+        self.window_query_time = 0.0
+        self.screen_query_time = 0.0
+
+    def _is_fresh(self, entry):
+        """判断缓存项是否仍然有效"""
+        if entry is None:
+            return False
+        cached_time, _, is_fallback = entry
+        age = time.time() - cached_time
+        if is_fallback:
+            return age < self.retry_interval
+        return self.max_age is None or age < self.max_age
+
+    def _query_window_bounds(self):
+        start_time = time.time()
+        try:
+            bounds = self.backend.query_window_bounds(self.process_name)
+            if bounds["width"] <= 0 or bounds["height"] <= 0:
+                raise ValueError(f"窗口尺寸异常: {bounds}")
+            is_fallback = False
+        except Exception as e:
+            print(f"获取微信窗口位置失败: {e}")
+            self.query_failures += 1
+            bounds = dict(DEFAULT_WINDOW_BOUNDS)
+            is_fallback = True
+        self.window_queries += 1
+        self.window_query_time += time.time() - start_time
+        self._window_entry = (time.time(), bounds, is_fallback)
+
+    def _query_screen_size(self):
+        start_time = time.time()
+        try:
+            screen_size = tuple(self.backend.query_screen_size())
+            is_fallback = False
+        except Exception as e:
+            print(f"获取屏幕大小失败: {e}")
+            self.query_failures += 1
+            screen_size = DEFAULT_SCREEN_SIZE
+            is_fallback = True
+        self.screen_queries += 1
+        self.screen_query_time += time.time() - start_time
+        self._screen_entry = (time.time(), screen_size, is_fallback)
+
+    def get_window_bounds(self, force_refresh=False):
+        """获取微信窗口的位置和大小
+
+        参数:
+            force_refresh: 是否忽略缓存重新查询
+
+        返回:
+            bounds: 包含x、y、width、height的字典
+        """
+        with self._lock:
+            if not force_refresh and self._is_fresh(self._window_entry):
+                self.window_hits += 1
+            else:
+                self._query_window_bounds()
+            return dict(self._window_entry[1])
+
+    def get_screen_size(self, force_refresh=False):
+        """获取屏幕尺寸 (宽, 高)"""
+        with self._lock:
+            if not force_refresh and self._is_fresh(self._screen_entry):
+                self.screen_hits += 1
+            else:
+                self._query_screen_size()
+            return self._screen_entry[1]
+
+    def get_region(self, relative_region=None, force_refresh=False):
+        """根据微信窗口位置计算小程序的绝对区域
+
+        参数:
+            relative_region: 小程序相对于微信窗口左上角的区域 (相对x, 相对y, 宽, 高)，
+                只使用偏移量，宽高取微信窗口扣除偏移后的剩余部分；None表示整个窗口
+            force_refresh: 是否忽略缓存重新查询
+
+        返回:
+            region: (x, y, width, height)
+        """
+        bounds = self.get_window_bounds(force_refresh)
+        rel_x, rel_y = (relative_region[0], relative_region[1]) if relative_region else (0, 0)
+        return (bounds["x"] + rel_x, bounds["y"] + rel_y, bounds["width"] - rel_x, bounds["height"] - rel_y)
+
+    def is_position_on_screen(self, x, y):
+        """判断坐标是否在屏幕范围内"""
+        screen_width, screen_height = self.get_screen_size()
+        return 0 <= x < screen_width and 0 <= y < screen_height
+
+    def invalidate(self, reason=None, screen=False):
+        """使窗口位置缓存失效，例如窗口被移动或重新激活后
+
+        参数:
+            reason: 失效原因，仅用于日志
+            screen: 是否同时使屏幕尺寸缓存失效
+        """
+        with self._lock:
+            self._window_entry = None
+            if screen:
+                self._screen_entry = None
+            self.invalidations += 1
+        if reason:
+            print(f"窗口几何缓存已失效: {reason}")
+
+    def update_window_bounds(self, bounds, reason=None):
+        """用调用方已经拿到的窗口位置更新缓存，不再单独查询
+
+        参数:
+            bounds: 包含x、y、width、height的字典
+            reason: 位置变化时日志中显示的原因
+
+        返回:
+            changed: 窗口位置是否与缓存不同（变化时计为一次失效）
+        """
+        bounds = {key: int(bounds[key]) for key in ("x", "y", "width", "height")}
+        if bounds["width"] <= 0 or bounds["height"] <= 0:
+            self.invalidate(f"{reason}: 窗口尺寸异常 {bounds}" if reason else None)
+            return True
+        with self._lock:
+            changed = self._window_entry is not None and (self._window_entry[2] or self._window_entry[1] != bounds)
+            if changed:
+                self.invalidations += 1
+            self._window_entry = (time.time(), bounds, False)
+        if changed and reason:
+            print(f"窗口位置已变化: {reason} -> {bounds}")
+        return changed
+
+    def report_sanity_failure(self, reason=None):
+        """调用方发现缓存的几何信息与实际不符（截图尺寸异常、点击位置越界等）时调用，下次查询会重新获取"""
+        self.sanity_failures += 1
+        self.invalidate(reason, screen=True)
+
+    def stats(self):
+        """返回查询统计信息，包括相对旧实现估算节省的子进程数和耗时"""
+        with self._lock:
+            avg_window = self.window_query_time / self.window_queries if self.window_queries else 0.0
+            avg_screen = self.screen_query_time / self.screen_queries if self.screen_queries else 0.0
+            window_requests = self.window_queries + self.window_hits
+            # 旧实现每次获取窗口位置启动3个进程并等待，屏幕尺寸每次检查点击位置都重新查询；
+            # 减去实际启动的子进程数（通过常驻自动化进程的查询不启动子进程）
+            legacy_subprocesses = (window_requests * LEGACY_WINDOW_SUBPROCESSES
+                                   + self.screen_queries + self.screen_hits)
+            subprocesses_saved = legacy_subprocesses - self.backend.subprocess_count
+            latency_saved = (self.window_hits * avg_window + self.screen_hits * avg_screen
+                             + window_requests * LEGACY_WINDOW_SLEEP)
+            return {
+                "backend": self.backend.name,
+                "subprocess_count": self.backend.subprocess_count,
+                "worker_roundtrips": self.backend.worker_roundtrips,
+                "window_queries": self.window_queries,
+                "window_hits": self.window_hits,
+                "screen_queries": self.screen_queries,
+                "screen_hits": self.screen_hits,
+                "query_failures": self.query_failures,
+                "invalidations": self.invalidations,
+                "sanity_failures": self.sanity_failures,
+                "avg_window_query_time": avg_window,
+                "avg_screen_query_time": avg_screen,
+                "subprocesses_saved": subprocesses_saved,
+                "latency_saved": latency_saved
+            }
+
+
+_shared_service = None
+_shared_service_lock = threading.Lock()
+
+
+def get_geometry_service():
+    """获取进程内共享的窗口几何服务，首次调用时根据配置创建"""
+    global _shared_service
+    with _shared_service_lock:
+        if _shared_service is None:
+            from config.config import SCREENSHOT_CONFIG
+            backend = create_geometry_backend(SCREENSHOT_CONFIG.get("geometry_backend", "auto"))
+            _shared_service = WindowGeometryService(
+                backend=backend,
+                process_name=SCREENSHOT_CONFIG.get("wechat_process_name", "WeChat"),
+                max_age=SCREENSHOT_CONFIG.get("geometry_max_age", DEFAULT_MAX_AGE),
+                retry_interval=SCREENSHOT_CONFIG.get("geometry_retry_interval", 5.0)
+            )
+        return _shared_service
+
+
+def set_geometry_service(service):
+    """替换共享的窗口几何服务，传入None时下次使用会按配置重新创建"""
+    global _shared_service
+    with _shared_service_lock:
+        _shared_service = service
@@ -3,6 +3,7 @@ import cv2
 import numpy as np
 from PIL import Image
 import os
+from cr.roi import get_roi_registry
 
 class YoloDetector:
     """YOLO检测器，用于检测皇室战争游戏画面中的元素和下兵位置"""
@@ -28,35 +29,69 @@ class YoloDetector:
             'princess_tower': 7# 公主塔
         }
         
-        # 游戏区域参数（根据实际游戏画面调整）
-        self.game_area = {
-            'x1': 0,    # 游戏区域左上角x坐标
-            'y1': 0,    # 游戏区域左上角y坐标
-            'x2': 1000, # 游戏区域右下角x坐标
-            'y2': 600   # 游戏区域右下角y坐标
-        }
+        # 游戏区域由ROI注册表统一定义（相对坐标），按截图尺寸换算
+        self.roi_registry = get_roi_registry()
+    
+    def get_game_area(self, image_shape):
+        """获取游戏区域的像素坐标
+        
+        参数:
+            image_shape: 图片形状 (高度, 宽度, 通道数)
+            
+        返回:
+            game_area: 包含x1、y1、x2、y2的字典
+        """
+        height, width = image_shape[:2]
+        x1, y1, x2, y2 = self.roi_registry.box("game_area", (width, height))
+        return {'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2}
+    
+    def load_bgr_image(self, image):
+        """加载OpenCV使用的BGR图像
+        
+        参数:
+            image: 截图路径、RGB numpy数组或Frame对象
+            
+        返回:
+            image_bgr: BGR格式的numpy数组，加载失败返回None
+        """
+        # 内存中的帧直接转换颜色通道，不经过磁盘
+        if hasattr(image, "image") and isinstance(image.image, np.ndarray):
+            image = image.image
+        if isinstance(image, np.ndarray):
+            if image.ndim == 2:
+                return cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+            return cv2.cvtColor(np.ascontiguousarray(image[:, :, :3]), cv2.COLOR_RGB2BGR)
+        
+        if not os.path.exists(image):
+            print(f"✗ 图片不存在: {image}")
+            return None
+        
+        image_bgr = cv2.imread(image)
+        if image_bgr is None:
+            print(f"✗ 无法加载图片: {image}")
+        return image_bgr
     
     def detect_game_elements(self, image_path):
         """检测游戏画面中的元素
         
         参数:
-            image_path: 游戏截图路径
+            image_path: 游戏截图路径、RGB numpy数组或Frame对象
             
         返回:
             results: 检测结果，包含各类元素的位置和置信度
         """
-        if not os.path.exists(image_path):
-            print(f"✗ 图片不存在: {image_path}")
-            return None
-        
         # 加载图片
-        image = cv2.imread(image_path)
+        image = self.load_bgr_image(image_path)
         if image is None:
-            print(f"✗ 无法加载图片: {image_path}")
             return None
         
+        # 只检测对战场地区域（不含底部卡牌栏），检测框再换算回整帧坐标
+        game_area = self.get_game_area(image.shape)
+        offset_x, offset_y = game_area['x1'], game_area['y1']
+        field = image[game_area['y1']:game_area['y2'], game_area['x1']:game_area['x2']]
+        
         # 使用YOLO模型进行检测
-        results = self.model(image)
+        results = self.model(np.ascontiguousarray(field))
         
         # 处理检测结果
         detected_elements = {
@@ -79,8 +114,10 @@ class YoloDetector:
                 if confidence < 0.5:
                     continue
                 
-                # 获取边界框坐标
+                # 获取边界框坐标（整帧坐标）
                 x1, y1, x2, y2 = map(int, box.xyxy[0])
+                x1, x2 = x1 + offset_x, x2 + offset_x
+                y1, y2 = y1 + offset_y, y2 + offset_y
                 
                 # 计算中心点坐标
                 center_x = (x1 + x2) // 2
@@ -240,21 +277,16 @@ class YoloDetector:
         """可视化检测结果
         
         参数:
-            image_path: 原始图片路径
+            image_path: 原始图片路径、RGB numpy数组或Frame对象
             detected_elements: 检测到的游戏元素
             deploy_position: 建议的下兵位置
             
         返回:
             visualized_image: 可视化后的图片
         """
-        if not os.path.exists(image_path):
-            print(f"✗ 图片不存在: {image_path}")
-            return None
-        
-        # 加载图片
-        image = cv2.imread(image_path)
+        # 加载图片（数组输入会复制一份，绘制时不修改原始帧）
+        image = self.load_bgr_image(image_path)
         if image is None:
-            print(f"✗ 无法加载图片: {image_path}")
             return None
         
         # 绘制检测到的元素
@@ -318,8 +350,9 @@ class YoloDetector:
         """检测游戏画面并可视化结果
         
         参数:
-            image_path: 游戏截图路径
-            output_path: 可视化结果输出路径，默认在原路径后添加_detection
+            image_path: 游戏截图路径、RGB numpy数组或Frame对象
+            output_path: 可视化结果输出路径，默认在原路径后添加_detection；
+                         传入内存中的帧且未指定输出路径时不保存
             
         返回:
             best_position: 最佳下兵位置
@@ -330,7 +363,7 @@ class YoloDetector:
             return None
         
         # 获取图片形状
-        image = cv2.imread(image_path)
+        image = self.load_bgr_image(image_path)
         image_shape = image.shape
         
         # 计算最佳下兵位置
@@ -340,8 +373,9 @@ class YoloDetector:
         visualized_image = self.visualize_detection(image_path, detected_elements, best_position)
         
         # 保存可视化结果
-        if not output_path:
+        if not output_path and isinstance(image_path, str):
             output_path = image_path.replace('.png', '_detection.png')
-        self.save_visualization(visualized_image, output_path)
+        if output_path:
+            self.save_visualization(visualized_image, output_path)
         
         return best_position
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+从已标注的实际游戏截图中找出最能区分各状态的区域和像素探针
+
+用法:
+    python discover_pixels.py [截图目录] [结果文件] [--grid 宽x高] [--regions N] [--probes N] [--save-probes]
+    截图目录默认为 png/实际游戏截图（子目录名即为状态），结果文件默认为 discovered_pixels.json
+
+截图缩小到分析网格后，逐单元计算每个状态与其余帧的Fisher判别比（类间差异/类内方差），
+把得分最高的单元合并成区域、选出互相分散的像素探针，并报告探针在本状态和其他帧上的命中率，
+以及留一法下探针能直接给出结果的帧比例和准确率。
+区域可直接填入 STATUS_RECOGNITION_CONFIG["page_rois"]["regions"]，填入后需重新校准阈值；
+--save-probes 把探针写入 STATUS_RECOGNITION_CONFIG["probes"]["probes_path"]，供StatusRecognizer运行时使用。
+"""
+
+import sys
+import json
+from cr.pixel_discovery import DEFAULT_GRID_SIZE, discover
+from cr.pixel_probes import ProbeSet
+from config.config import STATUS_RECOGNITION_CONFIG
+
+DEFAULT_OUTPUT = "discovered_pixels.json"
+
+
+def print_result(result):
+    """打印每个状态排好序的区域和探针"""
+    print(f"分析 {result['frames']} 张截图，网格 {result['grid_size'][0]}x{result['grid_size'][1]}")
+    for state, regions in result["regions"].items():
+        separation = result["separation"][state]
+        print(f"\n{state}: 区域占整帧 {result['coverage'][state]:.1%}，"
+              f"探针命中率 本状态 {separation['own_hit_rate']:.0%} / 其他帧 {separation['other_hit_rate']:.0%}")
+        for region in regions:
+            print(f"  区域 {region['box']}  得分 {region['score']:.1f}  单元 {region['cells']}")
+        for probe in result["probes"][state]:
+            print(f"  探针 ({probe['x']:.3f}, {probe['y']:.3f})  RGB {probe['rgb']} ±{probe['tolerance']}"
+                  f"  得分 {probe['score']:.1f}")
+    print("\n所有状态共同的区分区域:")
+    for region in result["shared_regions"]:
+        print(f"  区域 {region['box']}  得分 {region['score']:.1f}  单元 {region['cells']}")
+    evaluation = result["leave_one_out"]
+    print(f"\n留一法: 探针直接给出结果 {evaluation['decided']}/{evaluation['frames']} 帧"
+          f"（{evaluation['decision_rate']:.1%}），其中正确 {evaluation['accuracy']:.1%}")
+
+
+def discover_pixels(screenshot_dir="png/实际游戏截图", output_path=DEFAULT_OUTPUT, grid_size=DEFAULT_GRID_SIZE,
+                    regions=3, probes=8, save_probes=False):
+    """分析截图并保存结果，同时打印可填入配置的page_rois区域；save_probes为True时保存运行时探针文件"""
+    result = discover(screenshot_dir, grid_size=grid_size, regions=regions, probes=probes)
+    if not result["regions"]:
+        print(f"✗ 目录中没有可分析的状态: {screenshot_dir}")
+        return None
+    print_result(result)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"\n✓ 结果已保存: {output_path}")
+
+    print("\npage_rois区域:")
+    for state, state_regions in result["regions"].items():
+        boxes = ", ".join(str(tuple(region["box"])) for region in state_regions)
+        print(f'    "{state}": [{boxes}],')
+
+    if save_probes:
+        probes_path = STATUS_RECOGNITION_CONFIG.get("probes", {}).get("probes_path", "png/status_probes.json")
+        ProbeSet(result["probes"], result["grid_size"]).save(probes_path)
+        print(f"\n✓ 探针已保存: {probes_path}")
+    return result
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    options = {"save_probes": "--save-probes" in args}
+    positional = []
+    i = 0
+    while i < len(args):
+        if args[i] == "--grid":
+            options["grid_size"] = tuple(int(value) for value in args[i + 1].split("x"))
+            i += 1
+        elif args[i] == "--regions":
+            options["regions"] = int(args[i + 1])
+            i += 1
+        elif args[i] == "--probes":
+            options["probes"] = int(args[i + 1])
+            i += 1
+        elif not args[i].startswith("--"):
+            positional.append(args[i])
+        i += 1
+    if positional:
+        options["screenshot_dir"] = positional[0]
+    if len(positional) > 1:
+        options["output_path"] = positional[1]
+    discover_pixels(**options)
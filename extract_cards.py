@@ -8,6 +8,8 @@ import os
 import sys
 from PIL import Image
 import shutil
+from cr.roi import get_roi_registry
+from cr.utils import ImageUtils
 
 
 def extract_cards_from_screenshot(screenshot_path, output_dir):
@@ -20,37 +22,30 @@ def extract_cards_from_screenshot(screenshot_path, output_dir):
     print(f"\n=== 处理截图: {os.path.basename(screenshot_path)} ===")
     
     # 打开图片
-    img = Image.open(screenshot_path)
-    width, height = img.size
+    img_np = ImageUtils.load_image_array(screenshot_path)
+    height, width = img_np.shape[:2]
     
-    # 定义卡牌区域（基于分析结果）
-    card_area_height = int(height * 0.15)  # 底部15%为卡牌区域
-    card_area_top = height - card_area_height
-    card_area_bottom = height
+    # 卡牌区域（底部15%）由ROI注册表统一定义，取到的是原图的视图，不复制像素
+    card_strip = get_roi_registry().view(img_np, "card_strip")
+    strip_height, strip_width = card_strip.shape[:2]
     
     # 底部卡牌数量和间距（皇室战争通常有4-5张卡牌）
     card_count = 4
-    card_width = int(width / card_count)
+    card_width = int(strip_width / card_count)
     card_padding = 10  # 卡牌之间的间距
     
     extracted_cards = []
     
     # 裁剪每张卡牌
     for i in range(card_count):
-        # 计算卡牌坐标，添加适当间距
-        card_x1 = i * card_width + card_padding
-        card_x2 = (i + 1) * card_width - card_padding
-        card_y1 = card_area_top + card_padding
-        card_y2 = card_area_bottom - card_padding
-        
-        # 确保坐标在有效范围内
-        card_x1 = max(0, card_x1)
-        card_x2 = min(width, card_x2)
-        card_y1 = max(0, card_y1)
-        card_y2 = min(height, card_y2)
+        # 计算卡牌在卡牌区域内的坐标，添加适当间距
+        card_x1 = max(0, i * card_width + card_padding)
+        card_x2 = min(strip_width, (i + 1) * card_width - card_padding)
+        card_y1 = max(0, card_padding)
+        card_y2 = min(strip_height, strip_height - card_padding)
         
         # 裁剪卡牌
-        card_img = img.crop((card_x1, card_y1, card_x2, card_y2))
+        card_img = Image.fromarray(card_strip[card_y1:card_y2, card_x1:card_x2])
         
         # 保存卡牌图片
         card_filename = f"card_{i+1}_{os.path.basename(screenshot_path)}"
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+回放录制的会话：把录制的帧送回自动化流程，点击只记录不执行
+
+用法:
+    python replay_session.py <会话目录> [速度]
+    速度: 1为原速（默认），N为N倍速，max为最快速度
+"""
+
+import sys
+import json
+from cr import CRGameAutomation
+from cr.session import SessionReplayer
+
+
+def replay_session(session_dir, speed=1.0):
+    """回放会话并输出报告"""
+    automation = CRGameAutomation(use_yolo=False)
+    try:
+        report = SessionReplayer(session_dir, automation, speed=speed).run()
+    finally:
+        automation.close()
+    
+    print("\n===== 会话回放报告 =====")
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return report
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("用法: python replay_session.py <会话目录> [速度|max]")
+        sys.exit(1)
+    
+    speed_arg = sys.argv[2] if len(sys.argv) > 2 else "1"
+    replay_session(sys.argv[1], None if speed_arg == "max" else float(speed_arg))
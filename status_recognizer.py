@@ -1,7 +1,11 @@
 from PIL import Image
 import numpy as np
 import os
+import time
 import cv2
+from cr.template_bank import TemplateBank
+from cr.template_store import get_template_store
+from cr.utils import ImageUtils
 
 class ScreenStatusRecognizer:
     """屏幕状态识别器，用于判断当前截图属于什么状态，并执行相应行为"""
@@ -35,12 +39,21 @@ class ScreenStatusRecognizer:
             }
         }
         
+        # 预处理后的模板仓库（启动时内存映射快照）
+        self.template_store = get_template_store()
+        # 整页模板堆叠成一个矩阵，一次矩阵乘法算出与所有整页模板的相似度
+        self.template_bank = TemplateBank(self.template_store.canonical_size)
+        
+        # 最近一次识别各阶段的耗时（秒）：decode、preprocess、page_match、button_scan（局部模板匹配）
+        self.last_timings = {}
+        
         # 加载所有状态模板
         self.load_templates()
     
     def load_templates(self):
-        """加载所有状态模板图片"""
+        """从模板仓库加载所有状态模板，模板已预处理，启动时不再解码PNG"""
         print("加载状态模板...")
+        store = self.template_store
         for status, config in self.status_templates.items():
             try:
                 template_folder = config["template_path"]
@@ -52,55 +65,36 @@ class ScreenStatusRecognizer:
                     print(f"✓ 跳过加载状态模板: {status} -> 无模板路径")
                     continue
                 
-                # 遍历文件夹下的所有文件
-                for filename in os.listdir(template_folder):
-                    # 只处理图片文件
-                    if filename.endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp')):
-                        file_path = os.path.join(template_folder, filename)
-                        template_img = Image.open(file_path)
-                        # 转换为RGB模式，确保一致性
-                        template_img = template_img.convert("RGB")
-                        template_imgs.append(template_img)
-                        print(f"  ✓ 成功加载模板: {status} -> {file_path}")
+                page_count = 0
+                for file_path in store.entries(template_folder):
+                    if self.template_bank.fits(store.size(file_path)):
+                        # 整页截图放入模板库，直接使用仓库中的标准向量
+                        self.template_bank.add_vector(status, store.vector(file_path), file_path)
+                        page_count += 1
+                    else:
+                        # 按钮等局部截图仍然用滑动模板匹配，保存模糊后的灰度数组和掩码
+                        template_imgs.append((store.blurred(file_path), store.mask(file_path)))
+                    print(f"  ✓ 成功加载模板: {status} -> {file_path}")
                 
                 self.status_templates[status]["template_imgs"] = template_imgs
-                print(f"✓ 完成加载状态模板: {status} -> 共 {len(template_imgs)} 个模板")
+                print(f"✓ 完成加载状态模板: {status} -> 整页模板 {page_count} 个，局部模板 {len(template_imgs)} 个")
             except Exception as e:
                 print(f"✗ 加载模板失败: {status} -> {config['template_path']}")
                 print(f"  错误信息: {e}")
     
-    def compare_images(self, img1, img2):
-        """比较两张图片的相似度，返回0-1之间的值，1表示完全相同
-        
-        使用OpenCV模板匹配算法，添加图像预处理，提高匹配效率和准确率
-        """
-        # 将PIL图像转换为numpy数组
-        img1_np = np.array(img1)
-        img2_np = np.array(img2)
-        
-        # 确定哪个是大图，哪个是小图（模板）
-        if img1_np.size > img2_np.size:
-            # img1是大图，img2是模板
-            large_img = img1_np
-            template = img2_np
-        else:
-            # img2是大图，img1是模板
-            large_img = img2_np
-            template = img1_np
+    def compare_images(self, screenshot_blurred, template_blurred, mask=None):
+        """比较截图和模板的相似度，返回0-1之间的值，1表示完全相同
         
-        # 转换为BGR格式（OpenCV默认格式）
-        if large_img.shape[2] == 4:  # RGBA
-            large_img = large_img[:, :, :3]
-        if template.shape[2] == 4:  # RGBA
-            template = template[:, :, :3]
+        使用OpenCV模板匹配算法。两者都应是已经灰度化并高斯模糊的数组：
+        模板由模板仓库预处理，截图在recognize_status中只处理一次。
         
-        # 转换为灰度图像
-        large_gray = cv2.cvtColor(large_img, cv2.COLOR_RGB2GRAY)
-        template_gray = cv2.cvtColor(template, cv2.COLOR_RGB2GRAY)
-        
-        # 添加高斯模糊，减少噪声影响
-        large_gray = cv2.GaussianBlur(large_gray, (3, 3), 0)
-        template_gray = cv2.GaussianBlur(template_gray, (3, 3), 0)
+        参数:
+            screenshot_blurred: 截图的模糊灰度数组
+            template_blurred: 模板的模糊灰度数组
+            mask: 模板的掩码（1为有效像素），None表示使用所有像素
+        """
+        large_gray = screenshot_blurred
+        template_gray = template_blurred
         
         # 获取图片尺寸
         large_h, large_w = large_gray.shape
@@ -117,16 +111,12 @@ class ScreenStatusRecognizer:
                 return 0.0
             
             # 调整模板大小
-            resized_template = cv2.resize(template_gray, (new_template_w, new_template_h))
-            
-            # 计算相似度
-            res = cv2.matchTemplate(large_gray, resized_template, cv2.TM_CCOEFF_NORMED)
-            _, max_val, _, _ = cv2.minMaxLoc(res)
-            
-            return max_val
+            template_gray = cv2.resize(template_gray, (new_template_w, new_template_h))
+            if mask is not None:
+                mask = cv2.resize(mask, (new_template_w, new_template_h), interpolation=cv2.INTER_NEAREST)
         
-        # 使用OpenCV模板匹配算法（归一化相关系数）
-        res = cv2.matchTemplate(large_gray, template_gray, cv2.TM_CCOEFF_NORMED)
+        # 使用OpenCV模板匹配算法（归一化相关系数），有掩码时只比较有效像素
+        res = cv2.matchTemplate(large_gray, template_gray, cv2.TM_CCOEFF_NORMED, mask=mask)
         
         # 获取最大匹配值
         _, max_val, _, _ = cv2.minMaxLoc(res)
@@ -137,18 +127,32 @@ class ScreenStatusRecognizer:
     def recognize_status(self, screenshot_path):
         """识别当前截图的状态"""
         try:
-            # 打开并预处理截图
+            # 打开截图，灰度化和高斯模糊只做一次，所有局部模板共用
+            start_time = time.perf_counter()
             screenshot = Image.open(screenshot_path)
             screenshot = screenshot.convert("RGB")
+            screenshot_np = np.asarray(screenshot)
+            decoded_time = time.perf_counter()
+            kernel = (self.template_store.blur_kernel, self.template_store.blur_kernel)
+            screenshot_blurred = cv2.GaussianBlur(ImageUtils.load_gray_array(screenshot_np), kernel, 0)
+            preprocessed_time = time.perf_counter()
+            self.last_timings = {
+                "decode": decoded_time - start_time,
+                "preprocess": preprocessed_time - decoded_time
+            }
             
             best_status = None
             best_similarity = 0
-            status_scores = {}
             
             # 获取所有状态（包括其他状态）
             all_statuses = ["战斗中", "战斗结束", "战斗未开始", "开宝箱", "其他"]
             
-            # 与所有状态模板进行比较，计算每个状态的最高相似度
+            # 一次矩阵乘法算出与所有整页模板的相似度，按状态取最大值
+            status_scores = self.template_bank.label_scores(self.template_bank.score(screenshot_np))
+            page_time = time.perf_counter()
+            self.last_timings["page_match"] = page_time - preprocessed_time
+            
+            # 与局部模板进行比较，更新每个状态的最高相似度
             for status in all_statuses:
                 if status not in self.status_templates:
                     continue
@@ -157,13 +161,13 @@ class ScreenStatusRecognizer:
                 if "template_imgs" not in config:
                     continue
                 
-                # 获取该状态下的所有模板
+                # 获取该状态下的局部模板
                 template_imgs = config["template_imgs"]
-                status_max_similarity = 0
+                status_max_similarity = status_scores.get(status, 0)
                 
-                # 遍历该状态下的所有模板
-                for template in template_imgs:
-                    similarity = self.compare_images(screenshot, template)
+                # 遍历该状态下的局部模板
+                for template_blurred, mask in template_imgs:
+                    similarity = self.compare_images(screenshot_blurred, template_blurred, mask)
                     
                     # 更新该状态下的最高相似度
                     if similarity > status_max_similarity:
@@ -175,6 +179,7 @@ class ScreenStatusRecognizer:
                 
                 # 记录该状态的最高相似度
                 status_scores[status] = status_max_similarity
+            self.last_timings["button_scan"] = time.perf_counter() - page_time
             
             # 检查每个状态的相似度是否超过其阈值
             for status in all_statuses:
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模拟的自动化工作进程：协议与cr/automation_worker.py相同，但不执行真实的AppleScript和点击，
+用于在Linux上测试客户端的通信、重启和耗时统计
+
+用法: python fake_automation_worker.py [每条命令的模拟耗时（秒）]
+"""
+
+import sys
+import os
+# 与真实工作进程一样只加载cr/automation_worker.py本身，不导入cr包（避免加载YOLO等依赖拖慢启动）
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cr"))
+
+import time
+from automation_worker import serve
+
+
+def create_fake_handlers(latency=0.0):
+    """创建模拟的命令处理函数，AppleScript第二次执行时标记为已缓存"""
+    compiled = set()
+    clicks = []
+
+    def osascript(request):
+        time.sleep(latency)
+        script = request["script"]
+        cached = script in compiled
+        compiled.add(script)
+        if "error" in script:
+            return {"returncode": 1, "stdout": "", "stderr": "execution error", "cached": cached}
+        return {"returncode": 0, "stdout": f"{len(script)}\n", "stderr": "", "cached": cached}
+
+    def cliclick(request):
+        time.sleep(latency)
+        clicks.extend(request["args"])
+        return {"returncode": 0, "stdout": "", "stderr": "", "clicks": len(clicks)}
+
+    return {
+        "ping": lambda request: {"pid": os.getpid()},
+        "osascript": osascript,
+        "cliclick": cliclick,
+        # 模拟工作进程在执行命令时崩溃
+        "crash": lambda request: os._exit(3),
+        "sleep": lambda request: time.sleep(request["seconds"]) or {}
+    }
+
+
+if __name__ == "__main__":
+    serve(create_fake_handlers(float(sys.argv[1]) if len(sys.argv) > 1 else 0.0))
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试常驻自动化进程客户端：JSON行协议、异常重启和耗时统计（使用模拟工作进程）
+"""
+
+import sys
+import os
+# 将项目根目录添加到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import subprocess
+from cr.automation_worker import AutomationWorkerClient, AutomationWorkerError
+from cr.click_manager import ClickManager
+from cr.window_geometry import WindowGeometryService, StaticGeometryBackend
+from test_utils import print_test_header
+
+FAKE_WORKER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_automation_worker.py")
+
+
+def make_client(latency=0.0, timeout=5.0):
+    return AutomationWorkerClient(command=[sys.executable, FAKE_WORKER, str(latency)], timeout=timeout)
+
+
+def test_protocol_and_latency_accounting():
+    """多条命令复用同一个工作进程，统计往返耗时和执行耗时"""
+    print_test_header("测试自动化进程协议与耗时统计")
+    client = make_client(latency=0.01)
+    try:
+        pid = client.ping()
+        script = 'tell application "WeChat" to activate'
+        for _ in range(3):
+            result = client.run_osascript(script)
+            assert result.returncode == 0 and result.stdout.strip() == str(len(script))
+        assert client.run_cliclick("c:10,20").returncode == 0
+        assert client.ping() == pid
+
+        failed = client.run_osascript("error script")
+        assert failed.returncode == 1
+        try:
+            client.run_osascript("error script", check=True)
+            assert False, "check=True时应抛出异常"
+        except subprocess.CalledProcessError:
+            pass
+
+        stats = client.stats()
+        print(f"客户端统计: {stats}")
+        assert stats["starts"] == 1 and stats["restarts"] == 0
+        assert stats["requests"] == 8 and stats["spawns_saved"] == 7
+        assert stats["op_counts"] == {"ping": 2, "osascript": 5, "cliclick": 1}
+        assert stats["cached_scripts"] == 3
+        assert stats["avg_exec_time"] >= 0.005
+        assert stats["avg_roundtrip_time"] >= stats["avg_exec_time"]
+    finally:
+        client.close()
+    assert not client.is_running()
+
+
+def test_restart_after_crash():
+    """工作进程崩溃时报错，下一条命令自动重启"""
+    print_test_header("测试自动化进程重启")
+    client = make_client()
+    try:
+        first_pid = client.ping()
+        try:
+            client.request("crash")
+            assert False, "工作进程崩溃时应抛出异常"
+        except AutomationWorkerError as e:
+            print(f"崩溃时的错误: {e}")
+        second_pid = client.ping()
+        assert second_pid != first_pid
+
+        # 空闲时进程被外部结束，发送前检测到并透明重启
+        client._process.kill()
+        client._process.wait()
+        assert client.ping() not in (first_pid, second_pid)
+        stats = client.stats()
+        assert stats["restarts"] == 2 and stats["failures"] == 1
+    finally:
+        client.close()
+
+
+def test_timeout_kills_worker():
+    """命令超时后结束工作进程，之后的命令仍能正常执行"""
+    print_test_header("测试自动化进程超时")
+    client = make_client(timeout=0.3)
+    try:
+        try:
+            client.request("sleep", seconds=2)
+            assert False, "超时时应抛出异常"
+        except AutomationWorkerError:
+            pass
+        assert client.ping()
+    finally:
+        client.close()
+
+
+def test_unknown_command_and_local_mode():
+    """未知命令返回错误；关闭工作进程时在当前进程中执行"""
+    print_test_header("测试未知命令与本地执行")
+    client = AutomationWorkerClient(enabled=False)
+    assert client.ping() == os.getpid()
+    try:
+        client.request("unknown")
+        assert False, "未知命令应抛出异常"
+    except AutomationWorkerError as e:
+        print(f"未知命令错误: {e}")
+    assert client.stats()["starts"] == 0
+
+
+def test_click_manager_uses_worker():
+    """点击管理器通过同一个工作进程激活窗口和点击"""
+    print_test_header("测试点击管理器使用常驻进程")
+    client = make_client()
+    geometry = WindowGeometryService(backend=StaticGeometryBackend({"x": 0, "y": 0, "width": 400, "height": 800}))
+    try:
+        click_manager = ClickManager(geometry=geometry, automation=client)
+        assert click_manager.click(200, 300)
+        assert click_manager.double_click(50, 50)
+        stats = client.stats()
+        print(f"点击统计: {stats}")
+        assert stats["starts"] == 1
+        assert stats["op_counts"] == {"osascript": 2, "cliclick": 2}
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    test_protocol_and_latency_accounting()
+    test_restart_after_crash()
+    test_timeout_kills_worker()
+    test_unknown_command_and_local_mode()
+    test_click_manager_uses_worker()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试多进程流式批量识别：按块识别、按输入顺序或完成顺序产出、逐条写入JSONL/CSV、每个进程的吞吐量统计
+"""
+
+import sys
+import os
+import csv
+import json
+import tempfile
+import contextlib
+import subprocess
+import io
+# 将项目根目录添加到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cr.batch_analysis import BatchAnalyzer, ResultWriter, find_screenshots, RESULT_FIELDS
+from cr.status_recognizer import StatusRecognizer
+from test_utils import print_test_header
+
+SCREENSHOT_DIR = "png/实际游戏截图"
+
+
+def test_single_process_ordered():
+    """单进程模式使用传入的识别器，结果按路径顺序产出，与逐帧识别一致，并逐条写入JSONL和CSV"""
+    print_test_header("测试单进程批量识别")
+    paths = find_screenshots(SCREENSHOT_DIR)[:7]
+    with contextlib.redirect_stdout(io.StringIO()):
+        recognizer = StatusRecognizer()
+        expected = [recognizer.recognize_status(path)[0] for path in paths]
+    analyzer = BatchAnalyzer(processes=1, chunk_size=3, recognizer=recognizer)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        jsonl_path = os.path.join(temp_dir, "results.jsonl")
+        rows = analyzer.analyze(paths, jsonl_path)
+        with open(jsonl_path, encoding="utf-8") as f:
+            written = [json.loads(line) for line in f]
+        csv_path = os.path.join(temp_dir, "out", "results.csv")
+        with ResultWriter(csv_path) as writer:
+            for row in rows:
+                writer.write(row)
+        with open(csv_path, encoding="utf-8", newline="") as f:
+            csv_rows = list(csv.DictReader(f))
+
+    print(f"结果: {[(row['path'], row['status']) for row in rows]}")
+    assert [row["path"] for row in rows] == paths
+    assert [row["status"] for row in rows] == expected
+    assert written == rows and list(csv_rows[0]) == list(RESULT_FIELDS)
+    assert [row["status"] or None for row in csv_rows] == expected
+    stats = analyzer.stats()
+    print(f"吞吐量: {stats}")
+    assert stats["images"] == len(paths) and list(stats["workers"]) == [os.getpid()]
+    assert stats["workers"][os.getpid()]["images_per_sec"] > 0
+    assert stats["workers"][os.getpid()]["startup_seconds"] is None
+
+
+def test_process_pool_unordered():
+    """进程池按完成顺序产出，结果与按顺序产出的集合相同，每个进程的截图数之和等于总数"""
+    print_test_header("测试多进程批量识别")
+    paths = find_screenshots(SCREENSHOT_DIR)[:12]
+    ordered = BatchAnalyzer(processes=2, chunk_size=2).analyze(paths)
+    analyzer = BatchAnalyzer(processes=2, chunk_size=2, ordered=False)
+    unordered = analyzer.analyze(paths)
+    stats = analyzer.stats()
+    print(f"吞吐量: {stats}")
+
+    assert [row["path"] for row in ordered] == paths
+    assert sorted((row["path"], row["status"]) for row in unordered) == \
+        sorted((row["path"], row["status"]) for row in ordered)
+    assert sum(worker["images"] for worker in stats["workers"].values()) == len(paths)
+    assert os.getpid() not in stats["workers"]
+    # 每个工作进程的启动耗时随它的第一块结果返回
+    assert all(worker["startup_seconds"] > 0 for worker in stats["workers"].values())
+
+
+def test_worker_imports():
+    """工作进程导入批量识别模块时不加载自动化流程和YOLO（cr包按需导入）"""
+    print_test_header("测试工作进程导入的模块")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = ("import sys, cr.batch_analysis; "
+            "print(sorted(name for name in ('cr.automation', 'cr.yolo_detector', 'ultralytics') if name in sys.modules))")
+    output = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True).stdout
+    print(f"已加载: {output.strip()}")
+    assert output.strip() == "[]"
+    from cr import StatusRecognizer as exported
+    assert exported is StatusRecognizer
+
+
+def test_result_format():
+    """不支持的扩展名在打开文件前报错"""
+    print_test_header("测试结果文件格式")
+    try:
+        ResultWriter("results.txt")
+        assert False, "不支持的结果格式应抛出异常"
+    except ValueError:
+        pass
+    assert not os.path.exists("results.txt")
+
+
+if __name__ == "__main__":
+    test_single_process_ordered()
+    test_process_pool_unordered()
+    test_worker_imports()
+    test_result_format()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试识别基准：各阶段延迟百分位、各状态准确率、峰值内存，以及与基线的比较
+"""
+
+import sys
+import os
+import copy
+# 将项目根目录添加到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark_recognition import parse_args
+from cr.benchmark import run_path, compare_results
+from test_utils import print_test_header
+
+IMAGES = [
+    ("战斗中", "png/实际游戏截图/战斗中/weapp_auto_20251214_181351.png"),
+    ("其他", "png/实际游戏截图/其他/weapp_auto_20251214_181339.png")
+]
+
+
+def test_run_path():
+    """模板匹配路径记录实际执行的各阶段延迟、各状态准确率和峰值内存"""
+    print_test_header("测试识别路径基准")
+    result = run_path("template_matching", IMAGES, repeat=2)
+    print(f"结果: {result}")
+    assert result["frames"] == 2 and result["accuracy"] == 1.0
+    assert result["per_state"]["战斗中"] == {"frames": 1, "correct": 1, "accuracy": 1.0}
+    latency = result["latency_ms"]
+    assert latency["total"]["frames"] == 4
+    assert {"decode", "preprocess", "button_scan"} <= set(latency)
+    assert "probes" not in latency and "hash" not in latency and "classifier" not in latency
+    assert latency["total"]["p50"] <= latency["total"]["p99"]
+    assert result["peak_memory_mb"] > 0
+
+
+def test_held_out_path():
+    """留一法路径识别每张截图时用其余截图生成的像素探针、哈希索引或分类器，截图本身不在训练集中"""
+    print_test_header("测试留一法路径")
+    images = IMAGES + [
+        ("战斗中", "png/实际游戏截图/战斗中/weapp_auto_20251214_181358.png"),
+        ("其他", "png/实际游戏截图/其他/weapp_auto_20251214_181341.png")
+    ]
+    for name, stage in (("probes", "probes"), ("hash_index", "hash"), ("classifier", "classifier")):
+        result = run_path(name, images, measure_memory=False)
+        print(f"{name}: 准确率 {result['accuracy']:.1%}，直接给出结果 {result['decided']}/{result['frames']} 张")
+        assert result["frames"] == 4 and result["accuracy"] == 1.0
+        assert stage in result["latency_ms"] and 1 <= result["decided"] <= 4
+    # 同状态的两张截图画面几乎相同，哈希索引中总有另一张命中
+    assert run_path("hash_index", images, measure_memory=False)["decided"] == 4
+
+
+def test_compare_results():
+    """准确率下降、延迟和内存超出容差、缺少路径都视为回归，计时噪声范围内的变化不算"""
+    print_test_header("测试与基线比较")
+    baseline = {"paths": {"legacy": {
+        "per_state": {"战斗中": {"accuracy": 1.0}},
+        "latency_ms": {"total": {"p50": 100.0}, "hash": {"p50": 0.1}},
+        "peak_memory_mb": 20.0
+    }}}
+    current = copy.deepcopy(baseline)
+    current["paths"]["legacy"]["latency_ms"]["total"]["p50"] = 120.0
+    current["paths"]["legacy"]["latency_ms"]["hash"]["p50"] = 0.4
+    assert compare_results(current, baseline) == []
+
+    current["paths"]["legacy"]["per_state"]["战斗中"]["accuracy"] = 0.9
+    current["paths"]["legacy"]["latency_ms"]["total"]["p50"] = 200.0
+    current["paths"]["legacy"]["peak_memory_mb"] = 30.0
+    regressions = compare_results(current, baseline)
+    print(f"回归: {regressions}")
+    assert len(regressions) == 3
+    assert compare_results({"paths": {}}, baseline) == ["legacy: 缺少该识别路径的结果"]
+
+
+def test_command_line():
+    """命令行参数：--help 和未知参数直接退出，不运行基准测试"""
+    print_test_header("测试基准测试命令行参数")
+    options = parse_args(["out.json", "--paths", "legacy,probes", "--repeat", "2", "--no-memory"])
+    assert options["output_path"] == "out.json" and options["paths"] == ["legacy", "probes"]
+    assert options["repeat"] == 2 and not options["measure_memory"] and not options["update_baseline"]
+    for argv, code in ((["--help"], 0), (["--bogus"], 2)):
+        try:
+            parse_args(argv)
+        except SystemExit as e:
+            assert e.code == code
+        else:
+            raise AssertionError(f"{argv} 应直接退出")
+
+
+if __name__ == "__main__":
+    test_run_path()
+    test_held_out_path()
+    test_compare_results()
+    test_command_line()
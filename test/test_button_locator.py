@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试多尺度按钮定位：粗搜索找到候选，原始分辨率精确匹配，返回位置和尺度；
+识别器先在上一次的按钮位置附近匹配
+"""
+
+import sys
+import os
+# 将项目根目录添加到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import numpy as np
+from PIL import Image
+from cr.button_locator import MultiScaleButtonLocator
+from cr.status_recognizer import StatusRecognizer
+from cr.utils import ImageUtils
+from test_utils import print_test_header
+
+
+def make_texture(shape, seed):
+    """生成平滑的随机纹理，缩小后仍保留结构"""
+    noise = np.random.default_rng(seed).integers(0, 256, size=shape, dtype=np.uint8)
+    return cv2.GaussianBlur(noise, (0, 0), 3)
+
+
+def test_locate_scaled_button():
+    """按钮被缩小到0.65倍后仍能找到，并估计出尺度"""
+    print_test_header("测试多尺度按钮定位")
+    button = cv2.normalize(make_texture((90, 150), 1), None, 0, 255, cv2.NORM_MINMAX)
+    screenshot = make_texture((1280, 670), 2)
+    scaled = cv2.resize(button, (98, 58), interpolation=cv2.INTER_AREA)
+    screenshot[1001:1059, 203:301] = scaled
+
+    locator = MultiScaleButtonLocator()
+    similarity, position, scale = locator.locate(screenshot, button, key="test")
+    print(f"相似度: {similarity:.4f}, 位置: {position}, 尺度: {scale}")
+    assert similarity > 0.9
+    assert scale == 0.65
+    assert abs(position[0] - 203) <= 2 and abs(position[1] - 1001) <= 2
+
+    # 同一个模板键再次定位时复用缩放后的模板
+    cached = locator.stats()["cached_templates"]
+    locator.locate(screenshot, button, key="test")
+    assert locator.stats()["cached_templates"] == cached
+
+
+def test_pixel_budget():
+    """粗搜索的位置数不超过预算，总计算量远小于原始分辨率穷举"""
+    print_test_header("测试按钮定位计算预算")
+    screenshot = make_texture((1910, 1026), 3)
+    button = make_texture((60, 106), 4)
+    locator = MultiScaleButtonLocator(pixel_budget=50000)
+    locator.locate(screenshot, button, region=None)
+    stats = locator.stats()
+    print(stats)
+    assert stats["coarse_positions"] <= 50000
+    assert stats["full_search_ratio"] < 0.05
+
+    # 按钮比搜索区域还大时找不到
+    assert locator.locate(screenshot[:30], button, region=None) == (0.0, None, None)
+
+
+def test_actual_emote_button():
+    """表情按钮模板截自1026宽的截图，在670宽的实际截图中按约0.65倍找到"""
+    print_test_header("测试实际截图多尺度定位")
+    gray = ImageUtils.load_gray_array("png/实际游戏截图/战斗中/战斗中.png")
+    button = Image.open("png/战斗中/表情按钮.png").convert("L")
+    similarity, position, scale = MultiScaleButtonLocator().locate(gray, button)
+    print(f"相似度: {similarity:.4f}, 位置: {position}, 尺度: {scale}")
+    assert similarity > 0.8
+    assert scale == 0.65
+
+
+def test_locate_near():
+    """在上一次位置附近的小窗口内按已知尺度找到移动了几个像素的按钮，只计算窗口内的位置"""
+    print_test_header("测试按钮位置附近匹配")
+    button = cv2.normalize(make_texture((90, 150), 5), None, 0, 255, cv2.NORM_MINMAX)
+    screenshot = make_texture((1280, 670), 6)
+    screenshot[1005:1095, 206:356] = button
+
+    locator = MultiScaleButtonLocator()
+    similarity, position = locator.locate_near(screenshot, button, (200, 1000), 1.0, 20, key="near")
+    print(f"相似度: {similarity:.4f}, 位置: {position}, 统计: {locator.stats()}")
+    assert similarity > 0.99 and position == (206, 1005)
+    assert locator.stats()["hint_positions"] == 41 * 41
+
+    # 按钮移出窗口后得分很低
+    similarity, _ = locator.locate_near(screenshot, button, (400, 600), 1.0, 20, key="near")
+    assert similarity < 0.5
+
+
+def test_recognizer_button_hints():
+    """识别器记住按钮位置，下一帧先在附近匹配，结果与搜索整个区域一致；按钮消失后删除提示"""
+    print_test_header("测试按钮位置提示")
+    frames = ["png/实际游戏截图/战斗中/weapp_auto_20251214_181351.png",
+              "png/实际游戏截图/战斗中/weapp_auto_20251214_181358.png"]
+    recognizers = []
+    for hints in (False, True):
+        recognizer = StatusRecognizer()
+        # 语料截图在前面各阶段的训练集中，关闭它们和分级识别，每帧都检查所有按钮
+        recognizer.probes = None
+        recognizer.hash_index = None
+        recognizer.classifier = None
+        recognizer.color_signatures = None
+        recognizer.coarse_groups = {}
+        recognizer.button_hints_enabled = hints
+        recognizers.append(recognizer)
+    full, hinted = recognizers
+
+    for frame in frames:
+        full.recognize_status(frame)
+        hinted.recognize_status(frame)
+        assert abs(hinted.button_matches["战斗中"][0] - full.button_matches["战斗中"][0]) < 0.01
+    stats = hinted.get_button_hint_stats()
+    print(f"提示统计: {stats}")
+    assert stats["hits"] >= 1 and "战斗中" in stats["hints"]
+
+    hinted.recognize_status("png/实际游戏截图/战斗未开始/weapp_auto_20251214_180526.png")
+    stats = hinted.get_button_hint_stats()
+    assert stats["misses"] >= 1 and "战斗中" not in stats["hints"]
+
+
+def test_button_hints_follow_button_search():
+    """关闭多尺度按钮搜索后位置提示也不再使用，只按模板原始尺寸搜索整个区域"""
+    print_test_header("测试关闭多尺度搜索时不使用位置提示")
+    frame = "png/实际游戏截图/战斗中/weapp_auto_20251214_181351.png"
+    recognizer = StatusRecognizer()
+    recognizer.probes = None
+    recognizer.hash_index = None
+    recognizer.classifier = None
+    recognizer.color_signatures = None
+    recognizer.coarse_groups = {}
+    recognizer.button_locator = None
+    recognizer.button_hints_enabled = True
+    for _ in range(2):
+        recognizer.recognize_status(frame)
+    stats = recognizer.get_button_hint_stats()
+    print(f"提示统计: {stats}")
+    assert stats["hits"] == 0 and stats["misses"] == 0 and stats["hints"] == {}
+    assert recognizer.button_matches["战斗中"][2] == 1.0
+
+
+if __name__ == "__main__":
+    test_locate_scaled_button()
+    test_pixel_budget()
+    test_actual_emote_button()
+    test_locate_near()
+    test_recognizer_button_hints()
+    test_button_hints_follow_button_search()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试按钮定位：一次计算所有位置的匹配分数，返回相似度和按钮位置
+"""
+
+import sys
+import os
+# 将项目根目录添加到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PIL import Image
+from cr.utils import ImageUtils
+from test_utils import print_test_header
+
+
+def test_locate_exact_position():
+    """逐像素搜索能找到不在5像素网格上的按钮，坐标换算回整张截图"""
+    print_test_header("测试按钮精确定位")
+    rng = np.random.default_rng(0)
+    screenshot = rng.integers(0, 256, size=(1280, 670), dtype=np.uint8)
+    button = screenshot[1003:1063, 287:393].copy()
+
+    similarity, position = ImageUtils.locate_button(screenshot, button)
+    print(f"相似度: {similarity:.4f}, 位置: {position}")
+    assert similarity > 0.99
+    assert position == (287, 1003)
+
+    # 搜索区域不包含按钮时找不到同样的位置
+    similarity, position = ImageUtils.locate_button(screenshot[:600], button, region=None)
+    assert similarity < 0.5
+
+
+def test_no_uint8_wraparound():
+    """亮度相反的区域不会因为uint8相减回绕而得到高分"""
+    print_test_header("测试匹配分数无回绕")
+    button = np.random.default_rng(1).integers(0, 256, size=(40, 60), dtype=np.uint8)
+    inverted = (255 - button).astype(np.uint8)
+    screenshot = np.full((1280, 670), 128, dtype=np.uint8)
+    screenshot[900:940, 100:160] = inverted
+    similarity, _ = ImageUtils.locate_button(screenshot, button)
+    assert similarity < 0.5
+
+    screenshot[1000:1040, 300:360] = button
+    similarity, position = ImageUtils.locate_button(screenshot, button)
+    assert similarity > 0.99 and position == (300, 1000)
+
+
+def test_actual_button():
+    """在实际截图中找到战斗结束确认按钮；按钮大于搜索区域时返回0"""
+    print_test_header("测试实际截图按钮定位")
+    gray = ImageUtils.load_gray_array("png/实际游戏截图/战斗结束/战斗结束.png")
+    button = Image.open("png/战斗结束/战斗结束确认按钮.png").convert("L")
+    similarity, position = ImageUtils.locate_button(gray, button)
+    print(f"相似度: {similarity:.4f}, 位置: {position}")
+    assert similarity > 0.99
+    assert ImageUtils.button_template_matching(gray, button) == similarity
+
+    assert ImageUtils.locate_button(gray[:40], button, region=None) == (0.0, None)
+
+
+if __name__ == "__main__":
+    test_locate_exact_position()
+    test_no_uint8_wraparound()
+    test_actual_button()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试内存截图接口：回放后端、Frame元数据以及识别模块直接接收帧
+"""
+
+import sys
+import os
+# 将项目根目录添加到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tempfile
+from cr.capture import ReplayBackend, create_capture_backend
+from cr.screenshot import ScreenshotManager
+from cr.status_recognizer import StatusRecognizer
+from test_utils import print_test_header, get_screenshot_paths
+
+REPLAY_DIR = "png/实际游戏截图"
+
+
+def test_replay_backend():
+    """回放后端按路径顺序返回解码后的RGB帧"""
+    print_test_header("测试回放后端")
+    backend = create_capture_backend("replay", source=REPLAY_DIR, loop=False)
+    expected_paths = get_screenshot_paths(REPLAY_DIR)
+
+    frame = backend.grab((0, 0, 335, 640))
+    print(f"第一帧: {frame}")
+    assert frame.source == expected_paths[0]
+    assert frame.image.ndim == 3 and frame.image.shape[2] == 3
+    assert frame.region == (0, 0, 335, 640)
+
+    # 读完所有帧后不循环时应结束
+    for _ in range(len(expected_paths) - 1):
+        backend.grab()
+    try:
+        backend.grab()
+        assert False, "回放结束后应抛出EOFError"
+    except EOFError:
+        print("✓ 回放结束")
+
+
+def test_capture_frame_without_saving():
+    """capture_frame默认只返回内存帧，save=True时才写入磁盘"""
+    print_test_header("测试capture_frame是否写盘")
+    manager = ScreenshotManager(capture_backend=ReplayBackend(REPLAY_DIR))
+
+    frame = manager.capture_frame(save=False)
+    print(f"内存帧: {frame}, 路径: {frame.path}")
+    assert frame is not None and frame.path is None
+    assert frame.seq == 1
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        manager.set_screenshot_dir(temp_dir)
+        saved_path = manager.auto_screenshot_clash_royale(prefix="test_capture")
+        print(f"保存路径: {saved_path}")
+        assert saved_path and os.path.exists(saved_path)
+
+
+def test_replay_does_not_save_into_repo():
+    """回放后端默认不写盘，显式保存的截图写入临时目录而不是png/"""
+    print_test_header("测试回放后端的截图保存位置")
+    manager = ScreenshotManager(capture_backend=ReplayBackend(REPLAY_DIR))
+    assert manager.save_screenshots is False
+    assert manager.capture_frame().path is None
+
+    saved_path = manager.auto_screenshot_clash_royale(prefix="test_replay_dir")
+    print(f"保存路径: {saved_path}")
+    try:
+        assert saved_path.startswith(tempfile.gettempdir())
+    finally:
+        os.remove(saved_path)
+
+
+def test_recognize_frame_matches_path():
+    """识别内存帧与识别同一文件的结果一致"""
+    print_test_header("测试识别模块直接接收帧")
+    recognizer = StatusRecognizer()
+    path = get_screenshot_paths(REPLAY_DIR)[0]
+    frame = ReplayBackend(path).grab()
+
+    frame_result = recognizer.recognize_status(frame)
+    path_result = recognizer.recognize_status(path)
+    print(f"帧识别结果: {frame_result}, 路径识别结果: {path_result}")
+    assert frame_result == path_result
+
+
+if __name__ == "__main__":
+    test_replay_backend()
+    test_capture_frame_without_saving()
+    test_replay_does_not_save_into_repo()
+    test_recognize_frame_matches_path()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试画面变化检测：画面未变化时跳过状态识别
+"""
+
+import sys
+import os
+# 将项目根目录添加到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cr.automation import CRGameAutomation
+from cr.capture import ReplayBackend
+from cr.change_detector import FrameChangeDetector
+from cr.utils import ImageUtils
+from test_utils import print_test_header
+
+MENU_FRAME = "png/实际游戏截图/战斗未开始/weapp_auto_20251214_180526.png"
+MENU_FRAME_LATER = "png/实际游戏截图/战斗未开始/weapp_auto_20251214_181329.png"
+BATTLE_FRAME = "png/实际游戏截图/战斗中/weapp_auto_20251214_180807.png"
+
+
+def test_detector_skips_similar_frames():
+    """同一界面的相近帧被跳过，切换界面时重新识别"""
+    print_test_header("测试画面变化检测器")
+    detector = FrameChangeDetector(threshold=0.005, max_skipped=10)
+    menu = ImageUtils.load_image_array(MENU_FRAME)
+
+    assert detector.should_recognize(menu)
+    assert not detector.should_recognize(menu.copy())
+    assert not detector.should_recognize(ImageUtils.load_image_array(MENU_FRAME_LATER))
+    assert detector.should_recognize(ImageUtils.load_image_array(BATTLE_FRAME))
+
+    stats = detector.stats()
+    print(f"检测统计: {stats}, 最近差异: {detector.last_diff:.4f}")
+    assert stats["checked"] == 4 and stats["skipped"] == 2
+
+
+def test_max_skipped_forces_recognition():
+    """连续复用达到上限后强制重新识别"""
+    print_test_header("测试连续复用上限")
+    detector = FrameChangeDetector(max_skipped=2)
+    menu = ImageUtils.load_image_array(MENU_FRAME)
+    results = [detector.should_recognize(menu) for _ in range(5)]
+    print(f"是否识别: {results}")
+    assert results == [True, False, False, True, False]
+
+
+def test_automation_reuses_status():
+    """capture_and_analyze在画面未变化时复用上一次的识别结果"""
+    print_test_header("测试自动化流程复用识别结果")
+    automation = CRGameAutomation(use_yolo=False)
+    automation.screenshot_manager.capture_backend = ReplayBackend(MENU_FRAME)
+
+    first_status, _ = automation.capture_and_analyze(save_screenshot=False)
+    second_status, _ = automation.capture_and_analyze(save_screenshot=False)
+    stats = automation.get_recognition_stats()
+    print(f"识别结果: {first_status} -> {second_status}, 统计: {stats}")
+    assert first_status == second_status
+    assert stats["skipped"] == 1
+
+
+if __name__ == "__main__":
+    test_detector_skips_similar_frames()
+    test_max_skipped_forces_recognition()
+    test_automation_reuses_status()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试颜色预筛选：每个状态一个HSV直方图签名，交集低于下限的状态在模板匹配前被排除
+"""
+
+import sys
+import os
+import tempfile
+import contextlib
+import io
+# 将项目根目录添加到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PIL import Image
+from cr.color_signature import ColorSignatures
+from cr.status_recognizer import StatusRecognizer
+from test_utils import print_test_header
+
+# 状态 -> 画面主色 (RGB)：对战场地偏绿，菜单偏深蓝
+COLORS = {"战斗中": (60, 160, 60), "战斗未开始": (20, 40, 110)}
+BATTLE_FRAME = "png/实际游戏截图/战斗中/weapp_auto_20251214_181351.png"
+
+
+def make_frame(color, seed):
+    """主色加噪声的RGB截图"""
+    rng = np.random.default_rng(seed)
+    frame = np.empty((640, 336, 3), dtype=np.int16)
+    frame[:] = color
+    frame += rng.integers(-15, 16, size=frame.shape, dtype=np.int16)
+    return np.clip(frame, 0, 255).astype(np.uint8)
+
+
+def test_build_filter():
+    """签名从目录建立，颜色不同的状态被排除，没有签名的状态保留，保存再加载结果一致"""
+    print_test_header("测试颜色签名筛选")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for state, color in COLORS.items():
+            os.makedirs(os.path.join(temp_dir, state))
+            for i in range(3):
+                Image.fromarray(make_frame(color, i)).save(os.path.join(temp_dir, state, f"{i}.png"))
+        signatures = ColorSignatures.build(temp_dir)
+        path = os.path.join(temp_dir, "signatures.npz")
+        signatures.save(path)
+        loaded = ColorSignatures.load(path)
+
+    frame = make_frame(COLORS["战斗中"], 10)
+    intersections = signatures.intersections(frame)
+    print(f"交集: {intersections}")
+    assert intersections["战斗中"] > 0.9 and intersections["战斗未开始"] < 0.1
+    kept, eliminated, _ = signatures.filter(frame, ["战斗中", "战斗未开始", "开宝箱"], 0.5)
+    assert kept == ["战斗中", "开宝箱"] and eliminated == ["战斗未开始"]
+    assert signatures.stats()["eliminated"] == 1
+
+    assert loaded.labels == signatures.labels and loaded.bins == signatures.bins
+    assert np.allclose(loaded.signatures, signatures.signatures)
+    assert signatures.intersections(np.zeros((640, 336), dtype=np.uint8)) == {}
+
+
+def test_recognizer_prefilter():
+    """识别器在模板匹配前记录预筛选耗时和排除的状态，对战画面排除菜单类状态"""
+    print_test_header("测试识别器颜色预筛选")
+    with contextlib.redirect_stdout(io.StringIO()):
+        recognizer = StatusRecognizer()
+    recognizer.probes = None
+    recognizer.hash_index = None
+    recognizer.classifier = None
+    status, _ = recognizer.recognize_status(BATTLE_FRAME)
+    print(f"预筛选: {recognizer.last_prefilter}，阶段: {recognizer.last_stages}")
+    assert status == "战斗中"
+    assert "战斗中" in recognizer.last_prefilter["kept"]
+    assert "战斗未开始" in recognizer.last_prefilter["eliminated"]
+    assert recognizer.last_stages.index("prefilter") < recognizer.last_stages.index("button_scan")
+
+
+if __name__ == "__main__":
+    test_build_filter()
+    test_recognizer_prefilter()
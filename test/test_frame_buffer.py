@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试后台截图线程和环形缓冲区
+"""
+
+import sys
+import os
+# 将项目根目录添加到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import numpy as np
+from cr.capture import Frame, ReplayBackend
+from cr.frame_buffer import FrameRingBuffer, CaptureThread
+from cr.screenshot import ScreenshotManager
+from test_utils import print_test_header
+
+
+def make_frame(seq, timestamp, shape=(8, 6, 3)):
+    """构造像素值等于帧序号的测试帧"""
+    return Frame(np.full(shape, seq, dtype=np.uint8), timestamp=timestamp, seq=seq)
+
+
+def test_drop_oldest():
+    """写满后覆盖最旧的帧，并统计未读即被覆盖的帧数"""
+    print_test_header("测试环形缓冲区drop-oldest语义")
+    frame_buffer = FrameRingBuffer(capacity=3)
+    for seq in range(1, 6):
+        frame_buffer.put(make_frame(seq, timestamp=float(seq)))
+
+    stats = frame_buffer.stats()
+    print(f"缓冲区统计: {stats}")
+    assert stats["written"] == 5 and stats["dropped"] == 2
+
+    # 时间戳0之后最早仍在缓冲区中的是第3帧，最新的是第5帧
+    oldest = frame_buffer.next_after(0.0, timeout=0)
+    newest = frame_buffer.next_after(0.0, timeout=0, newest=True)
+    print(f"最早可用帧: {oldest.seq}, 最新帧: {newest.seq}")
+    assert oldest.seq == 3 and newest.seq == 5
+    assert frame_buffer.latest().image[0, 0, 0] == 5
+
+
+def test_reuse_output_array():
+    """传入out时复用同一块数组，读出的帧不受后续写入影响"""
+    print_test_header("测试读帧复用数组")
+    frame_buffer = FrameRingBuffer(capacity=2)
+    frame_buffer.put(make_frame(1, timestamp=1.0))
+    out = np.empty((8, 6, 3), dtype=np.uint8)
+
+    frame = frame_buffer.next_after(0.0, timeout=0, out=out)
+    frame_buffer.put(make_frame(2, timestamp=2.0))
+    frame_buffer.put(make_frame(3, timestamp=3.0))
+    print(f"读出帧: {frame.seq}, 像素值: {frame.image[0, 0, 0]}")
+    assert frame.image is out and frame.image[0, 0, 0] == 1
+
+    # 没有新帧时按超时返回None
+    assert frame_buffer.next_after(3.0, timeout=0.05) is None
+
+
+def test_capture_thread_with_replay():
+    """后台线程按目标帧率从回放后端填充缓冲区"""
+    print_test_header("测试后台截图线程")
+    manager = ScreenshotManager(capture_backend=ReplayBackend("png/实际游戏截图"))
+    frame_buffer = FrameRingBuffer(capacity=4)
+    thread = CaptureThread(manager, frame_buffer, target_fps=20)
+    thread.start()
+    try:
+        first = frame_buffer.next_after(0.0, timeout=5.0)
+        second = frame_buffer.next_after(first.timestamp, timeout=5.0)
+    finally:
+        thread.stop()
+
+    print(f"线程统计: {thread.stats()}, 缓冲区统计: {frame_buffer.stats()}")
+    assert first is not None and second is not None
+    assert second.timestamp > first.timestamp
+    assert not thread.is_alive()
+
+
+if __name__ == "__main__":
+    test_drop_oldest()
+    test_reuse_output_array()
+    test_capture_thread_with_replay()
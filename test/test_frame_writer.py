@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试截图异步写入器和保存策略
+"""
+
+import sys
+import os
+# 将项目根目录添加到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tempfile
+import numpy as np
+from PIL import Image
+from cr.capture import Frame
+from cr.frame_writer import FrameWriter, create_save_policy
+from test_utils import print_test_header
+
+
+def make_frame(seq, value=0, timestamp=1765700000.5):
+    """构造同一秒内的测试帧"""
+    return Frame(np.full((20, 10, 3), value, dtype=np.uint8), timestamp=timestamp, seq=seq)
+
+
+def test_save_policies():
+    """各保存策略按预期选择要保存的帧"""
+    print_test_header("测试保存策略")
+    every_n = create_save_policy("every_n", every_n=3)
+    assert [every_n.should_save(None) for _ in range(6)] == [True, False, False, True, False, False]
+
+    transition = create_save_policy("transition")
+    statuses = ["战斗中", "战斗中", "战斗结束", None, None]
+    assert [transition.should_save(None, status) for status in statuses] == [True, False, True, True, False]
+
+    low_confidence = create_save_policy("low_confidence", low_confidence_threshold=0.6)
+    assert low_confidence.should_save(None, "战斗中", 0.55)
+    assert not low_confidence.should_save(None, "战斗中", 0.8)
+    assert low_confidence.should_save(None, None, 0.8)
+
+    combined = create_save_policy(["transition", "low_confidence"], low_confidence_threshold=0.6)
+    results = [combined.should_save(None, "开宝箱", 0.9), combined.should_save(None, "开宝箱", 0.5),
+               combined.should_save(None, "开宝箱", 0.9)]
+    print(f"组合策略结果: {results}")
+    assert results == [True, True, False]
+
+
+def test_async_writes_do_not_collide():
+    """同一秒内的多帧写入不同文件，并能以npy格式无损读回"""
+    print_test_header("测试异步写入")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        writer = FrameWriter(output_dir=temp_dir, prefix="test", fmt="npy", workers=2)
+        frames = [make_frame(seq, value=seq) for seq in range(5)]
+        paths = [writer.submit(frame, "战斗中", 0.9) for frame in frames]
+        # 模拟截图线程复用数组：提交后修改原数组不影响写入内容
+        for frame in frames:
+            frame.image[:] = 255
+        writer.close()
+
+        stats = writer.stats()
+        print(f"写入统计: {stats}")
+        assert len(set(paths)) == 5 and stats["saved"] == 5
+        for seq, path in enumerate(paths):
+            assert np.load(path)[0, 0, 0] == seq
+
+
+def test_png_compress_level_and_full_queue():
+    """PNG按指定压缩级别写入，队列满时丢弃而不阻塞"""
+    print_test_header("测试PNG写入与队列丢弃")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        writer = FrameWriter(output_dir=temp_dir, fmt="png", png_compress_level=0, workers=0, queue_size=2)
+        paths = [writer.submit(make_frame(seq)) for seq in range(4)]
+        stats = writer.stats()
+        print(f"提交结果: {paths}, 统计: {stats}")
+        assert paths[2] is None and paths[3] is None and stats["dropped"] == 2
+
+        # 没有工作线程时手动写入队列中的帧
+        writer._write(paths[0], make_frame(0).image)
+        with Image.open(paths[0]) as img:
+            assert img.size == (10, 20)
+
+
+if __name__ == "__main__":
+    test_save_policies()
+    test_async_writes_do_not_collide()
+    test_png_compress_level_and_full_queue()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试感知哈希索引：离线建立索引，运行时按汉明距离查找已标注的状态
+"""
+
+import sys
+import os
+import tempfile
+# 将项目根目录添加到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from cr.hash_index import HashIndex, dhash, phash
+from cr.status_recognizer import StatusRecognizer
+from test_utils import print_test_header
+
+BATTLE_FRAME = "png/实际游戏截图/战斗中/weapp_auto_20251214_181351.png"
+
+
+def make_page(seed):
+    return np.random.default_rng(seed).integers(0, 256, size=(1280, 670, 3), dtype=np.uint8)
+
+
+def test_hash_lookup():
+    """同一画面的轻微变化命中原条目，不同画面不命中，距离范围内标签不一致时不命中"""
+    print_test_header("测试哈希查找")
+    page = make_page(0)
+    for function in (dhash, phash):
+        assert function(page) == function(page.copy())
+
+    index = HashIndex("phash")
+    index.add("战斗中", page)
+    index.add("战斗结束", make_page(1))
+    noisy = np.clip(page.astype(np.int16) + np.random.default_rng(2).integers(-8, 9, size=page.shape), 0, 255).astype(np.uint8)
+    match = index.lookup(noisy, max_distance=10)
+    print(f"加噪画面: {match}")
+    assert match is not None and match[0] == "战斗中" and match[1] <= 10
+    assert index.lookup(make_page(3), max_distance=10) is None
+
+    # 两个不同状态的条目哈希相同时无法确定
+    index.add("开宝箱", page)
+    assert index.lookup(page, max_distance=10) is None
+    stats = index.stats()
+    print(f"统计: {stats}")
+    assert stats["lookups"] == 3 and stats["hits"] == 1
+
+
+def test_save_load():
+    """索引保存后加载，条目和查找结果不变"""
+    print_test_header("测试哈希索引保存和加载")
+    index = HashIndex("dhash")
+    for seed, label in enumerate(["战斗中", "战斗结束", "其他"]):
+        index.add(label, make_page(seed), path=f"{label}_{seed}.png")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "index.npz")
+        index.save(path)
+        loaded = HashIndex.load(path)
+    assert loaded.method == "dhash"
+    assert loaded.labels == index.labels and loaded.paths == index.paths
+    assert np.array_equal(loaded.hashes, index.hashes)
+    assert loaded.lookup(make_page(1))[0] == "战斗结束"
+
+
+def test_recognizer_hash_hit():
+    """识别器命中哈希索引时直接返回标注的状态，不计算模板；标注为“其他”的截图返回None"""
+    print_test_header("测试识别器使用哈希索引")
+    recognizer = StatusRecognizer()
+    # 语料截图在像素探针的训练集中，关闭探针以测试哈希索引
+    recognizer.probes = None
+    recognizer.hash_index = HashIndex("phash")
+    recognizer.hash_index.add("战斗中", BATTLE_FRAME)
+    status, similarity = recognizer.recognize_status(BATTLE_FRAME)
+    print(f"战斗中画面: {status} ({similarity:.3f})，模板计算 {recognizer.last_evaluations} 次")
+    assert status == "战斗中" and similarity == 1.0
+    assert recognizer.last_hash_match is not None and recognizer.last_evaluations == 0
+
+    other = make_page(5)
+    recognizer.hash_index.add("其他", other)
+    status, _ = recognizer.recognize_status(other)
+    assert status is None and recognizer.last_hash_match[0] == "其他"
+
+
+if __name__ == "__main__":
+    test_hash_lookup()
+    test_save_load()
+    test_recognizer_hash_hit()
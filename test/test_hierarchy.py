@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试分级识别：粗分类后只运行所属类别的按钮和页面匹配，记录实际执行的阶段和超出预算的阶段
+"""
+
+import sys
+import os
+import contextlib
+import io
+# 将项目根目录添加到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cr.status_recognizer import StatusRecognizer
+from test_utils import print_test_header
+
+BATTLE_FRAME = "png/实际游戏截图/战斗中/weapp_auto_20251214_181351.png"
+MENU_FRAME = "png/实际游戏截图/战斗未开始/weapp_auto_20251214_180526.png"
+
+
+def make_recognizer():
+    """关闭像素探针、哈希索引、分类器和颜色预筛选（语料截图都在它们的训练集中），只测模板匹配路径"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        recognizer = StatusRecognizer()
+    recognizer.probes = None
+    recognizer.hash_index = None
+    recognizer.classifier = None
+    recognizer.color_signatures = None
+    return recognizer
+
+
+def test_branches():
+    """对战画面只计算对战类按钮，菜单画面只计算菜单类按钮和页面"""
+    print_test_header("测试分级识别")
+    recognizer = make_recognizer()
+    battle = set(recognizer.coarse_groups["battle"])
+    status, _ = recognizer.recognize_status(BATTLE_FRAME)
+    print(f"对战画面: {status}，类别 {recognizer.last_branch}，阶段 {recognizer.last_stages}")
+    assert status == "战斗中" and recognizer.last_branch == "battle"
+    assert recognizer.last_stages[:3] == ["decode", "preprocess", "coarse"]
+    assert set(recognizer.button_matches) <= battle
+
+    recognizer.button_matches = {}
+    status, _ = recognizer.recognize_status(MENU_FRAME)
+    print(f"菜单画面: {status}，类别 {recognizer.last_branch}，阶段 {recognizer.last_stages}")
+    assert status == "战斗未开始" and recognizer.last_branch == "menu"
+    assert not set(recognizer.button_matches) & battle
+
+    # 两类得分相差不够时检查所有状态
+    recognizer.coarse_min_margin = 1.0
+    status, _ = recognizer.recognize_status(BATTLE_FRAME)
+    assert status == "战斗中" and recognizer.last_branch is None
+    assert recognizer.get_stage_stats()["branches"] == {"battle": 1, "menu": 1, "all": 1}
+
+
+def test_stage_budgets():
+    """超出预算的阶段计入统计，没有执行的阶段不出现"""
+    print_test_header("测试阶段耗时预算")
+    recognizer = make_recognizer()
+    recognizer.stage_budgets = {"decode": 0.0, "coarse": 1000.0, "hash": 0.0}
+    recognizer.recognize_status(BATTLE_FRAME)
+    stats = recognizer.get_stage_stats()
+    print(f"阶段统计: {stats}")
+    stages = stats["stages"]
+    assert stages["decode"]["overruns"] == 1 and stages["decode"]["budget_ms"] == 0.0
+    assert stages["coarse"]["runs"] == 1 and stages["coarse"]["overruns"] == 0
+    assert stages["button_scan"]["budget_ms"] is None
+    assert "hash" not in stages and "probes" not in stages
+
+
+if __name__ == "__main__":
+    test_branches()
+    test_stage_budgets()
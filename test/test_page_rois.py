@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试页面ROI：每个状态只比较配置的区域，区域外的像素不影响页面相似度
+"""
+
+import sys
+import os
+import contextlib
+import io
+# 将项目根目录添加到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PIL import Image
+from cr.status_recognizer import StatusRecognizer
+from test_utils import print_test_header
+
+BATTLE_FRAME = "png/实际游戏截图/战斗中/weapp_auto_20251214_181351.png"
+MENU_FRAME = "png/实际游戏截图/战斗未开始/weapp_auto_20251214_180526.png"
+OTHER_FRAME = "png/实际游戏截图/其他/weapp_auto_20251214_181339.png"
+
+
+def make_recognizer():
+    """只使用模板匹配路径的识别器"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        recognizer = StatusRecognizer()
+    recognizer.probes = None
+    recognizer.hash_index = None
+    recognizer.classifier = None
+    recognizer.color_signatures = None
+    return recognizer
+
+
+def test_only_roi_pixels():
+    """修改所有ROI之外的像素不改变页面相似度，ROI只占整帧的一小部分"""
+    print_test_header("测试页面ROI只比较区域内像素")
+    recognizer = make_recognizer()
+    gray = np.array(Image.open(BATTLE_FRAME).convert("L"))
+    height, width = gray.shape
+    entries = recognizer.get_roi_templates((width, height))
+    assert set(entries) == {"战斗未开始", "战斗中", "战斗结束", "开宝箱"}
+
+    inside = np.zeros(gray.size, dtype=bool)
+    for indices, _ in entries.values():
+        inside[indices] = True
+    changed = gray.copy().ravel()
+    changed[~inside] = 255 - changed[~inside]
+    changed = changed.reshape(gray.shape)
+
+    similarities = recognizer.compute_roi_similarities(gray)
+    print(f"ROI相似度: {similarities}")
+    assert recognizer.compute_roi_similarities(changed) == similarities
+    assert max(similarities, key=similarities.get) == "战斗中"
+    assert similarities["战斗中"] >= recognizer.status_thresholds["战斗中"]
+
+    stats = recognizer.get_cache_stats()
+    print(f"缓存统计: {stats}")
+    assert 0 < stats["roi_fraction"] < 0.1
+
+
+def test_recognize_with_rois():
+    """没有按钮捷径的帧由ROI页面相似度识别，“其他”帧低于所有ROI阈值"""
+    print_test_header("测试启用页面ROI的状态识别")
+    recognizer = make_recognizer()
+    for path, expected in ((MENU_FRAME, "战斗未开始"), (OTHER_FRAME, None)):
+        with contextlib.redirect_stdout(io.StringIO()):
+            status, similarity = recognizer.recognize_status(path)
+        print(f"{path}: {status} ({similarity:.3f})，耗时: {recognizer.last_timings}")
+        assert status == expected
+        assert "page_match" in recognizer.last_timings
+
+
+if __name__ == "__main__":
+    test_only_roi_pixels()
+    test_recognize_with_rois()
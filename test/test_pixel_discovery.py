@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试区分像素分析：得分最高的区域和探针落在各状态独有的画面元素上
+"""
+
+import sys
+import os
+import tempfile
+# 将项目根目录添加到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PIL import Image
+from cr.pixel_discovery import discover
+from test_utils import print_test_header
+
+# 状态 -> 只在该状态出现的色块 (x1, y1, x2, y2, RGB)，画面尺寸 320x600
+PATCHES = {
+    "战斗中": (0, 480, 80, 560, (200, 40, 200)),
+    "战斗结束": (120, 60, 200, 120, (40, 200, 40))
+}
+
+
+def write_frames(root_dir):
+    """每个状态写4帧带噪声的截图，“其他”只有噪声"""
+    rng = np.random.default_rng(0)
+    for state in list(PATCHES) + ["其他"]:
+        os.makedirs(os.path.join(root_dir, state))
+        for i in range(4):
+            frame = rng.integers(60, 180, size=(600, 320, 3), dtype=np.uint8)
+            if state in PATCHES:
+                x1, y1, x2, y2, color = PATCHES[state]
+                frame[y1:y2, x1:x2] = color
+            Image.fromarray(frame).save(os.path.join(root_dir, state, f"{i}.png"))
+
+
+def test_discover():
+    """每个状态的首个区域和所有探针都在它的色块内，探针只命中本状态，留一法下也只命中本状态"""
+    print_test_header("测试区分像素分析")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        write_frames(temp_dir)
+        result = discover(temp_dir, regions=2, probes=4)
+    print(f"区域: {result['regions']}")
+    print(f"命中率: {result['separation']}")
+    assert result["frames"] == 12 and set(result["regions"]) == set(PATCHES)
+    for state, (x1, y1, x2, y2, color) in PATCHES.items():
+        box = (x1 / 320, y1 / 600, x2 / 320, y2 / 600)
+        left, top, right, bottom = result["regions"][state][0]["box"]
+        assert box[0] <= left < right <= box[2] and box[1] <= top < bottom <= box[3]
+        for probe in result["probes"][state]:
+            assert box[0] <= probe["x"] <= box[2] and box[1] <= probe["y"] <= box[3]
+            assert np.abs(np.array(probe["rgb"]) - color).max() <= 2
+        assert result["separation"][state] == {"own_hit_rate": 1.0, "other_hit_rate": 0.0}
+        assert 0 < result["coverage"][state] < 0.1
+    # 留一法下探针给出的结果都正确，“其他”帧不被判为任何状态
+    evaluation = result["leave_one_out"]
+    print(f"留一法: {evaluation}")
+    assert evaluation["decided"] == 8 and evaluation["accuracy"] == 1.0
+
+
+if __name__ == "__main__":
+    test_discover()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试像素探针：一次取出所有探针像素，恰好一个状态全部命中时直接给出结果，其余帧交给后续阶段
+"""
+
+import sys
+import os
+import tempfile
+# 将项目根目录添加到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from cr.pixel_probes import ProbeSet
+from cr.status_recognizer import StatusRecognizer
+from test_utils import print_test_header
+
+PROBES = {
+    "战斗中": [{"x": 0.1, "y": 0.9, "rgb": [200, 40, 200], "tolerance": 12},
+               {"x": 0.5, "y": 0.95, "rgb": [30, 30, 30], "tolerance": 12}],
+    "战斗结束": [{"x": 0.5, "y": 0.1, "rgb": [40, 200, 40], "tolerance": 12}]
+}
+
+
+def make_frame(width, height, state=None):
+    """灰色背景，按状态把探针位置涂成期望颜色"""
+    frame = np.full((height, width, 3), 128, dtype=np.uint8)
+    for probe in PROBES.get(state, []):
+        x, y = int(probe["x"] * width), int(probe["y"] * height)
+        frame[y, x] = np.array(probe["rgb"]) + 5
+    return frame
+
+
+def test_decide():
+    """任意分辨率下恰好一个状态全部命中才给出结果，部分命中或多个状态命中时不确定"""
+    print_test_header("测试像素探针判断")
+    probes = ProbeSet(PROBES)
+    for width, height in ((670, 1280), (1026, 1910)):
+        assert probes.decide(make_frame(width, height, "战斗中")) == ("战斗中", 1.0)
+        assert probes.decide(make_frame(width, height, "战斗结束")) == ("战斗结束", 1.0)
+        assert probes.decide(make_frame(width, height)) == (None, 0.0)
+
+    frame = make_frame(670, 1280, "战斗中")
+    frame[int(0.95 * 1280), int(0.5 * 670)] = 128
+    assert probes.match(frame)["战斗中"] == 0.5
+    assert probes.decide(frame) == (None, 0.5)
+    assert probes.decide(frame, min_fraction=0.5) == ("战斗中", 0.5)
+
+    both = make_frame(670, 1280, "战斗中")
+    both[int(0.1 * 1280), int(0.5 * 670)] = PROBES["战斗结束"][0]["rgb"]
+    assert probes.decide(both)[0] is None
+    stats = probes.stats()
+    print(f"统计: {stats}")
+    assert stats["probes"] == 3 and stats["checks"] == 9 and stats["decisions"] == 5
+
+
+def test_recognizer_probes():
+    """识别器最先检查探针，命中时不做灰度转换和模板匹配；保存再加载的探针结果一致"""
+    print_test_header("测试识别器使用像素探针")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "probes.json")
+        ProbeSet(PROBES, [32, 60]).save(path)
+        loaded = ProbeSet.load(path)
+    assert loaded.probes == PROBES and loaded.grid_size == [32, 60]
+
+    recognizer = StatusRecognizer()
+    recognizer.probes = loaded
+    status, fraction = recognizer.recognize_status(make_frame(670, 1280, "战斗中"))
+    print(f"识别结果: {status} ({fraction})，耗时: {recognizer.last_timings}")
+    assert (status, fraction) == ("战斗中", 1.0)
+    assert recognizer.last_probe_match == ("战斗中", 1.0)
+    assert set(recognizer.last_timings) == {"decode", "probes"}
+    assert recognizer.last_evaluations == 0
+
+
+if __name__ == "__main__":
+    test_decide()
+    test_recognizer_probes()
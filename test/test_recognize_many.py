@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试批量识别：并行解码、整批一次计算模板库得分，每帧结果与逐帧识别一致
+"""
+
+import sys
+import os
+import glob
+import contextlib
+import io
+# 将项目根目录添加到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from cr.status_recognizer import StatusRecognizer
+from test_utils import print_test_header
+
+FRAMES = sorted(glob.glob("png/实际游戏截图/*/*.png"))[::3]
+BATTLE_FRAME = "png/实际游戏截图/战斗中/weapp_auto_20251214_181351.png"
+
+
+def make_recognizer():
+    """关闭像素探针、哈希索引、分类器和颜色预筛选（语料截图都在它们的训练集中），只测模板匹配路径"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        recognizer = StatusRecognizer()
+    recognizer.probes = None
+    recognizer.hash_index = None
+    recognizer.classifier = None
+    recognizer.color_signatures = None
+    return recognizer
+
+
+def test_matches_single_frames():
+    """批量识别的状态和相似度与逐帧recognize_status相同，scores与模板库得分一致"""
+    print_test_header("测试批量识别与逐帧识别一致")
+    single = make_recognizer()
+    single.button_hints_enabled = False
+    batch = make_recognizer()
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected = [single.recognize_status(path) for path in FRAMES]
+        results = batch.recognize_many(FRAMES, workers=2, batch_size=4)
+    print(f"{len(results)} 帧，状态: {results['status'].tolist()}，耗时: {batch.last_batch_timings}")
+
+    assert len(results) == len(FRAMES) and results["source"].tolist() == FRAMES
+    assert results["status"].tolist() == [status for status, _ in expected]
+    assert np.allclose(results["similarity"], [similarity for _, similarity in expected], atol=1e-5)
+    assert results["scores"].shape == (len(FRAMES), len(batch.last_batch_labels))
+    labels, scores = batch.template_bank.label_scores_many(batch.template_bank.score_many(FRAMES[:2]))
+    assert labels == batch.last_batch_labels and np.allclose(results["scores"][:2], scores, atol=1e-4)
+    assert (results["decode_ms"] > 0).all() and (results["recognize_ms"] > 0).all()
+
+
+def test_decode_failure():
+    """无法解码的截图状态为None、得分为NaN，不影响同一批的其他截图"""
+    print_test_header("测试批量识别解码失败")
+    recognizer = make_recognizer()
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = recognizer.recognize_many(["png/不存在的截图.png", BATTLE_FRAME], batch_size=2)
+    print(f"结果: {results}")
+    assert results[0]["status"] is None and np.isnan(results[0]["scores"]).all()
+    assert results[1]["status"] == "战斗中"
+    assert len(recognizer.recognize_many([])) == 0
+
+
+def test_order_independent():
+    """批量识别不使用按钮位置提示，结果与输入顺序和分批方式无关，结束后恢复提示开关"""
+    print_test_header("测试批量识别与顺序无关")
+    recognizer = make_recognizer()
+    # 之前逐帧识别留下的提示不能带入批量识别
+    recognizer.button_hints = {"战斗中": ((1, 1), (0, 0), 1.0)}
+    with contextlib.redirect_stdout(io.StringIO()):
+        forward = recognizer.recognize_many(FRAMES, workers=2, batch_size=4)
+        backward = recognizer.recognize_many(FRAMES[::-1], workers=1, batch_size=len(FRAMES))
+    backward = backward[::-1]
+    print(f"正序: {forward['status'].tolist()}")
+    assert forward["status"].tolist() == backward["status"].tolist()
+    assert np.allclose(forward["similarity"], backward["similarity"], atol=1e-6)
+    assert recognizer.button_hints == {} and recognizer.button_hint_hits == 0
+    assert recognizer.button_hints_enabled
+
+
+if __name__ == "__main__":
+    test_matches_single_frames()
+    test_decode_failure()
+    test_order_independent()
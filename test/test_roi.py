@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试ROI注册表：相对坐标按截图尺寸换算一次，返回不复制像素的视图
+"""
+
+import sys
+import os
+# 将项目根目录添加到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from cr.capture import Frame
+from cr.roi import RoiRegistry, get_roi_registry
+from cr.yolo_detector import YoloDetector
+from test_utils import print_test_header
+
+
+def test_views_share_memory():
+    """区域视图与原帧共享内存，并按截图尺寸缓存换算结果"""
+    print_test_header("测试ROI视图")
+    registry = RoiRegistry({"card_strip": (0.0, 0.85, 1.0, 1.0), "center": (0.25, 0.25, 0.75, 0.75)})
+    frame = Frame(np.zeros((1280, 670, 3), dtype=np.uint8))
+
+    strip = frame.roi("card_strip", registry)
+    assert strip.shape == (192, 670, 3)
+    assert np.shares_memory(strip, frame.image)
+    strip[:] = 7
+    assert frame.image[-1, 0, 0] == 7 and frame.image[1087, 0, 0] == 0
+
+    assert registry.box("center", (670, 1280)) == (168, 320, 502, 960)
+    for _ in range(3):
+        frame.roi("center", registry)
+    assert registry.resolutions == 1
+
+    # 窗口尺寸变化时重新换算
+    registry.view(np.zeros((640, 335), dtype=np.uint8), "center")
+    assert registry.resolutions == 2
+
+
+def test_screen_region_and_validation():
+    """区域换算为屏幕坐标；无效区域在注册时报错"""
+    print_test_header("测试ROI屏幕坐标")
+    registry = RoiRegistry({"card_strip": (0.0, 0.85, 1.0, 1.0)})
+    assert registry.screen_region("card_strip", (100, 50, 400, 800)) == (100, 730, 400, 120)
+    try:
+        registry.register("bad", (0.5, 0.5, 0.2, 1.0))
+        assert False, "无效区域应抛出异常"
+    except ValueError:
+        pass
+
+
+def test_configured_regions():
+    """配置中的默认区域都能在实际截图尺寸下取到非空视图"""
+    print_test_header("测试配置中的ROI区域")
+    image = np.zeros((1280, 670, 3), dtype=np.uint8)
+    registry = get_roi_registry()
+    for name in ("elixir", "card_strip", "button_search", "game_area"):
+        view = registry.view(image, name)
+        print(f"{name}: {registry.box(name, (670, 1280))}")
+        assert view.size > 0 and np.shares_memory(view, image)
+    assert registry.box("elixir", (670, 1280)) == (108, 625, 443, 1265)
+
+
+class FakeBox:
+    """YOLO检测框：类别、置信度和相对于输入图片的坐标"""
+
+    def __init__(self, class_id, xyxy):
+        self.cls = [class_id]
+        self.conf = [0.9]
+        self.xyxy = [xyxy]
+
+
+class FakeResult:
+    def __init__(self, boxes):
+        self.boxes = boxes
+
+
+def test_yolo_detects_game_area():
+    """YOLO只对游戏区域检测，检测框换算回整帧坐标"""
+    print_test_header("测试YOLO使用游戏区域")
+    detector = YoloDetector.__new__(YoloDetector)
+    detector.game_classes = {"troop": 0, "building": 1, "tower": 3, "bridge": 4, "king_tower": 6, "princess_tower": 7}
+    detector.roi_registry = RoiRegistry({"game_area": (0.1, 0.1, 1.0, 0.85)})
+    inputs = []
+    detector.model = lambda image: inputs.append(image.shape) or [FakeResult([FakeBox(0, [10, 20, 30, 40])])]
+
+    elements = detector.detect_game_elements(np.zeros((1280, 670, 3), dtype=np.uint8))
+    print(f"检测输入: {inputs}, 兵种: {elements['troops']}")
+    assert inputs == [(960, 603, 3)]
+    assert elements["troops"][0]["bbox"] == [77, 148, 97, 168]
+
+
+if __name__ == "__main__":
+    test_views_share_memory()
+    test_screen_region_and_validation()
+    test_configured_regions()
+    test_yolo_detects_game_area()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试画面分类器：缩略灰度图加颜色直方图特征，linear和knn两种模型
+"""
+
+import sys
+import os
+import tempfile
+# 将项目根目录添加到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from cr.screen_classifier import ScreenClassifier
+from cr.status_recognizer import StatusRecognizer
+from test_utils import print_test_header
+from train_screen_classifier import capture_sessions, evaluate_classifier
+
+# 每个状态用一种底色加随机噪声模拟同一画面的不同截图
+BASE_COLORS = {"战斗中": (40, 140, 60), "战斗结束": (200, 170, 40), "其他": (60, 60, 200)}
+
+
+def make_frame(label, seed):
+    rng = np.random.default_rng(seed)
+    frame = np.empty((1280, 670, 3), dtype=np.uint8)
+    frame[:] = BASE_COLORS[label]
+    # 上半部分画面不同状态的布局也不同
+    frame[:400, : 200 + 150 * list(BASE_COLORS).index(label)] = 230
+    noise = rng.integers(-20, 21, size=frame.shape)
+    return np.clip(frame.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+
+def make_training_set(classifier):
+    labels = [label for label in BASE_COLORS for _ in range(4)]
+    features = np.stack([classifier.features(make_frame(label, seed)) for seed, label in enumerate(labels)])
+    return features, labels
+
+
+def test_fit_predict():
+    """两种模型都能区分训练集中的状态，训练集中没有的画面被拒绝"""
+    print_test_header("测试画面分类器训练和预测")
+    for method in ("linear", "knn"):
+        classifier = ScreenClassifier(method)
+        features, labels = make_training_set(classifier)
+        classifier.fit(features, labels)
+        for seed, label in enumerate(BASE_COLORS, start=100):
+            predicted, confidence = classifier.predict(make_frame(label, seed))
+            print(f"{method}: {label} -> {predicted} ({confidence:.3f})")
+            assert predicted == label and confidence > 0.9
+
+        unseen = np.full((1280, 670, 3), 255, dtype=np.uint8)
+        unseen[::2] = 0
+        assert classifier.predict(unseen) == (None, 0.0)
+        stats = classifier.stats()
+        print(f"统计: {stats}")
+        assert stats["predictions"] == 4 and stats["outliers"] == 1
+
+
+def test_save_load():
+    """模型保存为一个文件，加载后预测概率不变"""
+    print_test_header("测试画面分类器保存和加载")
+    for method in ("linear", "knn"):
+        classifier = ScreenClassifier(method)
+        features, labels = make_training_set(classifier)
+        classifier.fit(features, labels)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "classifier.npz")
+            classifier.save(path)
+            loaded = ScreenClassifier.load(path)
+        assert loaded.method == method and loaded.labels == classifier.labels
+        feature = classifier.features(make_frame("战斗结束", 200))
+        assert np.allclose(loaded.predict_proba(feature), classifier.predict_proba(feature))
+        assert loaded.radius == classifier.radius
+
+
+def test_recognizer_classifier():
+    """识别器在哈希索引未命中时使用分类器，置信度足够时不计算模板"""
+    print_test_header("测试识别器使用画面分类器")
+    recognizer = StatusRecognizer()
+    recognizer.probes = None
+    recognizer.hash_index = None
+    recognizer.classifier = ScreenClassifier("linear")
+    features, labels = make_training_set(recognizer.classifier)
+    recognizer.classifier.fit(features, labels)
+
+    status, confidence = recognizer.recognize_status(make_frame("战斗中", 300))
+    print(f"战斗中画面: {status} ({confidence:.3f})，模板计算 {recognizer.last_evaluations} 次")
+    assert status == "战斗中" and recognizer.last_evaluations == 0
+
+    # 标注为“其他”的画面返回None
+    status, _ = recognizer.recognize_status(make_frame("其他", 301))
+    assert status is None and recognizer.last_classification[0] == "其他"
+
+
+def test_held_out_evaluation():
+    """按截图时间分会话，整个会话留出时用其余会话训练的模型预测"""
+    print_test_header("测试按会话留出评估")
+    paths = [
+        "战斗中/weapp_auto_20251214_181345.png",
+        "战斗中/weapp_auto_20251214_221227.png",
+        "其他/weapp_auto_20251214_181339.png",
+        "战斗中/战斗中.png",
+        "其他/weapp_auto_20251214_183557.png"
+    ]
+    groups = capture_sessions(paths)
+    print(f"会话: {groups}")
+    assert groups[0] == groups[2] and len(set(groups)) == 4
+
+    classifier = ScreenClassifier("linear")
+    features, labels = make_training_set(classifier)
+    accuracy, errors = evaluate_classifier("linear", features, labels)
+    assert accuracy == 1.0 and errors == []
+    # 每组包含各状态的一半截图，用另一半训练仍能全部预测正确
+    accuracy, errors = evaluate_classifier("linear", features, labels, [i % 2 for i in range(len(labels))])
+    assert accuracy == 1.0 and errors == []
+    # 留出的一组包含某个状态的所有截图时，训练集中没有该状态，这些截图都预测错误
+    groups = [int(label == "其他") for label in labels]
+    accuracy, errors = evaluate_classifier("linear", features, labels, groups)
+    print(f"按组留出准确率: {accuracy:.1%}，错误: {errors}")
+    assert set(errors) >= {i for i, label in enumerate(labels) if label == "其他"}
+
+
+if __name__ == "__main__":
+    test_fit_predict()
+    test_save_load()
+    test_recognizer_classifier()
+    test_held_out_evaluation()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试会话录制与回放：帧、状态和点击写入分块目录，并能以最快速度回放
+"""
+
+import sys
+import os
+# 将项目根目录添加到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tempfile
+import threading
+import time
+import numpy as np
+from cr.automation import CRGameAutomation
+from cr.capture import Frame, ReplayBackend
+from cr.session import SessionRecorder, SessionReader, SessionReplayBackend, SessionReplayer, FakeClickSink
+from test_utils import print_test_header
+
+MENU_FRAME = "png/实际游戏截图/战斗未开始/weapp_auto_20251214_180526.png"
+BATTLE_FRAME = "png/实际游戏截图/战斗中/weapp_auto_20251214_180807.png"
+
+
+def test_recorder_round_trip():
+    """录制的帧、元数据和点击能按顺序读回，尺寸变化时切分分块"""
+    print_test_header("测试会话录制读回")
+    with tempfile.TemporaryDirectory() as session_dir:
+        recorder = SessionRecorder(session_dir, chunk_size=2)
+        for seq in range(5):
+            frame = Frame(np.full((20, 10, 3), seq, dtype=np.uint8), timestamp=100.0 + seq,
+                          region=(1, 2, 10, 20), seq=seq)
+            recorder.record_frame(frame, "战斗中", 0.9)
+            if seq == 1:
+                recorder.record_click(50, 60, True, "战斗中")
+        recorder.record_frame(Frame(np.zeros((30, 10, 3), dtype=np.uint8), timestamp=106.0, seq=5), None, 0.1)
+        recorder.close()
+        stats = recorder.stats()
+        print(f"录制统计: {stats}")
+        assert stats["frames"] == 6 and stats["chunks_written"] == 4 and stats["errors"] == 0
+
+        reader = SessionReader(session_dir)
+        frames = list(reader.iter_frames())
+        assert [frame.seq for frame, _ in frames] == list(range(6))
+        assert frames[3][0].image[0, 0, 0] == 3 and frames[3][0].region == (1, 2, 10, 20)
+        assert frames[5][0].image.shape == (30, 10, 3) and frames[5][1]["status"] is None
+        assert reader.clicks() == [{"timestamp": reader.clicks()[0]["timestamp"], "frame_seq": 1,
+                                    "x": 50, "y": 60, "success": True, "action": "战斗中"}]
+
+
+class SlowRecorder(SessionRecorder):
+    """每个分块写盘前等待一段时间，模拟写盘跟不上录制"""
+
+    def _write_chunk(self, path, images, meta):
+        time.sleep(0.1)
+        return super()._write_chunk(path, images, meta)
+
+
+def test_recorder_slow_writer():
+    """写盘队列满时录制线程等待写盘，但不持有锁：后台线程能更新统计，点击和stats不被阻塞"""
+    print_test_header("测试写盘较慢时的会话录制")
+    with tempfile.TemporaryDirectory() as session_dir:
+        recorder = SlowRecorder(session_dir, chunk_size=1, queue_size=1)
+
+        def record():
+            for seq in range(8):
+                recorder.record_frame(Frame(np.full((20, 10, 3), seq, dtype=np.uint8), seq=seq), "战斗中", 0.9)
+
+        thread = threading.Thread(target=record, daemon=True)
+        thread.start()
+        time.sleep(0.25)
+        # 录制线程在队列上等待时，点击和统计仍能立即完成
+        start_time = time.time()
+        recorder.record_click(50, 60, True)
+        assert recorder.stats()["chunks_written"] >= 1
+        assert time.time() - start_time < 0.05
+        thread.join(5.0)
+        assert not thread.is_alive()
+        recorder.close()
+        stats = recorder.stats()
+        print(f"录制统计: {stats}")
+        assert stats["frames"] == 8 and stats["chunks_written"] >= 8 and stats["errors"] == 0
+        assert [frame.seq for frame, _ in SessionReader(session_dir).iter_frames()] == list(range(8))
+
+
+def test_replay_backend_pacing():
+    """按倍速回放时保持录制的时间间隔，最快速度时不等待"""
+    print_test_header("测试会话回放节奏")
+    with tempfile.TemporaryDirectory() as session_dir:
+        recorder = SessionRecorder(session_dir)
+        for seq in range(3):
+            recorder.record_frame(Frame(np.zeros((4, 4, 3), dtype=np.uint8), timestamp=10.0 + seq * 0.1, seq=seq))
+        recorder.close()
+
+        for speed, minimum, maximum in ((2.0, 0.09, 0.5), (None, 0.0, 0.05)):
+            backend = SessionReplayBackend(session_dir, speed)
+            start_time = time.time()
+            for _ in range(3):
+                backend.grab()
+            elapsed = time.time() - start_time
+            print(f"速度 {speed}: 耗时 {elapsed:.3f} 秒")
+            assert minimum <= elapsed < maximum
+
+
+def test_record_and_replay_automation():
+    """录制自动化循环，再以最快速度回放，点击发送到FakeClickSink"""
+    print_test_header("测试录制并回放自动化循环")
+    automation = CRGameAutomation(use_yolo=False)
+    automation.frame_writer = None
+    automation.action_executor.click_sink = FakeClickSink()
+    automation.screenshot_manager.capture_backend = ReplayBackend(MENU_FRAME)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        session_dir = os.path.join(temp_dir, "session")
+        automation.start_recording(session_dir)
+        recorded = [automation.capture_and_analyze(execute_action=True, save_screenshot=False)[0] for _ in range(2)]
+        automation.screenshot_manager.capture_backend = ReplayBackend(BATTLE_FRAME)
+        recorded.append(automation.capture_and_analyze(execute_action=False, save_screenshot=False)[0])
+        automation.stop_recording()
+        recorded_clicks = len(automation.action_executor.click_sink.clicks)
+
+        replay_automation = CRGameAutomation(use_yolo=False)
+        replay_automation.frame_writer = None
+        replayer = SessionReplayer(session_dir, replay_automation, speed=None, execute_action=True)
+        report = replayer.run()
+        print(f"录制状态: {recorded}, 回放报告: {report}")
+        assert report["frames"] == 3
+        assert report["status_mismatches"] == []
+        assert report["recorded_clicks"] == recorded_clicks
+        # 回放时第三帧也会执行行为，点击数不少于录制时
+        assert report["replayed_clicks"] >= recorded_clicks
+        # 回放结束后恢复原来的截图后端和点击目标
+        assert replay_automation.action_executor.click_sink is replay_automation.action_executor.click_manager
+
+
+if __name__ == "__main__":
+    test_recorder_round_trip()
+    test_recorder_slow_writer()
+    test_replay_backend_pacing()
+    test_record_and_replay_automation()
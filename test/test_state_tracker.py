@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试状态跟踪：按转移概率排列候选状态，足够确定时提前返回，统计节省的模板计算次数
+"""
+
+import sys
+import os
+# 将项目根目录添加到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cr.automation import CRGameAutomation
+from config.config import STATUS_RECOGNITION_CONFIG
+from cr.capture import ReplayBackend
+from cr.pixel_probes import ProbeSet
+from cr.state_tracker import StateTracker
+from cr.status_recognizer import StatusRecognizer
+from test_utils import print_test_header
+
+STATUSES = ["战斗未开始", "战斗中", "战斗结束", "开宝箱"]
+BATTLE_FRAME = "png/实际游戏截图/战斗中/weapp_auto_20251214_181351.png"
+MENU_FRAME = "png/实际游戏截图/战斗未开始/战斗未开始.png"
+
+
+def test_candidate_order():
+    """候选顺序跟随上一个确认的状态，未识别的帧不改变状态，转移次数会更新概率"""
+    print_test_header("测试候选状态顺序")
+    tracker = StateTracker(STATUSES)
+    assert tracker.candidates() is None
+
+    tracker.update("战斗中", 8, 8)
+    assert tracker.candidates()[:2] == ["战斗中", "战斗结束"]
+    tracker.update(None, 8, 8)
+    assert tracker.last_status == "战斗中"
+    # 像素探针等阶段直接给出结果的帧不计算模板，但没有按候选顺序检查，不算节省
+    tracker.update("战斗中", 0, 8)
+    assert tracker.stats()["last_saved"] == 0
+
+    # 观察到足够多的战斗中 -> 开宝箱后，开宝箱排到战斗结束之前
+    for _ in range(5):
+        tracker.update("开宝箱", 2, 8, early_stop=True)
+        tracker.last_status = "战斗中"
+    assert tracker.candidates().index("开宝箱") < tracker.candidates().index("战斗结束")
+
+    stats = tracker.stats()
+    print(f"统计: {stats}")
+    assert stats["frames"] == 8 and stats["early_stops"] == 5
+    assert stats["saved_evaluations"] == 30
+
+
+def test_recognizer_candidates():
+    """按候选顺序识别的结果与完整识别一致，确定时少计算模板，不确定时完整识别"""
+    print_test_header("测试按候选顺序识别")
+    recognizer = StatusRecognizer()
+    # 语料截图都在像素探针、哈希索引、分类器和颜色签名的训练集中，全部关闭以测试模板匹配路径
+    recognizer.probes = None
+    recognizer.hash_index = None
+    recognizer.classifier = None
+    # 颜色预筛选和分级识别会让完整识别只检查部分状态，关闭后比较候选顺序与完整识别
+    recognizer.color_signatures = None
+    recognizer.coarse_groups = {}
+    full_status, _ = recognizer.recognize_status(BATTLE_FRAME)
+    full_evaluations = recognizer.last_evaluations
+
+    status, _ = recognizer.recognize_status(BATTLE_FRAME, candidates=["战斗结束", "战斗中", "战斗未开始", "开宝箱"])
+    print(f"战斗中画面: {status}，模板计算 {recognizer.last_evaluations}/{recognizer.total_evaluations} 次")
+    assert status == full_status == "战斗中"
+    assert recognizer.last_candidates_checked and recognizer.last_early_stop
+    assert recognizer.last_evaluations < full_evaluations
+
+    # 对战按钮相似度不够高，不能提前返回，完整识别的结果不变
+    full_status, full_similarity = recognizer.recognize_status(MENU_FRAME)
+    status, similarity = recognizer.recognize_status(MENU_FRAME, candidates=["战斗未开始", "战斗中"])
+    assert not recognizer.last_early_stop
+    assert (status, similarity) == (full_status, full_similarity)
+
+
+def test_automation_tracking():
+    """实时循环中状态跟踪器记录每帧节省的模板计算次数"""
+    print_test_header("测试自动化流程状态跟踪")
+    automation = CRGameAutomation(use_yolo=False)
+    automation.change_detector = None
+    automation.status_recognizer.probes = None
+    automation.status_recognizer.hash_index = None
+    automation.status_recognizer.classifier = None
+    automation.screenshot_manager.capture_backend = ReplayBackend(BATTLE_FRAME)
+    for _ in range(3):
+        status, _ = automation.capture_and_analyze(save_screenshot=False)
+        assert status == "战斗中"
+    stats = automation.get_state_tracking_stats()
+    print(f"统计: {stats}")
+    assert stats["frames"] == 3 and stats["early_stops"] == 2
+    assert stats["saved_evaluations"] > 0
+
+
+def test_probe_frames_not_counted():
+    """像素探针直接给出结果的帧没有按候选顺序检查，不计入节省的模板计算次数"""
+    print_test_header("测试探针识别的帧不计入节省")
+    automation = CRGameAutomation(use_yolo=False)
+    automation.change_detector = None
+    recognizer = automation.status_recognizer
+    recognizer.probes = ProbeSet.load(STATUS_RECOGNITION_CONFIG["probes"]["probes_path"])
+    automation.screenshot_manager.capture_backend = ReplayBackend(BATTLE_FRAME)
+    for _ in range(3):
+        status, _ = automation.capture_and_analyze(save_screenshot=False)
+        assert status == "战斗中" and recognizer.last_probe_match is not None
+        assert not recognizer.last_candidates_checked
+    stats = automation.get_state_tracking_stats()
+    print(f"统计: {stats}")
+    assert stats["frames"] == 3 and stats["saved_evaluations"] == 0
+
+
+if __name__ == "__main__":
+    test_candidate_order()
+    test_recognizer_candidates()
+    test_automation_tracking()
+    test_probe_frames_not_counted()
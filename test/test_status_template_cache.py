@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试状态模板缓存：同一截图尺寸只缩放一次模板，页面相似度与逐个模板匹配的结果一致
+"""
+
+import sys
+import os
+# 将项目根目录添加到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from cr.status_recognizer import StatusRecognizer
+from cr.utils import ImageUtils
+from test_utils import print_test_header
+
+SCREENSHOT_PATH = "png/实际游戏截图/战斗结束/战斗结束.png"
+
+
+def test_gray_array_matches_pil():
+    """numpy灰度转换与PIL的convert("L")逐像素一致"""
+    print_test_header("测试灰度数组转换")
+    gray = ImageUtils.load_gray_array(SCREENSHOT_PATH)
+    expected = np.asarray(ImageUtils.load_gray_image(SCREENSHOT_PATH))
+    assert gray.dtype == np.uint8 and gray.shape == expected.shape
+    assert np.array_equal(gray, expected)
+
+
+def test_page_similarities_match_legacy():
+    """一次算出的页面相似度与simple_template_matching逐个计算的结果相同"""
+    print_test_header("测试批量页面相似度")
+    recognizer = StatusRecognizer()
+    gray = ImageUtils.load_gray_array(SCREENSHOT_PATH)
+    similarities = recognizer.compute_page_similarities(gray)
+    legacy_gray = ImageUtils.load_gray_image(SCREENSHOT_PATH)
+    for status, config in recognizer.status_templates.items():
+        expected = ImageUtils.simple_template_matching(legacy_gray, config["template_img"])
+        print(f"{status}: {similarities[status]:.6f}")
+        assert abs(similarities[status] - expected) < 1e-9
+
+
+def test_cache_hits_and_eviction():
+    """同一尺寸命中缓存，超过容量时淘汰最久未使用的尺寸"""
+    print_test_header("测试模板缓存淘汰")
+    recognizer = StatusRecognizer()
+    recognizer.template_cache_size = 2
+    statuses, templates = recognizer.get_resized_templates((67, 128))
+    assert templates.shape == (len(statuses), 128, 67)
+    assert not templates.flags.writeable
+    assert recognizer.get_resized_templates((67, 128))[1] is templates
+
+    recognizer.get_resized_templates((100, 200))
+    recognizer.get_resized_templates((67, 128))
+    recognizer.get_resized_templates((50, 90))
+    stats = recognizer.get_cache_stats()
+    assert stats["sizes"] == [(67, 128), (50, 90)]
+    assert stats["hits"] == 2 and stats["misses"] == 3
+
+
+if __name__ == "__main__":
+    test_gray_array_matches_pil()
+    test_page_similarities_match_legacy()
+    test_cache_hits_and_eviction()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试模板库：所有模板堆叠成一个矩阵，一次计算得到完整的得分向量
+"""
+
+import sys
+import os
+# 将项目根目录添加到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from cr.template_bank import TemplateBank
+from test_utils import print_test_header
+
+
+def make_page(seed):
+    return np.random.default_rng(seed).integers(0, 256, size=(1280, 670, 3), dtype=np.uint8)
+
+
+def test_score_vector():
+    """与所有模板的得分一次算出，同一状态的多个模板取最大值"""
+    print_test_header("测试模板库得分向量")
+    bank = TemplateBank()
+    pages = {seed: make_page(seed) for seed in range(5)}
+    bank.add("战斗中", pages[0])
+    bank.add("战斗结束", pages[1])
+    bank.add("战斗中", pages[2])
+    bank.add("开宝箱", pages[3])
+
+    matrix = bank.matrix
+    assert matrix.shape == (4, 64 * 120) and matrix.flags.c_contiguous and not matrix.flags.writeable
+    # 同一状态的模板相邻排列
+    assert bank.labels == ["战斗中", "战斗中", "战斗结束", "开宝箱"]
+
+    scores = bank.score(pages[2])
+    assert scores.shape == (4,)
+    assert abs(scores[1] - 1.0) < 1e-4 and scores[0] < 0.5
+    label_scores = bank.label_scores(scores)
+    assert abs(label_scores["战斗中"] - 1.0) < 1e-4 and label_scores["开宝箱"] < 0.5
+
+    # 多帧一次矩阵乘法，结果与逐帧计算一致
+    batch = bank.score_many([pages[2], pages[4]])
+    assert batch.shape == (2, 4)
+    assert np.allclose(batch[0], scores, atol=1e-5)
+    labels, maxima = bank.label_scores_many(batch)
+    assert labels == ["战斗中", "战斗结束", "开宝箱"] and maxima.shape == (2, 3)
+    assert np.allclose(maxima[0], [label_scores[label] for label in labels], atol=1e-5)
+
+
+def test_fits_page_templates():
+    """整页截图适合放入模板库，按钮等局部截图不适合"""
+    print_test_header("测试整页模板判断")
+    bank = TemplateBank()
+    assert bank.fits((670, 1280)) and bank.fits((1026, 1910))
+    assert not bank.fits((106, 60)) and not bank.fits((114, 146)) and not bank.fits((32, 60))
+
+
+def test_legacy_recognizer():
+    """旧版识别器把整页模板放入模板库，识别结果正确"""
+    print_test_header("测试旧版识别器使用模板库")
+    from status_recognizer import ScreenStatusRecognizer
+    recognizer = ScreenStatusRecognizer()
+    assert len(recognizer.template_bank) > 0
+    for path, expected in (("png/实际游戏截图/战斗结束/战斗结束.png", "战斗结束"),
+                           ("png/实际游戏截图/战斗中/战斗中.png", "战斗中")):
+        status, similarity = recognizer.recognize_status(path)
+        print(f"{path}: {status} ({similarity:.4f})")
+        assert status == expected
+
+
+if __name__ == "__main__":
+    test_score_vector()
+    test_fits_page_templates()
+    test_legacy_recognizer()
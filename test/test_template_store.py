@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试模板仓库：模板只预处理一次，快照内存映射，模板文件修改后快照失效
+"""
+
+import sys
+import os
+import tempfile
+# 将项目根目录添加到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import cv2
+from PIL import Image
+from cr.template_bank import TemplateBank
+from cr.template_store import TemplateStore
+from test_utils import print_test_header
+
+
+def write_templates(root_dir):
+    """写入一个整页模板和一个带透明区域的按钮模板"""
+    rng = np.random.default_rng(0)
+    os.makedirs(os.path.join(root_dir, "战斗中"))
+    page = rng.integers(0, 256, size=(240, 128, 3), dtype=np.uint8)
+    Image.fromarray(page).save(os.path.join(root_dir, "战斗中", "页面.png"))
+    button = rng.integers(0, 256, size=(30, 40, 4), dtype=np.uint8)
+    button[..., 3] = 255
+    button[:10, :10, 3] = 0
+    Image.fromarray(button, "RGBA").save(os.path.join(root_dir, "战斗中", "按钮.png"))
+    return page, button
+
+
+def test_preprocessed_arrays():
+    """灰度、模糊、掩码和标准向量与逐次预处理的结果一致，且都是只读数组"""
+    print_test_header("测试模板仓库预处理结果")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        page, button = write_templates(temp_dir)
+        store = TemplateStore(temp_dir, snapshot_dir=os.path.join(temp_dir, "snapshot"))
+        page_path = os.path.join(temp_dir, "战斗中", "页面.png")
+        button_path = os.path.join(temp_dir, "战斗中", "按钮.png")
+        print(f"模板: {store.entries(os.path.join(temp_dir, '战斗中'))}")
+        assert len(store) == 2 and store.labels == ["战斗中", "战斗中"]
+
+        expected_gray = np.asarray(Image.fromarray(page).convert("L"))
+        assert np.array_equal(store.gray(page_path), expected_gray)
+        assert np.array_equal(store.blurred(page_path), cv2.GaussianBlur(expected_gray, (3, 3), 0))
+        assert np.allclose(store.vector(page_path), TemplateBank().vectorize(page), atol=1e-6)
+        assert store.size(button_path) == (40, 30)
+        assert store.mask(page_path) is None
+        assert np.array_equal(store.mask(button_path), (button[..., 3] > 0).astype(np.uint8))
+        for array in (store.gray(page_path), store.blurred(button_path), store.vector(page_path)):
+            assert not array.flags.writeable
+
+
+def test_snapshot_invalidation():
+    """第二次启动直接映射快照；模板文件修改时间变化后重新预处理"""
+    print_test_header("测试模板快照失效")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        write_templates(temp_dir)
+        snapshot_dir = os.path.join(temp_dir, "snapshot")
+        first = TemplateStore(temp_dir, snapshot_dir=snapshot_dir)
+        second = TemplateStore(temp_dir, snapshot_dir=snapshot_dir)
+        print(f"首次: {first.stats()}")
+        print(f"再次: {second.stats()}")
+        assert first.rebuilt and not second.rebuilt
+        assert second.stats()["memory_mapped"]
+        page_path = os.path.join(temp_dir, "战斗中", "页面.png")
+        assert np.array_equal(first.gray(page_path), second.gray(page_path))
+
+        # 覆盖模板并修改修改时间，快照失效
+        Image.fromarray(np.zeros((240, 128, 3), dtype=np.uint8)).save(page_path)
+        stat = os.stat(page_path)
+        os.utime(page_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        third = TemplateStore(temp_dir, snapshot_dir=snapshot_dir)
+        assert third.rebuilt and third.gray(page_path).max() == 0
+        assert not TemplateStore(temp_dir, snapshot_dir=snapshot_dir).rebuilt
+
+
+if __name__ == "__main__":
+    test_preprocessed_arrays()
+    test_snapshot_invalidation()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试共享窗口几何服务：窗口位置和屏幕尺寸只在失效时重新查询
+"""
+
+import sys
+import os
+import time
+import subprocess
+# 将项目根目录添加到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cr.click_manager import ClickManager
+from cr.screenshot import ScreenshotManager
+from cr.capture import ReplayBackend
+from cr.window_geometry import WindowGeometryService, StaticGeometryBackend, GeometryBackend, \
+    AppleScriptGeometryBackend
+from test_utils import print_test_header
+
+MENU_FRAME = "png/实际游戏截图/战斗未开始/weapp_auto_20251214_180526.png"
+
+
+class FailingGeometryBackend(GeometryBackend):
+    """每次查询都失败的后端"""
+
+    name = "failing"
+
+    def query_window_bounds(self, process_name):
+        self.subprocess_count += 1
+        raise RuntimeError("osascript不可用")
+
+    def query_screen_size(self):
+        self.subprocess_count += 1
+        raise RuntimeError("osascript不可用")
+
+
+class RecordingAutomation:
+    """记录AppleScript和cliclick命令、不真正执行的自动化客户端
+
+    AppleScript返回bounds字典中的当前窗口位置和大小，未提供时返回固定的窗口几何
+    """
+
+    def __init__(self, enabled=True, bounds=None):
+        self.enabled = enabled
+        self.bounds = bounds
+        self.scripts = []
+        self.clicks = []
+
+    def run_osascript(self, script, check=False):
+        self.scripts.append(script)
+        if self.bounds is None:
+            return subprocess.CompletedProcess(["osascript"], 0, "{10, 20, 300, 600}\n", "")
+        values = ", ".join(str(self.bounds[key]) for key in ("x", "y", "width", "height"))
+        return subprocess.CompletedProcess(["osascript"], 0, values + "\n", "")
+
+    def run_cliclick(self, *args, check=True):
+        self.clicks.extend(args)
+
+
+def make_service(latency=0.0):
+    backend = StaticGeometryBackend({"x": 100, "y": 50, "width": 400, "height": 800}, (1440, 900), latency)
+    return WindowGeometryService(backend=backend)
+
+
+def test_cache_and_invalidate():
+    """重复查询命中缓存，显式失效后重新查询到新的窗口位置"""
+    print_test_header("测试窗口几何缓存")
+    service = make_service(latency=0.01)
+    for _ in range(5):
+        assert service.get_region() == (100, 50, 400, 800)
+        assert service.get_screen_size() == (1440, 900)
+    assert service.backend.subprocess_count == 2
+
+    service.backend.window_bounds["x"] = 300
+    assert service.get_region()[0] == 100
+    service.invalidate("窗口被移动")
+    assert service.get_region((10, 20, 0, 0)) == (310, 70, 390, 780)
+
+    stats = service.stats()
+    print(f"几何服务统计: {stats}")
+    assert stats["window_queries"] == 2 and stats["window_hits"] == 5
+    assert stats["screen_hits"] == 4
+    assert stats["subprocesses_saved"] == 7 * 3 - 2 + 4
+    assert stats["latency_saved"] > 0.05
+
+
+def test_failed_query_uses_default_then_retries():
+    """查询失败时返回默认值，重试间隔内不再启动子进程"""
+    print_test_header("测试查询失败回退")
+    service = WindowGeometryService(backend=FailingGeometryBackend(), retry_interval=60.0)
+    assert service.get_window_bounds() == {"x": 400, "y": 100, "width": 800, "height": 600}
+    assert service.get_screen_size() == (1920, 1080)
+    service.get_window_bounds()
+    assert service.backend.subprocess_count == 2
+
+    service.retry_interval = 0.0
+    service.get_window_bounds()
+    assert service.backend.subprocess_count == 3 and service.query_failures == 3
+
+
+def test_click_manager_shares_cache():
+    """截图和点击模块共用同一份缓存，点击检查不再重复查询屏幕尺寸"""
+    print_test_header("测试截图和点击共用缓存")
+    service = make_service()
+    screenshot_manager = ScreenshotManager(capture_backend=ReplayBackend(MENU_FRAME), geometry=service)
+    click_manager = screenshot_manager.click_manager
+    assert click_manager.geometry is service
+
+    for _ in range(10):
+        assert click_manager.check_click_position(300, 400)[0]
+    assert not click_manager.check_click_position(2000, 400)[0]
+    assert service.backend.subprocess_count == 2
+    assert screenshot_manager.weapp_region == click_manager.cr_window_region
+
+    # 截图帧携带的区域优先于缓存区域
+    click_manager.cr_window_region = (0, 0, 200, 200)
+    assert click_manager.get_cr_window_position()["right"] == 200
+
+
+def test_click_sanity_failure_refreshes_region():
+    """点击位置校验失败时使缓存失效，按新的窗口位置重新计算"""
+    print_test_header("测试点击校验失败刷新缓存")
+    service = make_service()
+    click_manager = ClickManager(geometry=service)
+    click_manager.get_cr_window_position()
+
+    # 窗口被移动到右侧，缓存中仍是旧位置
+    service.backend.window_bounds["x"] = 800
+    abs_x, abs_y, is_valid, _ = click_manager._resolve_position(850, 400)
+    print(f"校验结果: ({abs_x}, {abs_y}) {is_valid}, 统计: {service.stats()}")
+    assert is_valid and service.sanity_failures == 1
+    assert click_manager.get_cr_window_position()["x"] == 800
+
+
+def test_window_moved_between_clicks():
+    """两次点击之间窗口被移动：激活微信返回的窗口位置与缓存不同，第二次点击落在新位置"""
+    print_test_header("测试两次点击之间窗口移动")
+    service = make_service()
+    automation = RecordingAutomation(bounds=service.backend.window_bounds)
+    click_manager = ClickManager(geometry=service, automation=automation)
+
+    assert click_manager.click(50, 50)
+    service.backend.window_bounds.update({"x": 600, "y": 80})
+    assert click_manager.click(50, 50)
+    print(f"点击: {automation.clicks}, 统计: {service.stats()}")
+    assert automation.clicks == ["c:300,450", "c:800,480"]
+    assert service.invalidations == 1 and service.sanity_failures == 0
+
+
+def test_clicks_reuse_cached_bounds():
+    """窗口没有移动时，激活微信不会使缓存失效，连续点击不再单独查询窗口位置"""
+    print_test_header("测试连续点击复用窗口位置缓存")
+    service = make_service()
+    automation = RecordingAutomation(bounds=service.backend.window_bounds)
+    click_manager = ClickManager(geometry=service, automation=automation)
+
+    assert service.get_region() == (100, 50, 400, 800)
+    for _ in range(3):
+        assert click_manager.click(50, 50)
+    assert click_manager.double_click(25, 25)
+    stats = service.stats()
+    print(f"点击: {automation.clicks}, 统计: {stats}")
+    assert automation.clicks[:3] == ["c:300,450"] * 3
+    assert stats["window_queries"] == 1 and stats["invalidations"] == 0 and stats["window_hits"] > 0
+
+    # 激活返回的结果无法解析时使缓存失效，下一次点击重新查询
+    automation.bounds = None
+    automation.run_osascript = lambda script, check=False: subprocess.CompletedProcess(["osascript"], 0, "", "")
+    assert click_manager.click(50, 50)
+    assert service.invalidations == 1 and service.window_queries == 2
+
+def test_cache_expires_after_max_age():
+    """缓存超过max_age后重新查询，即使没有显式失效"""
+    print_test_header("测试窗口位置缓存过期")
+    service = make_service()
+    service.max_age = 0.05
+    assert service.get_region()[0] == 100
+    service.backend.window_bounds["x"] = 200
+    time.sleep(0.06)
+    assert service.get_region()[0] == 200 and service.window_queries == 2
+
+
+def test_worker_queries_are_not_subprocesses():
+    """通过常驻自动化进程的查询只计为往返，客户端禁用时才计为启动的子进程"""
+    print_test_header("测试子进程计数")
+    for enabled in (True, False):
+        service = WindowGeometryService(backend=AppleScriptGeometryBackend(RecordingAutomation(enabled)))
+        for _ in range(3):
+            assert service.get_region() == (10, 20, 300, 600)
+        assert service.get_screen_size() == (300, 600)
+        stats = service.stats()
+        print(f"自动化进程{'启用' if enabled else '禁用'}: {stats}")
+        assert stats["worker_roundtrips"] == (2 if enabled else 0)
+        assert stats["subprocess_count"] == (0 if enabled else 2)
+        assert stats["subprocesses_saved"] == 3 * 3 + 1 - stats["subprocess_count"]
+
+
+if __name__ == "__main__":
+    test_cache_and_invalidate()
+    test_failed_query_uses_default_then_retries()
+    test_click_manager_shares_cache()
+    test_click_sanity_failure_refreshes_region()
+    test_window_moved_between_clicks()
+    test_clicks_reuse_cached_bounds()
+    test_cache_expires_after_max_age()
+    test_worker_queries_are_not_subprocesses()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+用已标注的实际游戏截图训练轻量画面分类器，供StatusRecognizer运行时使用
+
+用法:
+    python train_screen_classifier.py [截图目录] [模型文件] [linear|knn]
+    截图目录默认为 png/实际游戏截图（子目录名即为状态），模型文件和分类方法默认读取
+    STATUS_RECOGNITION_CONFIG["classifier"]
+
+训练前先评估：留一法（每张截图用其余截图训练的模型预测）和按截图会话留出（同一会话的截图
+连续截取、画面几乎相同，整个会话用其余会话训练的模型预测），报告两者的准确率；后者更接近
+未见过的截图上的表现。训练完成后报告模型文件大小和单帧特征提取、推理耗时。
+"""
+
+import os
+import re
+import sys
+import time
+from datetime import datetime
+import numpy as np
+from cr.screen_classifier import ScreenClassifier, labeled_images
+from cr.utils import ImageUtils
+from config.config import STATUS_RECOGNITION_CONFIG
+
+
+# 文件名中的截图时间，例如 weapp_auto_20251214_181351.png
+CAPTURE_TIME_PATTERN = re.compile(r"(\d{8}_\d{6})")
+# 相邻截图间隔超过该秒数时视为新的截图会话
+SESSION_GAP_SECONDS = 600
+
+
+def capture_sessions(paths, gap=SESSION_GAP_SECONDS):
+    """按文件名中的截图时间把截图分成会话，文件名中没有时间的截图各自成为一个会话
+
+    返回:
+        groups: 每张截图的会话编号
+    """
+    times = []
+    for path in paths:
+        match = CAPTURE_TIME_PATTERN.search(os.path.basename(path))
+        times.append(datetime.strptime(match.group(1), "%Y%m%d_%H%M%S") if match else None)
+    groups = [None] * len(paths)
+    session = -1
+    previous = None
+    for i in sorted((i for i in range(len(paths)) if times[i] is not None), key=lambda i: times[i]):
+        if previous is None or (times[i] - previous).total_seconds() > gap:
+            session += 1
+        groups[i] = session
+        previous = times[i]
+    for i in range(len(paths)):
+        if groups[i] is None:
+            session += 1
+            groups[i] = session
+    return groups
+
+
+def evaluate_classifier(method, features, labels, groups=None):
+    """交叉验证：每组截图用其余截图训练的模型预测
+
+    参数:
+        groups: 每张截图的分组编号，None表示每张截图自成一组（留一法）
+
+    返回:
+        (accuracy, errors): 准确率和预测错误（含被当作未见过画面拒绝）的样本下标
+    """
+    groups = np.arange(len(labels)) if groups is None else np.asarray(groups)
+    errors = []
+    for group in np.unique(groups):
+        keep = groups != group
+        classifier = ScreenClassifier(method).fit(features[keep], [labels[j] for j in np.flatnonzero(keep)])
+        for i in np.flatnonzero(~keep):
+            best = int(np.argmax(classifier.predict_proba(features[i])))
+            if classifier.labels[best] != labels[i] or classifier.is_outlier(features[i], best):
+                errors.append(int(i))
+    return 1 - len(errors) / len(labels), sorted(errors)
+
+
+def train_screen_classifier(screenshot_dir="png/实际游戏截图", model_path=None, method=None):
+    """训练并保存分类器，输出留一法和按会话留出的准确率、模型大小和推理耗时"""
+    config = STATUS_RECOGNITION_CONFIG.get("classifier", {})
+    model_path = model_path or config.get("model_path", "png/status_classifier.npz")
+    method = method or config.get("method", "linear")
+
+    images = labeled_images(screenshot_dir)
+    if not images:
+        print(f"✗ 目录中没有已标注的截图: {screenshot_dir}")
+        return None
+    labels = [label for label, _ in images]
+    counts = {}
+    for label in labels:
+        counts[label] = counts.get(label, 0) + 1
+    print(f"训练画面分类器: {screenshot_dir} ({method})，共 {len(images)} 张截图: {counts}")
+
+    # 特征只提取一次，留一法评估和最终训练共用
+    extractor = ScreenClassifier(method)
+    frames = [ImageUtils.load_image_array(path) for _, path in images]
+    features = np.stack([extractor.features(frame) for frame in frames])
+
+    accuracy, errors = evaluate_classifier(method, features, labels)
+    print(f"\n留一法准确率: {accuracy:.1%}")
+    for i in errors:
+        print(f"  ✗ {images[i][1]}")
+    groups = capture_sessions([path for _, path in images])
+    held_out_accuracy, held_out_errors = evaluate_classifier(method, features, labels, groups)
+    print(f"按截图会话留出准确率: {held_out_accuracy:.1%} ({len(set(groups))} 个会话)")
+    for i in held_out_errors:
+        print(f"  ✗ {images[i][1]}")
+
+    start_time = time.time()
+    classifier = ScreenClassifier(method).fit(features, labels)
+    train_time = time.time() - start_time
+    classifier.save(model_path)
+    print(f"\n✓ 模型已保存: {model_path} ({os.path.getsize(model_path)} 字节)，训练耗时 {train_time:.3f} 秒")
+
+    # 运行时帧已在内存中，测量特征提取和推理的耗时
+    for frame in frames:
+        classifier.predict(frame)
+    stats = classifier.stats()
+    print(f"  单帧特征提取: {stats['avg_feature_us']:.1f} 微秒，推理: {stats['avg_inference_us']:.1f} 微秒")
+    return {
+        "accuracy": accuracy,
+        "held_out_accuracy": held_out_accuracy,
+        "train_time": train_time,
+        "avg_feature_us": stats["avg_feature_us"],
+        "avg_inference_us": stats["avg_inference_us"]
+    }
+
+
+if __name__ == "__main__":
+    train_screen_classifier(*sys.argv[1:4])